@@ -11,7 +11,7 @@ WEEKEND_CUTOFF = time(15, 15)   # fredag 15:15
 DAGNAVN = ["mandag","tirsdag","onsdag","torsdag","fredag","lørdag","søndag"]
 
 TOP_N_SENDERS = 25              # antall avsendere i e-posten
-SEARCH_TIMEOUT_SEC = 12         # ventetid per AdvancedSearch-kall
+SEARCH_TIMEOUT_SEC = 300        # ytre sikkerhetsgrense for samtidige AdvancedSearch (event-drevet)
 MAX_PER_FOLDER = 6000           # maks meldinger per mappe ved manuell skanning
 LOOKBACK_DAYS = 30              # sikkerhetsmargin bakover ved manuell skanning
 FALLBACK_RECENT_N = 2000        # N siste i default Innboks (fallback), filtreres til uke
@@ -218,21 +218,15 @@ def _msg_time(it):
 # =======================
 #  HENTING VIA OUTLOOK
 # =======================
-def _run_advanced_search(app, scope_str, query):
-    """Kjør AdvancedSearch og returner liste_av_mailitems. scope_str må være sitert ('...')."""
-    srch = app.AdvancedSearch(Scope=scope_str, Filter=query, SearchSubFolders=True, Tag=f"HS_{int(pytime.time()*1000)}")
-    waited = 0.0
-    while True:
+class _SearchEvents:
+    """Mottar Application.AdvancedSearchComplete; fullførte søk samles på Tag."""
+    def OnAdvancedSearchComplete(self, SearchObject):
         try:
-            if getattr(srch, "Complete", False):
-                break
+            self.done[SearchObject.Tag] = SearchObject
         except Exception:
-            break
-        pytime.sleep(0.25)
-        waited += 0.25
-        if waited >= SEARCH_TIMEOUT_SEC:
-            break
+            pass
 
+def _collect_mail(srch):
     results = []
     try:
         res = srch.Results
@@ -248,8 +242,54 @@ def _run_advanced_search(app, scope_str, query):
         pass
     return results
 
-def _build_inbox_scope_list(session):
-    """Returner en komma-separert streng med **sitert** sti for alle Innboks-mapper."""
+def _run_advanced_searches(app, scopes, query):
+    """
+    Starter ett AdvancedSearch per scope samtidig (egen Tag per søk) og samler
+    resultatene etter hvert som AdvancedSearchComplete fyrer. Venter på meldinger
+    (ingen fast sleep-polling). SEARCH_TIMEOUT_SEC er kun en ytre sikkerhetsgrense:
+    søk som ikke blir ferdige stoppes, delresultatet tas med og scopet rapporteres.
+    Returnerer (liste_av_mailitems, ufullstendige_scopes).
+    """
+    import pythoncom, win32event  # type: ignore
+    ev = win32.WithEvents(app, _SearchEvents)
+    ev.done = {}
+
+    pending, incomplete = {}, []
+    base = int(pytime.time() * 1000)
+    for i, scope in enumerate(scopes):
+        tag = f"HS_{base}_{i}"
+        try:
+            srch = app.AdvancedSearch(Scope=scope, Filter=query, SearchSubFolders=True, Tag=tag)
+            pending[tag] = (scope, srch)
+        except Exception:
+            incomplete.append(scope)          # kunne ikke startes – telles som ufullstendig
+
+    results = []
+    deadline = pytime.monotonic() + SEARCH_TIMEOUT_SEC
+    while pending:
+        pythoncom.PumpWaitingMessages()
+        for tag in [t for t in pending if t in ev.done]:
+            pending.pop(tag)
+            results.extend(_collect_mail(ev.done.pop(tag)))
+        remaining = deadline - pytime.monotonic()
+        if not pending or remaining <= 0:
+            break
+        # Blokker til neste COM-melding (event) eller timeout
+        win32event.MsgWaitForMultipleObjects([], False, int(min(remaining, 1.0) * 1000), win32event.QS_ALLINPUT)
+
+    for scope, srch in pending.values():
+        try: srch.Stop()
+        except Exception: pass
+        results.extend(_collect_mail(srch))
+        incomplete.append(scope)
+    try:
+        ev.close()
+    except Exception:
+        pass
+    return results, incomplete
+
+def _inbox_scopes(session):
+    """Returner en liste med **sitert** sti for alle Innboks-mapper (én per store)."""
     parts = []
     olFolderInbox = 6
     try:
@@ -271,7 +311,26 @@ def _build_inbox_scope_list(session):
                 continue
     except Exception:
         pass
-    return ", ".join(parts)
+    return parts
+
+def _search_all_inboxes(app, session, query):
+    """AdvancedSearch i alle Innboks-scopes parallelt (se _run_advanced_searches)."""
+    scopes = _inbox_scopes(session)
+    if not scopes:
+        return [], ["(ingen Innboks)"]
+    return _run_advanced_searches(app, scopes, query)
+
+def _received_since(dt):
+    """DASL-filter for AdvancedSearch: mottatt fra og med dt."""
+    return f"\"urn:schemas:httpmail:datereceived\" >= '{dt:%m/%d/%Y %H:%M}'"
+
+def _count_mail(counts, it, sow_date):
+    if getattr(it, "Class", None) == 43:
+        dt = _msg_time(it)
+        if dt and dt.date() >= sow_date:
+            name, smtp = _normalize_sender(it)
+            key = ((name or "")[:120], (smtp or "")[:200])
+            counts[key] = counts.get(key, 0) + 1
 
 def _walk_subfolders(folder):
     yield folder
@@ -309,12 +368,7 @@ def _count_senders_in_folder(folder, sow_date, per_folder_limit=MAX_PER_FOLDER):
     if use_seq:
         while it and processed < per_folder_limit:
             try:
-                if getattr(it, "Class", None) == 43:
-                    dt = _msg_time(it)
-                    if dt and dt.date() >= sow_date:
-                        name, smtp = _normalize_sender(it)
-                        key = ((name or "")[:120], (smtp or "")[:200])
-                        counts[key] = counts.get(key, 0) + 1
+                _count_mail(counts, it, sow_date)
                 processed += 1
                 it = items.GetNext()
             except Exception:
@@ -330,27 +384,38 @@ def _count_senders_in_folder(folder, sow_date, per_folder_limit=MAX_PER_FOLDER):
         for idx in range(1, upto + 1):
             try:
                 it = items.Item(idx)
-                if it and getattr(it, "Class", None) == 43:
-                    dt = _msg_time(it)
-                    if dt and dt.date() >= sow_date:
-                        name, smtp = _normalize_sender(it)
-                        key = ((name or "")[:120], (smtp or "")[:200])
-                        counts[key] = counts.get(key, 0) + 1
+                if it:
+                    _count_mail(counts, it, sow_date)
             except Exception:
                 continue
 
     return counts
 
-def _weekly_sender_stats(session, top_n=TOP_N_SENDERS):
-    """Avsenderstatistikk for inneværende uke. Skanner Innboks + undermapper."""
-    sow_date = _start_of_week_local().date()
+def _weekly_sender_stats(session, top_n=TOP_N_SENDERS, app=None):
+    """
+    Avsenderstatistikk for inneværende uke. Med app: AdvancedSearch i alle Innboks-mapper
+    (alle stores, med undermapper) samtidig. Skanner default Innboks + undermapper bare
+    hvis søket ikke kunne kjøres eller ikke ble ferdig.
+    """
+    sow = _start_of_week_local()
+    sow_date = sow.date()
     counts = {}
 
-    # Default Innboks
-    try:
-        inbox = session.GetDefaultFolder(6)  # olFolderInbox
-    except Exception:
-        inbox = None
+    found, incomplete = [], ["(ikke søkt)"]
+    if app is not None:
+        try:
+            found, incomplete = _search_all_inboxes(app, session, _received_since(sow))
+        except Exception:
+            pass
+    if not incomplete:
+        for it in found:
+            _count_mail(counts, it, sow_date)
+        inbox = None             # søket er komplett – ingen skanning
+    else:
+        try:
+            inbox = session.GetDefaultFolder(6)  # olFolderInbox
+        except Exception:
+            inbox = None
 
     # Skann Innboks + undermapper
     if inbox is not None:
@@ -440,7 +505,7 @@ def _send_mail(subject, status_text):
     if not to_addr:
         return False, "Fant ikke standard e-post i Outlook-profilen. Sett FALLBACK_EMAIL i koden."
 
-    stats = _weekly_sender_stats(session, TOP_N_SENDERS)
+    stats = _weekly_sender_stats(session, TOP_N_SENDERS, app)
     html = _build_html(subject, status_text, stats)
 
     m = app.CreateItem(0)  # olMailItem
@@ -536,12 +601,13 @@ def sjekk_helg_og_send():
 # =======================
 #  GUI
 # =======================
-root = tk.Tk()
-root.title("Helgesjekk (Outlook – ukesoppsummering, HTML)")
-tk.Label(root, text="Helgesjekk", font=("TkDefaultFont", 13, "bold")).pack(padx=20, pady=(18, 8))
-tk.Button(root, text="Sjekk helg", width=16, command=sjekk_helg_og_send).pack(pady=6)
-svar_label = tk.Label(root, text="Trykk «Sjekk helg» – sender pen HTML‑epost for inneværende uke.", font=("TkDefaultFont", 11))
-svar_label.pack(pady=(6, 6))
-feedback_label = tk.Label(root, text="", font=("TkDefaultFont", 9))
-feedback_label.pack(pady=(2, 14))
-root.mainloop()
+if __name__ == "__main__":
+    root = tk.Tk()
+    root.title("Helgesjekk (Outlook – ukesoppsummering, HTML)")
+    tk.Label(root, text="Helgesjekk", font=("TkDefaultFont", 13, "bold")).pack(padx=20, pady=(18, 8))
+    tk.Button(root, text="Sjekk helg", width=16, command=sjekk_helg_og_send).pack(pady=6)
+    svar_label = tk.Label(root, text="Trykk «Sjekk helg» – sender pen HTML‑epost for inneværende uke.", font=("TkDefaultFont", 11))
+    svar_label.pack(pady=(6, 6))
+    feedback_label = tk.Label(root, text="", font=("TkDefaultFont", 9))
+    feedback_label.pack(pady=(2, 14))
+    root.mainloop()
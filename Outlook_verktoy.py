@@ -3,6 +3,11 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from datetime import datetime, timedelta
 
+try:
+    from .widgets_virtuallist import VirtualList
+except ImportError:  # kjørt direkte som skript
+    from widgets_virtuallist import VirtualList
+
 # ---------- Outlook helpers (samme stil som i din app) ----------
 def _try_import_outlook():
     try:
@@ -11,9 +16,8 @@ def _try_import_outlook():
     except Exception:
         return None
 
-win32 = _try_import_outlook()
-
 def _get_outlook():
+    win32 = _try_import_outlook()   # pywin32 lastes først når vinduet åpnes
     if not win32:
         return None
     try:
@@ -121,9 +125,17 @@ def _walk_subfolders(folder, include_subfolders=True):
         return
 
 # ---------- Søking ----------
-def _find_messages(session, sender_query, since_date, include_subfolders=True, max_per_folder=5000, cap_total=2000):
-    """Returnerer liste av dicts: {'item':ComObject,'dt':datetime,'from':'', 'from_email':'', 'subject':'', 'folder':'', 'attach':int}"""
+def _find_messages(session, sender_query, since_date, include_subfolders=True, max_per_folder=5000, cap_total=2000,
+                   on_batch=None, batch_size=200):
+    """Returnerer liste av dicts: {'item':ComObject,'dt':datetime,'from':'', 'from_email':'', 'subject':'', 'folder':'', 'attach':int}
+    on_batch(rows) kalles med nye treff i bolker på 'batch_size' underveis (strømming til GUI)."""
     results = []
+    sent = 0
+    def _flush(force=False):
+        nonlocal sent
+        if on_batch and (force or len(results) - sent >= batch_size) and len(results) > sent:
+            on_batch(results[sent:])
+            sent = len(results)
     try:
         inbox = session.GetDefaultFolder(6)  # olFolderInbox
     except Exception:
@@ -171,6 +183,7 @@ def _find_messages(session, sender_query, since_date, include_subfolders=True, m
                                     "item": it, "dt": dt, "from": name, "from_email": smtp,
                                     "subject": sub, "folder": fpath, "attach": n_att
                                 })
+                                _flush()
                     processed += 1
                     it = items.GetNext()
                 except Exception:
@@ -200,8 +213,10 @@ def _find_messages(session, sender_query, since_date, include_subfolders=True, m
                                 "item": it, "dt": dt, "from": name, "from_email": smtp,
                                 "subject": sub, "folder": fpath, "attach": n_att
                             })
+                            _flush()
                 except Exception:
                     continue
+    _flush(force=True)
     return results
 
 # ---------- Vedlegg ----------
@@ -293,27 +308,12 @@ class OutlookTools(tk.Tk):
 
         ttk.Button(top, text="Søk", command=self.on_search).grid(row=0, column=5, padx=6)
 
-        # Resultattabell
-        mid = ttk.Frame(frm)
-        mid.pack(fill="both", expand=True, pady=(8, 6))
-
-        cols = ("dato", "emne", "fra", "vedlegg")
-        self.tree = ttk.Treeview(mid, columns=cols, show="headings", height=16)
-        self.tree.heading("dato", text="Dato")
-        self.tree.heading("emne", text="Emne")
-        self.tree.heading("fra", text="Fra")
-        self.tree.heading("vedlegg", text="#Vedlegg")
-        self.tree.column("dato", width=150, anchor="w")
-        self.tree.column("emne", width=520, anchor="w")
-        self.tree.column("fra", width=220, anchor="w")
-        self.tree.column("vedlegg", width=80, anchor="e")
-        self.tree.pack(side="left", fill="both", expand=True)
-
-        sb = ttk.Scrollbar(mid, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscroll=sb.set)
-        sb.pack(side="right", fill="y")
-
-        self.tree.bind("<<TreeviewSelect>>", self.on_select)
+        # Resultattabell (virtualisert: kun synlige rader tegnes)
+        cols = [("dato", "Dato", 150, "w"), ("emne", "Emne", 520, "w"),
+                ("fra", "Fra", 220, "w"), ("vedlegg", "#Vedlegg", 80, "e")]
+        self.list = VirtualList(frm, cols, self._row_values, height=16)
+        self.list.pack(fill="both", expand=True, pady=(8, 6))
+        self.list.bind("<<VirtualListSelect>>", self.on_select)
 
         # Detalj/lesevisning
         bottom = ttk.Frame(frm)
@@ -335,8 +335,18 @@ class OutlookTools(tk.Tk):
         self.status = ttk.Label(frm, text="Klar.")
         self.status.pack(fill="x", pady=(8, 0))
 
-        self.results = []   # liste av dicts (se _find_messages)
-        self._id_to_ix = {} # map tree item -> index
+        self._search_gen = 0  # hindrer at bolker fra et avbrutt søk havner i nytt søk
+
+    @property
+    def results(self):
+        """Liste av dicts (se _find_messages) – eies av listevisningen."""
+        return self.list.rows
+
+    @staticmethod
+    def _row_values(r):
+        d = r["dt"].strftime("%Y-%m-%d %H:%M")
+        subj = (r["subject"] or "").replace("\r", " ").replace("\n", " ")
+        return (d, subj, f"{r['from']} <{r['from_email'] or ''}>", r["attach"])
 
     def on_search(self):
         # Les inn parametre
@@ -348,32 +358,35 @@ class OutlookTools(tk.Tk):
             return
         incl = self.subfolders_var.get()
 
-        self.tree.delete(*self.tree.get_children())
+        self.list.clear()
         self.body.delete("1.0", "end")
         self.status.config(text="Søker… dette kan ta litt tid ved store postbokser.")
+        self._search_gen += 1
+        gen = self._search_gen
 
         def _run():
-            res = _find_messages(self.session, q, since, include_subfolders=incl, max_per_folder=6000, cap_total=3000)
-            # Oppdater GUI i hovedtråd
-            self.after(0, lambda: self._populate(res))
+            # Treff strømmes i bolker; GUI oppdateres i hovedtråd
+            res = _find_messages(self.session, q, since, include_subfolders=incl, max_per_folder=6000, cap_total=3000,
+                                 on_batch=lambda rows: self.after(0, self._populate, rows, gen))
+            self.after(0, self._search_done, len(res), gen)
 
         threading.Thread(target=_run, daemon=True).start()
 
-    def _populate(self, res):
-        self.results = res
-        self._id_to_ix.clear()
-        for r in res:
-            d = r["dt"].strftime("%Y-%m-%d %H:%M")
-            subj = (r["subject"] or "").replace("\r", " ").replace("\n", " ")
-            row_id = self.tree.insert("", "end", values=(d, subj, f"{r['from']} <{r['from_email'] or ''}>", r["attach"]))
-            self._id_to_ix[row_id] = len(self._id_to_ix)
-        self.status.config(text=f"Fant {len(res)} e‑poster.")
+    def _populate(self, rows, gen):
+        if gen != self._search_gen:
+            return
+        self.list.append_rows(rows)
+        self.status.config(text=f"Søker… {len(self.list)} treff så langt.")
+
+    def _search_done(self, n, gen):
+        if gen == self._search_gen:
+            self.status.config(text=f"Fant {n} e‑poster.")
 
     def on_select(self, _evt):
-        sel = self.tree.selection()
+        sel = self.list.selected_rows()
         if not sel:
             return
-        r = self.results[self._id_to_ix[sel[0]]]
+        r = sel[0]
         txt = _as_text(r["item"])
         self.body.delete("1.0", "end")
         self.body.insert("1.0", txt)
@@ -383,16 +396,16 @@ class OutlookTools(tk.Tk):
         return d if d else None
 
     def open_in_outlook(self):
-        sel = self.tree.selection()
+        sel = self.list.selected_rows()
         if not sel: return
-        r = self.results[self._id_to_ix[sel[0]]]
+        r = sel[0]
         try:
             r["item"].Display()
         except Exception:
             messagebox.showerror("Outlook", "Klarte ikke å åpne e‑posten i Outlook.")
 
     def save_selected_attachments(self):
-        sel = self.tree.selection()
+        sel = self.list.selected_rows()
         if not sel:
             messagebox.showinfo("Vedlegg", "Velg en rad først.")
             return
@@ -400,8 +413,7 @@ class OutlookTools(tk.Tk):
         if not target:
             return
         saved_sum = 0
-        for iid in sel:
-            r = self.results[self._id_to_ix[iid]]
+        for r in sel:
             saved_sum += _save_attachments(r["item"], target)
         messagebox.showinfo("Vedlegg", f"Lagret {saved_sum} vedlegg.")
 
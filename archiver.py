@@ -2,8 +2,10 @@ from __future__ import annotations
 import hashlib
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, List, Tuple, Optional
 
+from . import telemetry
+from .com_retry import call as com_call, is_transient
 from .path_template import month_abbr as _mabbr, safe_component, extract_subject_tag, render_template, domain_from_email
 from .categories import ensure_category
 from .dedup_index import load_index, save_index, prune_expired
@@ -70,7 +72,9 @@ def archive_messages(session,
                      subject_regex: Optional[str] = None,
                      set_category_color: Optional[str] = None,
                      persist_index: bool = False,
-                     index_ttl_days: int = 365) -> Tuple[int, int, str]:
+                     index_ttl_days: int = 365,
+                     on_saved: Optional[Callable[[Path, Dict], None]] = None,
+                     on_failed: Optional[Callable[[Dict, str], None]] = None) -> Tuple[int, int, str]:
     """
     Arkiverer vedlegg for 'results'
     - filters: {"exts":[...], "min_kb":int, "max_kb":int}
@@ -78,6 +82,10 @@ def archive_messages(session,
     - template/subject_regex: sti‑mal + emne‑tag
     - persist_index: vedvarende dedup mot global hash‑indeks (TTL i dager)
     - dry_run: simuler lagring
+    - on_saved(sti, søkerad): kalles for hver fil som faktisk skrives (f.eks. tekstindeksering)
+    - on_failed(søkerad, feil): meldingen ble ikke ferdig behandlet fordi en forbigående COM-feil
+      (struping) gjensto etter alle gjenforsøk – bør ikke markeres som arkivert. Varige feil
+      (f.eks. et vedlegg som aldri kan lagres) meldes bare i err_msg, som før.
     Returnerer (saved_count, skipped_count, err_msg)
     """
     root = Path(root_dir); root.mkdir(parents=True, exist_ok=True)
@@ -86,8 +94,9 @@ def archive_messages(session,
     max_kb = int((filters or {}).get("max_kb") or 0)
 
     if set_category and not dry_run:
-        try: ensure_category(session, set_category, set_category_color or None)
-        except Exception: pass
+        with telemetry.stage("category") as st:
+            try: ensure_category(session, set_category, set_category_color or None); st.add(com_calls=1)
+            except Exception: st.add(errors=1)
 
     saved = skipped = 0
     errors: List[str] = []
@@ -101,23 +110,41 @@ def archive_messages(session,
         try: prune_expired(idx, int(index_ttl_days or 0))
         except Exception: pass
 
+    def _failed(r: Dict, e: Exception) -> None:
+        if on_failed and is_transient(e):
+            try: on_failed(r, str(e))
+            except Exception: pass
+
     for r in results:
-        it = get_item(r)
-        if not it: continue
+        with telemetry.stage("extract") as st:
+            try:
+                it = get_item(r)
+                atts = com_call(_attach_iter, it, stage="extract") if it else []
+            except Exception as e:
+                errors.append(str(e)); st.add(errors=1)
+                _failed(r, e); continue
+            st.add(com_calls=1 + len(atts))          # GetItemFromID + Attachments.Item
+        if not it:
+            continue                                 # slettet/flyttet siden søket
         base = _build_target(root, it, r, per_sender, template, subject_regex)
         any_saved_here = False
+        failed_here = False
 
-        for att in _attach_iter(it):
+        for att in atts:
             tmp_path = None
             try:
-                if not _attachment_allowed(att, allowed_exts, min_kb, max_kb):
+                if not com_call(_attachment_allowed, att, allowed_exts, min_kb, max_kb, stage="extract"):
                     skipped += 1; continue
 
                 fname = safe_component(getattr(att, "FileName", "") or "vedlegg")
                 tmp_path = tmp_root / fname
-                att.SaveAsFile(str(tmp_path))
+                with telemetry.stage("extract") as st:
+                    com_call(att.SaveAsFile, str(tmp_path), stage="extract")
+                    st.add(items=1, bytes=tmp_path.stat().st_size, com_calls=1)
 
-                h = _hash_file(tmp_path)
+                with telemetry.stage("hash") as st:
+                    h = _hash_file(tmp_path)
+                    st.add(items=1, bytes=tmp_path.stat().st_size)
 
                 # persist dedup først, deretter run‑scope dedup
                 if persist_index and h in idx:
@@ -128,33 +155,45 @@ def archive_messages(session,
                 if dry_run:
                     saved += 1; any_saved_here = True; seen_hashes.add(h)
                 else:
-                    dest = base / fname
-                    if dest.exists():
-                        dest = dest.with_name(f"{dest.stem}__{h[:8]}{dest.suffix}")
-                    tmp_path.replace(dest)
+                    with telemetry.stage("write") as st:
+                        dest = base / fname
+                        if dest.exists():
+                            dest = dest.with_name(f"{dest.stem}__{h[:8]}{dest.suffix}")
+                        tmp_path.replace(dest)
+                        st.add(items=1, bytes=dest.stat().st_size)
                     saved += 1; any_saved_here = True; seen_hashes.add(h)
                     if persist_index:
                         idx[h] = datetime.now().timestamp()
+                    if on_saved:
+                        try: on_saved(dest, r)
+                        except Exception: pass
 
             except Exception as e:
                 errors.append(str(e))
+                telemetry.count("extract", errors=1)
+                if not failed_here and is_transient(e):
+                    failed_here = True; _failed(r, e)
             finally:
                 if tmp_path and tmp_path.exists():
                     try: tmp_path.unlink(missing_ok=True)
                     except Exception: pass
 
         if set_category and any_saved_here and not dry_run:
-            try:
-                cats = getattr(it, "Categories", "") or ""
-                wanted = set_category.strip()
-                parts = [c.strip() for c in cats.split(";") if c.strip()]
-                if wanted not in parts:
-                    parts.append(wanted); it.Categories = "; ".join(parts); it.Save()
-            except Exception:
-                pass
+            with telemetry.stage("category") as st:
+                try:
+                    cats = getattr(it, "Categories", "") or ""
+                    wanted = set_category.strip()
+                    parts = [c.strip() for c in cats.split(";") if c.strip()]
+                    if wanted not in parts:
+                        parts.append(wanted); it.Categories = "; ".join(parts); it.Save()
+                        st.add(items=1, com_calls=3)
+                    else:
+                        st.add(com_calls=1)
+                except Exception:
+                    st.add(errors=1)
 
     if persist_index and not dry_run:
-        try: save_index(idx)
+        try: save_index(idx, merge=True, ttl_days=int(index_ttl_days or 0))   # parallelle arkiveringer fletter
         except Exception: pass
 
     return saved, skipped, "; ".join(errors)
@@ -0,0 +1,393 @@
+"""
+Tekstindeks over arkiverte vedlegg (SQLite FTS5) i .ragdb/attachments.db.
+
+archive_messages() melder hver lagret fil via on_saved; group_archiver registrerer den her
+med gruppe, avsender og meldingsdato (fasettene). update() går så gjennom gruppemappene:
+
+  - mapper hvis mtime er uendret listes ikke på nytt (kjente undermapper huskes)
+  - filer med samme (mtime, størrelse) som sist hoppes over
+  - nye/endrede filer trekkes ut i en prosesspool; slettede fjernes fra indeksen
+
+Filer som ikke kom via arkiveringen (lagt inn for hånd) får gruppen fra mappen og
+filens mtime som dato. PDF krever pypdf (valgfri); docx/xlsx/pptx leses med zipfile.
+
+    python -m fredag.attachment_index update
+    python -m fredag.attachment_index search "kontrakt" --group KundeX
+"""
+from __future__ import annotations
+import argparse
+import html as htmlmod
+import json
+import os
+import re
+import sqlite3
+import threading
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from . import telemetry
+
+MAX_TEXT_CHARS = 500_000
+MAX_FILE_MB = 100
+INLINE_BELOW = 4                  # så få filer at en prosesspool ikke lønner seg
+TEXT_EXTS = {"txt", "csv", "log", "md", "json", "xml", "htm", "html"}
+ZIP_PARTS = {                     # Office Open XML: hvilke deler som har teksten
+    "docx": (r"word/(document|header\d*|footer\d*)\.xml",),
+    "xlsx": (r"xl/sharedStrings\.xml", r"xl/worksheets/sheet\d+\.xml"),
+    "pptx": (r"ppt/slides/slide\d+\.xml",),
+}
+SUPPORTED = TEXT_EXTS | set(ZIP_PARTS) | {"pdf"}
+
+_DB = None  # type: Optional[sqlite3.Connection]
+_LOCK = threading.RLock()
+
+def _db_path() -> Path:
+    root = Path(__file__).resolve().parents[1] / ".ragdb"
+    root.mkdir(exist_ok=True)
+    return root / "attachments.db"
+
+def _conn() -> sqlite3.Connection:
+    global _DB
+    if _DB is None:
+        db = sqlite3.connect(str(_db_path()), check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL;")
+        _ensure_schema(db)
+        _DB = db
+    return _DB
+
+def _ensure_schema(db: sqlite3.Connection) -> None:
+    db.executescript("""
+    CREATE TABLE IF NOT EXISTS files (
+        id       INTEGER PRIMARY KEY,
+        path     TEXT NOT NULL UNIQUE,
+        dir      TEXT NOT NULL DEFAULT '',
+        grp      TEXT NOT NULL DEFAULT '',
+        sender   TEXT NOT NULL DEFAULT '',
+        dt       TEXT NOT NULL DEFAULT '',
+        eid      TEXT NOT NULL DEFAULT '',
+        mtime_ns INTEGER NOT NULL DEFAULT 0,
+        size     INTEGER NOT NULL DEFAULT 0,
+        status   TEXT NOT NULL DEFAULT 'pending',   -- pending | ok | skip | error
+        error    TEXT NOT NULL DEFAULT ''
+    );
+    CREATE INDEX IF NOT EXISTS ix_files_dir ON files(dir);
+    CREATE INDEX IF NOT EXISTS ix_files_grp ON files(grp);
+    CREATE TABLE IF NOT EXISTS dirs (
+        path     TEXT PRIMARY KEY,
+        mtime_ns INTEGER NOT NULL,
+        children TEXT NOT NULL DEFAULT '[]'
+    );
+    CREATE VIRTUAL TABLE IF NOT EXISTS files_fts USING fts5(
+        name, body, tokenize = 'unicode61 remove_diacritics 2'
+    );
+    """)
+    db.commit()
+
+def close() -> None:
+    global _DB
+    with _LOCK:
+        if _DB is not None:
+            try: _DB.close()
+            except Exception: pass
+            _DB = None
+
+def _settings() -> Dict:
+    try:
+        from .settings import load_settings
+        return load_settings()
+    except Exception:
+        return {}
+
+def enabled() -> bool:
+    from .fulltext_index import available
+    return bool(_settings().get("attachment_index_enabled")) and available()
+
+def _key(p) -> str:
+    return os.path.normcase(os.path.abspath(str(p)))
+
+def _dt_str(dt) -> str:
+    if isinstance(dt, datetime):
+        return dt.replace(tzinfo=None).isoformat(timespec="seconds")
+    return str(dt or "")[:19]
+
+# ---------- registrering fra arkiveringen ----------
+def record_saved(entries: Iterable[Tuple[Path, str, Dict]]) -> int:
+    """
+    (sti, gruppe, søkerad) for filer archive_messages nettopp skrev. Fasettene lagres nå;
+    selve teksten trekkes ut ved neste update().
+    """
+    n = 0
+    with _LOCK:
+        db = _conn()
+        with db:
+            for path, group, r in entries:
+                sender = (r.get("from_email") or r.get("from") or "").strip().lower()
+                db.execute(
+                    """INSERT INTO files(path, dir, grp, sender, dt, eid, status) VALUES (?,?,?,?,?,?,'pending')
+                       ON CONFLICT(path) DO UPDATE SET grp=excluded.grp, sender=excluded.sender,
+                           dt=excluded.dt, eid=excluded.eid, mtime_ns=0, status='pending'""",
+                    (_key(path), _key(Path(path).parent), group or "", sender[:200],
+                     _dt_str(r.get("dt")), r.get("eid") or ""))
+                n += 1
+    return n
+
+# ---------- tekstuttrekk (kjøres i arbeiderprosesser) ----------
+class _Unsupported(Exception):
+    pass
+
+def _decode(data: bytes) -> str:
+    for enc in ("utf-8-sig", "cp1252"):
+        try: return data.decode(enc)
+        except UnicodeDecodeError: continue
+    return data.decode("latin-1", "replace")
+
+_RE_XML_BREAK = re.compile(r"</(?:w:p|a:p|row)>|<(?:w:br|w:tab|a:br)\b[^>]*/?>")
+_RE_XML_CELL = re.compile(r"</(?:c|si)>")
+_RE_XML_TAG = re.compile(r"<[^>]+>")
+
+def _xml_text(xml: str) -> str:
+    xml = _RE_XML_CELL.sub(" ", _RE_XML_BREAK.sub("\n", xml))
+    return htmlmod.unescape(_RE_XML_TAG.sub("", xml))
+
+def _extract_zip(path: str, ext: str) -> str:
+    pats = [re.compile(p) for p in ZIP_PARTS[ext]]
+    out: List[str] = []
+    with zipfile.ZipFile(path) as z:
+        for name in sorted(z.namelist()):
+            if any(p.fullmatch(name) for p in pats):
+                out.append(_xml_text(z.read(name).decode("utf-8", "replace")))
+    return "\n".join(out)
+
+def _extract_pdf(path: str) -> str:
+    try:
+        from pypdf import PdfReader  # type: ignore
+    except ImportError:
+        raise _Unsupported("pypdf er ikke installert")
+    return "\n".join((page.extract_text() or "") for page in PdfReader(path).pages)
+
+def extract_text(path: str) -> str:
+    """Tekst fra én fil (etter filendelse). _Unsupported hvis typen ikke kan leses her."""
+    ext = Path(path).suffix.lower().lstrip(".")
+    if ext in TEXT_EXTS:
+        with open(path, "rb") as f:
+            text = _decode(f.read(MAX_TEXT_CHARS * 2))
+        if ext in ("htm", "html"):
+            from .outlook_core import html_to_text
+            text = html_to_text(text)
+        return text
+    if ext in ZIP_PARTS:
+        return _extract_zip(path, ext)
+    if ext == "pdf":
+        return _extract_pdf(path)
+    raise _Unsupported(f".{ext} støttes ikke")
+
+def _extract_job(path: str) -> Tuple[str, str, str, str]:
+    """(sti, status, tekst, feil) – toppnivåfunksjon så den kan sendes til en prosesspool."""
+    try:
+        return path, "ok", re.sub(r"[ \t]+", " ", extract_text(path))[:MAX_TEXT_CHARS], ""
+    except _Unsupported as e:
+        return path, "skip", "", str(e)
+    except Exception as e:
+        return path, "error", "", f"{type(e).__name__}: {e}"[:300]
+
+# ---------- inkrementell gjennomgang ----------
+DirRow = Tuple[str, int, str]      # (mappe, mtime_ns, undermapper som JSON)
+
+def _scan(root: Path, db: sqlite3.Connection, stop_evt=None) -> Tuple[Dict[str, os.stat_result], List[DirRow]]:
+    """
+    Filer i mapper som er nye/endret siden sist (sti → stat) og mappene som ble listet.
+    Uendrede mapper hoppes over, men deres kjente undermapper besøkes fortsatt. Mappenes
+    nye mtime lagres først når filene er trukket ut (se update), så et avbrutt løp tas igjen.
+    """
+    files: Dict[str, os.stat_result] = {}
+    listed: List[DirRow] = []
+    stack = [str(root)]
+    while stack:
+        if stop_evt is not None and stop_evt.is_set():
+            break
+        d = stack.pop()
+        try:
+            mt = os.stat(d).st_mtime_ns
+        except OSError:
+            continue
+        row = db.execute("SELECT mtime_ns, children FROM dirs WHERE path=?", (_key(d),)).fetchone()
+        if row and row[0] == mt:
+            stack.extend(json.loads(row[1]))
+            continue
+        children: List[str] = []
+        try:
+            with os.scandir(d) as it:
+                for e in it:
+                    if e.is_dir(follow_symlinks=False):
+                        children.append(e.path)
+                    elif e.is_file() and Path(e.name).suffix.lower().lstrip(".") in SUPPORTED:
+                        files[_key(e.path)] = e.stat()
+        except OSError:
+            continue
+        listed.append((_key(d), mt, json.dumps(children)))
+        stack.extend(children)
+    return files, listed
+
+def _run_jobs(paths: List[str], workers: int, stop_evt=None) -> Iterable[Tuple[str, str, str, str]]:
+    if len(paths) < INLINE_BELOW or workers <= 1:
+        for p in paths:
+            if stop_evt is not None and stop_evt.is_set():
+                return
+            yield _extract_job(p)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for res in pool.map(_extract_job, paths, chunksize=max(1, min(32, len(paths) // (workers * 4)))):
+            if stop_evt is not None and stop_evt.is_set():
+                pool.shutdown(wait=False, cancel_futures=True)
+                return
+            yield res
+
+def _default_roots() -> Dict[str, str]:
+    from .group_rules import load_rules
+    return {g.name: g.target_dir for g in load_rules() if g.target_dir}
+
+def update(roots: Optional[Dict[str, str]] = None, workers: Optional[int] = None, stop_evt=None,
+           progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
+    """
+    Oppdaterer indeksen for {gruppe: mappe} (standard: alle gruppers målmapper).
+    Returnerer tellere: scanned_dirs, new, ok, skip, error, removed.
+    """
+    roots = roots if roots is not None else _default_roots()
+    if workers is None:
+        workers = int(_settings().get("attachment_index_workers") or 0)
+    if workers <= 0:
+        workers = max(1, (os.cpu_count() or 2) - 1)
+    out = {"scanned_dirs": 0, "new": 0, "ok": 0, "skip": 0, "error": 0, "removed": 0}
+    todo: Dict[str, Tuple[str, os.stat_result]] = {}
+    dir_rows: List[DirRow] = []
+    with telemetry.stage("attachment_text") as st:
+        with _LOCK, _conn() as db:
+            for group, root in roots.items():
+                files, listed = _scan(Path(root), db, stop_evt)
+                dir_rows.extend(listed)
+                out["scanned_dirs"] += len(listed)
+                for d, _mt, _ch in listed:          # filer som er borte fra en listet mappe
+                    gone = [(i,) for i, p in db.execute("SELECT id, path FROM files WHERE dir=?", (d,))
+                            if p not in files]
+                    db.executemany("DELETE FROM files_fts WHERE rowid=?", gone)
+                    db.executemany("DELETE FROM files WHERE id=?", gone)
+                    out["removed"] += len(gone)
+                for p, s in files.items():
+                    row = db.execute("SELECT mtime_ns, size FROM files WHERE path=?", (p,)).fetchone()
+                    if row and row[0] == s.st_mtime_ns and row[1] == s.st_size:
+                        continue
+                    if s.st_size > MAX_FILE_MB * 1024 * 1024:
+                        continue
+                    todo[p] = (group, s)
+        out["new"] = len(todo)
+        done = 0
+        for path, status, text, err in _run_jobs(sorted(todo), workers, stop_evt):
+            group, s = todo[path]
+            with _LOCK, _conn() as db:
+                row = db.execute("SELECT id, grp, sender, dt FROM files WHERE path=?", (path,)).fetchone()
+                dt = (row[3] if row and row[3] else
+                      datetime.fromtimestamp(s.st_mtime).isoformat(timespec="seconds"))
+                if row:
+                    fid = row[0]
+                    db.execute("""UPDATE files SET grp=?, dt=?, mtime_ns=?, size=?, status=?, error=?
+                                  WHERE id=?""", (row[1] or group, dt, s.st_mtime_ns, s.st_size, status, err, fid))
+                    db.execute("DELETE FROM files_fts WHERE rowid=?", (fid,))
+                else:
+                    fid = db.execute("""INSERT INTO files(path, dir, grp, dt, mtime_ns, size, status, error)
+                                        VALUES (?,?,?,?,?,?,?,?)""",
+                                     (path, _key(Path(path).parent), group, dt, s.st_mtime_ns, s.st_size,
+                                      status, err)).lastrowid
+                if status == "ok":
+                    db.execute("INSERT INTO files_fts(rowid, name, body) VALUES (?,?,?)",
+                               (fid, Path(path).name, text))
+            out[status] += 1
+            done += 1
+            st.add(items=1, bytes=s.st_size, errors=1 if status == "error" else 0)
+            if progress and done % 50 == 0:
+                try: progress(done, len(todo))
+                except Exception: pass
+        if done == len(todo):
+            with _LOCK, _conn() as db:
+                db.executemany("REPLACE INTO dirs(path, mtime_ns, children) VALUES (?,?,?)", dir_rows)
+    return out
+
+# ---------- søk ----------
+def _where(query: str, group: Optional[str], sender: Optional[str],
+           after: Optional[datetime], before: Optional[datetime]) -> Tuple[str, List]:
+    from .fulltext_index import _match_expr
+    sql, args = " WHERE files_fts MATCH ?", [_match_expr(query)]
+    if group is not None:
+        sql += " AND f.grp = ?"; args.append(group)
+    if sender is not None:
+        sql += " AND f.sender = ?"; args.append(sender.strip().lower())
+    if after is not None:
+        sql += " AND f.dt >= ?"; args.append(_dt_str(after))
+    if before is not None:
+        sql += " AND f.dt <= ?"; args.append(_dt_str(before))
+    return sql, args
+
+_FROM = " FROM files_fts JOIN files f ON f.id = files_fts.rowid"
+
+def search(query: str, group: Optional[str] = None, sender: Optional[str] = None,
+           after: Optional[datetime] = None, before: Optional[datetime] = None,
+           limit: int = 50) -> List[Dict]:
+    """Rangerte treff: {"path", "group", "sender", "dt", "eid", "score", "snippet"}."""
+    where, args = _where(query, group, sender, after, before)
+    if not args[0]:
+        return []
+    sql = ("SELECT f.path, f.grp, f.sender, f.dt, f.eid, bm25(files_fts, 3.0, 1.0) AS score,"
+           " snippet(files_fts, 1, '[', ']', '…', 12)" + _FROM + where + " ORDER BY score LIMIT ?")
+    try:
+        with _LOCK:
+            rows = _conn().execute(sql, args + [int(limit)]).fetchall()
+    except sqlite3.OperationalError:
+        return []
+    return [{"path": p, "group": g, "sender": s, "dt": dt, "eid": eid, "score": round(-sc, 4), "snippet": sn}
+            for p, g, s, dt, eid, sc, sn in rows]
+
+def facets(query: str, top: int = 10, **filters) -> Dict[str, List[Tuple[str, int]]]:
+    """Antall treff per gruppe, avsender og måned (for å snevre inn et søk)."""
+    where, args = _where(query, filters.get("group"), filters.get("sender"),
+                         filters.get("after"), filters.get("before"))
+    if not args[0]:
+        return {"group": [], "sender": [], "month": []}
+    out = {}
+    for name, col in (("group", "f.grp"), ("sender", "f.sender"), ("month", "substr(f.dt, 1, 7)")):
+        sql = f"SELECT {col} AS v, COUNT(*) AS n" + _FROM + where + " GROUP BY v ORDER BY n DESC, v LIMIT ?"
+        try:
+            with _LOCK:
+                out[name] = [(v, n) for v, n in _conn().execute(sql, args + [int(top)]).fetchall()]
+        except sqlite3.OperationalError:
+            out[name] = []
+    return out
+
+def stats() -> Dict[str, int]:
+    with _LOCK:
+        cur = _conn().execute("SELECT status, COUNT(*) FROM files GROUP BY status")
+        return dict(cur.fetchall())
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description="Tekstindeks over arkiverte vedlegg")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    up = sub.add_parser("update", help="Trekk ut tekst fra nye/endrede filer")
+    up.add_argument("--workers", type=int, default=None)
+    sp = sub.add_parser("search", help="Søk")
+    sp.add_argument("query")
+    sp.add_argument("--group"); sp.add_argument("--sender")
+    sp.add_argument("--limit", type=int, default=20)
+    sub.add_parser("stats", help="Antall filer per status")
+    args = ap.parse_args(argv)
+    if args.cmd == "update":
+        print(update(workers=args.workers))
+    elif args.cmd == "search":
+        for h in search(args.query, args.group, args.sender, limit=args.limit):
+            print(f"{h['score']:>7.2f}  {h['dt'][:10]}  {h['group']:<16}  {h['path']}")
+            print(f"         {h['snippet']}")
+    else:
+        print(stats())
+
+if __name__ == "__main__":
+    main()
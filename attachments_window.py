@@ -5,12 +5,24 @@ import time
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 
-# Prøv Pillow for bedre bilde-støtte (JPEG osv.), men fall tilbake til Tk om det ikke finnes.
-try:
-    from PIL import Image, ImageTk  # type: ignore
-    _HAS_PIL = True
-except Exception:
-    _HAS_PIL = False
+# Pillow gir bedre bilde-støtte (JPEG osv.), men lastes først ved første bildevisning;
+# uten Pillow faller vi tilbake til Tk.
+_PIL = None
+
+def _pil():
+    """(Image, ImageTk) eller None hvis Pillow mangler."""
+    global _PIL
+    if _PIL is None:
+        try:
+            from PIL import Image, ImageTk  # type: ignore
+            _PIL = (Image, ImageTk)
+        except Exception:
+            _PIL = False
+    return _PIL or None
+
+from .preview_cache import Prefetcher, get_cache, open_mail_by_id
+
+PREFETCH_NEIGHBOURS = 3   # antall vedlegg før/etter valgt rad som hentes i bakgrunnen
 
 _ILLEGAL = r'<>:"/\\|?*'
 
@@ -37,6 +49,7 @@ class AttachmentsWindow(tk.Toplevel):
     - Søkefelt filtrerer listen live
     - Dobbeltklikk åpner vedlegg (lagres i temp under %TEMP%\\OutlookVedlegg\\<melding>\\)
     - Forhåndsvisning: tekst/HTML vises som tekst, PNG/GIF via Tk, JPEG mm. via Pillow hvis tilgjengelig
+    - Lagrede filer, miniatyrer og tekst caches på disk (preview_cache); naboer hentes i bakgrunnen
     - Lagre valgte / alle, åpne temp-mappe
     """
     def __init__(self, master, mail_item, context_title: str = ""):
@@ -57,9 +70,33 @@ class AttachmentsWindow(tk.Toplevel):
         self._row_to_ix = {}     # tree iid -> index i _atts
         self._img_cache = None   # holder på siste PhotoImage så preview ikke blir GC'et
 
+        # Disk-cache for forhåndsvisning + prefetch (krever EntryID for nøkkel)
+        self._eid = getattr(mail_item, "EntryID", None)
+        try:
+            self._cache = get_cache() if self._eid else None
+        except Exception:
+            self._cache = None
+        self._prefetch = None
+        if self._cache:
+            try:
+                store_id = getattr(getattr(mail_item, "Parent", None), "StoreID", None)
+                self._prefetch = Prefetcher(self._cache, self._eid, open_mail_by_id(self._eid, store_id))
+            except Exception:
+                self._prefetch = None
+        self.bind("<Destroy>", self._on_destroy)
+
         self._build_ui()
         self._load_attachments()
 
+    def _on_destroy(self, evt):
+        if evt.widget is not self:
+            return
+        if self._prefetch:
+            self._prefetch.stop()
+        if self._cache:
+            try: self._cache.flush()
+            except Exception: pass
+
     # ---------- UI ----------
     def _build_ui(self):
         wrapper = ttk.Frame(self, padding=8)
@@ -127,7 +164,8 @@ class AttachmentsWindow(tk.Toplevel):
                 name = getattr(att, "FileName", f"vedlegg_{i}") or f"vedlegg_{i}"
                 size = getattr(att, "Size", 0) or 0
                 ext = (os.path.splitext(name)[1] or "").lower()
-                self._atts.append({"index": i, "name": name, "size": size, "ext": ext, "temp": None})
+                self._atts.append({"index": i, "name": name, "size": size, "ext": ext, "temp": None,
+                                   "cached": None})
             except Exception:
                 continue
 
@@ -165,10 +203,28 @@ class AttachmentsWindow(tk.Toplevel):
             self._show_preview_message("Ingen treff.")
 
     # ---------- Forhåndsvisning ----------
+    def _cached(self, ix: int) -> dict | None:
+        """Cache-oppføring (fil/miniatyr/tekst) for vedlegget; lagres via COM ved bom."""
+        if not self._cache:
+            return None
+        a = self._atts[ix]
+        hit = self._cache.get(self._eid, a["index"], a["size"])
+        if hit is None:
+            try:
+                att = self.mail.Attachments.Item(a["index"])
+            except Exception:
+                return None
+            hit = self._cache.put(self._eid, a["index"], a["size"], a["name"], att.SaveAsFile)
+        if hit:
+            a["temp"], a["cached"] = str(hit["file"]), hit
+        return hit
+
     def _ensure_saved_temp(self, ix: int) -> str | None:
         a = self._atts[ix]
         if a["temp"] and os.path.exists(a["temp"]):
             return a["temp"]
+        if self._cached(ix):
+            return a["temp"]
         try:
             att = self.mail.Attachments.Item(a["index"])
         except Exception:
@@ -189,6 +245,26 @@ class AttachmentsWindow(tk.Toplevel):
         if ix is None:
             return
         self._preview_ix(ix)
+        self._prefetch_around(sel[0])
+
+    def _prefetch_around(self, iid):
+        if not self._prefetch:
+            return
+        rows = list(self.tree.get_children())
+        try:
+            pos = rows.index(iid)
+        except ValueError:
+            return
+        # nærmeste først: +1, -1, +2, -2 ...
+        order = []
+        for d in range(1, PREFETCH_NEIGHBOURS + 1):
+            order += [pos + d, pos - d]
+        jobs = []
+        for p in order:
+            if 0 <= p < len(rows):
+                a = self._atts[self._row_to_ix[rows[p]]]
+                jobs.append((a["index"], a["size"], a["name"]))
+        self._prefetch.request(jobs)
 
     def _clear_preview(self):
         self.preview_canvas.delete("all")
@@ -207,6 +283,10 @@ class AttachmentsWindow(tk.Toplevel):
             return
 
         ext = (os.path.splitext(path)[1] or "").lower()
+        cached = self._atts[ix].get("cached")
+        if cached and cached.get("text") is not None:
+            self._show_preview_message(cached["text"])
+            return
         # Tekstlige formater
         if ext in (".txt", ".log", ".csv", ".json", ".xml", ".md", ".ini"):
             try:
@@ -230,8 +310,12 @@ class AttachmentsWindow(tk.Toplevel):
         if ext in (".png", ".gif", ".jpg", ".jpeg", ".bmp", ".webp"):
             self._clear_preview()
             try:
-                if _HAS_PIL:
-                    im = Image.open(path)
+                pil = _pil()
+                if pil:
+                    Image, ImageTk = pil
+                    # nedskalert miniatyr fra cachen i stedet for å dekode originalen
+                    thumb = cached.get("thumb") if cached else None
+                    im = Image.open(thumb if thumb and os.path.exists(thumb) else path)
                     # skaler ned til maks 90% av canvas
                     cw = max(100, int(self.preview_canvas.winfo_width() * 0.9))
                     ch = max(100, int(self.preview_canvas.winfo_height() * 0.9))
@@ -3,14 +3,11 @@ import argparse
 from datetime import datetime, timedelta, date
 from typing import Dict, List, Tuple
 
+from . import telemetry
 from .outlook_core import get_session, search_messages, default_smtp
 from .group_rules import load_rules
 from .group_archiver import archive_by_groups
-from .mail_utils import send_html_mail
-from .locking import try_acquire_lock
-from .retention import apply_retention
-
-LOCK_NAME = "auto_archive_run"
+from .locking import format_contention_report, total_lock_wait
 
 def _from_to_from_days(days: int) -> tuple[date, date]:
     today = datetime.now().date()
@@ -27,19 +24,39 @@ def run_archive(session,
                 cap_per_folder: int = 6000,
                 cap_total: int = 4000) -> Tuple[Dict, List[Dict]]:
     stop_flag = type("Stop", (), {"is_set": lambda self: False})()
-    res, err, aborted = search_messages(
-        session=session, sender_query="", subject_contains=subject_contains,
-        after_date=from_date, before_date=to_date, include_subfolders=include_subfolders,
-        only_unread=unread_only, only_attachments=only_attachments,
-        cap_per_folder=cap_per_folder, cap_total=cap_total, stop_evt=stop_flag, progress=None
-    )
+    with telemetry.stage("search") as st:
+        res, err, aborted = search_messages(
+            session=session, sender_query="", subject_contains=subject_contains,
+            after_date=from_date, before_date=to_date, include_subfolders=include_subfolders,
+            only_unread=unread_only, only_attachments=only_attachments,
+            cap_per_folder=cap_per_folder, cap_total=cap_total, stop_evt=stop_flag, progress=None
+        )
+        st.add(items=len(res), errors=1 if err else 0)
     if aborted: raise SystemExit("Avbrutt.")
     if err:     raise SystemExit(f"Feil under søk: {err}")
 
-    summary, unassigned = archive_by_groups(session, res, rules=load_rules(), dedup=True, dry_run=dry_run)
+    # Søkeradene mater dagsaggregatet for avsenderstatistikk (EntryID telles én gang)
+    try:
+        from .email_stats import rows_from_search
+        from .state_store import record_sender_rows
+        record_sender_rows(rows_from_search(res))
+    except Exception:
+        pass
+
+    # rules=None: gruppene og den kompilerte matcheren hentes fra minnecachen
+    summary, unassigned = archive_by_groups(session, res, dedup=True, dry_run=dry_run)
+
+    # ... og fulltekstindeksen (bare nye meldinger i vinduet; no-op når den er slått av)
+    if not dry_run:
+        try:
+            from .fulltext_index import feed_from_search
+            feed_from_search(session, res)
+        except Exception:
+            pass
     return summary, unassigned
 
-def _html_report(summary: Dict, unassigned_count: int, f: date, t: date, dry: bool) -> str:
+def _html_report(summary: Dict, unassigned_count: int, f: date, t: date, dry: bool,
+                 lock_wait: float = 0.0) -> str:
     rows = "".join(
         f"<tr><td>{g}</td><td style='text-align:right'>{s['msgs']}</td>"
         f"<td style='text-align:right'>{s['saved']}</td><td style='text-align:right'>{s['skipped']}</td></tr>"
@@ -54,6 +71,7 @@ def _html_report(summary: Dict, unassigned_count: int, f: date, t: date, dry: bo
       {rows or '<tr><td colspan="4">(Ingen grupper matchet)</td></tr>'}
     </table>
     <p>Uten gruppe: {unassigned_count}</p>
+    <p style="color:#666">Ventet på lås: {lock_wait:.2f} s</p>
     </body></html>"""
 
 def main():
@@ -77,11 +95,9 @@ def main():
     else:
         f, t = _from_to_from_days(args.from_days)
 
-    lock = try_acquire_lock(LOCK_NAME, timeout_sec=2)
-    if not lock:
-        print("En annen arkiveringsjobb kjører allerede – avbryter.")
-        return
-    try:
+    with telemetry.run("archive", dry_run=bool(args.dry_run)):
+        # Ingen global lås: hver gruppe låser kun sin målmappe (se group_archiver/retention),
+        # så retention/flytting av andre grupper kan kjøre samtidig.
         session = get_session()
         summary, unassigned = run_archive(
             session=session, from_date=f, to_date=t, include_subfolders=not args.no_subfolders,
@@ -91,27 +107,33 @@ def main():
 
         print("=== Tørrkjøring pr. gruppe ===" if args.dry_run else "=== Arkivert pr. gruppe ===")
         for g, s in summary.items():
-            print(f"- {g}: {('ville lagret' if args.dry_run else 'lagret')} {s['saved']}, hoppet {s['skipped']} (meldinger: {s['msgs']})")
+            busy = " – LÅST av annen jobb, hoppet over" if s.get("busy") else ""
+            if s.get("failed"):
+                busy += f" – {s['failed']} meldinger feilet (prøves neste kjøring)"
+            print(f"- {g}: {('ville lagret' if args.dry_run else 'lagret')} {s['saved']}, hoppet {s['skipped']} (meldinger: {s['msgs']}){busy}")
         if unassigned:
             print(f"(Uten gruppe: {len(unassigned)} meldinger – ikke berørt)")
 
         if args.mail_report:
             to = args.to or (default_smtp(session) or "")
             if to:
-                html = _html_report(summary, len(unassigned), f, t, args.dry_run)
+                from .mail_utils import send_html_mail
+                html = _html_report(summary, len(unassigned), f, t, args.dry_run, total_lock_wait())
                 ok, msg = send_html_mail(session, to, "Arkivering – rapport (tørrkjøring)" if args.dry_run else "Arkivering – rapport", html)
                 print(f"Rapport: {'OK' if ok else 'FEIL'} – {msg}")
             else:
                 print("Ingen standard e‑postadresse – hopper over rapport.")
 
         if args.after_retention and not args.dry_run:
+            from .retention import apply_retention
             rsum = apply_retention(load_rules(), dry_run=False)
             print("=== Retention etter arkivering ===")
             for g, s in rsum.items():
-                print(f"- {g}: slettet {s['deleted']}, beholdt {s['kept']}, feil {s['errors']}")
+                print(f"- {g}: slettet {s['deleted']}, beholdt {s['kept']}, feil {s['errors']}"
+                      + (" – LÅST, hoppet over" if s.get("busy") else ""))
 
-    finally:
-        lock.release()
+        print(f"Ventet på lås: {total_lock_wait():.2f} s")
+        print(format_contention_report())
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,8 @@
+"""
+Ytelsesmålinger som kan kjøres uten Outlook (python -m fredag.benchmarks.<navn>).
+
+suite          – hot-path-suiten med JSON-resultater og 'compare' mellom versjoner
+bench_export   – Excel/CSV-eksport (rader/s, valgfritt toppminne)
+bench_search   – søkemotorene mot fake_outlook
+bench_importtime – oppstartstid for inngangspunktene
+"""
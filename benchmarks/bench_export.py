@@ -0,0 +1,65 @@
+"""
+Måler eksport av syntetiske søkeresultater: rader/sek, og med --mem toppminne
+(tracemalloc – gjør kjøringen flere ganger tregere, så mål fart og minne hver for seg).
+
+    python -m fredag.benchmarks.bench_export --rows 100000
+    python -m fredag.benchmarks.bench_export --rows 100000 --format csv --mem
+"""
+from __future__ import annotations
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Dict, Iterator
+
+from ..excel_export import export_rows_to_csv, export_rows_to_xlsx
+
+def synthetic_rows(n: int) -> Iterator[Dict]:
+    t0 = datetime(2025, 1, 6, 8, 0)
+    for i in range(n):
+        yield {
+            "dt": t0 + timedelta(minutes=i),
+            "subject": f"Faktura {i:07d} – oppfølging av bestilling",
+            "from": f"Avsender {i % 997}",
+            "from_email": f"avsender{i % 997}@eksempel.no",
+            "attach": i % 4,
+            "unread": i % 5 == 0,
+            "folder": "\\\\Postboks\\Innboks\\Leverandører",
+        }
+
+def run(fmt: str, rows: int, mem: bool = False) -> Dict:
+    fn = export_rows_to_csv if fmt == "csv" else export_rows_to_xlsx
+    fd, path = tempfile.mkstemp(suffix=f".{fmt}")
+    os.close(fd)
+    try:
+        if mem: tracemalloc.start()
+        t = time.perf_counter()
+        err = fn(path, synthetic_rows(rows))
+        secs = time.perf_counter() - t
+        peak = tracemalloc.get_traced_memory()[1] if mem else None
+        if mem: tracemalloc.stop()
+        if err:
+            raise SystemExit(err)
+        return {"format": fmt, "rows": rows, "seconds": round(secs, 3),
+                "rows_per_sec": round(rows / secs) if secs else None,
+                "peak_mb": round(peak / 1e6, 2) if peak is not None else None, "file_mb": round(os.path.getsize(path) / 1e6, 2)}
+    finally:
+        try: os.remove(path)
+        except OSError: pass
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--format", choices=("xlsx", "csv", "both"), default="both")
+    ap.add_argument("--mem", action="store_true", help="mål toppminne med tracemalloc")
+    args = ap.parse_args(argv)
+    for fmt in (("xlsx", "csv") if args.format == "both" else (args.format,)):
+        r = run(fmt, args.rows, args.mem)
+        print(f"{r['format']:>4}: {r['rows']:>9,} rader på {r['seconds']:>7.2f}s  "
+              f"→ {r['rows_per_sec']:>9,} rader/s  fil {r['file_mb']} MB"
+              + (f"  toppminne {r['peak_mb']} MB" if r["peak_mb"] is not None else ""))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Oppstartstid for inngangspunktene: kjører `python -X importtime -c "import fredag.X"`
+i en ren prosess og viser total importtid og de tyngste modulene (kumulativt).
+
+    python -m fredag.benchmarks.bench_importtime
+    python -m fredag.benchmarks.bench_importtime auto_archive helgesjekk_app --top 25
+"""
+from __future__ import annotations
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+ENTRY_POINTS = ("auto_archive", "retention_job", "daemon", "config_cli", "helgesjekk_app")
+CLI_BUDGET_MS = 200
+
+Row = Tuple[int, int, int, str]   # (self µs, kumulativ µs, dybde, modul)
+
+def _pkg_parent() -> Path:
+    return Path(__file__).absolute().parents[2]   # ikke resolve(): pakken kan være en symlink
+
+def _pkg_name() -> str:
+    return (__package__ or "fredag.benchmarks").rpartition(".")[0]
+
+def parse_importtime(stderr: str) -> List[Row]:
+    rows: List[Row] = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cum_us, name = line[len("import time:"):].split("|", 2)
+            depth = (len(name) - len(name.lstrip())) // 2
+            rows.append((int(self_us), int(cum_us), depth, name.strip()))
+        except ValueError:
+            continue
+    return rows
+
+def measure(module: str, extra: str = "") -> Dict:
+    """
+    Importerer fredag.<module> i en ny prosess. Returnerer total (ms), radene fra
+    -X importtime, og evt. stdout fra 'extra' (ekstra kode som kjøres etter importen).
+    """
+    full = f"{_pkg_name()}.{module}"
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    env.pop("PYTHONPROFILEIMPORTTIME", None)
+    p = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {full}\n{extra}"],
+                       cwd=str(_pkg_parent()), env=env, capture_output=True, text=True, timeout=60)
+    if p.returncode != 0:
+        raise RuntimeError(f"import {full} feilet:\n{p.stderr[-2000:]}")
+    rows = parse_importtime(p.stderr)
+    top = next((r for r in rows if r[3] == full), None)
+    return {"module": module, "total_ms": round((top[1] if top else 0) / 1000, 1),
+            "rows": rows, "stdout": p.stdout}
+
+def heaviest(rows: List[Row], n: int = 15, prefix: Optional[str] = None) -> List[Row]:
+    rows = [r for r in rows if prefix is None or r[3].startswith(prefix)]
+    return sorted(rows, key=lambda r: -r[1])[:n]
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("modules", nargs="*", default=list(ENTRY_POINTS))
+    ap.add_argument("--top", type=int, default=10, help="antall tyngste moduler som vises")
+    ap.add_argument("--runs", type=int, default=3, help="beste av N kjøringer (varm diskcache)")
+    args = ap.parse_args(argv)
+    for m in args.modules:
+        best = min((measure(m) for _ in range(max(1, args.runs))), key=lambda r: r["total_ms"])
+        print(f"{m:<16} {best['total_ms']:>7.1f} ms")
+        for self_us, cum_us, depth, name in heaviest(best["rows"][:-1], args.top):
+            print(f"    {cum_us / 1000:>7.1f} ms  (selv {self_us / 1000:>5.1f})  {name}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Søkemotorene i outlook_core mot fake_outlook: rader/sek og COM-kall per motor.
+
+    python -m fredag.benchmarks.bench_search --items 1000000
+    python -m fredag.benchmarks.bench_search --items 100000 --latency realistic --engine gettable
+"""
+from __future__ import annotations
+import argparse
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict
+
+from .. import outlook_core
+from ..fake_outlook import REALISTIC_LATENCY, generate_mailbox
+
+_NEVER = threading.Event()   # stop_evt som aldri settes
+
+def run(engine: str, session, after: date, before: date, cap: int, only_attachments: bool = False) -> Dict:
+    inbox = session.GetDefaultFolder(6)
+    flt = outlook_core._restrict_str(datetime.combine(after, datetime.min.time()),
+                                     datetime.combine(before, datetime.max.time()), None,
+                                     True if only_attachments else None)
+    fn = outlook_core._search_via_gettable if engine == "gettable" else outlook_core._search_via_items
+    session.reset_calls()
+    t = time.perf_counter()
+    res, err, _ = fn(session, inbox, flt, "", "", True, cap, cap, _NEVER, None)
+    secs = time.perf_counter() - t
+    if err:
+        raise SystemExit(err)
+    return {"engine": engine, "rows": len(res), "seconds": round(secs, 3),
+            "rows_per_sec": round(len(res) / secs) if secs else None,
+            "com_calls": session.com_calls, "calls_per_row": round(session.com_calls / max(1, len(res)), 1)}
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--items", type=int, default=100_000, help="meldinger i syntetisk postboks")
+    ap.add_argument("--days", type=int, default=30, help="søkevindu bakover fra siste melding")
+    ap.add_argument("--engine", choices=("gettable", "items", "both"), default="both")
+    ap.add_argument("--latency", choices=("none", "realistic"), default="none")
+    ap.add_argument("--cap", type=int, default=1_000_000)
+    args = ap.parse_args(argv)
+
+    t = time.perf_counter()
+    s = generate_mailbox(args.items, latency=REALISTIC_LATENCY if args.latency == "realistic" else None)
+    print(f"Postboks: {args.items:,} meldinger generert på {time.perf_counter() - t:.2f}s")
+    end = date(2025, 6, 30)
+    for eng in (("gettable", "items") if args.engine == "both" else (args.engine,)):
+        r = run(eng, s, end - timedelta(days=args.days), end, args.cap)
+        print(f"{r['engine']:>8}: {r['rows']:>9,} rader på {r['seconds']:>7.2f}s → {r['rows_per_sec'] or 0:>9,} rader/s  "
+              f"COM-kall {r['com_calls']:,} ({r['calls_per_row']}/rad)")
+
+if __name__ == "__main__":
+    main()
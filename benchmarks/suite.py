@@ -0,0 +1,271 @@
+"""
+Benchmark-suite for de rene hot-pathene (ingen Outlook nødvendig). Resultater lagres som
+JSON i .ragdb/benchmarks/ slik at versjoner kan sammenlignes.
+
+    python -m fredag.benchmarks.suite list
+    python -m fredag.benchmarks.suite run [-k resolve] [--quick]
+    python -m fredag.benchmarks.suite compare                 # to siste kjøringer
+    python -m fredag.benchmarks.suite compare A.json B.json --threshold 0.15
+
+Hvert tilfelle er en generator som gjør oppsett, yield-er (fn, ops) og rydder etterpå.
+Bare fn() måles; tallet som sammenlignes er median tid per operasjon.
+"""
+from __future__ import annotations
+import argparse
+import hashlib
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+REGRESSION_THRESHOLD = 0.10
+DATA_DIR = Path(__file__).resolve().parent / "data"
+
+@dataclass
+class Case:
+    name: str
+    setup: Callable
+    params: Sequence
+    quick_params: Sequence
+    budget_sec: float
+
+CASES: List[Case] = []
+
+def bench(name: str, params: Sequence = (None,), quick: Optional[Sequence] = None, budget_sec: float = 1.0):
+    """Registrerer et tilfelle. Funksjonen tar param og yield-er (fn, ops)."""
+    def deco(fn):
+        CASES.append(Case(name, contextmanager(fn), tuple(params),
+                          tuple(quick if quick is not None else params), budget_sec))
+        return fn
+    return deco
+
+def _results_dir() -> Path:
+    root = Path(__file__).resolve().parents[2] / ".ragdb" / "benchmarks"
+    root.mkdir(parents=True, exist_ok=True)
+    return root
+
+def _git_rev() -> str:
+    try:
+        p = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=str(Path(__file__).resolve().parents[1]),
+                           capture_output=True, text=True, timeout=10)
+        return p.stdout.strip() if p.returncode == 0 else ""
+    except Exception:
+        return ""
+
+def measure(fn: Callable[[], object], budget_sec: float, min_runs: int = 3, max_runs: int = 1000) -> List[float]:
+    fn()   # oppvarming (importer, cacher)
+    times: List[float] = []
+    start = time.perf_counter()
+    while len(times) < max_runs and (len(times) < min_runs or time.perf_counter() - start < budget_sec):
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    return times
+
+def case_id(name: str, param) -> str:
+    return name if param is None else f"{name}[{param}]"
+
+def run_suite(pattern: str = "", quick: bool = False, echo: Callable[[str], None] = print) -> Dict:
+    results: Dict[str, Dict] = {}
+    for c in CASES:
+        for param in (c.quick_params if quick else c.params):
+            cid = case_id(c.name, param)
+            if pattern and pattern.lower() not in cid.lower():
+                continue
+            with c.setup(param) as (fn, ops):
+                times = measure(fn, c.budget_sec * (0.25 if quick else 1.0))
+            med = statistics.median(times)
+            results[cid] = {"ops": ops, "runs": len(times), "min": min(times), "median": med,
+                            "mean": statistics.fmean(times),
+                            "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+                            "per_op_us": med / max(1, ops) * 1e6}
+            echo(f"{cid:<42} {results[cid]['per_op_us']:>12.2f} µs/op  (median {med * 1e3:9.2f} ms, n={len(times)})")
+    return {"meta": {"created": datetime.now().isoformat(timespec="seconds"), "git": _git_rev(),
+                     "python": sys.version.split()[0], "platform": platform.platform(), "quick": quick},
+            "results": results}
+
+def save_results(data: Dict, path: Optional[Path] = None) -> Path:
+    if path is None:
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        rev = data["meta"].get("git") or "nogit"
+        path = _results_dir() / f"{stamp}_{rev}.json"
+    Path(path).write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+    return Path(path)
+
+def compare(old: Dict, new: Dict, threshold: float = REGRESSION_THRESHOLD) -> List[Tuple[str, float, float, float, str]]:
+    """[(id, gammel µs/op, ny µs/op, forhold ny/gammel, merknad)] for tilfeller som finnes i begge."""
+    rows = []
+    for cid, n in new["results"].items():
+        o = old["results"].get(cid)
+        if not o:
+            continue
+        ratio = n["per_op_us"] / o["per_op_us"] if o["per_op_us"] else float("inf")
+        note = "REGRESJON" if ratio > 1 + threshold else ("raskere" if ratio < 1 - threshold else "")
+        rows.append((cid, o["per_op_us"], n["per_op_us"], ratio, note))
+    return rows
+
+def _latest(n: int = 2) -> List[Path]:
+    return sorted(_results_dir().glob("*.json"), key=lambda p: p.stat().st_mtime)[-n:]
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("list")
+    r = sub.add_parser("run")
+    r.add_argument("-k", dest="pattern", default="", help="kjør bare tilfeller som inneholder teksten")
+    r.add_argument("--quick", action="store_true", help="små parametre og kort tidsbudsjett (CI)")
+    r.add_argument("--out", type=Path, help="resultatfil (standard .ragdb/benchmarks/<tid>_<git>.json)")
+    c = sub.add_parser("compare")
+    c.add_argument("files", nargs="*", type=Path, help="GAMMEL NY (standard: to siste)")
+    c.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "list":
+        for case in CASES:
+            print(f"{case.name:<36} {', '.join(str(p) for p in case.params if p is not None)}")
+        return 0
+    if args.cmd == "run":
+        data = run_suite(args.pattern, args.quick)
+        print(f"Lagret: {save_results(data, args.out)}")
+        return 0
+
+    files = args.files or _latest(2)
+    if len(files) != 2:
+        print("Trenger to resultatfiler (kjør 'run' to ganger, eller oppgi GAMMEL NY).")
+        return 2
+    old, new = (json.loads(Path(f).read_text(encoding="utf-8")) for f in files)
+    print(f"{files[0].name}  →  {files[1].name}")
+    rows = compare(old, new, args.threshold)
+    for cid, o, n, ratio, note in rows:
+        print(f"{cid:<42} {o:>12.2f} → {n:>12.2f} µs/op  ×{ratio:5.2f}  {note}")
+    return 1 if any(r[4] == "REGRESJON" for r in rows) else 0
+
+# ---------------------------------------------------------------- tilfeller
+def _rules(n: int, rng: random.Random):
+    from ..group_rules import GroupRule
+    rules = []
+    for k in range(n):
+        pats = [f"@kunde{k}.no", f"faktura@lev{k}.com"]
+        if k % 10 == 0:
+            pats.append(f"*.avd{k}.no")
+        if k % 7 == 0:
+            pats.append(f"regnskap {k}")
+        rules.append(GroupRule(name=f"G{k}", target_dir=f"/arkiv/g{k}", senders=pats))
+    return rules
+
+def _queries(n_rules: int, rng: random.Random, n: int = 1000) -> List[Tuple[str, str]]:
+    out = []
+    for i in range(n):
+        k = rng.randrange(n_rules)
+        r = rng.random()
+        if r < 0.35:
+            out.append((f"ola@kunde{k}.no", "Ola Nordmann"))
+        elif r < 0.5:
+            out.append((f"faktura@lev{k}.com", f"Lev {k} AS"))
+        else:                                      # ingen treff – verste tilfelle (alle regler sjekkes)
+            out.append((f"nyhetsbrev@ukjent{i}.no", f"Ukjent avsender {i}"))
+    return out
+
+@bench("group_rules.resolve_group", params=(10, 100, 1000), quick=(10, 100))
+def _b_resolve(n):
+    from ..group_rules import resolve_group
+    rng = random.Random(n)
+    rules, qs = _rules(n, rng), _queries(n, rng)
+    yield (lambda: [resolve_group(rules, s, nm) for s, nm in qs]), len(qs)
+
+@bench("group_rules.RuleMatcher", params=(10, 100, 1000), quick=(10, 100))
+def _b_matcher(n):
+    from ..group_rules import RuleMatcher
+    rng = random.Random(n)
+    rules, qs = _rules(n, rng), _queries(n, rng)
+    def fn():
+        m = RuleMatcher(rules)                     # ny per kjøring, som i et arkiveringsløp
+        return [m.match(s, nm) for s, nm in qs]
+    yield fn, len(qs)
+
+@bench("outlook_core.html_to_text", params=(1, 30), quick=(1,))
+def _b_html(copies):
+    from ..outlook_core import html_to_text
+    html = (DATA_DIR / "newsletter.html").read_text(encoding="utf-8") * copies   # 30 ≈ 2 MB
+    yield (lambda: html_to_text(html)), 1
+
+@bench("path_template.render_template")
+def _b_template(_):
+    from ..path_template import render_template
+    metas = [{"year": "2025", "month2": f"{m % 12 + 1:02d}", "month_abbr": "Jun", "sender": f"post@kunde{m}.no",
+              "domain": f"kunde{m}.no", "subject_tag": f"PRJ-{m:05d}"} for m in range(2000)]
+    tpl = "{year}/{month2}_{month_abbr}/{domain}/{subject_tag}"
+    yield (lambda: [render_template(tpl, mt) for mt in metas]), len(metas)
+
+@bench("archiver.archive_messages", params=(200,), budget_sec=2.0)
+def _b_archive(n):
+    from ..archiver import archive_messages
+    from ..fake_outlook import eid_of, generate_mailbox
+    s = generate_mailbox(n * 4, attach_ratio=0.5, max_attachment_kb=32, seed=3)
+    rows = [{"eid": eid_of(i), "from_email": "post@kunde.no", "subject": f"PRJ-{i} faktura"}
+            for i in range(len(s.mailbox)) if s.mailbox.n_att[i]][:n]
+    get_item = lambda r: s.GetItemFromID(r["eid"])
+    with tempfile.TemporaryDirectory() as d:
+        runs = iter(range(10**9))
+        def fn():
+            return archive_messages(s, rows, get_item, os.path.join(d, str(next(runs))), dedup=True,
+                                    template="{year}/{month2}_{month_abbr}/{domain}", set_category="Arkivert")
+        yield fn, len(rows)
+
+def _fake_index(n: int) -> Dict[str, float]:
+    now = time.time()
+    return {hashlib.sha1(str(i).encode()).hexdigest(): now - (i % 400) * 86400.0 for i in range(n)}
+
+@bench("dedup_index.save", params=(100_000, 1_000_000), quick=(100_000,), budget_sec=2.0)
+def _b_dedup_save(n):
+    from ..dedup_index import save_index
+    idx = _fake_index(n)
+    with tempfile.TemporaryDirectory() as d:
+        p = Path(d) / "dedup_index.json"
+        yield (lambda: save_index(idx, p)), 1
+
+@bench("dedup_index.load", params=(100_000, 1_000_000), quick=(100_000,), budget_sec=2.0)
+def _b_dedup_load(n):
+    from ..dedup_index import load_index, save_index
+    with tempfile.TemporaryDirectory() as d:
+        p = Path(d) / "dedup_index.json"
+        save_index(_fake_index(n), p)
+        yield (lambda: load_index(p)), 1
+
+@bench("retention.apply_retention", params=(2_000, 20_000), quick=(2_000,), budget_sec=2.0)
+def _b_retention(n):
+    from ..group_rules import GroupRule
+    from ..retention import apply_retention
+    with tempfile.TemporaryDirectory() as d:
+        root = Path(d) / "arkiv"
+        old = (datetime.now() - timedelta(days=400)).timestamp()
+        for i in range(n):
+            sub = root / f"{2024 + i % 2}" / f"{i % 12 + 1:02d}" / f"kunde{i % 25}"
+            sub.mkdir(parents=True, exist_ok=True)
+            f = sub / f"vedlegg_{i}.pdf"
+            f.write_bytes(b"x")
+            if i % 2:
+                os.utime(f, (old, old))
+        rules = [GroupRule(name="Arkiv", target_dir=str(root), senders=[], retention_days=365)]
+        yield (lambda: apply_retention(rules, dry_run=True)), n   # tørrkjøring: treet er likt hver gang
+
+@bench("outlook_core.search_gettable", params=(100_000,), quick=(20_000,), budget_sec=2.0)
+def _b_search(n):
+    from .bench_search import run
+    from ..fake_outlook import generate_mailbox
+    from datetime import date
+    s = generate_mailbox(n)
+    yield (lambda: run("gettable", s, date(2025, 6, 1), date(2025, 6, 30), 10**7)), 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
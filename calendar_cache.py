@@ -0,0 +1,364 @@
+from __future__ import annotations
+import json
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Rullerende vindu for lokalt kalender-øyeblikksbilde
+WINDOW_PAST_DAYS = 90
+WINDOW_FUTURE_DAYS = 365
+MIN_SYNC_INTERVAL_SEC = 30      # bla mellom uker uten å spørre Outlook på nytt
+FULL_REFRESH_HOURS = 7 * 24     # full omlasting per mappe som sikkerhetsnett (ellers inkrementelt)
+
+def _store_dir() -> Path:
+    root = Path(__file__).resolve().parents[1] / ".ragdb"
+    root.mkdir(exist_ok=True)
+    return root
+
+def snapshot_path(include_subfolders: bool) -> Path:
+    return _store_dir() / f"calendar_snapshot{'_sub' if include_subfolders else ''}.json"
+
+def _naive(dt):
+    """pywin32 leverer lokal tid merket med tzinfo – fjern den så alt kan sammenlignes."""
+    if dt is None:
+        return None
+    try:
+        return datetime(dt.year, dt.month, dt.day, dt.hour, dt.minute, dt.second)
+    except Exception:
+        return None
+
+def _or(v, default):
+    return default if v is None else v
+
+def _fmt(dt: datetime) -> str:
+    return dt.strftime("%m/%d/%Y %I:%M %p")   # Restrict må bruke US‑format
+
+# ---------- Intervallindeks ----------
+class EventIndex:
+    """
+    Sortert start/slutt-indeks over avtaler (dicts med 'start'/'end').
+    - query(a, b): avtaler som starter i [a, b] (samme semantikk som [Start]-Restrict)
+    - overlapping(a, b): avtaler som overlapper [a, b)
+    Begge er O(log n + k) via bisect; overlapping bruker lengste varighet som søkevindu.
+    """
+    def __init__(self, events: List[Dict]):
+        evs = [e for e in events if e.get("start")]
+        evs.sort(key=lambda e: e["start"])
+        self._events = evs
+        self._starts = [e["start"] for e in evs]
+        self._max_dur = max(((e.get("end") or e["start"]) - e["start"] for e in evs), default=timedelta(0))
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def query(self, a: datetime, b: datetime) -> List[Dict]:
+        return self._events[bisect_left(self._starts, a):bisect_right(self._starts, b)]
+
+    def overlapping(self, a: datetime, b: datetime) -> List[Dict]:
+        lo = bisect_left(self._starts, a - self._max_dur)
+        hi = bisect_left(self._starts, b)
+        return [e for e in self._events[lo:hi] if (e.get("end") or e["start"]) > a]
+
+# ---------- Outlook-tilgang ----------
+def walk_subfolders(folder, include_subfolders: bool) -> Iterator:
+    yield folder
+    if not include_subfolders: return
+    try:
+        subs = folder.Folders
+        for i in range(1, subs.Count + 1):
+            yield from walk_subfolders(subs.Item(i), True)
+    except Exception:
+        return
+
+def calendar_roots(session) -> List:
+    roots = []
+    try:
+        ds = session.DefaultStore
+        if ds:
+            try: roots.append(ds.GetDefaultFolder(9))  # olFolderCalendar
+            except Exception: pass
+        for i in range(1, session.Stores.Count + 1):
+            st = session.Stores.Item(i)
+            if ds and st.StoreID == ds.StoreID: continue
+            try: roots.append(st.GetDefaultFolder(9))
+            except Exception: continue
+    except Exception:
+        pass
+    return roots
+
+def calendar_folders(session, include_subfolders: bool) -> Iterator:
+    for root in calendar_roots(session):
+        yield from walk_subfolders(root, include_subfolders)
+
+def _folder_key(folder) -> str:
+    return f"{getattr(folder, 'StoreID', '')}:{getattr(folder, 'EntryID', '') or getattr(folder, 'FolderPath', '')}"
+
+def _event_from_item(it, folder, fkey: str) -> Optional[Dict]:
+    if getattr(it, "Class", None) != 26:  # olAppointment
+        return None
+    return {
+        "eid": getattr(it, "EntryID", None),
+        "store": getattr(folder, "StoreID", None),
+        "start": _naive(getattr(it, "Start", None)),
+        "end": _naive(getattr(it, "End", None)),
+        "subject": getattr(it, "Subject", "") or "",
+        "location": getattr(it, "Location", "") or "",
+        "busy": int(_or(getattr(it, "BusyStatus", None), 2)),  # OlBusyStatus (0=ledig, 2=opptatt)
+        "folder": fkey,
+    }
+
+def load_folder_events(folder, start_dt: datetime, end_dt: datetime, fkey: str = "",
+                       overlapping: bool = False) -> List[Dict]:
+    """
+    Alle avtaler (inkl. gjentakelser) som starter i [start_dt, end_dt] i én mappe.
+    overlapping=True: i stedet alle som overlapper intervallet (også de som startet før).
+    """
+    try: items = folder.Items
+    except Exception: return []
+    try: items.IncludeRecurrences = True
+    except Exception: pass
+    try: items.Sort("[Start]")
+    except Exception: pass
+
+    if overlapping:
+        restr = items.Restrict(f"[Start] < '{_fmt(end_dt)}' AND [End] > '{_fmt(start_dt)}'")
+    else:
+        restr = items.Restrict(f"[Start] >= '{_fmt(start_dt)}' AND [Start] <= '{_fmt(end_dt)}'")
+    out: List[Dict] = []
+    # Med IncludeRecurrences er Count ikke pålitelig – bruk GetFirst/GetNext
+    it = restr.GetFirst()
+    while it:
+        try:
+            ev = _event_from_item(it, folder, fkey)
+            if ev: out.append(ev)
+        except Exception:
+            pass
+        it = restr.GetNext()
+    return out
+
+# ---------- Øyeblikksbilde ----------
+class CalendarSnapshot:
+    """
+    Lokalt øyeblikksbilde av kalenderavtaler i et rullerende vindu
+    (-WINDOW_PAST_DAYS/+WINDOW_FUTURE_DAYS). Oppdateres inkrementelt per mappe:
+    - endrede/nye avtaler via [LastModificationTime]
+    - slettinger ved å avstemme EntryID-ene mot en GetTable med bare EntryID (når antallet
+      er endret eller noe er endret – sletting + ny avtale gir samme antall)
+    - når vinduet flytter seg (ny dag) lastes bare de nye dagene, og utløpte avtaler fjernes
+    Mappen lastes helt på nytt når en gjentakende avtale er endret, når vinduet har hoppet
+    (ikke overlapper det gamle) eller etter FULL_REFRESH_HOURS.
+    """
+    def __init__(self, include_subfolders: bool = False):
+        self.include_subfolders = include_subfolders
+        self.window: Tuple[Optional[datetime], Optional[datetime]] = (None, None)
+        self.folders: Dict[str, Dict] = {}     # fkey -> {"count", "synced", "full"}
+        self.events: List[Dict] = []
+        self.synced: Optional[datetime] = None
+        self._index: Optional[EventIndex] = None
+
+    # --- spørringer (lokalt) ---
+    @property
+    def index(self) -> EventIndex:
+        if self._index is None:
+            self._index = EventIndex(self.events)
+        return self._index
+
+    def covers(self, a: datetime, b: datetime) -> bool:
+        w0, w1 = self.window
+        return bool(w0 and w1 and w0 <= a and b <= w1)
+
+    def query(self, a: datetime, b: datetime) -> List[Dict]:
+        return self.index.query(a, b)
+
+    # --- synk mot Outlook ---
+    @staticmethod
+    def desired_window(now: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+        today = (now or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+        return today - timedelta(days=WINDOW_PAST_DAYS), today + timedelta(days=WINDOW_FUTURE_DAYS + 1)
+
+    def _replace_folder(self, fkey: str, events: List[Dict]) -> None:
+        self.events = [e for e in self.events if e.get("folder") != fkey] + events
+        self._index = None
+
+    def _shift_folder(self, folder, fkey: str, old: Tuple[datetime, datetime]) -> None:
+        """Vinduet har flyttet seg fremover: fjern avtaler før nytt start, last bare nye dager."""
+        w0, w1 = self.window
+        mine = [e for e in self.events if e.get("folder") == fkey and e["start"] and e["start"] >= w0]
+        have = {(e.get("eid"), e["start"]) for e in mine}
+        added = [e for e in load_folder_events(folder, old[1], w1, fkey) if (e.get("eid"), e["start"]) not in have]
+        self._replace_folder(fkey, mine + added)
+
+    def _reconcile_deleted(self, folder, fkey: str) -> None:
+        """Fjerner avtaler hvis EntryID ikke lenger finnes i mappen (én tabell med bare EntryID)."""
+        tbl = folder.GetTable()
+        cols = tbl.Columns
+        try: cols.RemoveAll()
+        except Exception: pass
+        cols.Add("EntryID")
+        alive = set()
+        while not tbl.EndOfTable:
+            row = tbl.GetNextRow()
+            if row is None:
+                break
+            alive.add(row.Item("EntryID"))
+        before = len(self.events)
+        self.events = [e for e in self.events if e.get("folder") != fkey or e.get("eid") in alive]
+        if len(self.events) != before:
+            self._index = None
+
+    def _sync_folder(self, folder, now: datetime, old_window: Tuple[Optional[datetime], Optional[datetime]]) -> None:
+        fkey = _folder_key(folder)
+        w0, w1 = self.window
+        try:
+            count = int(folder.Items.Count)
+        except Exception:
+            count = -1
+        info = self.folders.get(fkey)
+        o0, o1 = old_window
+        moved = (o0, o1) != (w0, w1)
+        shift = moved and o0 is not None and o1 is not None and o0 <= w0 <= o1 <= w1
+        full = (info is None or (moved and not shift) or count < 0
+                or now - info["full"] > timedelta(hours=FULL_REFRESH_HOURS))
+
+        if not full:
+            # Endret siden forrige synk (1 min margin for klokkeskjevhet)
+            since = info["synced"] - timedelta(minutes=1)
+            try:
+                changed = folder.Items.Restrict(f"[LastModificationTime] > '{_fmt(since)}'")
+                changed_items = [changed.Item(i) for i in range(1, changed.Count + 1)]
+            except Exception:
+                changed_items, full = [], True
+            if any(bool(getattr(it, "IsRecurring", False)) for it in changed_items):
+                full = True
+            if not full:
+                if shift:
+                    self._shift_folder(folder, fkey, (o0, o1))
+                if changed_items:
+                    eids = {getattr(it, "EntryID", None) for it in changed_items}
+                    keep = [e for e in self.events if not (e.get("folder") == fkey and e.get("eid") in eids)]
+                    for it in changed_items:
+                        ev = _event_from_item(it, folder, fkey)
+                        if ev and ev["start"] and w0 <= ev["start"] <= w1:
+                            keep.append(ev)
+                    self.events = keep
+                    self._index = None
+                if changed_items or info.get("count") != count:
+                    try:
+                        self._reconcile_deleted(folder, fkey)
+                    except Exception:
+                        full = True
+
+        if full:
+            self._replace_folder(fkey, load_folder_events(folder, w0, w1, fkey))
+            self.folders[fkey] = {"count": count, "synced": now, "full": now}
+        else:
+            info["synced"] = now; info["count"] = count
+
+    def sync(self, session, now: Optional[datetime] = None, force: bool = False) -> bool:
+        """Synker mot Outlook. Returnerer False hvis hoppet over (nylig synket)."""
+        now = now or datetime.now()
+        if not force and self.synced and (now - self.synced).total_seconds() < MIN_SYNC_INTERVAL_SEC:
+            return False
+        old = self.window
+        self.window = self.desired_window(now)
+        seen = set()
+        for folder in calendar_folders(session, self.include_subfolders):
+            fkey = _folder_key(folder)
+            seen.add(fkey)
+            try:
+                self._sync_folder(folder, now, old)
+            except Exception:
+                self.folders.pop(fkey, None)     # ufullstendig – lastes helt neste gang
+                continue
+        # Mapper som er borte
+        for fkey in [k for k in self.folders if k not in seen]:
+            self.folders.pop(fkey, None)
+            self._replace_folder(fkey, [])
+        self.synced = now
+        return True
+
+    # --- persistens ---
+    def to_json(self) -> Dict:
+        iso = lambda d: d.isoformat() if d else None
+        return {
+            "v": 1,
+            "include_subfolders": self.include_subfolders,
+            "window": [iso(self.window[0]), iso(self.window[1])],
+            "synced": iso(self.synced),
+            "folders": {k: {"count": v["count"], "synced": iso(v["synced"]), "full": iso(v["full"])}
+                        for k, v in self.folders.items()},
+            "events": [dict(e, start=iso(e.get("start")), end=iso(e.get("end"))) for e in self.events],
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict) -> "CalendarSnapshot":
+        dt = lambda s: datetime.fromisoformat(s) if s else None
+        snap = cls(bool(data.get("include_subfolders")))
+        w = data.get("window") or [None, None]
+        snap.window = (dt(w[0]), dt(w[1]))
+        snap.synced = dt(data.get("synced"))
+        snap.folders = {k: {"count": v.get("count"), "synced": dt(v.get("synced")), "full": dt(v.get("full"))}
+                        for k, v in (data.get("folders") or {}).items()}
+        snap.events = [dict(e, start=dt(e.get("start")), end=dt(e.get("end"))) for e in data.get("events") or []]
+        return snap
+
+    def save(self) -> None:
+        p = snapshot_path(self.include_subfolders)
+        tmp = p.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.to_json(), ensure_ascii=False), encoding="utf-8")
+        tmp.replace(p)
+
+    @classmethod
+    def load(cls, include_subfolders: bool) -> "CalendarSnapshot":
+        p = snapshot_path(include_subfolders)
+        if not p.exists():
+            return cls(include_subfolders)
+        try:
+            return cls.from_json(json.loads(p.read_text(encoding="utf-8")))
+        except Exception:
+            return cls(include_subfolders)
+
+# Én delt instans per variant (med/uten undermapper) i prosessen
+_SNAPSHOTS: Dict[bool, CalendarSnapshot] = {}
+_LOCK = threading.Lock()
+
+def get_events(session, start_dt: datetime, end_dt: datetime, include_subfolders: bool,
+               force_sync: bool = False, overlapping: bool = False) -> Optional[List[Dict]]:
+    """
+    Avtaler som starter i [start_dt, end_dt] fra øyeblikksbildet (synket ved behov), eller
+    med overlapping=True alle som overlapper [start_dt, end_dt).
+    Returnerer None hvis intervallet ligger utenfor vinduet – kaller spør da Outlook direkte.
+    """
+    with _LOCK:
+        snap = _SNAPSHOTS.get(include_subfolders)
+        if snap is None:
+            snap = _SNAPSHOTS[include_subfolders] = CalendarSnapshot.load(include_subfolders)
+        if snap.sync(session, force=force_sync):
+            try: snap.save()
+            except Exception: pass
+        if not snap.covers(start_dt, end_dt):
+            return None
+        if overlapping:
+            return snap.index.overlapping(start_dt, end_dt)
+        return list(snap.query(start_dt, end_dt))
+
+def busy_events(session, start_dt: datetime, end_dt: datetime, include_subfolders: bool) -> List[Dict]:
+    """
+    Grunnlaget for ledig tid: avtaler som overlapper [start_dt, end_dt), også flerdagsavtaler
+    som startet før start_dt. Fra øyeblikksbildet når det dekker intervallet, ellers Outlook.
+    """
+    try:
+        cached = get_events(session, start_dt, end_dt, include_subfolders, overlapping=True)
+    except Exception:
+        cached = None
+    if cached is not None:
+        return cached
+    events: List[Dict] = []
+    for folder in calendar_folders(session, include_subfolders):
+        try:
+            events.extend(load_folder_events(folder, start_dt, end_dt, overlapping=True))
+        except Exception:
+            continue
+    return EventIndex(events).overlapping(start_dt, end_dt)
@@ -5,6 +5,8 @@ from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 
 from .widgets_datepicker import DatePicker
+from .calendar_cache import busy_events, get_events, calendar_folders, load_folder_events
+from .freebusy import free_slots
 
 _INPUTS = ("%d.%m.%Y", "%d.%m.%y", "%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y")
 def _parse_date(s: str):
@@ -25,7 +27,13 @@ def _parse_dt(date_str: str, time_str: str) -> datetime:
     d = _parse_date(date_str); t = _parse_time(time_str)
     return datetime(d.year, d.month, d.day, t.hour, t.minute)
 
-def _thread_load_events(d_from, d_to, include_subfolders: bool) -> (List[Dict], Optional[str]):
+def _thread_load_events(d_from, d_to, include_subfolders: bool,
+                        force_sync: bool = False) -> (List[Dict], List[Dict], Optional[str]):
+    """
+    Henter avtaler i egen tråd. Innenfor det rullerende vinduet (calendar_cache)
+    besvares spørringen lokalt etter en inkrementell synk; ellers spørres Outlook direkte.
+    Returnerer (avtaler som starter i intervallet, avtaler som overlapper det, feil).
+    """
     try:
         import pythoncom, win32com.client
         pythoncom.CoInitialize()
@@ -33,70 +41,29 @@ def _thread_load_events(d_from, d_to, include_subfolders: bool) -> (List[Dict],
             app = win32com.client.Dispatch("Outlook.Application")
             session = app.Session
         except Exception as e:
-            return [], f"Klarte ikke å starte Outlook i tråd: {e}"
-
-        def walk_subfolders(folder):
-            yield folder
-            if not include_subfolders: return
-            try:
-                subs = folder.Folders
-                for i in range(1, subs.Count + 1):
-                    sub = subs.Item(i)
-                    for f in walk_subfolders(sub): yield f
-            except Exception: return
-
-        def calendar_roots():
-            roots = []
-            try:
-                ds = session.DefaultStore
-                if ds:
-                    try: roots.append(ds.GetDefaultFolder(9))  # olFolderCalendar
-                    except Exception: pass
-                for i in range(1, session.Stores.Count + 1):
-                    st = session.Stores.Item(i)
-                    if ds and st.StoreID == ds.StoreID: continue
-                    try: roots.append(st.GetDefaultFolder(9))
-                    except Exception: continue
-            except Exception:
-                pass
-            return roots or []
+            return [], [], f"Klarte ikke å starte Outlook i tråd: {e}"
 
         start_dt = datetime.combine(d_from, datetime.min.time())
         end_dt   = datetime.combine(d_to,   datetime.max.time())
-        start_s  = start_dt.strftime("%m/%d/%Y %I:%M %p")   # Restrict må bruke US‑format
-        end_s    = end_dt.strftime("%m/%d/%Y %I:%M %p")
-
-        results: List[Dict] = []
-        for root in calendar_roots():
-            for folder in walk_subfolders(root):
-                try: items = folder.Items
-                except Exception: continue
-                try: items.IncludeRecurrences = True
-                except Exception: pass
-                try: items.Sort("[Start]")
-                except Exception: pass
-
-                restr = items.Restrict(f"[Start] >= '{start_s}' AND [Start] <= '{end_s}'")
-                try: cnt = restr.Count
-                except Exception: cnt = 0
-                for i in range(1, cnt + 1):
-                    try:
-                        it = restr.Item(i)
-                        if getattr(it, "Class", None) != 26:  # olAppointment
-                            continue
-                        results.append({
-                            "eid": getattr(it, "EntryID", None),
-                            "store": getattr(folder, "StoreID", None),
-                            "start": getattr(it, "Start", None),
-                            "end": getattr(it, "End", None),
-                            "subject": getattr(it, "Subject", "") or "",
-                            "location": getattr(it, "Location", "") or "",
-                        })
-                    except Exception:
-                        continue
-        return results, None
+
+        try:
+            cached = get_events(session, start_dt, end_dt, include_subfolders, force_sync=force_sync)
+        except Exception:
+            cached = None
+        if cached is not None:
+            results = cached
+        else:
+            results = []
+            for folder in calendar_folders(session, include_subfolders):
+                try:
+                    results.extend(load_folder_events(folder, start_dt, end_dt))
+                except Exception:
+                    continue
+            results.sort(key=lambda r: r["start"] or datetime.min)
+        # ledig tid må også se flerdagsavtaler som startet før intervallet
+        return results, busy_events(session, start_dt, end_dt, include_subfolders), None
     except Exception as e:
-        return [], f"Uventet feil i tråd: {e}"
+        return [], [], f"Uventet feil i tråd: {e}"
     finally:
         try:
             import pythoncom; pythoncom.CoUninitialize()
@@ -127,7 +94,7 @@ class CalendarWindow(tk.Toplevel):
 
         self.subfolders_var = tk.BooleanVar(value=False)
         ttk.Checkbutton(flt, text="Inkluder undermapper", variable=self.subfolders_var).grid(row=0, column=6)
-        ttk.Button(flt, text="Oppdater", command=self.refresh).grid(row=0, column=7, padx=6)
+        ttk.Button(flt, text="Oppdater", command=lambda: self.refresh(force_sync=True)).grid(row=0, column=7, padx=6)
         ttk.Button(flt, text="Eksporter CSV", command=self.export_csv).grid(row=0, column=8, padx=6)
 
         mid = ttk.Frame(frm); mid.pack(fill="both", expand=True, pady=(8, 6))
@@ -173,12 +140,31 @@ class CalendarWindow(tk.Toplevel):
         ttk.Button(newf, text="Lag avtale", command=lambda: self.make_new(invite=False, teams=False)).grid(row=1, column=8, padx=6, pady=(6,0))
         ttk.Button(newf, text="Lag møte (Teams)", command=lambda: self.make_new(invite=True, teams=True)).grid(row=1, column=9, padx=6, pady=(6,0))
 
+        fb = ttk.LabelFrame(frm, text="Finn ledig tid (i valgt intervall)"); fb.pack(fill="x", pady=(8,0))
+        ttk.Label(fb, text="Varighet (min):").grid(row=0, column=0, sticky="w")
+        self.fb_len = tk.StringVar(value="60")
+        ttk.Entry(fb, textvariable=self.fb_len, width=6).grid(row=0, column=1, padx=(6,12))
+        ttk.Label(fb, text="Antall:").grid(row=0, column=2, sticky="w")
+        self.fb_count = tk.StringVar(value="5")
+        ttk.Entry(fb, textvariable=self.fb_count, width=4).grid(row=0, column=3, padx=(6,12))
+        ttk.Label(fb, text="Arbeidstid:").grid(row=0, column=4, sticky="w")
+        self.fb_from = tk.StringVar(value="08:00"); self.fb_to = tk.StringVar(value="16:00")
+        ttk.Entry(fb, textvariable=self.fb_from, width=6).grid(row=0, column=5, padx=(6,2))
+        ttk.Label(fb, text="–").grid(row=0, column=6)
+        ttk.Entry(fb, textvariable=self.fb_to, width=6).grid(row=0, column=7, padx=(2,12))
+        ttk.Button(fb, text="Finn ledige tider", command=self.find_free).grid(row=0, column=8, padx=6)
+        self.fb_list = tk.Listbox(fb, height=4, width=48)
+        self.fb_list.grid(row=0, column=9, rowspan=2, sticky="we", padx=(6,0))
+        self.fb_list.bind("<<ListboxSelect>>", self._on_free_select)
+        self._free: List = []
+
         self.status = ttk.Label(frm, text="Klar."); self.status.pack(fill="x", pady=(8, 0))
         self.results: List[Dict] = []; self._id_to_ix: Dict[str,int] = {}
+        self._busy: List[Dict] = []   # avtaler som overlapper intervallet (ledig tid)
         self.refresh()
 
     # ---- datahenting ----
-    def refresh(self):
+    def refresh(self, force_sync: bool = False):
         try:
             d_from = _parse_date(self.from_var.get()); d_to = _parse_date(self.to_var.get())
         except Exception:
@@ -192,9 +178,10 @@ class CalendarWindow(tk.Toplevel):
         include_sub = self.subfolders_var.get()
         import threading
         def _run():
-            res, err = _thread_load_events(d_from, d_to, include_sub)
+            res, busy, err = _thread_load_events(d_from, d_to, include_sub, force_sync=force_sync)
             def _done():
                 if err: self.status.config(text=f"Feil under henting: {err}")
+                self._busy = busy
                 self._populate(res)
             self.after(0, _done)
         threading.Thread(target=_run, daemon=True).start()
@@ -242,6 +229,30 @@ class CalendarWindow(tk.Toplevel):
         except Exception:
             messagebox.showerror("Outlook", "Klarte ikke å vise avtalen i Outlook.")
 
+    # ---- ledig tid ----
+    def find_free(self):
+        try:
+            d_from = _parse_date(self.from_var.get()); d_to = _parse_date(self.to_var.get())
+            length = timedelta(minutes=int(self.fb_len.get() or "60"))
+            count = int(self.fb_count.get() or "5")
+            ws = _parse_time(self.fb_from.get()); we = _parse_time(self.fb_to.get())
+        except Exception as e:
+            messagebox.showerror("Ledig tid", f"Ugyldig verdi: {e}"); return
+        self._free = free_slots(self._busy, d_from, d_to, length, n=count,
+                                work_start=ws, work_end=we, not_before=datetime.now())
+        self.fb_list.delete(0, "end")
+        for s, e in self._free:
+            self.fb_list.insert("end", f"{s:%a %d.%m.%Y %H:%M} – {e:%H:%M}")
+        if not self._free:
+            self.fb_list.insert("end", "(Ingen ledige tider i intervallet)")
+
+    def _on_free_select(self, _evt):
+        sel = self.fb_list.curselection()
+        if not sel or sel[0] >= len(self._free): return
+        s, e = self._free[sel[0]]
+        self.new_from_date.set(s.strftime("%d.%m.%Y")); self.new_from_time.set(s.strftime("%H:%M"))
+        self.new_to_date.set(e.strftime("%d.%m.%Y")); self.new_to_time.set(e.strftime("%H:%M"))
+
     # ---- opprettelse / eksport ----
     def copy_from_selected(self):
         sel = self.tree.selection()
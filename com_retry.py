@@ -0,0 +1,206 @@
+"""
+Gjenforsøk og adaptiv struping av COM-kall mot Outlook (Exchange i online-modus).
+
+Under last svarer Exchange/Outlook med forbigående feil (RPC_E_CALL_REJECTED, «server
+busy», RPC-tidsavbrudd, «administratoren har begrenset antall elementer …»). call()
+prøver slike kall på nytt med eksponentiell backoff (med jitter); andre feil kastes
+med en gang som før. En felles Governor for prosessen styrer hvor mange COM-kall som
+kan være i gang samtidig og en pause før hvert kall (AIMD): struping halverer grensen
+og dobler pausen, vellykkede kall med normal latens åpner gradvis igjen, og kall som
+blir mye tregere enn observert grunnlinje strammer inn før Exchange begynner å avvise.
+Grunnlinjen følges per kalltype (steg + funksjon), så et GetTable/Restrict etter mange
+raske GetNextRow ikke regnes som tregt.
+
+    tbl = com_retry.call(folder.GetTable, flt, stage="search")
+
+Per kjøring telles forsøk på nytt (retries) og strupehendelser (throttled) i telemetri-
+steget som oppgis; governor.snapshot() gir tellere for hele prosessen.
+"""
+from __future__ import annotations
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+from . import telemetry
+
+RPC_E_CALL_REJECTED = -2147418111           # 0x80010001 – Outlook opptatt (dialog/meldingskø)
+RPC_E_SERVERCALL_RETRYLATER = -2147417846   # 0x8001010A
+RPC_S_SERVER_UNAVAILABLE = -2147023174      # 0x800706BA
+RPC_S_CALL_FAILED = -2147023170             # 0x800706BE
+MAPI_E_NETWORK_ERROR = -2147221227          # 0x80040115
+MAPI_E_BUSY = -2147221237                   # 0x8004010B
+MAPI_E_TIMEOUT = -2147220479                # 0x80040401
+TRANSIENT_HRESULTS = frozenset({RPC_E_CALL_REJECTED, RPC_E_SERVERCALL_RETRYLATER, RPC_S_SERVER_UNAVAILABLE,
+                                RPC_S_CALL_FAILED, MAPI_E_NETWORK_ERROR, MAPI_E_BUSY, MAPI_E_TIMEOUT})
+# Exchange-struping kommer ofte som generisk E_FAIL med forklarende tekst
+_TRANSIENT_TEXT = ("limited the number of items", "har begrenset antall", "server is busy", "serveren er opptatt",
+                   "call was rejected", "retry later", "timed out", "tidsavbrudd")
+
+def _hresults(exc: BaseException) -> Iterator[int]:
+    hr = getattr(exc, "hresult", None)
+    if isinstance(hr, int):
+        yield hr
+    args = getattr(exc, "args", ()) or ()
+    if args and isinstance(args[0], int):
+        yield args[0]
+    # pywintypes.com_error: (hr, tekst, excepinfo, argerr) – excepinfo[5] er scode
+    if len(args) > 2 and isinstance(args[2], tuple) and len(args[2]) > 5 and isinstance(args[2][5], int):
+        yield args[2][5]
+
+def is_transient(exc: BaseException) -> bool:
+    """True for feil som er verdt å prøve igjen (struping/opptatt/nettverk)."""
+    if any(hr in TRANSIENT_HRESULTS for hr in _hresults(exc)):
+        return True
+    args = getattr(exc, "args", ()) or ()
+    text = " ".join(str(a) for a in args if isinstance(a, (str, tuple))).lower()
+    return any(t in text for t in _TRANSIENT_TEXT)
+
+class Governor:
+    """
+    Adaptiv samtidighetsgrense + pause før hvert kall (AIMD).
+    limit: hvor mange COM-kall som slippes til samtidig (1..max_concurrency).
+    pace: sekunder å vente før hvert kall (0 når alt går fint).
+    """
+    def __init__(self, max_concurrency: int = 4, retries: int = 5, backoff_sec: float = 0.5,
+                 max_backoff_sec: float = 30.0, max_pace_sec: float = 2.0, slow_factor: float = 4.0,
+                 sleep: Callable[[float], None] = time.sleep, seed: Optional[int] = None):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.retries = max(0, int(retries))
+        self.backoff_sec = float(backoff_sec)
+        self.max_backoff_sec = float(max_backoff_sec)
+        self.max_pace_sec = float(max_pace_sec)
+        self.slow_factor = float(slow_factor)
+        self.sleep = sleep
+        self.limit = float(self.max_concurrency)
+        self.pace = 0.0
+        self._rng = random.Random(seed)
+        self._cond = threading.Condition()
+        self._active = 0
+        self._held = threading.local()
+        self._lat: Dict[str, List[float]] = {}  # kalltype → [glidende snitt, grunnlinje]
+        self._last_ewma = 0.0
+        self.calls = self.retries_done = self.throttled = self.failures = self.slow = 0
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        if getattr(self._held, "n", 0):      # nestet call() i samme tråd: har allerede plass
+            yield
+            return
+        with self._cond:
+            while self._active >= max(1, int(self.limit)):
+                self._cond.wait(0.5)
+            self._active += 1
+            pace = self.pace
+        self._held.n = 1
+        try:
+            if pace > 0:
+                self.sleep(pace)
+            yield
+        finally:
+            self._held.n = 0
+            with self._cond:
+                self._active -= 1
+                self._cond.notify()
+
+    def on_success(self, latency: float, kind: str = "") -> None:
+        """kind: kalltype (f.eks. 'search:GetNextRow'); latens sammenlignes bare med samme type."""
+        with self._cond:
+            self.calls += 1
+            st = self._lat.get(kind)
+            if st is None:
+                st = self._lat[kind] = [latency, latency]
+            else:
+                st[0] = 0.9 * st[0] + 0.1 * latency
+                # grunnlinjen kryper sakte oppover, så et tidlig tilfeldig lavt kall ikke låser den
+                st[1] = min(st[0], st[1] * 1.01)
+            self._last_ewma = st[0]
+            if st[0] > self.slow_factor * max(st[1], 1e-4):
+                self.slow += 1
+                self.limit = max(1.0, self.limit * 0.9)
+            else:
+                self.limit = min(float(self.max_concurrency), self.limit + 1.0 / max(1.0, self.limit))
+                self.pace = self.pace * 0.8 if self.pace > 1e-3 else 0.0
+            self._cond.notify_all()
+
+    def on_throttle(self) -> None:
+        with self._cond:
+            self.calls += 1
+            self.throttled += 1
+            self.limit = max(1.0, self.limit / 2)
+            self.pace = min(self.max_pace_sec, max(0.05, self.pace * 2))
+
+    def backoff(self, attempt: int) -> float:
+        """Ventetid før forsøk nr. attempt+1: base·2^attempt, maks max_backoff_sec, med jitter."""
+        d = min(self.max_backoff_sec, self.backoff_sec * (2 ** attempt))
+        return d * (0.5 + 0.5 * self._rng.random())
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._cond:
+            return {"limit": round(self.limit, 2), "pace_sec": round(self.pace, 4), "calls": self.calls,
+                    "retries": self.retries_done, "throttled": self.throttled, "failures": self.failures,
+                    "slow": self.slow, "latency_ms": round(self._last_ewma * 1000, 3)}
+
+_DEFAULT: Optional[Governor] = None
+_DEFAULT_LOCK = threading.Lock()
+
+def default_governor() -> Governor:
+    """Prosessens felles governor (innstillingene com_* leses første gang)."""
+    global _DEFAULT
+    if _DEFAULT is None:
+        with _DEFAULT_LOCK:
+            if _DEFAULT is None:
+                try:
+                    from .settings import load_settings
+                    st = load_settings()
+                except Exception:
+                    st = {}
+                _DEFAULT = Governor(max_concurrency=int(st.get("com_max_concurrency", 4) or 4),
+                                    retries=int(st.get("com_retries", 5)),
+                                    backoff_sec=float(st.get("com_backoff_sec", 0.5)),
+                                    max_backoff_sec=float(st.get("com_max_backoff_sec", 30.0)))
+    return _DEFAULT
+
+def set_default_governor(g: Optional[Governor]) -> None:
+    """Bytter (eller nullstiller med None) prosessens governor – for tester og benchmarks."""
+    global _DEFAULT
+    with _DEFAULT_LOCK:
+        _DEFAULT = g
+
+def _kind(fn: Callable, stage: Optional[str]) -> str:
+    name = getattr(fn, "__qualname__", None) or getattr(fn, "__name__", None) or type(fn).__name__
+    return f"{stage or ''}:{name}"
+
+def call(fn: Callable, *args, stage: Optional[str] = None, governor: Optional[Governor] = None, **kw):
+    """
+    fn(*args, **kw) under governoren. Forbigående COM-feil prøves på nytt inntil
+    governor.retries ganger med backoff; siste feil (eller en ikke-forbigående) kastes.
+    'stage' = telemetri-steget som får retries/throttled-tellerne.
+    """
+    g = governor or default_governor()
+    attempt = 0
+    while True:
+        with g.slot():
+            t0 = time.perf_counter()
+            try:
+                out = fn(*args, **kw)
+            except Exception as e:
+                if not is_transient(e):
+                    raise
+                g.on_throttle()
+                if stage:
+                    telemetry.count(stage, throttled=1)
+                if attempt >= g.retries:
+                    with g._cond:
+                        g.failures += 1
+                    raise
+            else:
+                g.on_success(time.perf_counter() - t0, _kind(fn, stage))
+                return out
+        g.sleep(g.backoff(attempt))
+        attempt += 1
+        with g._cond:
+            g.retries_done += 1
+        if stage:
+            telemetry.count(stage, retries=1)
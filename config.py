@@ -8,10 +8,17 @@ DAGNAVN = ["mandag", "tirsdag", "onsdag", "torsdag", "fredag", "lørdag", "sønd
 
 # Ukesoppsummering
 TOP_N_SENDERS = 25
+TREND_WEEKS = 4               # sammenlign mot snitt for N foregående uker
+SENDER_STATS_KEEP_DAYS = 120  # hvor lenge dagsaggregatet (avsendere) beholdes
 
 # Ytelses-/sikkerhetsgrenser
 MAX_PER_FOLDER = 6000       # maks meldinger vi skanner per mappe manuelt
 FALLBACK_RECENT_N = 2000    # fallback: N siste i Innboks (filtreres til uke)
 
+# Avsendertelling: over så mange distinkte avsendere byttes eksakt telling ut med
+# Space-Saving (heavy hitters) med fast antall tellere – avvik ≤ totalt/kapasitet
+HEAVY_HITTERS_THRESHOLD = 50000
+HEAVY_HITTERS_CAPACITY = 5000
+
 # Hvis Outlook-profilen mangler standardadresse (sjelden) – sett denne manuelt
 FALLBACK_EMAIL = None       # f.eks. "din@adresse.no"
@@ -0,0 +1,70 @@
+"""
+Felles minnecache for konfigfiler (settings.json, grupper.json).
+
+Innholdet parses én gang og gjenbrukes til filens (mtime_ns, størrelse) endrer seg –
+da parses den på nytt ved neste oppslag og registrerte on_reload-kroker kalles med
+den nye verdien (f.eks. for å bygge regel-matcheren på nytt). Mangler fila, caches
+parserens verdi for «ingen fil» på samme måte.
+"""
+from __future__ import annotations
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+Stamp = Optional[Tuple[int, int]]
+
+_LOCK = threading.RLock()
+_CACHE: Dict[str, Tuple[Stamp, Any]] = {}
+_HOOKS: Dict[str, List[Callable[[Any], None]]] = {}
+_STATS = {"hits": 0, "loads": 0}
+
+def _key(path: Path) -> str:
+    return os.path.normcase(os.path.abspath(str(path)))
+
+def _stamp(path: Path) -> Stamp:
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+def load(path: Path, parse: Callable[[Path], Any]) -> Any:
+    """
+    Parsed innhold av 'path'. NB: verdien deles mellom kallere – den som vil endre
+    den må kopiere først (settings/group_rules gjør det i sine load-funksjoner).
+    """
+    k = _key(path)
+    stamp = _stamp(path)
+    with _LOCK:
+        hit = _CACHE.get(k)
+        if hit is not None and hit[0] == stamp:
+            _STATS["hits"] += 1
+            return hit[1]
+        value = parse(path)
+        _CACHE[k] = (stamp, value)
+        _STATS["loads"] += 1
+        hooks = list(_HOOKS.get(k, ()))
+    for fn in hooks:
+        try: fn(value)
+        except Exception: pass
+    return value
+
+def on_reload(path: Path, fn: Callable[[Any], None]) -> None:
+    """Kalles med ny verdi hver gang 'path' (re)parses."""
+    with _LOCK:
+        lst = _HOOKS.setdefault(_key(path), [])
+        if fn not in lst:
+            lst.append(fn)
+
+def invalidate(path: Optional[Path] = None) -> None:
+    """Glem cachet verdi (alle filer hvis path=None) – neste load() parser på nytt."""
+    with _LOCK:
+        if path is None:
+            _CACHE.clear()
+        else:
+            _CACHE.pop(_key(path), None)
+
+def stats() -> Dict[str, int]:
+    with _LOCK:
+        return dict(_STATS, files=len(_CACHE))
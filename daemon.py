@@ -0,0 +1,447 @@
+"""
+Fredag-daemon: én langlivet prosess med innebygd cron-lignende planlegger.
+
+Holder Outlook-sesjonen og varme cacher (regler, avsenderaggregat, mappeoppslag)
+mellom kjøringene i stedet for at schtasks starter en ny Python-prosess hver gang.
+Kommandoer tas imot over en lokal kanal (navngitt pipe på Windows, Unix-socket
+ellers) via multiprocessing.connection med delt nøkkel i .ragdb/daemon.key:
+
+    python -m fredag.daemon                 # start (forgrunn)
+    python -m fredag.daemon send status
+    python -m fredag.daemon send run archive
+    python -m fredag.daemon send stop
+
+All COM-bruk skjer i hovedtråden (sesjonen er apartment-bundet); lyttetråden
+legger bare kommandoer i en kø.
+"""
+from __future__ import annotations
+import argparse
+import os
+import queue
+import secrets
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+
+from . import telemetry
+from .locking import Lock, describe_holder
+from .log_utils import log_event
+
+# ---------- Cron-uttrykk ----------
+_DOW_NAMES = {"sun": 0, "mon": 1, "tue": 2, "wed": 3, "thu": 4, "fri": 5, "sat": 6}
+_MON_NAMES = {m: i for i, m in enumerate(
+    ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"), start=1)}
+
+def _parse_field(expr: str, lo: int, hi: int, names: Dict[str, int]) -> Set[int]:
+    val = lambda x: names[x] if x in names else int(x)
+    out: Set[int] = set()
+    for part in expr.lower().split(","):
+        step = 1
+        if "/" in part:
+            part, s = part.split("/", 1)
+            step = int(s)
+        if part in ("*", ""):
+            a, b = lo, hi
+        elif "-" in part:
+            x, y = part.split("-", 1)
+            a, b = val(x), val(y)
+        else:
+            a = val(part)
+            b = hi if step > 1 else a
+        if not (lo <= a <= hi and lo <= b <= hi) or step <= 0:
+            raise ValueError(f"Ugyldig cron-felt: {expr!r}")
+        out.update(range(a, b + 1, step))
+    return out
+
+class CronSpec:
+    """
+    Standard 5-felts cron: 'min time dag-i-mnd mnd ukedag' (ukedag 0/7=søndag, navn mon..sun).
+    Som i cron gjelder «dag ELLER ukedag» når begge er begrenset.
+    """
+    def __init__(self, expr: str):
+        parts = expr.split()
+        if len(parts) != 5:
+            raise ValueError(f"Cron-uttrykk må ha 5 felt: {expr!r}")
+        self.expr = expr
+        self.minutes = _parse_field(parts[0], 0, 59, {})
+        self.hours = _parse_field(parts[1], 0, 23, {})
+        self.dom = _parse_field(parts[2], 1, 31, {})
+        self.months = _parse_field(parts[3], 1, 12, _MON_NAMES)
+        dow = _parse_field(parts[4], 0, 7, _DOW_NAMES)
+        self.dow = {d % 7 for d in dow}
+        self._dom_any = parts[2] == "*"
+        self._dow_any = parts[4] == "*"
+
+    def _day_ok(self, d: date) -> bool:
+        dom_ok = d.day in self.dom
+        dow_ok = (d.weekday() + 1) % 7 in self.dow
+        if self._dom_any or self._dow_any:
+            return dom_ok and dow_ok
+        return dom_ok or dow_ok
+
+    def matches(self, dt: datetime) -> bool:
+        return (dt.minute in self.minutes and dt.hour in self.hours
+                and dt.month in self.months and self._day_ok(dt.date()))
+
+    def next_after(self, dt: datetime) -> Optional[datetime]:
+        """Første tidspunkt > dt som matcher (hopper dag/time om gangen)."""
+        t = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = t + timedelta(days=366 * 5)
+        while t < limit:
+            if t.month not in self.months or not self._day_ok(t.date()):
+                t = (t + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if t.hour not in self.hours:
+                t = (t + timedelta(hours=1)).replace(minute=0)
+                continue
+            if t.minute not in self.minutes:
+                t += timedelta(minutes=1)
+                continue
+            return t
+        return None
+
+# ---------- Jobber ----------
+@dataclass
+class Job:
+    name: str
+    spec: Optional[CronSpec]                      # None = kun manuelt (send run <navn>)
+    fn: Callable[["Daemon"], str]
+    next_run: Optional[datetime] = None
+    last: Dict = field(default_factory=dict)
+
+def job_archive(d: "Daemon") -> str:
+    from .auto_archive import run_archive
+    today = datetime.now().date()
+    summary, unassigned = run_archive(d.session, today - timedelta(days=7), today)
+    return "; ".join(f"{g}: lagret {s['saved']}" + (f", feilet {s['failed']}" if s.get("failed") else "")
+                     + (" (låst)" if s.get("busy") else "")
+                     for g, s in summary.items()) or f"ingen grupper (uten gruppe: {len(unassigned)})"
+
+def job_retention(d: "Daemon") -> str:
+    from .group_rules import load_rules
+    from .retention import apply_retention
+    summary = apply_retention(load_rules())
+    return "; ".join(f"{g}: slettet {s['deleted']}" for g, s in summary.items()) or "ingen grupper med retention"
+
+def job_move(d: "Daemon") -> str:
+    from .group_mover import move_by_groups
+    from .outlook_core import search_messages
+    from .settings import load_settings
+    st = load_settings()
+    today = datetime.now().date()
+    res, err, _ = search_messages(
+        session=d.session, sender_query="", subject_contains="", after_date=today - timedelta(days=7),
+        before_date=today, include_subfolders=True, only_unread=False, only_attachments=False,
+        cap_per_folder=int(st["cap_per_folder"]), cap_total=int(st["cap_total"]), stop_evt=threading.Event())
+    if err:
+        raise RuntimeError(err)
+    summary, _unassigned, _nodest = move_by_groups(d.session, res)
+    return "; ".join(f"{g}: flyttet {s['moved']}" + (f" ({s['per_sec']}/s)" if s.get("moved") else "")
+                     + (" (låst)" if s.get("busy") else "")
+                     for g, s in summary.items()) or "ingenting å flytte"
+
+def job_weekly_report(d: "Daemon") -> str:
+    from .config import FALLBACK_EMAIL, TOP_N_SENDERS
+    from .email_stats import weekly_sender_report, weekly_sender_trend
+    from .html_email import build_html
+    from .mail_utils import send_html_mail
+    from .outlook_core import default_smtp
+    to = default_smtp(d.session) or FALLBACK_EMAIL
+    if not to:
+        raise RuntimeError("Fant ikke standard e-postadresse.")
+    report = weekly_sender_report(d.session, TOP_N_SENDERS)
+    subject = f"Ukesoppsummering {datetime.now():%d.%m.%Y}"
+    html = build_html(subject, "Automatisk ukesrapport fra Fredag-daemon.", report.rows,
+                      trend=weekly_sender_trend(), max_error=report.max_error)
+    ok, msg = send_html_mail(d.session, to, subject, html)
+    if not ok:
+        raise RuntimeError(msg)
+    return f"sendt til {to}"
+
+def job_fulltext(d: "Daemon") -> str:
+    from . import fulltext_index
+    if not fulltext_index.enabled():
+        return "fulltekstindeks er slått av"
+    added = fulltext_index.backfill(d.session)
+    docs = sum(v["docs"] for v in fulltext_index.stats().values())
+    return f"indekserte {added} nye ({docs} totalt)"
+
+def job_attachment_text(d: "Daemon") -> str:
+    from . import attachment_index
+    if not attachment_index.enabled():
+        return "vedleggsindeks er slått av"
+    res = attachment_index.update()
+    return f"{res['new']} nye/endrede filer: {res['ok']} indeksert, {res['skip']} hoppet over, {res['error']} feil"
+
+BUILTIN_JOBS: Dict[str, Callable[["Daemon"], str]] = {
+    "archive": job_archive,
+    "retention": job_retention,
+    "move": job_move,
+    "weekly_report": job_weekly_report,
+    "fulltext": job_fulltext,
+    "attachment_text": job_attachment_text,
+}
+
+def jobs_from_settings() -> List[Job]:
+    """Innebygde jobber med tidsplan fra settings['daemon_schedule'] ('' = kun manuelt)."""
+    from .settings import load_settings
+    sched = load_settings().get("daemon_schedule") or {}
+    jobs = []
+    for name, fn in BUILTIN_JOBS.items():
+        expr = (sched.get(name) or "").strip()
+        try:
+            spec = CronSpec(expr) if expr else None
+        except ValueError as e:
+            log_event(f"daemon: ignorerer tidsplan for {name}: {e}")
+            spec = None
+        jobs.append(Job(name, spec, fn))
+    return jobs
+
+# ---------- Kanal ----------
+def _store_dir() -> Path:
+    root = Path(__file__).resolve().parents[1] / ".ragdb"
+    root.mkdir(exist_ok=True)
+    return root
+
+def default_address() -> str:
+    if sys.platform == "win32":
+        user = os.environ.get("USERNAME", "bruker")
+        return rf"\\.\pipe\fredag-daemon-{user}"
+    return str(_store_dir() / "daemon.sock")
+
+def load_authkey(path: Optional[Path] = None) -> bytes:
+    p = path or (_store_dir() / "daemon.key")
+    if not p.exists():
+        p.write_text(secrets.token_hex(32), encoding="utf-8")
+        try: os.chmod(p, 0o600)
+        except Exception: pass
+    return p.read_text(encoding="utf-8").strip().encode("ascii")
+
+def send_command(cmd: str, address: Optional[str] = None, authkey: Optional[bytes] = None,
+                 **args) -> Dict:
+    """Sender én kommando til kjørende daemon og returnerer svaret (dict)."""
+    from multiprocessing.connection import Client
+    with Client(address or default_address(), authkey=authkey or load_authkey()) as conn:
+        conn.send(dict(args, cmd=cmd))
+        return conn.recv()
+
+# ---------- Daemon ----------
+class Daemon:
+    """
+    Planlegger + kommandokanal. session_factory kalles i hovedtråden første gang en jobb
+    trenger sesjonen (testbar med falsk sesjon); ved COM-feil lages sesjonen på nytt.
+    """
+    def __init__(self, jobs: Optional[List[Job]] = None,
+                 session_factory: Optional[Callable[[], object]] = None,
+                 address: Optional[str] = None, authkey: Optional[bytes] = None,
+                 clock: Callable[[], datetime] = datetime.now):
+        self.jobs: Dict[str, Job] = {j.name: j for j in (jobs if jobs is not None else jobs_from_settings())}
+        self._session_factory = session_factory
+        self._session = None
+        self.address = address or default_address()
+        self.authkey = authkey or load_authkey()
+        self.clock = clock
+        self.started: Optional[datetime] = None
+        self._cmds: "queue.Queue" = queue.Queue()
+        self._stop = threading.Event()
+        self._listener = None
+        now = clock()
+        for j in self.jobs.values():
+            j.next_run = j.spec.next_after(now) if j.spec else None
+
+    # --- sesjon ---
+    @property
+    def session(self):
+        if self._session is None:
+            if self._session_factory is None:
+                from .outlook_core import get_session
+                self._session_factory = get_session
+            self._session = self._session_factory()
+        return self._session
+
+    def reset_session(self) -> None:
+        self._session = None
+
+    # --- jobber ---
+    def run_job(self, name: str) -> Dict:
+        job = self.jobs.get(name)
+        if job is None:
+            return {"ok": False, "msg": f"ukjent jobb: {name}"}
+        t0 = time.perf_counter()
+        try:
+            with telemetry.run(name, source="daemon"):
+                msg, ok = job.fn(self), True
+        except (Exception, SystemExit) as e:   # run_archive signaliserer feil med SystemExit
+            msg, ok = f"{type(e).__name__}: {e}", False
+            self.reset_session()   # sesjonen kan være død (Outlook restartet) – lag ny neste gang
+        job.last = {"ok": ok, "msg": msg, "at": self.clock().isoformat(timespec="seconds"),
+                    "secs": round(time.perf_counter() - t0, 3)}
+        try: log_event(f"daemon: {name} {'OK' if ok else 'FEIL'} – {msg}")
+        except Exception: pass
+        return dict(job.last, job=name)
+
+    def run_due(self, now: Optional[datetime] = None) -> List[Dict]:
+        now = now or self.clock()
+        out = []
+        for j in sorted(self.jobs.values(), key=lambda j: j.next_run or datetime.max):
+            if j.next_run and j.next_run <= now:
+                out.append(self.run_job(j.name))
+                # neste kjøring regnes fra nå – kjøringer som ble misset mens vi jobbet slås sammen
+                j.next_run = j.spec.next_after(max(now, self.clock()))
+        return out
+
+    def seconds_to_next(self, now: Optional[datetime] = None) -> float:
+        now = now or self.clock()
+        nxt = [j.next_run for j in self.jobs.values() if j.next_run]
+        return max(0.0, (min(nxt) - now).total_seconds()) if nxt else 3600.0
+
+    def status(self) -> Dict:
+        return {
+            "pid": os.getpid(),
+            "started": self.started.isoformat(timespec="seconds") if self.started else None,
+            "session": self._session is not None,
+            "jobs": {n: {"cron": j.spec.expr if j.spec else "", "next": j.next_run.isoformat() if j.next_run else None,
+                         "last": j.last} for n, j in self.jobs.items()},
+        }
+
+    def handle(self, req: Dict) -> Dict:
+        cmd = (req or {}).get("cmd")
+        if cmd == "ping":
+            return {"ok": True, "msg": "pong"}
+        if cmd == "status":
+            return dict(self.status(), ok=True)
+        if cmd == "run":
+            return self.run_job(req.get("job", ""))
+        if cmd == "reload":
+            from . import config_cache
+            config_cache.invalidate()       # tving ny lesing selv om mtime ikke er endret
+            keep = {n: j.last for n, j in self.jobs.items()}
+            self.jobs = {j.name: j for j in jobs_from_settings()}
+            now = self.clock()
+            for j in self.jobs.values():
+                j.last = keep.get(j.name, {})
+                j.next_run = j.spec.next_after(now) if j.spec else None
+            return {"ok": True, "msg": "tidsplan lastet på nytt"}
+        if cmd == "stop":
+            self._stop.set()
+            return {"ok": True, "msg": "stopper"}
+        return {"ok": False, "msg": f"ukjent kommando: {cmd}"}
+
+    # --- kanal ---
+    def _serve_conn(self, conn) -> None:
+        try:
+            req = conn.recv()
+            box: "queue.Queue" = queue.Queue(maxsize=1)
+            self._cmds.put((req, box))
+            conn.send(box.get())
+        except Exception:
+            pass
+        finally:
+            try: conn.close()
+            except Exception: pass
+
+    def _accept_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                conn = self._listener.accept()
+            except Exception:
+                if self._stop.is_set():
+                    break
+                continue
+            threading.Thread(target=self._serve_conn, args=(conn,), daemon=True).start()
+
+    def _open_listener(self):
+        from multiprocessing.connection import Listener
+        if not self.address.startswith("\\\\.\\pipe\\"):
+            try: os.unlink(self.address)   # gammel socket etter krasj
+            except FileNotFoundError: pass
+        return Listener(self.address, authkey=self.authkey)
+
+    def serve_forever(self) -> None:
+        com = None
+        try:
+            import pythoncom  # type: ignore
+            pythoncom.CoInitialize(); com = pythoncom
+        except Exception:
+            pass
+        self.started = self.clock()
+        self._listener = self._open_listener()
+        acc = threading.Thread(target=self._accept_loop, daemon=True)
+        acc.start()
+        try:
+            while not self._stop.is_set():
+                try:
+                    req, box = self._cmds.get(timeout=min(60.0, self.seconds_to_next()))
+                    try:
+                        box.put(self.handle(req))
+                    except Exception as e:
+                        box.put({"ok": False, "msg": f"{type(e).__name__}: {e}"})
+                except queue.Empty:
+                    pass
+                if not self._stop.is_set():
+                    self.run_due()
+        finally:
+            self._stop.set()
+            try: self._listener.close()
+            except Exception: pass
+            # vekk accept() slik at lyttetråden avslutter
+            try:
+                from multiprocessing.connection import Client
+                Client(self.address, authkey=self.authkey).close()
+            except Exception: pass
+            self._session = None
+            if com:
+                try: com.CoUninitialize()
+                except Exception: pass
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._cmds.put(({"cmd": "ping"}, queue.Queue(maxsize=1)))
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Fredag-daemon med innebygd planlegger.")
+    sub = ap.add_subparsers(dest="action")
+    sub.add_parser("serve", help="Start daemon (standard)")
+    sp = sub.add_parser("send", help="Send kommando til kjørende daemon")
+    sp.add_argument("cmd", choices=("ping", "status", "run", "reload", "stop"))
+    sp.add_argument("job", nargs="?", default="")
+    args = ap.parse_args(argv)
+
+    if args.action == "send":
+        try:
+            reply = send_command(args.cmd, job=args.job) if args.job else send_command(args.cmd)
+        except (ConnectionRefusedError, FileNotFoundError, OSError) as e:
+            print(f"Daemon kjører ikke ({e}).")
+            return 1
+        if args.cmd == "status":
+            print(f"pid {reply.get('pid')}, startet {reply.get('started')}")
+            for n, j in reply.get("jobs", {}).items():
+                last = j.get("last") or {}
+                print(f"- {n:<14} cron '{j['cron'] or '(manuell)'}'  neste {j['next'] or '-'}  "
+                      f"sist {last.get('at', '-')} {'OK' if last.get('ok') else ('FEIL' if last else '')} {last.get('msg', '')}")
+        else:
+            print(reply.get("msg", reply))
+        return 0 if reply.get("ok", True) else 1
+
+    lock = Lock("daemon")
+    if not lock.acquire(timeout_sec=0):
+        print(f"Daemon kjører allerede – {describe_holder(lock.holder)}.")
+        return 1
+    try:
+        d = Daemon()
+        print(f"Fredag-daemon lytter på {d.address}")
+        for n, j in d.jobs.items():
+            print(f"- {n}: {j.spec.expr if j.spec else '(manuell)'} → neste {j.next_run or '-'}")
+        d.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        lock.release()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
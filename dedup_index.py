@@ -1,7 +1,7 @@
 from __future__ import annotations
-import json, time
+import json, os, time
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Dict, Optional, Tuple
 
 def _path() -> Path:
     root = Path(__file__).resolve().parents[1] / ".ragdb"
@@ -11,8 +11,8 @@ def _path() -> Path:
 def _now() -> float:
     return time.time()
 
-def load_index() -> Dict[str, float]:
-    p = _path()
+def load_index(path: Optional[Path] = None) -> Dict[str, float]:
+    p = path or _path()
     if not p.exists():
         return {}
     try:
@@ -22,13 +22,34 @@ def load_index() -> Dict[str, float]:
     except Exception:
         return {}
 
-def save_index(idx: Dict[str, float]) -> None:
-    p = _path()
+def _write(idx: Dict[str, float], p: Path) -> None:
     payload = {"v": 1, "items": idx}
-    tmp = p.with_suffix(".tmp")
+    tmp = p.with_name(f"{p.stem}.{os.getpid()}.tmp")
     tmp.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
     tmp.replace(p)
 
+def save_index(idx: Dict[str, float], path: Optional[Path] = None, merge: bool = False,
+               ttl_days: int = 0, lock_timeout_sec: float = 60) -> None:
+    """
+    Skriver indeksen atomisk. merge=True: flett inn det som ligger på disk (nyeste tidsstempel
+    vinner) under en fil-lås – for parallelle arkiveringsprosesser som ellers ville
+    overskrive hverandres nye hasher. Oppføringer eldre enn ttl_days flettes ikke inn igjen.
+    'idx' oppdateres med det flettede resultatet.
+    """
+    p = path or _path()
+    if not merge:
+        _write(idx, p)
+        return
+    from .locking import Lock
+    cutoff = _now() - ttl_days * 24 * 3600 if ttl_days > 0 else 0
+    with Lock(p.name, root=p.parent) as lk:
+        if not lk.acquire(timeout_sec=lock_timeout_sec):
+            raise TimeoutError(f"Fikk ikke lås på {p}")
+        for k, ts in load_index(p).items():
+            if ts >= cutoff and ts > idx.get(k, 0):
+                idx[k] = ts
+        _write(idx, p)
+
 def prune_expired(idx: Dict[str, float], ttl_days: int) -> int:
     if ttl_days <= 0:  # ikke utløp
         return 0
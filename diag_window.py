@@ -6,20 +6,29 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime
 
+from . import telemetry
 from .log_utils import log_path
 
+RUNS_SHOWN = 20
+STAGE_COLORS = {
+    "search": "#4e79a7", "resolve_groups": "#f28e2b", "extract": "#e15759", "hash": "#76b7b2",
+    "write": "#59a14f", "category": "#edc948", "retention": "#b07aa1", "fulltext": "#ff9da7",
+    "attachment_text": "#9c755f", "move": "#d37295", "annet": "#bab0ac",
+}
+
 class DiagnoseWindow(tk.Toplevel):
     """
     En enkel diagnosevisning:
       - Miljøinfo (OS, Python)
       - Outlook DefaultStore/Innboks om session finnes
       - Sti til loggmappe + knapp for å åpne den
+      - Stablede søyler med tid per steg for de siste kjøringene (fra telemetry)
     Forventes kalt fra et vindu som har attributtet 'session' (Outlook.Session).
     """
     def __init__(self, master):
         super().__init__(master)
         self.title("Diagnose")
-        self.geometry("720x420")
+        self.geometry("760x640")
         self.session = getattr(master, "session", None)
         self._build()
         self._fill()
@@ -28,9 +37,24 @@ class DiagnoseWindow(tk.Toplevel):
         frm = ttk.Frame(self, padding=10)
         frm.pack(fill="both", expand=True)
 
-        self.txt = tk.Text(frm, wrap="word")
+        self.txt = tk.Text(frm, wrap="word", height=12)
         self.txt.pack(fill="both", expand=True)
 
+        runs = ttk.LabelFrame(frm, text=f"Siste {RUNS_SHOWN} kjøringer – sekunder per steg", padding=6)
+        runs.pack(fill="both", expand=True, pady=(8, 0))
+        top = ttk.Frame(runs); top.pack(fill="x")
+        ttk.Label(top, text="Jobb:").pack(side="left")
+        self.v_job = tk.StringVar(value="(alle)")
+        self.cb_job = ttk.Combobox(top, textvariable=self.v_job, state="readonly", width=18)
+        self.cb_job.pack(side="left", padx=(4, 8))
+        self.cb_job.bind("<<ComboboxSelected>>", lambda e: self._draw_runs())
+        ttk.Button(top, text="Oppdater", command=self._draw_runs).pack(side="left")
+        self.lbl_last = ttk.Label(top, text="")
+        self.lbl_last.pack(side="right")
+        self.chart = tk.Canvas(runs, height=200, background="white", highlightthickness=0)
+        self.chart.pack(fill="both", expand=True, pady=(6, 0))
+        self.chart.bind("<Configure>", lambda e: self._draw_runs())
+
         btns = ttk.Frame(self, padding=(0,8))
         btns.pack(fill="x")
         ttk.Button(btns, text="Åpne loggmappe", command=self._open_logs).pack(side="left")
@@ -68,3 +92,57 @@ class DiagnoseWindow(tk.Toplevel):
         self.txt.delete("1.0", "end")
         self.txt.insert("1.0", "\n".join(lines))
         self.txt.configure(state="disabled")
+        self._draw_runs()
+
+    def _draw_runs(self):
+        try:
+            all_runs = telemetry.recent_runs(500)
+        except Exception:
+            all_runs = []
+        self.cb_job["values"] = ["(alle)"] + sorted({r.get("job", "") for r in all_runs})
+        job = self.v_job.get()
+        runs = [r for r in all_runs if job in ("(alle)", r.get("job"))][-RUNS_SHOWN:]
+
+        c = self.chart
+        c.delete("all")
+        w, h = max(c.winfo_width(), 200), max(c.winfo_height(), 120)
+        if not runs:
+            c.create_text(w // 2, h // 2, text=f"Ingen kjøringer registrert ennå ({telemetry.metrics_path()})", fill="#666")
+            self.lbl_last.config(text="")
+            return
+        last = runs[-1]
+        self.lbl_last.config(text=f"Sist: {last.get('job')} {last.get('ts', '')[:16].replace('T', ' ')} – "
+                                  f"{last.get('seconds', 0):.1f} s, {last.get('status')}")
+
+        legend_h, axis_h, left = 18, 16, 40
+        plot_h = h - legend_h - axis_h - 6
+        peak = max(float(r.get("seconds") or 0) for r in runs) or 1.0
+        c.create_text(left - 4, legend_h, text=f"{peak:.1f}s", anchor="ne", fill="#666", font=("Segoe UI", 7))
+        c.create_line(left, legend_h, left, legend_h + plot_h, fill="#ccc")
+        slot = (w - left - 4) / len(runs)
+        bar = max(4, slot * 0.7)
+        for i, r in enumerate(runs):
+            x0 = left + i * slot + (slot - bar) / 2
+            y = legend_h + plot_h
+            parts = [(n, float(st.get("seconds") or 0)) for n, st in r.get("stages", {}).items()]
+            rest = float(r.get("seconds") or 0) - sum(s for _, s in parts)
+            if rest > 0:
+                parts.append(("annet", rest))   # tid utenfor målte steg (oppstart, rapport …)
+            for name, secs in parts:
+                dh = plot_h * secs / peak
+                if dh < 0.5:
+                    continue
+                c.create_rectangle(x0, y - dh, x0 + bar, y, width=0,
+                                   fill=STAGE_COLORS.get(name, STAGE_COLORS["annet"]))
+                y -= dh
+            if r.get("status") != "ok":
+                c.create_rectangle(x0, y, x0 + bar, legend_h + plot_h, outline="#c00", width=2)
+            if len(runs) <= 12 or i % 2 == 0:
+                c.create_text(x0 + bar / 2, legend_h + plot_h + 2, text=r.get("ts", "")[5:10],
+                              anchor="n", fill="#666", font=("Segoe UI", 7))
+
+        x = left
+        for name in list(telemetry.STAGES) + ["annet"]:
+            c.create_rectangle(x, 4, x + 10, 14, width=0, fill=STAGE_COLORS[name])
+            t = c.create_text(x + 13, 9, text=name, anchor="w", font=("Segoe UI", 8))
+            x = c.bbox(t)[2] + 10
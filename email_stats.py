@@ -1,83 +1,217 @@
-from datetime import datetime, timedelta
-from typing import List, Tuple, Dict
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
 
-from .config import TOP_N_SENDERS, MAX_PER_FOLDER, FALLBACK_RECENT_N
-from .outlook_core import msg_time, normalize_sender, walk_subfolders
+from .config import (TOP_N_SENDERS, MAX_PER_FOLDER, FALLBACK_RECENT_N, TREND_WEEKS, SENDER_STATS_KEEP_DAYS,
+                     HEAVY_HITTERS_THRESHOLD, HEAVY_HITTERS_CAPACITY)
+from .outlook_core import SMTP_PROP, normalize_sender, walk_subfolders, _restrict_str
+from .heavy_hitters import SenderTally
+from . import state_store
+
+try:
+    from .log_utils import get_logger  # type: ignore
+    log = get_logger(__name__)
+except Exception:  # pragma: no cover
+    class _Null:
+        def exception(self, *a, **k): ...
+    log = _Null()
+
+SenderKey = Tuple[str, str]
+STATS_JOB = "sender_stats"
+
+# Kolonner i GetTable – SMTP hentes direkte som MAPI-egenskap (PR_SENDER_SMTP_ADDRESS)
+_TABLE_COLUMNS = ("[EntryID]", "[ReceivedTime]", "[SenderName]", "[SenderEmailAddress]",
+                  "[MessageClass]", "[Size]", "[HasAttachment]", SMTP_PROP)
 
 def _start_of_week_local() -> datetime:
     t = datetime.now()
     return (t - timedelta(days=t.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
 
-def _count_senders_in_folder(folder, sow_date, per_folder_limit=MAX_PER_FOLDER) -> Dict[Tuple[str, str], int]:
-    counts: Dict[Tuple[str, str], int] = {}
+def _sender_key(name, smtp) -> SenderKey:
+    return ((name or "").strip()[:120], (smtp or "").strip().lower()[:200])
+
+def _open_table(folder, flt: str):
+    tbl = folder.GetTable(flt)
+    cols = tbl.Columns
+    try: cols.RemoveAll()
+    except Exception: pass
+    for col in _TABLE_COLUMNS:
+        cols.Add(col)
+    return tbl
+
+def _iter_table_rows(folder, tbl, per_folder_limit: int) -> Iterator[Dict]:
+    """Strømmer GetTable-rader som søkeresultat-dicts (ingen åpning av enkeltmeldinger)."""
+    processed = 0
+    while processed < per_folder_limit:
+        try:
+            if tbl.EndOfTable:
+                break
+            row = tbl.GetNextRow()
+        except Exception:
+            break
+        if row is None:
+            break
+        processed += 1
+        try:
+            mclass = row.Item("MessageClass") or ""
+            if mclass and not str(mclass).startswith("IPM.Note"):
+                continue
+            smtp = row.Item(SMTP_PROP) or ""
+            if "@" not in str(smtp):
+                raw = row.Item("SenderEmailAddress") or ""
+                smtp = raw if "@" in str(raw) else ""
+            name, smtp = _sender_key(row.Item("SenderName"), smtp)
+            yield {
+                "eid": row.Item("EntryID"),
+                "store": getattr(folder, "StoreID", None),
+                "dt": row.Item("ReceivedTime"),
+                "from": name,
+                "from_email": smtp,
+                "attach": 1 if row.Item("HasAttachment") else 0,
+                "size": row.Item("Size") or 0,
+            }
+        except Exception:
+            continue
+
+def _iter_item_rows(folder, flt: str, per_folder_limit: int) -> Iterator[Dict]:
+    """Fallback: Items.Restrict på samme datofilter + normalize_sender per melding."""
     try:
-        items = folder.Items
+        items = folder.Items.Restrict(flt)
+        it = items.GetFirst()
     except Exception:
-        return counts
+        return
+
+    processed = 0
+    while it and processed < per_folder_limit:
+        try:
+            if getattr(it, "Class", None) == 43:
+                name, smtp = _sender_key(*normalize_sender(it))
+                yield {
+                    "eid": getattr(it, "EntryID", None),
+                    "store": getattr(folder, "StoreID", None),
+                    "dt": getattr(it, "ReceivedTime", None),
+                    "from": name,
+                    "from_email": smtp,
+                    "attach": 1 if getattr(it, "HasAttachment", False) else 0,
+                    "size": getattr(it, "Size", 0) or 0,
+                }
+            processed += 1
+            it = items.GetNext()
+        except Exception:
+            break
+
+def rows_from_search(rows) -> Iterator[Dict]:
+    """
+    Søkerader (search_messages) med samme avsendernøkkel som ukeskanningen, klare for
+    state_store.record_sender_rows. GetTable-søket henter ikke PR_SENDER_SMTP_ADDRESS, så for
+    Exchange-avsendere er from_email en EX/X.500-DN; slike rader hoppes over (de telles av
+    ukeskanningen med SMTP-adresse) i stedet for å dele avsenderen på to nøkler.
+    """
+    for r in rows:
+        smtp = r.get("from_email") or ""
+        if "@" not in str(smtp):
+            continue
+        name, smtp = _sender_key(r.get("from"), smtp)
+        yield dict(r, **{"from": name, "from_email": smtp})
+
+def _iter_folder_rows(folder, since: datetime, per_folder_limit=MAX_PER_FOLDER) -> Iterator[Dict]:
+    """Rader for én mappe mottatt fra og med 'since'. GetTable først, ellers Items.Restrict."""
+    flt = _restrict_str(since, None, None, None)
     try:
-        items.Sort("[ReceivedTime]", True)
+        tbl = _open_table(folder, flt)
     except Exception:
-        pass
+        yield from _iter_item_rows(folder, flt, per_folder_limit)
+        return
+    yield from _iter_table_rows(folder, tbl, per_folder_limit)
 
-    processed = 0
+def _count_senders_in_folder(folder, sow: datetime, per_folder_limit=MAX_PER_FOLDER) -> Counter:
+    """Avsendertelling for én mappe, kun meldinger mottatt fra og med 'sow'."""
+    return Counter((r["from"], r["from_email"]) for r in _iter_folder_rows(folder, sow, per_folder_limit))
+
+def _iter_inbox_rows(inbox, since: datetime) -> Iterator[Dict]:
+    for folder in walk_subfolders(inbox, include_subfolders=True):
+        yield from _iter_folder_rows(folder, since)
+
+@dataclass
+class SenderReport:
+    """Toppliste + feilmargin. max_error > 0 betyr at tallene er omtrentlige (Space-Saving)."""
+    rows: List[Tuple[str, str, int]] = field(default_factory=list)
+    max_error: int = 0
+
+def count_rows(rows, threshold: int = HEAVY_HITTERS_THRESHOLD,
+               capacity: int = HEAVY_HITTERS_CAPACITY) -> SenderTally:
+    """Teller (navn, smtp) over strømmede rader; bytter til heavy-hitters over terskel."""
+    tally = SenderTally(threshold, capacity)
+    for r in rows:
+        tally.add((r["from"], r["from_email"]))
+    return tally
+
+def _scan_counts(inbox, sow: datetime) -> SenderTally:
+    tally = count_rows(_iter_inbox_rows(inbox, sow))
+    if not tally:
+        flt = _restrict_str(sow, None, None, None)
+        tally = count_rows(_iter_item_rows(inbox, flt, FALLBACK_RECENT_N))
+    return tally
+
+def update_sender_aggregate(session) -> int:
+    """
+    Oppdaterer dagsaggregatet i state_store inkrementelt: skanner kun meldinger
+    siden forrige oppdatering (med én dags overlapp – EntryID hindrer dobbelttelling).
+    Returnerer antall nye meldinger.
+    """
+    inbox = session.GetDefaultFolder(6)  # olFolderInbox
+    now = datetime.now()
+    sow = _start_of_week_local()
+    last = state_store.get_last_run(STATS_JOB)
+    since = max(sow, last - timedelta(days=1)) if last else sow
+    added = state_store.record_sender_rows(_iter_inbox_rows(inbox, since))
+    state_store.set_last_run(STATS_JOB, now)
+    state_store.prune_sender_stats(SENDER_STATS_KEEP_DAYS)
+    return added
+
+def update_sender_aggregate_offline(paths: Sequence, workers: Optional[int] = None,
+                                    after: Optional[date] = None, before: Optional[date] = None) -> int:
+    """
+    Som update_sender_aggregate, men fra postbokseksporter (.eml/.mbox/.msg) uten COM.
+    Filene parses på en prosesspool (offline_source); EntryID-ene er stabile per
+    fil/offset, så gjentatte kjøringer teller ikke dobbelt. Dager eldre enn
+    SENDER_STATS_KEEP_DAYS ryddes ved neste ordinære oppdatering. Returnerer antall nye.
+    """
+    from .offline_source import iter_rows_parallel
+    return state_store.record_sender_rows(iter_rows_parallel(paths, after, before, workers))
+
+def weekly_sender_report(session, top_n: int = TOP_N_SENDERS) -> SenderReport:
+    """
+    Topp-N avsendere for inneværende uke (Innboks + undermapper).
+    Oppdaterer dagsaggregatet og henter topplisten med én SQL-spørring (eksakt);
+    faller tilbake til strømmet ukeskanning hvis aggregatet ikke er tilgjengelig.
+    Skanningen går over til Space-Saving når antall distinkte avsendere passerer
+    HEAVY_HITTERS_THRESHOLD – da oppgis maks avvik i max_error.
+    """
+    sow = _start_of_week_local()
     try:
-        it = items.GetFirst()
-        seq_ok = True
+        update_sender_aggregate(session)
+        return SenderReport(state_store.top_senders(sow.date(), datetime.now().date(), top_n))
     except Exception:
-        it = None
-        seq_ok = False
-
-    if seq_ok:
-        while it and processed < per_folder_limit:
-            try:
-                if getattr(it, "Class", None) == 43:
-                    dt = msg_time(it)
-                    if dt and dt.date() >= sow_date:
-                        name, smtp = normalize_sender(it)
-                        key = ((name or "")[:120], (smtp or "")[:200])
-                        counts[key] = counts.get(key, 0) + 1
-                processed += 1
-                it = items.GetNext()
-            except Exception:
-                break
-    else:
-        total = getattr(items, "Count", 0)
-        upto = min(per_folder_limit, total)
-        for idx in range(1, upto + 1):
-            try:
-                it = items.Item(idx)
-                if it and getattr(it, "Class", None) == 43:
-                    dt = msg_time(it)
-                    if dt and dt.date() >= sow_date:
-                        name, smtp = normalize_sender(it)
-                        key = ((name or "")[:120], (smtp or "")[:200])
-                        counts[key] = counts.get(key, 0) + 1
-            except Exception:
-                continue
-    return counts
+        log.exception("Dagsaggregat utilgjengelig – skanner hele uken")
+
+    try:
+        inbox = session.GetDefaultFolder(6)  # olFolderInbox
+    except Exception:
+        return SenderReport()
+    tally = _scan_counts(inbox, sow)
+    rows = [(name, smtp, n) for (name, smtp), n in tally.top(top_n)]
+    return SenderReport(rows, tally.max_error)
 
 def weekly_sender_stats(session, top_n: int = TOP_N_SENDERS) -> List[Tuple[str, str, int]]:
-    """Skann Default Innboks + undermapper for inneværende uke. Fallback: N siste i Innboks."""
-    sow_date = _start_of_week_local().date()
-    counts: Dict[Tuple[str, str], int] = {}
+    """Som weekly_sender_report, men kun radene (navn, smtp, antall)."""
+    return weekly_sender_report(session, top_n).rows
 
+def weekly_sender_trend(weeks: int = TREND_WEEKS) -> Dict[SenderKey, float]:
+    """Snitt per uke for hver (navn, smtp) de siste 'weeks' ukene før inneværende uke."""
     try:
-        inbox = session.GetDefaultFolder(6)  # olFolderInbox
+        return state_store.sender_weekly_average(_start_of_week_local().date(), weeks)
     except Exception:
-        inbox = None
-
-    if inbox is not None:
-        for folder in walk_subfolders(inbox, include_subfolders=True):
-            sub_counts = _count_senders_in_folder(folder, sow_date)
-            if sub_counts:
-                for k, v in sub_counts.items():
-                    counts[k] = counts.get(k, 0) + v
-
-    if not counts and inbox is not None:
-        sub_counts = _count_senders_in_folder(inbox, sow_date, per_folder_limit=FALLBACK_RECENT_N)
-        for k, v in sub_counts.items():
-            counts[k] = counts.get(k, 0) + v
-
-    ranked = sorted(((k[0], k[1], v) for k, v in counts.items()),
-                    key=lambda x: x[2], reverse=True)
-    return ranked[:top_n]
+        log.exception("Klarte ikke å lese trend fra dagsaggregat")
+        return {}
@@ -1,50 +1,116 @@
 from __future__ import annotations
-from typing import List, Dict, Optional
+import csv
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
 
-def export_messages_to_xlsx(path: str, results: List[Dict]) -> Optional[str]:
+EXCEL_MAX_ROWS = 1_048_576        # Excel-grense per ark (inkl. topptekst)
+PROGRESS_EVERY = 10_000
+
+HEADERS = ["Dato", "Emne", "Fra", "Fra (smtp)", "#Vedlegg", "Ulest", "Mappe"]
+WIDTHS = [20, 60, 32, 32, 10, 8, 60]
+
+def _fmt_dt(dt) -> str:
+    if isinstance(dt, datetime):
+        return dt.strftime("%Y-%m-%d %H:%M")
+    return str(dt or "")
+
+def _row_values(r: Dict) -> List:
+    return [
+        _fmt_dt(r.get("dt")),
+        r.get("subject", ""),
+        r.get("from", ""),
+        r.get("from_email", ""),
+        r.get("attach", 0),
+        "Ja" if r.get("unread") else "",
+        r.get("folder", ""),
+    ]
+
+def export_rows_to_xlsx(path: str, rows: Iterable[Dict],
+                        max_rows_per_sheet: int = EXCEL_MAX_ROWS,
+                        progress: Optional[Callable[[int], None]] = None) -> Optional[str]:
     """
-    Eksporter søkeresultater til Excel .xlsx. Returnerer None ved suksess, ellers feiltekst.
+    Strømmende eksport til .xlsx (openpyxl write_only): radene skrives rett til
+    arkets midlertidige XML-fil, så minnebruken er konstant uansett antall rader.
+    'rows' kan være en hvilken som helst iterator. Nytt ark («Eposter (2)» …) startes
+    når Excel-grensen nås. Returnerer None ved suksess, ellers feiltekst.
     """
     try:
         from openpyxl import Workbook  # type: ignore
+        from openpyxl.cell import WriteOnlyCell  # type: ignore
         from openpyxl.utils import get_column_letter  # type: ignore
         from openpyxl.styles import Alignment, Font  # type: ignore
     except Exception:
         return "openpyxl mangler. Installer med:\n  pip install openpyxl"
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Eposter"
-
-    headers = ["Dato", "Emne", "Fra", "Fra (smtp)", "#Vedlegg", "Ulest", "Mappe"]
-    ws.append(headers)
-
-    for r in results:
-        ws.append([
-            r["dt"].strftime("%Y-%m-%d %H:%M"),
-            r.get("subject", ""),
-            r.get("from", ""),
-            r.get("from_email", ""),
-            r.get("attach", 0),
-            "Ja" if r.get("unread") else "",
-            r.get("folder", ""),
-        ])
-
-    # topptekst
-    for cell in ws[1]:
-        cell.font = Font(bold=True)
-        cell.alignment = Alignment(horizontal="center")
-
-    # kolonnebredder (enkelt og effektivt)
-    widths = [20, 60, 32, 32, 10, 8, 60]
-    for idx, w in enumerate(widths, start=1):
-        ws.column_dimensions[get_column_letter(idx)].width = w
-
-    ws.auto_filter.ref = ws.dimensions
-    ws.freeze_panes = "A2"
+    per_sheet = max(1, int(max_rows_per_sheet) - 1)   # minus topptekst
+    last_col = get_column_letter(len(HEADERS))
+    wb = Workbook(write_only=True)
+    bold, center = Font(bold=True), Alignment(horizontal="center")
+
+    def new_sheet(no: int):
+        ws = wb.create_sheet("Eposter" if no == 1 else f"Eposter ({no})")
+        # kolonnebredder/frys må settes før første rad i write_only-modus
+        for idx, w in enumerate(WIDTHS, start=1):
+            ws.column_dimensions[get_column_letter(idx)].width = w
+        ws.freeze_panes = "A2"
+        head = []
+        for h in HEADERS:
+            c = WriteOnlyCell(ws, value=h); c.font = bold; c.alignment = center
+            head.append(c)
+        ws.append(head)
+        return ws
+
+    sheet_no, in_sheet, total = 1, 0, 0
+    ws = new_sheet(sheet_no)
+    try:
+        for r in rows:
+            if in_sheet >= per_sheet:
+                ws.auto_filter.ref = f"A1:{last_col}{in_sheet + 1}"
+                sheet_no += 1; in_sheet = 0
+                ws = new_sheet(sheet_no)
+            ws.append(_row_values(r))
+            in_sheet += 1; total += 1
+            if progress and total % PROGRESS_EVERY == 0:
+                progress(total)
+        ws.auto_filter.ref = f"A1:{last_col}{in_sheet + 1}"
+    except Exception as e:
+        return f"Feil ved lesing av rader: {e}"
 
     try:
         wb.save(path)
         return None
     except Exception as e:
         return f"Feil ved lagring av Excel: {e}"
+
+def export_rows_to_csv(path: str, rows: Iterable[Dict], delimiter: str = ";",
+                       progress: Optional[Callable[[int], None]] = None) -> Optional[str]:
+    """
+    Rask vei: samme kolonner som Excel-eksporten, strømmet rett til CSV (UTF-8 med BOM
+    så Excel gjenkjenner æøå). Ingen radgrense. Returnerer None ved suksess, ellers feiltekst.
+    """
+    try:
+        with open(path, "w", newline="", encoding="utf-8-sig") as f:
+            w = csv.writer(f, delimiter=delimiter)
+            w.writerow(HEADERS)
+            total = 0
+            for r in rows:
+                w.writerow(_row_values(r))
+                total += 1
+                if progress and total % PROGRESS_EVERY == 0:
+                    progress(total)
+        return None
+    except Exception as e:
+        return f"Feil ved skriving av CSV: {e}"
+
+def export_messages(path: str, rows: Iterable[Dict],
+                    progress: Optional[Callable[[int], None]] = None) -> Optional[str]:
+    """Velger format etter filendelse: .csv → CSV, ellers .xlsx."""
+    if str(path).lower().endswith(".csv"):
+        return export_rows_to_csv(path, rows, progress=progress)
+    return export_rows_to_xlsx(path, rows, progress=progress)
+
+def export_messages_to_xlsx(path: str, results: Iterable[Dict]) -> Optional[str]:
+    """
+    Eksporter søkeresultater til Excel .xlsx. Returnerer None ved suksess, ellers feiltekst.
+    """
+    return export_rows_to_xlsx(path, results)
@@ -0,0 +1,889 @@
+"""
+Syntetisk Outlook-objektmodell i minnet – for benchmarks og tester på Linux/CI.
+
+Dekker det kodebasen bruker: Namespace (Stores, Folders, DefaultStore, GetDefaultFolder,
+GetItemFromID, GetFolderFromID, Categories, Accounts, Application.CreateItem),
+Store/Folder (Folders, Items, GetTable, FolderPath, StoreID), Items (Count, Item,
+GetFirst/GetNext, Sort, Restrict – Jet- og @SQL/DASL-filtre), Table (Columns, GetNextRow, GetArray, EndOfTable,
+Restrict, Sort), MailItem (avsender, tider, PropertyAccessor, Attachments, Move, Save)
+og Attachment.SaveAsFile.
+
+Meldingene lagres kolonnevis (array/bytearray), så en postboks med 10^6 meldinger
+tar noen titalls MB; COM-lignende objekter lages først ved oppslag.
+
+Hvert «COM-kall» telles i session.calls, kan forsinkes med per-kall latens og kan
+feile som Exchange-struping (faults/fail_next):
+
+    s = generate_mailbox(1_000_000, latency=REALISTIC_LATENCY, seed=1)
+    res, err, _ = outlook_core.search_messages(s, ...)
+    print(s.calls.most_common(5))
+"""
+from __future__ import annotations
+import hashlib
+import random
+import re
+import time
+from array import array
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+SMTP_PROP = "http://schemas.microsoft.com/mapi/proptag/0x5D01001E"
+OL_MAIL, OL_MEETING = 43, 53
+OL_FOLDER_INBOX = 6
+RPC_E_CALL_REJECTED = -2147418111   # 0x80010001
+_EID_PREFIX = "00000000F4DE0A11"
+
+# Omtrentlige rundturer mot lokal Outlook (sekunder per kall) – juster etter målinger.
+REALISTIC_LATENCY: Dict[str, float] = {
+    "*": 5e-6,
+    "Table.GetNextRow": 25e-6,
+    "Row.Item": 8e-6,
+    "Items.Item": 150e-6, "Items.GetFirst": 150e-6, "Items.GetNext": 150e-6,
+    "Items.Restrict": 20e-3, "Folder.GetTable": 15e-3,
+    "Namespace.GetItemFromID": 400e-6,
+    "Attachment.SaveAsFile": 2e-3,
+    "Mail.Move": 3e-3, "Mail.Save": 2e-3,
+}
+
+_SUBJECTS = ("Faktura {n}", "Ordrebekreftelse {n}", "Re: Møte om prosjekt {n}", "Timeliste uke {w}",
+             "Kontoutskrift {n}", "Tilbud {n} – oppfølging", "Purring på faktura {n}",
+             "Nyhetsbrev {w}", "Kvittering {n}", "Kontrakt {n} til signering")
+_EXTS = ("pdf", "pdf", "pdf", "xlsx", "docx", "jpg", "png", "txt", "zip", "csv")
+_DOMAINS = ("leverandor{k}.no", "kunde{k}.no", "firma{k}.com", "bank{k}.no", "etat{k}.no")
+
+def _spin(sec: float) -> None:
+    # time.sleep() har ~50–100 µs oppløsning; korte latenser må aktiv-ventes
+    if sec >= 1e-3:
+        time.sleep(sec)
+        return
+    end = time.perf_counter() + sec
+    while time.perf_counter() < end:
+        pass
+
+# ---------- Restrict/DASL-lignende filter ----------
+_CLAUSE = re.compile(r"^\s*\[(\w+)\]\s*(>=|<=|<>|=|>|<)\s*(.+?)\s*$")
+_OPS = {">=": lambda a, b: a >= b, "<=": lambda a, b: a <= b, "=": lambda a, b: a == b,
+        "<>": lambda a, b: a != b, ">": lambda a, b: a > b, "<": lambda a, b: a < b}
+
+def _parse_value(raw: str):
+    v = raw.strip()
+    if v[:1] in "'\"" and v[-1:] == v[:1]:
+        v = v[1:-1]
+        for fmt in ("%m/%d/%Y %I:%M %p", "%m/%d/%Y %H:%M", "%m/%d/%Y"):
+            try: return datetime.strptime(v, fmt)
+            except ValueError: pass
+        return v
+    if v.lower() in ("true", "false"):
+        return v.lower() == "true"
+    try: return int(v)
+    except ValueError: return v
+
+def parse_filter(flt: str) -> List[Tuple[str, str, object]]:
+    """'[ReceivedTime] >= '01/02/2025 08:00 AM' AND [UnRead] = True' → [(felt, op, verdi)]."""
+    out = []
+    for part in re.split(r"\s+AND\s+", (flt or "").strip(), flags=re.I):
+        if not part:
+            continue
+        m = _CLAUSE.match(part)
+        if not m:
+            raise ValueError(f"Ugyldig filter: {part!r}")
+        out.append((m.group(1), m.group(2), _parse_value(m.group(3))))
+    return out
+
+# DASL («@SQL=»): "egenskap" op 'verdi' med LIKE/AND/OR/NOT/parenteser; LIKE og = på tekst
+# er uavhengig av store/små bokstaver som i Outlook
+_DASL_PROPS = {
+    "urn:schemas:httpmail:sendername": "SenderName",
+    "urn:schemas:httpmail:fromemail": "SenderEmailAddress",
+    "urn:schemas:httpmail:subject": "Subject",
+    "urn:schemas:httpmail:datereceived": "ReceivedTime",
+    "urn:schemas:httpmail:read": "Read",
+    "urn:schemas:httpmail:hasattachment": "HasAttachment",
+}
+_DASL_TOKEN = re.compile(r"""\s*(?:(\()|(\))|"([^"]+)"|'((?:[^']|'')*)'|(>=|<=|<>|=|>|<)|(\w+))""")
+
+def _dasl_tokens(s: str) -> List[Tuple[str, str]]:
+    out, pos = [], 0
+    while pos < len(s):
+        if not s[pos:].strip():
+            break
+        m = _DASL_TOKEN.match(s, pos)
+        if not m:
+            raise ValueError(f"Ugyldig DASL ved {s[pos:pos + 20]!r}")
+        lp, rp, prop, val, op, word = m.groups()
+        if lp or rp: out.append(("(" if lp else ")", ""))
+        elif prop is not None: out.append(("prop", prop))
+        elif val is not None: out.append(("val", val.replace("''", "'")))
+        elif op: out.append(("op", op))
+        elif word.isdigit(): out.append(("num", word))
+        else: out.append(("op", "LIKE") if word.upper() == "LIKE" else ("kw", word.upper()))
+        pos = m.end()
+    return out
+
+def _like(pattern: str) -> "re.Pattern":
+    rx = "".join(".*" if c == "%" else "." if c == "_" else re.escape(c) for c in pattern)
+    return re.compile(rx + r"\Z", re.I | re.S)
+
+def parse_dasl(flt: str):
+    """'@SQL=("urn:…:fromemail" LIKE '%@x.no' OR …) AND …' → predikat(get) der get(egenskap) gir verdien."""
+    toks = _dasl_tokens(re.sub(r"^\s*@SQL=", "", flt, flags=re.I))
+    pos = 0
+
+    def peek(kind=None, val=None):
+        if pos < len(toks) and (kind is None or toks[pos][0] == kind) and (val is None or toks[pos][1] == val):
+            return toks[pos]
+        return None
+
+    def take(kind, val=None):
+        nonlocal pos
+        t = peek(kind, val)
+        if t is None:
+            raise ValueError(f"Ugyldig DASL: forventet {val or kind} i {flt!r}")
+        pos += 1
+        return t[1]
+
+    def clause():
+        if peek("kw", "NOT"):
+            take("kw"); inner = clause()
+            return lambda get: not inner(get)
+        if peek("("):
+            take("("); e = expr(); take(")")
+            return e
+        prop, op = take("prop"), take("op")
+        name = _DASL_PROPS.get(prop.lower(), prop)
+        if peek("num"):
+            val, fn = int(take("num")), _OPS[op]
+            return lambda get: fn(int(get(name) or 0), val)
+        raw = take("val")
+        if op == "LIKE":
+            rx = _like(raw)
+            return lambda get: bool(rx.match(str(get(name) or "")))
+        val, fn = _parse_value(f"'{raw}'"), _OPS[op]
+        if isinstance(val, str):
+            val = val.lower()
+            return lambda get: fn(str(get(name) or "").lower(), val)
+        return lambda get: fn(get(name), val)
+
+    def seq(word, sub):
+        parts = [sub()]
+        while peek("kw", word):
+            take("kw"); parts.append(sub())
+        return parts
+
+    def term():
+        parts = seq("AND", clause)
+        return parts[0] if len(parts) == 1 else (lambda get: all(p(get) for p in parts))
+
+    def expr():
+        parts = seq("OR", term)
+        return parts[0] if len(parts) == 1 else (lambda get: any(p(get) for p in parts))
+
+    pred = expr()
+    if pos != len(toks):
+        raise ValueError(f"Ugyldig DASL: uventet {toks[pos][1] or toks[pos][0]!r} i {flt!r}")
+    return pred
+
+# ---------- Kolonnelager ----------
+class _Mailbox:
+    """Alle meldinger i sesjonen, kolonnevis. Indeksen i kolonnene er meldingens id."""
+    def __init__(self):
+        self.received = array("d")     # epoch-sekunder
+        self.sender = array("I")       # indeks i senders
+        self.subject = array("I")      # malnummer << 24 | løpenummer (begrenset)
+        self.size = array("I")
+        self.n_att = bytearray()
+        self.unread = bytearray()
+        self.kind = bytearray()        # 0 = e-post, 1 = møteinnkalling
+        self.folder_of = array("H")
+        self.orig_folder = array("H")
+        self.senders: List[Tuple[str, str, str]] = []   # (navn, SenderEmailAddress, smtp)
+        self.categories: Dict[int, str] = {}
+        self.modified: Dict[int, float] = {}
+
+    def __len__(self) -> int:
+        return len(self.received)
+
+    def subject_of(self, i: int) -> str:
+        s = self.subject[i]
+        tpl, n = _SUBJECTS[s >> 24], s & 0xFFFFFF
+        return tpl.format(n=n, w=n % 52 + 1)
+
+    def value(self, i: int, prop: str, folder: "FakeFolder"):
+        """Verdien en Table-rad/Restrict ser for egenskapen 'prop'."""
+        p = prop.strip("[]")
+        if p == "ReceivedTime" or p == "CreationTime" or p == "SentOn":
+            return datetime.fromtimestamp(self.received[i])
+        if p == "LastModificationTime":
+            return datetime.fromtimestamp(self.modified.get(i, self.received[i]))
+        if p == "EntryID":
+            return eid_of(i)
+        if p == "Subject":
+            return self.subject_of(i)
+        if p == "SenderName":
+            return self.senders[self.sender[i]][0]
+        if p == "SenderEmailAddress":
+            return self.senders[self.sender[i]][1]
+        if p == SMTP_PROP or p.endswith("0x5D01001E"):
+            return self.senders[self.sender[i]][2]
+        if p == "UnRead":
+            return bool(self.unread[i])
+        if p == "Read":
+            return not self.unread[i]
+        if p == "HasAttachment":
+            return self.n_att[i] > 0
+        if p == "Size":
+            return self.size[i]
+        if p == "MessageClass":
+            return "IPM.Schedule.Meeting.Request" if self.kind[i] else "IPM.Note"
+        if p == "Categories":
+            return self.categories.get(i, "")
+        if p == "Class":
+            return OL_MEETING if self.kind[i] else OL_MAIL
+        raise AttributeError(prop)
+
+def eid_of(i: int) -> str:
+    return f"{_EID_PREFIX}{i:012X}"
+
+def _idx_of(eid: str) -> Optional[int]:
+    if not isinstance(eid, str) or not eid.startswith(_EID_PREFIX):
+        return None
+    try: return int(eid[len(_EID_PREFIX):], 16)
+    except ValueError: return None
+
+# ---------- COM-lignende objekter ----------
+class _Collection:
+    """1-basert samling med Count/Item og iterasjon (som pywin32)."""
+    _op = "Collection"
+
+    def __init__(self, session: "FakeNamespace", items: Sequence):
+        self._s = session
+        self._items = items
+
+    @property
+    def Count(self) -> int:
+        return len(self._items)
+
+    def Item(self, ix):
+        self._s._tick(f"{self._op}.Item")
+        if isinstance(ix, str):
+            for x in self._items:
+                if getattr(x, "Name", None) == ix:
+                    return x
+            raise KeyError(ix)
+        if not 1 <= ix <= len(self._items):
+            raise IndexError(ix)
+        return self._items[ix - 1]
+
+    def __iter__(self):
+        return iter(list(self._items))
+
+    def __len__(self):
+        return len(self._items)
+
+class FakeAttachment:
+    def __init__(self, mail: "FakeMail", index: int):
+        self._mail = mail
+        self.Index = index
+        self.Type = 1   # olByValue
+        i = mail._i
+        h = hashlib.blake2b(f"{i}:{index}".encode(), digest_size=8).digest()
+        self._seed = h
+        # noen vedlegg er identiske på tvers av meldinger (dedup-stier)
+        self._dup = h[0] < 40
+        ext = _EXTS[h[1] % len(_EXTS)]
+        stem = f"dokument_{h[2] % 16}" if self._dup else f"vedlegg_{i}_{index}"
+        self.FileName = self.DisplayName = f"{stem}.{ext}"
+        self.Size = 2_000 + (int.from_bytes(h[3:6], "little") % (mail._s.max_attachment_kb * 1024))
+
+    def _content(self) -> bytes:
+        block = (b"FAKE" + (self._seed[:2] if self._dup else self._seed)) * 64
+        n = self.Size
+        return (block * (n // len(block) + 1))[:n]
+
+    def SaveAsFile(self, path: str) -> None:
+        self._mail._s._tick("Attachment.SaveAsFile")
+        with open(path, "wb") as f:
+            f.write(self._content())
+
+class FakeAttachments(_Collection):
+    _op = "Attachments"
+
+class FakePropertyAccessor:
+    def __init__(self, mail: "FakeMail"):
+        self._mail = mail
+
+    def GetProperty(self, prop: str):
+        m = self._mail
+        m._s._tick("PropertyAccessor.GetProperty")
+        return m._s.mailbox.value(m._i, prop, m.Parent)
+
+class FakeMail:
+    """MailItem (eller MeetingItem) for én meldingsindeks. Egenskapslesing telles som COM-kall."""
+    def __init__(self, session: "FakeNamespace", i: int):
+        object.__setattr__(self, "_s", session)
+        object.__setattr__(self, "_i", i)
+
+    def __getattr__(self, name):
+        s, i = self._s, self._i
+        if name.startswith("_"):
+            raise AttributeError(name)
+        s._tick("Mail.get")
+        mb = s.mailbox
+        if name == "Attachments":
+            return FakeAttachments(s, [FakeAttachment(self, k) for k in range(1, mb.n_att[i] + 1)])
+        if name == "PropertyAccessor":
+            return FakePropertyAccessor(self)
+        if name == "Parent":
+            return s._folders[mb.folder_of[i]]
+        if name == "Body":
+            return f"Hei,\n\n{mb.subject_of(i)}.\n\nMvh\n{mb.senders[mb.sender[i]][0]}"
+        if name == "HTMLBody":
+            return f"<html><body><p>Hei,</p><p>{mb.subject_of(i)}.</p></body></html>"
+        try:
+            return mb.value(i, name, None)
+        except AttributeError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name, value):
+        s, i = self._s, self._i
+        s._tick("Mail.set")
+        if name == "UnRead":
+            s.mailbox.unread[i] = 1 if value else 0
+        elif name == "Categories":
+            s.mailbox.categories[i] = str(value or "")
+        else:
+            raise AttributeError(f"{name} er skrivebeskyttet i simulatoren")
+        s.mailbox.modified[i] = time.time()
+
+    def Save(self) -> None:
+        self._s._tick("Mail.Save")
+
+    def Move(self, dest: "FakeFolder") -> "FakeMail":
+        s = self._s
+        s._tick("Mail.Move")
+        if not isinstance(dest, FakeFolder):
+            raise TypeError("Move krever en mappe")
+        s._move(self._i, dest)
+        return self
+
+    def __eq__(self, other):
+        return isinstance(other, FakeMail) and other._i == self._i
+
+    def __hash__(self):
+        return hash(("mail", self._i))
+
+    def __repr__(self):
+        return f"<FakeMail {self.EntryID}>"
+
+class FakeItems:
+    """Items-samling over en liste meldingsindekser (Sort/Restrict gir nye visninger)."""
+    def __init__(self, folder: "FakeFolder", idx: List[int]):
+        self._f = folder
+        self._s = folder._s
+        self._idx = idx
+        self._pos = 0
+
+    @property
+    def Count(self) -> int:
+        self._s._tick("Items.Count")
+        return len(self._idx)
+
+    def Item(self, ix: int) -> FakeMail:
+        self._s._tick("Items.Item")
+        if not 1 <= ix <= len(self._idx):
+            raise IndexError(ix)
+        return FakeMail(self._s, self._idx[ix - 1])
+
+    def GetFirst(self) -> Optional[FakeMail]:
+        self._s._tick("Items.GetFirst")
+        self._pos = 0
+        return self._next()
+
+    def GetNext(self) -> Optional[FakeMail]:
+        self._s._tick("Items.GetNext")
+        return self._next()
+
+    def GetLast(self) -> Optional[FakeMail]:
+        self._s._tick("Items.GetLast")
+        self._pos = len(self._idx) - 1
+        return self._next()
+
+    def _next(self) -> Optional[FakeMail]:
+        if 0 <= self._pos < len(self._idx):
+            m = FakeMail(self._s, self._idx[self._pos])
+            self._pos += 1
+            return m
+        return None
+
+    def Sort(self, prop: str, descending: bool = False) -> None:
+        self._s._tick("Items.Sort")
+        mb, f = self._s.mailbox, self._f
+        self._idx.sort(key=lambda i: mb.value(i, prop, f), reverse=bool(descending))
+
+    def Restrict(self, flt: str) -> "FakeItems":
+        self._s._tick("Items.Restrict")
+        return FakeItems(self._f, self._s._filter(self._idx, flt, self._f))
+
+    def __iter__(self) -> Iterator[FakeMail]:
+        return (FakeMail(self._s, i) for i in list(self._idx))
+
+class FakeRow:
+    __slots__ = ("_t", "_i")
+
+    def __init__(self, table: "FakeTable", i: int):
+        self._t, self._i = table, i
+
+    def Item(self, col):
+        t = self._t
+        t._s._tick("Row.Item")
+        if isinstance(col, int):
+            col = t._cols[col - 1]
+        key = col.strip("[]")
+        if key not in t._colset and col not in t._colset:
+            raise KeyError(f"Kolonnen {col} er ikke lagt til i tabellen")
+        return t._s.mailbox.value(self._i, key, t._f)
+
+    def __call__(self, col):
+        return self.Item(col)
+
+class FakeColumns:
+    def __init__(self, table: "FakeTable"):
+        self._t = table
+
+    @property
+    def Count(self) -> int:
+        return len(self._t._cols)
+
+    def Add(self, name: str) -> None:
+        t = self._t
+        t._s._tick("Columns.Add")
+        t._s.mailbox.value(0, name, t._f) if len(t._s.mailbox) else None   # ukjent egenskap → feil som i Outlook
+        key = name.strip("[]")
+        if key not in t._colset:
+            t._cols.append(key); t._colset.add(key)
+
+    def Remove(self, name: str) -> None:
+        key = name.strip("[]")
+        if key in self._t._colset:
+            self._t._cols.remove(key); self._t._colset.discard(key)
+
+    def RemoveAll(self) -> None:
+        self._t._cols.clear(); self._t._colset.clear()
+
+class FakeTable:
+    DEFAULT_COLUMNS = ("EntryID", "Subject", "CreationTime", "LastModificationTime", "MessageClass")
+
+    def __init__(self, folder: "FakeFolder", idx: List[int]):
+        self._f = folder
+        self._s = folder._s
+        self._idx = idx
+        self._pos = 0
+        self._cols: List[str] = list(self.DEFAULT_COLUMNS)
+        self._colset = set(self._cols)
+        self.Columns = FakeColumns(self)
+
+    @property
+    def EndOfTable(self) -> bool:
+        return self._pos >= len(self._idx)
+
+    def GetRowCount(self) -> int:
+        return len(self._idx)
+
+    def GetNextRow(self) -> Optional[FakeRow]:
+        self._s._tick("Table.GetNextRow")
+        if self._pos >= len(self._idx):
+            return None
+        r = FakeRow(self, self._idx[self._pos])
+        self._pos += 1
+        return r
+
+    def GetArray(self, max_rows: int) -> Tuple[Tuple, ...]:
+        """Neste inntil max_rows rader som tuple av rader (kolonner i Columns-rekkefølge)."""
+        self._s._tick("Table.GetArray")
+        mb, f, cols = self._s.mailbox, self._f, list(self._cols)
+        chunk = self._idx[self._pos:self._pos + max(0, int(max_rows))]
+        self._pos += len(chunk)
+        return tuple(tuple(mb.value(i, c, f) for c in cols) for i in chunk)
+
+    def MoveToStart(self) -> None:
+        self._pos = 0
+
+    def Sort(self, prop: str, descending: bool = False) -> None:
+        self._s._tick("Table.Sort")
+        mb, f = self._s.mailbox, self._f
+        self._idx.sort(key=lambda i: mb.value(i, prop, f), reverse=bool(descending))
+
+    def Restrict(self, flt: str) -> "FakeTable":
+        self._s._tick("Table.Restrict")
+        t = FakeTable(self._f, self._s._filter(self._idx, flt, self._f))
+        t._cols, t._colset = list(self._cols), set(self._colset)
+        return t
+
+class FakeFolder:
+    def __init__(self, session: "FakeNamespace", store: "FakeStore", name: str,
+                 parent: Optional["FakeFolder"] = None):
+        self._s = session
+        self.Store = store
+        self.Name = name
+        self.Parent = parent
+        self._id = len(session._folders)
+        session._folders.append(self)
+        self.EntryID = f"F0{self._id:014X}"
+        self.StoreID = store.StoreID
+        self._children: List[FakeFolder] = []
+        self._own = array("I")          # meldinger opprinnelig lagt her
+        self._moved_in: Dict[int, None] = {}
+        self.DefaultItemType = 0
+
+    @property
+    def FolderPath(self) -> str:
+        parts, f = [], self
+        while f is not None:
+            parts.append(f.Name); f = f.Parent
+        return "\\\\" + "\\".join(reversed(parts))
+
+    @property
+    def Folders(self) -> "FakeFolders":
+        return FakeFolders(self._s, self)
+
+    def _members(self) -> List[int]:
+        fo, me = self._s.mailbox.folder_of, self._id
+        out = [i for i in self._own if fo[i] == me]
+        if self._moved_in:
+            out.extend(i for i in self._moved_in if fo[i] == me)
+        return out
+
+    @property
+    def Items(self) -> FakeItems:
+        self._s._tick("Folder.Items")
+        return FakeItems(self, self._members())
+
+    def GetTable(self, flt: str = "", contents: int = 0) -> FakeTable:
+        self._s._tick("Folder.GetTable")
+        idx = self._members()
+        return FakeTable(self, self._s._filter(idx, flt, self) if flt else idx)
+
+    def __repr__(self):
+        return f"<FakeFolder {self.FolderPath}>"
+
+class FakeFolders(_Collection):
+    _op = "Folders"
+
+    def __init__(self, session: "FakeNamespace", parent: FakeFolder):
+        super().__init__(session, parent._children)
+        self._parent = parent
+
+    def Add(self, name: str, folder_type=None) -> FakeFolder:
+        if any(f.Name.lower() == name.lower() for f in self._parent._children):
+            raise ValueError(f"Mappen {name} finnes allerede")
+        f = FakeFolder(self._s, self._parent.Store, name, self._parent)
+        self._parent._children.append(f)
+        return f
+
+class FakeStore:
+    def __init__(self, session: "FakeNamespace", display_name: str):
+        self._s = session
+        self.DisplayName = display_name
+        self.StoreID = f"0000STORE{len(session._stores):04d}"
+        self.FilePath = f"C:\\Users\\test\\{display_name}.ost"
+        self._root = FakeFolder(session, self, display_name)
+        self._inbox = None
+
+    def GetRootFolder(self) -> FakeFolder:
+        return self._root
+
+    def GetDefaultFolder(self, kind: int) -> FakeFolder:
+        if kind != OL_FOLDER_INBOX or self._inbox is None:
+            raise ValueError(f"Standardmappe {kind} finnes ikke i simulatoren")
+        return self._inbox
+
+class FakeCategory:
+    def __init__(self, name: str, color: int):
+        self.Name, self.Color = name, color
+
+class FakeCategories(_Collection):
+    _op = "Categories"
+
+    def Add(self, name: str, color: int = 0) -> FakeCategory:
+        c = FakeCategory(name, color)
+        self._items.append(c)
+        return c
+
+class _Account:
+    def __init__(self, smtp: str):
+        self.SmtpAddress = smtp
+        self.DisplayName = smtp
+
+class _Outgoing:
+    """Enkel MailItem for CreateItem(0); Send() legger den i session.outbox."""
+    def __init__(self, session):
+        self._s = session
+        self.To = self.Subject = self.HTMLBody = self.Body = ""
+
+    def Send(self):
+        self._s._tick("Mail.Send")
+        self._s.outbox.append({"to": self.To, "subject": self.Subject, "html": self.HTMLBody})
+
+class FakeSearch:
+    """Search-objektet fra Application.AdvancedSearch; Results er ferdig beregnet ved start."""
+    def __init__(self, session: "FakeNamespace", scope: str, flt: str, subfolders: bool, tag: str):
+        self.Tag = tag
+        self.stopped = False
+        paths = {p.replace("''", "'").lower() for p in re.findall(r"'((?:[^']|'')*)'", scope)}
+        idx: List[int] = []
+        for f in session._folders:
+            if f.FolderPath.lower() in paths:
+                stack = [f]
+                while stack:
+                    cur = stack.pop()
+                    idx.extend(session._filter(cur._members(), "@SQL=" + flt, cur) if flt else cur._members())
+                    if subfolders:
+                        stack.extend(cur._children)
+        self.Results = _Collection(session, [FakeMail(session, i) for i in sorted(idx)])
+        self.Results._op = "Results"
+
+    def Stop(self) -> None:
+        self.stopped = True
+
+class FakeApplication:
+    """
+    Outlook.Application. AdvancedSearchComplete leveres ikke av seg selv: pump() (som
+    pythoncom.PumpWaitingMessages) kaller OnAdvancedSearchComplete på hver mottaker i
+    .sinks. Søk der scopet inneholder en streng fra .hang_scopes blir aldri ferdige.
+    """
+    def __init__(self, session):
+        self.Session = session
+        self.sinks: List[object] = []
+        self.hang_scopes: List[str] = []
+        self.searches: List[FakeSearch] = []
+        self._pending: List[FakeSearch] = []
+
+    def CreateItem(self, kind: int):
+        return _Outgoing(self.Session)
+
+    def AdvancedSearch(self, Scope: str, Filter: str = "", SearchSubFolders: bool = False,
+                       Tag: str = "") -> FakeSearch:
+        self.Session._tick("Application.AdvancedSearch")
+        srch = FakeSearch(self.Session, Scope, Filter, SearchSubFolders, Tag)
+        self.searches.append(srch)
+        if not any(h in Scope for h in self.hang_scopes):
+            self._pending.append(srch)
+        return srch
+
+    def pump(self) -> None:
+        while self._pending:
+            srch = self._pending.pop(0)
+            for sink in self.sinks:
+                sink.OnAdvancedSearchComplete(srch)
+
+class FakeComError(Exception):
+    """Som pywintypes.com_error: args = (hresult, tekst, excepinfo, argerr)."""
+    def __init__(self, hresult: int = RPC_E_CALL_REJECTED, text: Optional[str] = None):
+        if text is None:
+            text = "Call was rejected by callee." if hresult == RPC_E_CALL_REJECTED else "The operation failed."
+        super().__init__(hresult, text, (0, "Microsoft Outlook", text, None, 0, hresult), None)
+        self.hresult = hresult
+
+class FakeNamespace:
+    """
+    Outlook.Session. latency: {"Op.Navn": sekunder, "*": standard}. Alle kall telles i .calls.
+    faults: {"Op.Navn": sannsynlighet, "*": standard} – kallet feiler med FakeComError
+    (struping) før det har noen virkning; fail_next() gir deterministiske feil.
+    """
+    def __init__(self, latency: Optional[Dict[str, float]] = None, owner: str = "test@example.no",
+                 max_attachment_kb: int = 256, faults: Optional[Dict[str, float]] = None, fault_seed: int = 0):
+        self.calls: Counter = Counter()
+        self.latency: Dict[str, float] = dict(latency or {})
+        self.faults: Dict[str, float] = dict(faults or {})
+        self._fault_rng = random.Random(fault_seed)
+        self._fail_next: Dict[str, List[int]] = {}
+        self.faults_raised: Counter = Counter()
+        self.mailbox = _Mailbox()
+        self.max_attachment_kb = max(1, int(max_attachment_kb))
+        self._folders: List[FakeFolder] = []
+        self._stores: List[FakeStore] = []
+        self.Stores = _Collection(self, self._stores)
+        self.Categories = FakeCategories(self, [])
+        self.Accounts = _Collection(self, [_Account(owner)])
+        self.Application = FakeApplication(self)
+        self.outbox: List[Dict] = []
+
+    # --- intern ---
+    def _tick(self, op: str) -> None:
+        self.calls[op] += 1
+        lat = self.latency
+        if lat:
+            d = lat.get(op, lat.get("*", 0.0))
+            if d:
+                _spin(d)
+        if self.faults or self._fail_next:
+            self._maybe_fail(op)
+
+    def _maybe_fail(self, op: str) -> None:
+        queue = self._fail_next.get(op)
+        if queue:
+            self.faults_raised[op] += 1
+            raise FakeComError(queue.pop(0))
+        rate = self.faults.get(op, self.faults.get("*", 0.0))
+        if rate and self._fault_rng.random() < rate:
+            self.faults_raised[op] += 1
+            raise FakeComError()
+
+    # --- feilinjeksjon ---
+    def fail_next(self, op: str, n: int = 1, hresult: int = None) -> None:
+        """De neste n kallene til 'op' feiler med hresult (standard RPC_E_CALL_REJECTED)."""
+        self._fail_next.setdefault(op, []).extend([RPC_E_CALL_REJECTED if hresult is None else hresult] * n)
+
+    def _filter(self, idx: List[int], flt: str, folder: FakeFolder) -> List[int]:
+        mb = self.mailbox
+        if flt.lstrip()[:5].upper() == "@SQL=":
+            pred = parse_dasl(flt)
+            return [i for i in idx if pred(lambda prop: mb.value(i, prop, folder))]
+        clauses = parse_filter(flt)
+        if not clauses:
+            return list(idx)
+        checks = [(prop, _OPS[op], val) for prop, op, val in clauses]
+        return [i for i in idx if all(fn(mb.value(i, prop, folder), val) for prop, fn, val in checks)]
+
+    def _move(self, i: int, dest: FakeFolder) -> None:
+        mb = self.mailbox
+        mb.folder_of[i] = dest._id
+        if mb.orig_folder[i] != dest._id:
+            dest._moved_in[i] = None
+        mb.modified[i] = time.time()
+
+    # --- oppsett ---
+    def add_store(self, display_name: str, folders: Iterable[str] = ("Innboks",)) -> FakeStore:
+        """folders: stier relativt til roten, f.eks. 'Innboks\\\\Leverandører'. Første 'Innboks' blir standard."""
+        st = FakeStore(self, display_name)
+        self._stores.append(st)
+        for path in folders:
+            self.folder(st, path)
+        return st
+
+    def folder(self, store: FakeStore, path: str) -> FakeFolder:
+        """Finn eller opprett mappe under store-roten."""
+        cur = store._root
+        for name in [p for p in path.replace("/", "\\").split("\\") if p]:
+            nxt = next((f for f in cur._children if f.Name.lower() == name.lower()), None)
+            if nxt is None:
+                nxt = FakeFolder(self, store, name, cur)
+                cur._children.append(nxt)
+            cur = nxt
+        if store._inbox is None and cur.Parent is store._root and cur.Name.lower() in ("innboks", "inbox"):
+            store._inbox = cur
+        return cur
+
+    def add_message(self, folder: FakeFolder, received: datetime, sender: Tuple[str, str, str],
+                    subject_no: int = 0, n_attachments: int = 0, unread: bool = False,
+                    size: int = 20_000, meeting: bool = False) -> str:
+        """Legger til én melding; returnerer EntryID. sender = (navn, SenderEmailAddress, smtp)."""
+        mb = self.mailbox
+        try:
+            sx = mb.senders.index(sender)
+        except ValueError:
+            mb.senders.append(sender); sx = len(mb.senders) - 1
+        i = len(mb)
+        mb.received.append(received.timestamp()); mb.sender.append(sx)
+        mb.subject.append((subject_no % len(_SUBJECTS)) << 24 | (i & 0xFFFFFF))
+        mb.size.append(size); mb.n_att.append(min(255, n_attachments)); mb.unread.append(1 if unread else 0)
+        mb.kind.append(1 if meeting else 0)
+        mb.folder_of.append(folder._id); mb.orig_folder.append(folder._id)
+        folder._own.append(i)
+        return eid_of(i)
+
+    # --- Namespace-API ---
+    @property
+    def DefaultStore(self) -> FakeStore:
+        return self._stores[0]
+
+    @property
+    def Folders(self) -> _Collection:
+        return _Collection(self, [s._root for s in self._stores])
+
+    def GetDefaultFolder(self, kind: int) -> FakeFolder:
+        self._tick("Namespace.GetDefaultFolder")
+        return self.DefaultStore.GetDefaultFolder(kind)
+
+    def GetItemFromID(self, entry_id: str, store_id: Optional[str] = None) -> FakeMail:
+        self._tick("Namespace.GetItemFromID")
+        i = _idx_of(entry_id)
+        if i is None or i >= len(self.mailbox):
+            raise LookupError(f"Fant ikke element {entry_id!r}")
+        return FakeMail(self, i)
+
+    def GetFolderFromID(self, entry_id: str, store_id: Optional[str] = None) -> FakeFolder:
+        self._tick("Namespace.GetFolderFromID")
+        for f in self._folders:
+            if f.EntryID == entry_id and (not store_id or f.StoreID == store_id):
+                return f
+        raise LookupError(f"Fant ikke mappe {entry_id!r}")
+
+    # --- diagnostikk ---
+    @property
+    def com_calls(self) -> int:
+        return sum(self.calls.values())
+
+    def reset_calls(self) -> None:
+        self.calls.clear()
+
+# ---------- Generator ----------
+DEFAULT_FOLDERS = ("Innboks", "Innboks\\Leverandører", "Innboks\\Kunder", "Innboks\\Kunder\\Prosjekter",
+                   "Innboks\\Nyhetsbrev", "Arkiv", "Arkiv\\2024")
+
+def _make_senders(rng: random.Random, n: int, exchange_ratio: float) -> List[Tuple[str, str, str]]:
+    out = []
+    for k in range(n):
+        dom = _DOMAINS[k % len(_DOMAINS)].format(k=k // len(_DOMAINS))
+        local = ("post", "faktura", "no-reply", "kontakt", f"ansatt{k}")[k % 5]
+        smtp = f"{local}@{dom}"
+        name = f"{dom.split('.')[0].title()} {'AS' if k % 3 else 'Regnskap'}"
+        if rng.random() < exchange_ratio:   # intern Exchange-avsender: X500 i SenderEmailAddress
+            out.append((name, f"/O=EXCHANGELABS/OU=EXCHANGE ADMINISTRATIVE GROUP/CN=RECIPIENTS/CN={local}{k}", smtp))
+        else:
+            out.append((name, smtp, smtp))
+    return out
+
+def generate_mailbox(n_items: int = 10_000, folders: Sequence[str] = DEFAULT_FOLDERS,
+                     n_senders: int = 500, days: int = 365, attach_ratio: float = 0.35,
+                     unread_ratio: float = 0.15, meeting_ratio: float = 0.02,
+                     exchange_ratio: float = 0.1, end: Optional[datetime] = None, seed: int = 1,
+                     latency: Optional[Dict[str, float]] = None, store_name: str = "Postboks",
+                     max_attachment_kb: int = 256) -> FakeNamespace:
+    """
+    Deterministisk postboks med n_items meldinger fordelt over 'folders' (første mappe får
+    mest) og de siste 'days' dagene før 'end'. Avsendere er skjevfordelt (noen få står for
+    mye av trafikken), som i ekte innbokser. 10^6 meldinger tar noen sekunder å lage.
+    """
+    rng = random.Random(seed)
+    s = FakeNamespace(latency=latency, max_attachment_kb=max_attachment_kb)
+    store = s.add_store(store_name, folders)
+    flist = [s.folder(store, p) for p in folders]
+    mb = s.mailbox
+    mb.senders.extend(_make_senders(rng, max(1, n_senders), exchange_ratio))
+
+    end_ts = (end or datetime(2025, 6, 30, 17, 0)).timestamp()
+    span = max(1, days) * 86400.0
+    weights = [1.0 / (k + 1) for k in range(len(flist))]
+    cum = [sum(weights[:k + 1]) / sum(weights) for k in range(len(weights))]
+    n_s, n_f = len(mb.senders), len(flist)
+    rnd = rng.random
+    # tidsstempler synkende innen hver mappe gir realistisk rekkefølge uten sortering
+    for i in range(n_items):
+        r = rnd()
+        fx = 0
+        while fx < n_f - 1 and r > cum[fx]:
+            fx += 1
+        f = flist[fx]
+        mb.received.append(end_ts - span * (i / max(1, n_items)) - rnd() * 60)
+        mb.sender.append(int(n_s * rnd() ** 3))
+        mb.subject.append((int(rnd() * len(_SUBJECTS)) << 24) | (i & 0xFFFFFF))
+        has_att = rnd() < attach_ratio
+        mb.n_att.append(1 + int(rnd() * 3) if has_att else 0)
+        mb.size.append(8_000 + int(rnd() * (400_000 if has_att else 40_000)))
+        mb.unread.append(1 if rnd() < unread_ratio else 0)
+        mb.kind.append(1 if rnd() < meeting_ratio else 0)
+        mb.folder_of.append(f._id); mb.orig_folder.append(f._id)
+        f._own.append(i)
+    return s
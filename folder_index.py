@@ -0,0 +1,201 @@
+"""
+Vedvarende indeks over Outlook-mapper: normalisert sti («\\\\Store\\A\\B») → (StoreID, EntryID).
+
+Å finne en mappe fra sti krever ellers at alle stores listes og at hvert nivås Folders
+gjennomsøkes med Count/Item – mange COM-kall per oppslag. Her slås stien opp i indeksen
+og hentes med ett GetFolderFromID; treffet valideres ved at mappens FolderPath fortsatt
+er den lagrede (omdøpt/flyttet/slettet → oppføringen er foreldet, og bare den stien
+letes opp på nytt). Indeksen ligger i .ragdb/folder_index.json og deles av group_mover
+og mappevelgeren (widgets_folderpicker) i GUI-et.
+"""
+from __future__ import annotations
+import json, os, threading
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+_LOCK = threading.RLock()
+_INDEX: Optional[Dict] = None
+
+def _path() -> Path:
+    root = Path(__file__).resolve().parents[1] / ".ragdb"
+    root.mkdir(exist_ok=True)
+    return root / "folder_index.json"
+
+def _parts(path: str) -> List[str]:
+    return [x.strip() for x in (path or "").replace("/", "\\").split("\\") if x.strip()]
+
+def normalize(path: str) -> str:
+    """'\\\\Store\\A\\B' uansett skråstreker, ledende/doble skilletegn og mellomrom rundt ledd."""
+    parts = _parts(path)
+    return "\\\\" + "\\".join(parts) if parts else ""
+
+def _key(path: str) -> str:
+    return normalize(path).casefold()
+
+# ---------- lagring ----------
+def _load() -> Dict:
+    global _INDEX
+    if _INDEX is None:
+        data: Dict = {}
+        try:
+            data = json.loads(_path().read_text(encoding="utf-8"))
+        except Exception:
+            pass
+        items = data.get("items") if isinstance(data, dict) else None
+        _INDEX = {"items": dict(items or {}), "complete": bool(isinstance(data, dict) and data.get("complete"))}
+    return _INDEX
+
+def _save() -> None:
+    p = _path()
+    tmp = p.with_name(f"{p.stem}.{os.getpid()}.tmp")
+    try:
+        tmp.write_text(json.dumps({"v": 1, **_load()}, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(p)
+    except Exception:
+        pass
+
+def clear() -> None:
+    """Glemmer alt (neste oppslag bygger på nytt)."""
+    global _INDEX
+    with _LOCK:
+        _INDEX = {"items": {}, "complete": False}
+        _save()
+
+def _entry(folder) -> Optional[Dict]:
+    try:
+        return {"path": normalize(folder.FolderPath), "store_id": getattr(folder, "StoreID", "") or "",
+                "eid": folder.EntryID}
+    except Exception:
+        return None
+
+def remember(folder, alias: Optional[str] = None, save: bool = True) -> None:
+    """Legger mappen inn under sin FolderPath (og evt. 'alias', f.eks. sti uten store-navn)."""
+    e = _entry(folder)
+    if not e or not e["eid"]:
+        return
+    with _LOCK:
+        items = _load()["items"]
+        items[_key(e["path"])] = e
+        if alias and _key(alias) != _key(e["path"]):
+            items[_key(alias)] = e
+        if save:
+            _save()
+
+def _forget(key: str) -> None:
+    with _LOCK:
+        idx = _load()
+        if idx["items"].pop(key, None) is not None:
+            idx["complete"] = False
+            _save()
+
+# ---------- oppslag i mappetreet (treg vei) ----------
+def _iter_stores(session) -> Iterator[Tuple[str, object]]:
+    stores = getattr(session, "Stores", None)
+    if stores:
+        for i in range(1, int(stores.Count) + 1):
+            s = stores.Item(i)
+            if s:
+                try:
+                    yield s.DisplayName, s.GetRootFolder()
+                except Exception:
+                    continue
+    else:
+        # Fallback: Session.Folders (eldre Outlook)
+        roots = getattr(session, "Folders", None)
+        if roots:
+            for i in range(1, int(roots.Count) + 1):
+                r = roots.Item(i)
+                if r:
+                    yield getattr(r, "Name", ""), r
+
+def _find_child(parent, name: str):
+    subs = getattr(parent, "Folders", None)
+    if not subs: return None
+    for i in range(1, int(subs.Count) + 1):
+        f = subs.Item(i)
+        if f and getattr(f, "Name", "").lower() == name.lower():
+            return f
+    return None
+
+def find_by_walk(session, path: str):
+    """
+    Slår opp stien ved å gå gjennom mappetreet (uten indeks).
+    Hvis første ledd ikke er et store-navn, brukes DefaultStore.
+    """
+    parts = _parts(path)
+    if not parts:
+        return None
+    root = None
+    first = parts[0]
+    for disp, rf in _iter_stores(session):
+        if disp and disp.lower() == first.lower():
+            root = rf; parts = parts[1:]; break
+    if root is None:
+        try:
+            root = session.DefaultStore.GetRootFolder()
+        except Exception:
+            return None
+    cur = root
+    for name in parts:
+        nxt = _find_child(cur, name)
+        if nxt is None:
+            return None
+        cur = nxt
+    return cur
+
+# ---------- offentlig ----------
+def resolve(session, path: str):
+    """
+    Mappen for 'path' (None hvis den ikke finnes). Indekstreff hentes med GetFolderFromID og
+    godtas bare hvis FolderPath fortsatt stemmer; ellers slettes oppføringen og stien letes
+    opp i treet og lagres på nytt.
+    """
+    key = _key(path)
+    if not key:
+        return None
+    with _LOCK:
+        e = _load()["items"].get(key)
+    if e:
+        try:
+            f = session.GetFolderFromID(e["eid"], e.get("store_id") or None)
+            if f is not None and _key(f.FolderPath) == _key(e["path"]):
+                return f
+        except Exception:
+            pass
+        _forget(key)
+    f = find_by_walk(session, path)
+    if f is not None:
+        remember(f, alias=path)
+    return f
+
+def _walk_all(folder) -> Iterator:
+    yield folder
+    subs = getattr(folder, "Folders", None)
+    if subs:
+        for i in range(1, int(subs.Count) + 1):
+            try:
+                yield from _walk_all(subs.Item(i))
+            except Exception:
+                continue
+
+def rebuild(session) -> int:
+    """Går gjennom alle stores og lagrer alle mapper. Returnerer antall mapper."""
+    n = 0
+    with _LOCK:
+        _load()["items"].clear()
+        for _disp, root in _iter_stores(session):
+            for f in _walk_all(root):
+                remember(f, save=False); n += 1
+        _load()["complete"] = True
+        _save()
+    return n
+
+def list_paths(session=None, refresh: bool = False) -> List[str]:
+    """
+    Alle kjente mappestier (for mappevelgere), sortert. Bygges fra Outlook første gang eller
+    når refresh=True; ellers rett fra indeksen uten COM-kall.
+    """
+    with _LOCK:
+        if session is not None and (refresh or not _load()["complete"]):
+            rebuild(session)
+        return sorted({e["path"] for e in _load()["items"].values()}, key=str.casefold)
@@ -0,0 +1,90 @@
+from __future__ import annotations
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+Interval = Tuple[datetime, datetime]
+
+OL_FREE = 0   # OlBusyStatus.olFree – teller ikke som opptatt
+
+def _as_dt(d, t: time) -> datetime:
+    return d if isinstance(d, datetime) else datetime.combine(d, t)
+
+def merge_busy(events: Iterable[Dict]) -> List[Interval]:
+    """
+    Slår sammen opptatt-intervaller fra avtaler ({'start','end','busy'?}).
+    Sortering + ett sveip: O(n log n). Avtaler markert som ledig (busy=0) hoppes over.
+    """
+    spans = sorted(
+        (e["start"], e.get("end") or e["start"])
+        for e in events
+        if e.get("start") and e.get("busy", 2) != OL_FREE
+    )
+    merged: List[Interval] = []
+    for s, e in spans:
+        if merged and s <= merged[-1][1]:
+            if e > merged[-1][1]:
+                merged[-1] = (merged[-1][0], e)
+        else:
+            merged.append((s, e))
+    return merged
+
+def _ceil(dt: datetime, align: Optional[timedelta]) -> datetime:
+    if not align:
+        return dt
+    base = dt.replace(hour=0, minute=0, second=0, microsecond=0)
+    steps = -(-(dt - base) // align)  # heltallsdivisjon rundet opp
+    return base + steps * align
+
+def free_slots(events: Iterable[Dict],
+               d_from,
+               d_to,
+               length: timedelta,
+               n: int = 5,
+               work_start: time = time(8, 0),
+               work_end: time = time(16, 0),
+               weekdays: Sequence[int] = (0, 1, 2, 3, 4),
+               align: Optional[timedelta] = timedelta(minutes=15),
+               step: Optional[timedelta] = None,
+               not_before: Optional[datetime] = None) -> List[Interval]:
+    """
+    De første 'n' ledige tidsrommene med lengde 'length' mellom d_from og d_to
+    (dato eller datetime), innenfor arbeidstid på angitte ukedager (0=mandag).
+    - align: starttid rundes opp til nærmeste kvarter (None = ingen avrunding)
+    - step: None gir ett forslag per ledig luke; ellers flere forslag i samme luke med dette intervallet
+    - not_before: ignorer tid før dette (typisk nå)
+    """
+    if n <= 0 or length <= timedelta(0):
+        return []
+    busy = merge_busy(events)
+    lo = _as_dt(d_from, time.min)
+    hi = _as_dt(d_to, time.max)
+    if not_before and not_before > lo:
+        lo = not_before
+
+    out: List[Interval] = []
+    bi = 0
+    day: date = lo.date()
+    while day <= hi.date() and len(out) < n:
+        if day.weekday() in weekdays:
+            ws = max(datetime.combine(day, work_start), lo)
+            we = min(datetime.combine(day, work_end), hi)
+            # hopp over opptatt-intervaller som slutter før arbeidsdagen
+            while bi < len(busy) and busy[bi][1] <= ws:
+                bi += 1
+            cur = ws
+            j = bi
+            while cur < we and len(out) < n:
+                gap_end = busy[j][0] if j < len(busy) and busy[j][0] < we else we
+                s = _ceil(cur, align)
+                while s + length <= gap_end and len(out) < n:
+                    out.append((s, s + length))
+                    if not step:
+                        break
+                    s = _ceil(s + step, align)
+                if j < len(busy) and busy[j][0] < we:
+                    cur = max(cur, busy[j][1])
+                    j += 1
+                else:
+                    break
+        day += timedelta(days=1)
+    return out
@@ -0,0 +1,381 @@
+"""
+Lokal fulltekstindeks over meldingstekst (SQLite FTS5) i .ragdb/fulltext.db.
+
+Indeksen er valgfri (innstillingen 'fulltext_enabled') og mates trinnvis:
+  - fra søkeresultater (auto_archive sender radene videre, som for avsenderstatistikken)
+  - fra bakgrunnsjobben 'fulltext' i daemonen (backfill over hele vinduet)
+
+Per melding lagres mail_as_text() + vedleggsnavn, men kun for meldinger nyere enn
+'fulltext_window_days'. Hver store har et tak ('fulltext_max_mb_per_store'); når det
+overskrides, kastes de eldste meldingene først. Søk gir EntryID-er rangert med bm25:
+
+    python -m fredag.fulltext_index search "faktura mars"
+    python -m fredag.fulltext_index backfill --days 30
+"""
+from __future__ import annotations
+import argparse
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from . import telemetry
+
+WINDOW_DAYS = 90
+MAX_MB_PER_STORE = 500
+MAX_BODY_CHARS = 200_000        # lange nyhetsbrev/tråder kuttes – starten er det som søkes i
+BATCH = 200                     # meldinger per transaksjon
+BACKFILL_SLICE_DAYS = 7         # backfill søker ett slikt datointervall om gangen, nyeste først
+BACKFILL_SLICE_CAP = 100_000    # eget tak per intervall (søkets cap_total gjelder ikke her)
+# Rangering: emne og vedleggsnavn teller mer enn brødtekst (bm25-vekter per kolonne)
+_BM25 = "bm25(fts, 5.0, 2.0, 1.0, 3.0)"
+
+_DB = None  # type: Optional[sqlite3.Connection]
+_LOCK = threading.RLock()
+
+def _db_path() -> Path:
+    root = Path(__file__).resolve().parents[1] / ".ragdb"
+    root.mkdir(exist_ok=True)
+    return root / "fulltext.db"
+
+def available() -> bool:
+    """FTS5 er kompilert inn i denne SQLite-versjonen."""
+    try:
+        c = sqlite3.connect(":memory:")
+        try:
+            c.execute("CREATE VIRTUAL TABLE t USING fts5(x)")
+            return True
+        finally:
+            c.close()
+    except sqlite3.Error:
+        return False
+
+def _conn() -> sqlite3.Connection:
+    global _DB
+    if _DB is None:
+        db = sqlite3.connect(str(_db_path()), check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL;")
+        _ensure_schema(db)
+        _DB = db
+    return _DB
+
+def _ensure_schema(db: sqlite3.Connection) -> None:
+    db.executescript("""
+    CREATE TABLE IF NOT EXISTS docs (
+        id      INTEGER PRIMARY KEY,
+        eid     TEXT NOT NULL UNIQUE,
+        store   TEXT NOT NULL DEFAULT '',
+        dt      TEXT NOT NULL,
+        subject TEXT NOT NULL DEFAULT '',
+        sender  TEXT NOT NULL DEFAULT '',
+        folder  TEXT NOT NULL DEFAULT '',
+        bytes   INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS ix_docs_store_dt ON docs(store, dt);
+    CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+    CREATE VIRTUAL TABLE IF NOT EXISTS fts USING fts5(
+        subject, sender, body, attachments, tokenize = 'unicode61 remove_diacritics 2'
+    );
+    """)
+    db.commit()
+
+def close() -> None:
+    global _DB
+    with _LOCK:
+        if _DB is not None:
+            try: _DB.close()
+            except Exception: pass
+            _DB = None
+
+def _settings() -> Dict:
+    try:
+        from .settings import load_settings
+        return load_settings()
+    except Exception:
+        return {}
+
+def enabled() -> bool:
+    return bool(_settings().get("fulltext_enabled")) and available()
+
+def _meta_get(key: str) -> Optional[str]:
+    with _LOCK:
+        row = _conn().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+def _meta_set(key: str, value: str) -> None:
+    with _LOCK:
+        db = _conn()
+        with db:
+            db.execute("INSERT OR REPLACE INTO meta(key, value) VALUES (?, ?)", (key, value))
+
+def _dt_str(dt) -> str:
+    if isinstance(dt, datetime):
+        return dt.replace(tzinfo=None).isoformat(timespec="seconds")
+    return str(dt or "")[:19]
+
+# ---------- skriving ----------
+def known_eids(eids: Iterable[str]) -> Set[str]:
+    """De av 'eids' som allerede er indeksert."""
+    lst = [e for e in eids if e]
+    out: Set[str] = set()
+    with _LOCK:
+        db = _conn()
+        for i in range(0, len(lst), 500):
+            chunk = lst[i:i + 500]
+            cur = db.execute(f"SELECT eid FROM docs WHERE eid IN ({','.join('?' * len(chunk))})", chunk)
+            out.update(r[0] for r in cur.fetchall())
+    return out
+
+def add_documents(docs: Iterable[Dict]) -> int:
+    """
+    Legger inn ferdige dokumenter: {"eid", "store", "dt", "subject", "from", "folder",
+    "body", "attachments": [navn]}. Eksisterende EntryID erstattes. Returnerer antall.
+    """
+    n = 0
+    with _LOCK:
+        db = _conn()
+        with db:
+            for d in docs:
+                eid = d.get("eid")
+                if not eid:
+                    continue
+                body = (d.get("body") or "")[:MAX_BODY_CHARS]
+                atts = " ".join(d.get("attachments") or ())
+                subj, sender = d.get("subject") or "", d.get("from") or ""
+                size = len(body.encode("utf-8", "ignore")) + len(subj) + len(sender) + len(atts)
+                old = db.execute("SELECT id FROM docs WHERE eid=?", (eid,)).fetchone()
+                if old:
+                    db.execute("DELETE FROM fts WHERE rowid=?", (old[0],))
+                    db.execute("DELETE FROM docs WHERE id=?", (old[0],))
+                cur = db.execute(
+                    "INSERT INTO docs(eid, store, dt, subject, sender, folder, bytes) VALUES (?,?,?,?,?,?,?)",
+                    (eid, d.get("store") or "", _dt_str(d.get("dt")), subj, sender, d.get("folder") or "", size))
+                db.execute("INSERT INTO fts(rowid, subject, sender, body, attachments) VALUES (?,?,?,?,?)",
+                           (cur.lastrowid, subj, sender, body, atts))
+                n += 1
+    return n
+
+def _delete_ids(db: sqlite3.Connection, ids: List[int]) -> None:
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        marks = ",".join("?" * len(chunk))
+        db.execute(f"DELETE FROM fts WHERE rowid IN ({marks})", chunk)
+        db.execute(f"DELETE FROM docs WHERE id IN ({marks})", chunk)
+
+def prune(window_days: int) -> int:
+    """Fjerner meldinger eldre enn vinduet. Returnerer antall fjernet."""
+    if window_days <= 0:
+        return 0
+    cutoff = _dt_str(datetime.now() - timedelta(days=window_days))
+    with _LOCK:
+        db = _conn()
+        ids = [r[0] for r in db.execute("SELECT id FROM docs WHERE dt < ?", (cutoff,))]
+        with db:
+            _delete_ids(db, ids)
+    return len(ids)
+
+def enforce_cap(max_bytes: int, stores: Optional[Iterable[str]] = None) -> int:
+    """Holder hver store under 'max_bytes' indeksert tekst ved å kaste eldste først."""
+    if max_bytes <= 0:
+        return 0
+    evicted = 0
+    with _LOCK:
+        db = _conn()
+        sizes = dict(db.execute("SELECT store, SUM(bytes) FROM docs GROUP BY store").fetchall())
+        for store in (set(stores) if stores is not None else sizes):
+            excess = (sizes.get(store) or 0) - max_bytes
+            if excess <= 0:
+                continue
+            ids: List[int] = []
+            for rid, b in db.execute("SELECT id, bytes FROM docs WHERE store=? ORDER BY dt, id", (store,)):
+                if excess <= 0:
+                    break
+                ids.append(rid)
+                excess -= b
+            with db:
+                _delete_ids(db, ids)
+            evicted += len(ids)
+    return evicted
+
+# ---------- mating fra Outlook ----------
+def _attachment_names(mail) -> List[str]:
+    try:
+        atts = mail.Attachments
+        count = getattr(atts, "Count", 0)
+    except Exception:
+        return []
+    names = []
+    for i in range(1, count + 1):
+        try: names.append(str(atts.Item(i).FileName or ""))
+        except Exception: continue
+    return names
+
+def index_rows(session, rows: Iterable[Dict], window_days: Optional[int] = None,
+               max_mb: Optional[int] = None, stop_evt=None,
+               progress: Optional[Callable[[int, int], None]] = None) -> int:
+    """
+    Indekserer søkeresultat-rader ({"eid", "store", "dt", "subject", "from", "folder"})
+    som er innenfor vinduet og ikke allerede finnes. Åpner hver melding én gang
+    (GetItemFromID) for tekst og vedleggsnavn. Returnerer antall nye.
+    """
+    from .outlook_core import mail_as_text
+    st = _settings()
+    window_days = int(window_days if window_days is not None else st.get("fulltext_window_days", WINDOW_DAYS))
+    max_mb = int(max_mb if max_mb is not None else st.get("fulltext_max_mb_per_store", MAX_MB_PER_STORE))
+    cutoff = datetime.now() - timedelta(days=window_days) if window_days > 0 else None
+
+    todo = [r for r in rows if r.get("eid") and isinstance(r.get("dt"), datetime)
+            and (cutoff is None or r["dt"].replace(tzinfo=None) >= cutoff)]
+    have = known_eids(r["eid"] for r in todo)
+    todo = [r for r in todo if r["eid"] not in have]
+    added, stores, batch = 0, set(), []
+    with telemetry.stage("fulltext") as stage:
+        for k, r in enumerate(todo, 1):
+            if stop_evt is not None and stop_evt.is_set():
+                break
+            try:
+                mail = (session.GetItemFromID(r["eid"], r["store"]) if r.get("store")
+                        else session.GetItemFromID(r["eid"]))
+                doc = dict(r, body=mail_as_text(mail), attachments=_attachment_names(mail))
+            except Exception:
+                stage.add(errors=1)
+                continue
+            batch.append(doc)
+            stores.add(r.get("store") or "")
+            stage.add(items=1, bytes=len(doc["body"]), com_calls=1 + len(doc["attachments"]))
+            if len(batch) >= BATCH:
+                added += add_documents(batch); batch = []
+                if progress:
+                    try: progress(k, len(todo))
+                    except Exception: pass
+        added += add_documents(batch)
+        if added:
+            enforce_cap(max_mb * 1024 * 1024, stores)
+    return added
+
+def feed_from_search(session, rows: List[Dict]) -> int:
+    """Kalles med ferske søkeresultater; gjør ingenting når indeksen er slått av."""
+    try:
+        if not enabled():
+            return 0
+        return index_rows(session, rows)
+    except Exception:
+        return 0
+
+def _slices(days: int, today: date) -> Iterator[Tuple[date, date]]:
+    """(fra, til)-datoer (begge inklusive) bakover fra i dag, BACKFILL_SLICE_DAYS om gangen."""
+    first = today - timedelta(days=days)
+    b = today
+    while b >= first:
+        a = max(first, b - timedelta(days=BACKFILL_SLICE_DAYS - 1))
+        yield a, b
+        b = a - timedelta(days=1)
+
+def backfill(session, days: Optional[int] = None, stop_evt=None,
+             progress: Optional[Callable[[int, int], None]] = None) -> int:
+    """
+    Søker gjennom vinduet (innboks + undermapper) i datointervaller, nyeste først, og
+    indekserer det som mangler. Hvert intervall har eget tak (BACKFILL_SLICE_CAP), så store
+    postbokser kommer helt gjennom. Når en tidligere kjøring har gått hele vinduet, stopper
+    den ved første intervall der alt allerede er indeksert.
+    """
+    from .outlook_core import search_messages
+    st = _settings()
+    days = int(days if days is not None else st.get("fulltext_window_days", WINDOW_DAYS))
+    stop = stop_evt or threading.Event()
+    covered = int(_meta_get("backfill_days") or 0)     # vinduet en hel kjøring sist dekket
+    added = 0
+    for a, b in _slices(days, datetime.now().date()):
+        if stop.is_set():
+            break
+        res, err, _aborted = search_messages(
+            session=session, sender_query="", subject_contains="",
+            after_date=a, before_date=b, include_subfolders=True,
+            only_unread=False, only_attachments=False,
+            cap_per_folder=BACKFILL_SLICE_CAP, cap_total=BACKFILL_SLICE_CAP, stop_evt=stop)
+        if err:
+            raise RuntimeError(err)
+        eids = {r["eid"] for r in res if r.get("eid")}
+        if covered >= days and len(known_eids(eids)) == len(eids):
+            break
+        added += index_rows(session, res, window_days=days, stop_evt=stop, progress=progress)
+    else:
+        if not stop.is_set():
+            _meta_set("backfill_days", str(days))
+    prune(days)
+    return added
+
+# ---------- søk ----------
+def _match_expr(query: str) -> str:
+    """Brukertekst → FTS5-uttrykk: hvert ord siteres (ingen syntaksfeil), 'ord*' = prefiks."""
+    terms = []
+    for tok in (query or "").split():
+        prefix = tok.endswith("*")
+        tok = tok.rstrip("*").replace('"', "")
+        if tok:
+            terms.append(f'"{tok}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+def search(query: str, limit: int = 50, store: Optional[str] = None,
+           after: Optional[datetime] = None) -> List[Dict]:
+    """
+    Rangerte treff (best først): {"eid", "store", "dt", "subject", "from", "folder",
+    "score", "snippet"}. Tom liste ved tomt søk eller ugyldig uttrykk.
+    """
+    expr = _match_expr(query)
+    if not expr:
+        return []
+    sql = (f"SELECT d.eid, d.store, d.dt, d.subject, d.sender, d.folder, {_BM25} AS score,"
+           " snippet(fts, 2, '[', ']', '…', 12)"
+           " FROM fts JOIN docs d ON d.id = fts.rowid WHERE fts MATCH ?")
+    args: List = [expr]
+    if store is not None:
+        sql += " AND d.store = ?"; args.append(store)
+    if after is not None:
+        sql += " AND d.dt >= ?"; args.append(_dt_str(after))
+    sql += " ORDER BY score LIMIT ?"; args.append(int(limit))
+    try:
+        with _LOCK:
+            rows = _conn().execute(sql, args).fetchall()
+    except sqlite3.OperationalError:
+        return []
+    out = []
+    for eid, st, dt, subj, sender, folder, score, snip in rows:
+        try: dt = datetime.fromisoformat(dt)
+        except Exception: pass
+        out.append({"eid": eid, "store": st, "dt": dt, "subject": subj, "from": sender,
+                    "folder": folder, "score": round(-score, 4), "snippet": snip})
+    return out
+
+def stats() -> Dict[str, Dict]:
+    """Per store: antall meldinger, indekserte bytes og eldste/nyeste dato."""
+    with _LOCK:
+        cur = _conn().execute("SELECT store, COUNT(*), SUM(bytes), MIN(dt), MAX(dt) FROM docs GROUP BY store")
+        return {s: {"docs": n, "bytes": b or 0, "oldest": lo, "newest": hi} for s, n, b, lo, hi in cur.fetchall()}
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description="Lokal fulltekstindeks (FTS5)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sp = sub.add_parser("search", help="Søk i indeksen")
+    sp.add_argument("query")
+    sp.add_argument("--limit", type=int, default=20)
+    bp = sub.add_parser("backfill", help="Indekser vinduet fra Outlook")
+    bp.add_argument("--days", type=int, default=None)
+    sub.add_parser("stats", help="Størrelse per store")
+    args = ap.parse_args(argv)
+    if not available():
+        raise SystemExit("SQLite mangler FTS5.")
+    if args.cmd == "search":
+        for h in search(args.query, args.limit):
+            print(f"{h['score']:>7.2f}  {h['dt']}  {h['from'][:24]:<24}  {h['subject'][:60]}")
+            print(f"         {h['snippet']}")
+    elif args.cmd == "backfill":
+        from .outlook_core import get_session
+        print(f"Indekserte {backfill(get_session(), args.days)} nye meldinger.")
+    else:
+        for s, v in stats().items():
+            print(f"{s or '(standard)'}: {v['docs']} meldinger, {v['bytes'] / 1e6:.1f} MB, {v['oldest']} – {v['newest']}")
+
+if __name__ == "__main__":
+    main()
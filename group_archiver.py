@@ -2,18 +2,21 @@ from __future__ import annotations
 from collections import defaultdict
 from typing import Dict, List, Tuple, Optional
 
-from .group_rules import GroupRule, load_rules, resolve_group
+from . import telemetry
+from .com_retry import call as com_call, is_transient
+from .group_rules import GroupRule, matcher_for
 from .archiver import archive_messages
-from .state_store import was_archived, mark_archived
 from .settings import load_settings
+from .locking import LockBusy, dir_locks, resource_locks
 
 Summary = Dict[str, Dict[str, int]]
 
 def _get_item_fn(session):
     def _get(r):
         try:
-            return session.GetItemFromID(r.get("eid"), r.get("store"))
-        except Exception:
+            return com_call(session.GetItemFromID, r.get("eid"), r.get("store"), stage="extract")
+        except Exception as e:
+            if is_transient(e): raise     # struping: archive_messages melder on_failed
             return None
     return _get
 
@@ -22,7 +25,9 @@ def archive_by_groups(session,
                       rules: Optional[List[GroupRule]] = None,
                       dedup: bool = True,
                       dry_run: bool = False) -> Tuple[Summary, List[Dict]]:
-    rules = rules or load_rules()
+    from .state_store import was_archived, mark_archived   # sqlite lastes først ved arkivering
+    matcher = matcher_for(rules or None)
+    rules = matcher.rules
     defaults = load_settings()
 
     summary: Summary = {}
@@ -30,18 +35,26 @@ def archive_by_groups(session,
     mapping: Dict[str, GroupRule] = {}
 
     unassigned: List[Dict] = []
-    for r in results:
-        eid = r.get("eid") or ""
-        if not dry_run and (not eid or was_archived(eid)):
-            continue
-        smtp = (r.get("from_email") or "").lower()
-        name = r.get("from") or ""
-        g = resolve_group(rules, smtp, name)
-        if not g:
-            unassigned.append(r); continue
-        buckets[g.name].append(r); mapping[g.name] = g
+    with telemetry.stage("resolve_groups") as st:
+        n = 0
+        for r in results:
+            eid = r.get("eid") or ""
+            if not dry_run and (not eid or was_archived(eid)):
+                continue
+            smtp = (r.get("from_email") or "").lower()
+            name = r.get("from") or ""
+            g = matcher.match(smtp, name)
+            n += 1
+            if not g:
+                unassigned.append(r); continue
+            buckets[g.name].append(r); mapping[g.name] = g
+        st.add(items=n)
 
     get_item = _get_item_fn(session)
+    known_dirs = [g.target_dir for g in rules]
+    # Lagrede filer meldes til vedleggsindeksen (gruppe/avsender/dato som fasetter)
+    saved_files: List[Tuple[str, str, Dict]] = []
+    index_files = not dry_run and bool(defaults.get("attachment_index_enabled"))
     for gname, rows in buckets.items():
         rule = mapping[gname]
 
@@ -55,17 +68,37 @@ def archive_by_groups(session,
         template = rule.target_template or (defaults.get("default_target_template") or "")
         subj_rx  = rule.subject_tag_regex or (defaults.get("default_subject_tag_regex") or "")
 
-        saved, skipped, err = archive_messages(
-            session=session, results=rows, get_item=get_item, root_dir=rule.target_dir,
-            per_sender=False, dedup=dedup, filters=filters,
-            set_category=(category or None), set_category_color=(category_color or None),
-            dry_run=dry_run, template=(template or None), subject_regex=(subj_rx or None),
-            persist_index=bool(defaults.get("dedup_persist", True)),
-            index_ttl_days=int(defaults.get("dedup_ttl_days", 365))
-        )
-        if not dry_run:
-            for r in rows:
-                if r.get("eid"): mark_archived(r["eid"])
-        summary[gname] = {"saved": saved, "skipped": skipped, "msgs": len(rows)}
+        failed: set = set()
+        # Kun målmappen (og overlappende gruppemapper) låses – andre grupper kan kjøre samtidig
+        try:
+            with resource_locks([] if dry_run else dir_locks(rule.target_dir, known_dirs)):
+                if not dry_run:
+                    # en annen prosess (daemon/GUI) kan ha arkivert de samme meldingene før vi fikk låsen
+                    rows = [r for r in rows if not was_archived(r["eid"])]
+                    if not rows: continue
+                saved, skipped, err = archive_messages(
+                    session=session, results=rows, get_item=get_item, root_dir=rule.target_dir,
+                    per_sender=False, dedup=dedup, filters=filters,
+                    set_category=(category or None), set_category_color=(category_color or None),
+                    dry_run=dry_run, template=(template or None), subject_regex=(subj_rx or None),
+                    persist_index=bool(defaults.get("dedup_persist", True)),
+                    index_ttl_days=int(defaults.get("dedup_ttl_days", 365)),
+                    on_saved=(lambda p, r, g=gname: saved_files.append((p, g, r))) if index_files else None,
+                    on_failed=lambda r, _msg: failed.add(r.get("eid"))
+                )
+                if not dry_run:
+                    # meldinger som feilet (f.eks. struping) prøves igjen ved neste kjøring
+                    for r in rows:
+                        if r.get("eid") and r["eid"] not in failed: mark_archived(r["eid"])
+        except LockBusy:
+            summary[gname] = {"saved": 0, "skipped": len(rows), "msgs": len(rows), "busy": 1}
+            continue
+        summary[gname] = {"saved": saved, "skipped": skipped, "msgs": len(rows), "failed": len(failed)}
 
+    if saved_files:
+        try:
+            from .attachment_index import record_saved
+            record_saved(saved_files)
+        except Exception:
+            pass
     return summary, unassigned
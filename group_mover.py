@@ -1,81 +1,184 @@
 from __future__ import annotations
+import time
+from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional
 
-from .group_rules import GroupRule, load_rules, resolve_group
-
-def _iter_stores(session):
-    stores = getattr(session, "Stores", None)
-    if stores:
-        for i in range(1, int(stores.Count) + 1):
-            s = stores.Item(i)
-            if s:
-                try:
-                    yield s.DisplayName, s.GetRootFolder()
-                except Exception:
-                    continue
-    else:
-        # Fallback: Session.Folders (eldre Outlook)
-        roots = getattr(session, "Folders", None)
-        if roots:
-            for i in range(1, int(roots.Count) + 1):
-                r = roots.Item(i)
-                if r:
-                    yield getattr(r, "Name", ""), r
-
-def _find_child(parent, name: str):
-    subs = getattr(parent, "Folders", None)
-    if not subs: return None
-    for i in range(1, int(subs.Count) + 1):
-        f = subs.Item(i)
-        if f and getattr(f, "Name", "").lower() == name.lower():
-            return f
-    return None
+from . import folder_index, telemetry
+from .com_retry import call as com_call
+from .group_rules import GroupRule, matcher_for
+from .locking import LockBusy, folder_lock, resource_locks
+from .settings import load_settings
+
+# DASL-egenskaper for avsender (SMTP hentes både som MAPI-egenskap og fromemail – Exchange-
+# avsendere har X.500-adresse i fromemail, SMTP-avsendere mangler noen ganger 0x5D01001E)
+_DASL_SMTP = ("http://schemas.microsoft.com/mapi/proptag/0x5D01001E", "urn:schemas:httpmail:fromemail")
+_DASL_NAME = "urn:schemas:httpmail:sendername"
+_DASL_RECEIVED = "urn:schemas:httpmail:datereceived"
 
 def get_folder_by_path(session, path: str):
     """
     path: r"\\Store DisplayName\\Delmappe\\Under"
-    Hvis store‑navn utelates, brukes DefaultStore.
+    Hvis store‑navn utelates, brukes DefaultStore. Slås opp via folder_index
+    (StoreID/EntryID + GetFolderFromID); mappetreet gjennomsøkes bare for ukjente/foreldede stier.
     """
     if not path or not path.strip():
         return None
-    p = path.replace("/", "\\").strip()
-    while p.startswith("\\"): p = p[1:]
-    parts = [x for x in p.split("\\") if x.strip()]
-    if not parts:
+    return folder_index.resolve(session, path)
+
+def _q(v: str) -> str:
+    return "'" + v.replace("'", "''") + "'"
+
+def _sender_clauses(pat: str) -> Optional[List[str]]:
+    """DASL som fanger (minst) det group_rules._match_sender godtar; None = kan ikke uttrykkes."""
+    pat = pat.lower().strip()
+    if not pat:
+        return []
+    if pat.startswith("@"):
+        return [f'"{p}" LIKE {_q("%" + pat)}' for p in _DASL_SMTP]
+    if any(ch in pat for ch in "[]"):
+        return None                      # tegnklasser finnes ikke i LIKE
+    if any(ch in pat for ch in "*?"):
+        like = _q(pat.replace("*", "%").replace("?", "_"))
+        return [f'"{p}" LIKE {like}' for p in _DASL_SMTP + (_DASL_NAME,)]
+    return [f'"{p}" = {_q(pat)}' for p in _DASL_SMTP] + [f'"{_DASL_NAME}" LIKE {_q("%" + pat + "%")}']
+
+def _fmt(dt: datetime) -> str:
+    return dt.strftime("%m/%d/%Y %I:%M %p")
+
+def group_dasl(rule: GroupRule, rows: List[Dict]) -> Optional[str]:
+    """
+    @SQL-filter for gruppens avsendermønstre, avgrenset til radenes datointervall (±1 dag –
+    dekker tidssoneforskjeller). Filteret kan gi for mange treff (LIKE, navn), aldri for få;
+    hvilke som faktisk flyttes avgjøres av EntryID-ene i radene. None = ikke mulig.
+    """
+    ors: List[str] = []
+    for pat in rule.senders or []:
+        c = _sender_clauses(pat)
+        if c is None:
+            return None
+        ors.extend(c)
+    if not ors:
         return None
+    flt = "(" + " OR ".join(ors) + ")"
+    dts = [r["dt"] for r in rows if isinstance(r.get("dt"), datetime)]
+    if len(dts) == len(rows) and dts:
+        flt += (f' AND "{_DASL_RECEIVED}" >= {_q(_fmt(min(dts) - timedelta(days=1)))}'
+                f' AND "{_DASL_RECEIVED}" <= {_q(_fmt(max(dts) + timedelta(days=1)))}')
+    return "@SQL=" + flt
 
-    # Finn rot
-    root = None
-    # Hvis første del matcher en store, bruk den – ellers bruk DefaultStore
-    first = parts[0]
-    for disp, rf in _iter_stores(session):
-        if disp and disp.lower() == first.lower():
-            root = rf; parts = parts[1:]; break
-    if root is None:
+def _move_each(session, rows: List[Dict], dest, mark_read: bool, dry_run: bool) -> Tuple[int, int]:
+    """Per melding: GetItemFromID + (Save) + Move. Returnerer (flyttet, feil)."""
+    moved = errors = 0
+    for r in rows:
         try:
-            root = session.DefaultStore.GetRootFolder()
+            it = com_call(session.GetItemFromID, r.get("eid"), r.get("store"), stage="move") if r.get("eid") else None
         except Exception:
-            return None
+            it = None
+        if not it:
+            errors += 1; continue
+        try:
+            if dry_run:
+                moved += 1
+            else:
+                if mark_read:
+                    try:
+                        if bool(com_call(getattr, it, "UnRead", False, stage="move")):
+                            com_call(setattr, it, "UnRead", False, stage="move")
+                            com_call(it.Save, stage="move")
+                    except Exception:
+                        pass
+                com_call(it.Move, dest, stage="move")
+                moved += 1
+        except Exception:
+            errors += 1
+    return moved, errors
 
-    cur = root
-    for name in parts:
-        nxt = _find_child(cur, name)
-        if nxt is None:
-            return None
-        cur = nxt
-    return cur
+def _move_restricted(src, flt: str, want: Dict[str, Dict], dest, mark_read: bool,
+                     dry_run: bool) -> Tuple[int, int, int]:
+    """
+    Flytter meldingene i src.Items.Restrict(flt) som har EntryID i 'want' (fjernes derfra).
+    Baklengs etter indeks, så samlingen kan krympe mens vi flytter. Markeres som lest i samme
+    runde, med Save før Move som i _move_each. Returnerer (flyttet, feil, COM-kall).
+    """
+    items = com_call(lambda: src.Items.Restrict(flt), stage="move")
+    n = int(items.Count)
+    moved = errors = 0
+    calls = 3 + n * 2
+    for k in range(n, 0, -1):
+        if not want:
+            break
+        try:
+            it = com_call(items.Item, k, stage="move")
+            eid = com_call(getattr, it, "EntryID", stage="move")
+        except Exception:
+            continue                     # raden blir igjen i 'want' og tas per melding
+        if eid not in want:
+            continue
+        want.pop(eid)
+        try:
+            if not dry_run:
+                if mark_read and bool(com_call(getattr, it, "UnRead", False, stage="move")):
+                    com_call(setattr, it, "UnRead", False, stage="move")
+                    com_call(it.Save, stage="move"); calls += 3
+                com_call(it.Move, dest, stage="move"); calls += 1
+            moved += 1
+        except Exception:
+            errors += 1
+    return moved, errors, calls
+
+def _move_bulk(session, rule: GroupRule, rows: List[Dict], dest, dry_run: bool,
+               folder_cache: Dict[str, object], st) -> Tuple[int, int, int]:
+    """
+    Grupperer radene per kildemappe og flytter hver mappes treff via én Restrict. Rader som
+    ikke dukket opp (ukjent mappe, filter ikke mulig, Restrict feilet) tas per melding.
+    Returnerer (flyttet, feil, flyttet_i_bulk).
+    """
+    by_folder: Dict[str, List[Dict]] = {}
+    for r in rows:
+        by_folder.setdefault(r.get("folder") or "", []).append(r)
+
+    moved = errors = bulk = 0
+    rest: List[Dict] = []
+    for fpath, frows in by_folder.items():
+        flt = group_dasl(rule, frows)
+        src = None
+        if fpath and flt:
+            if fpath not in folder_cache:
+                folder_cache[fpath] = get_folder_by_path(session, fpath)
+            src = folder_cache[fpath]
+        if src is None:
+            rest.extend(frows); continue
+        want = {r["eid"]: r for r in frows if r.get("eid")}
+        try:
+            m, e, calls = _move_restricted(src, flt, want, dest, bool(rule.move_mark_read), dry_run)
+        except Exception:
+            rest.extend(frows); continue
+        moved += m; errors += e; bulk += m
+        st.add(com_calls=calls)
+        rest.extend(want.values())
+        rest.extend(r for r in frows if not r.get("eid"))
+    if rest:
+        m, e = _move_each(session, rest, dest, bool(rule.move_mark_read), dry_run)
+        moved += m; errors += e
+        st.add(com_calls=len(rest) * 3)
+    return moved, errors, bulk
 
 def move_by_groups(session,
                    results: List[Dict],
                    rules: Optional[List[GroupRule]] = None,
-                   dry_run: bool = False) -> Tuple[Dict[str, Dict[str, int]], List[Dict], List[str]]:
+                   dry_run: bool = False,
+                   bulk: Optional[bool] = None) -> Tuple[Dict[str, Dict[str, int]], List[Dict], List[str]]:
     """
     Flytter meldinger til mappe fra rule.move_to_folder_path.
     Returnerer (summary, unassigned_rows, grupper_uten_dest)
-    summary[gname] = {"moved": x, "skipped": y, "errors": z}
+    summary[gname] = {"moved": x, "skipped": y, "errors": z, "sec": s, "per_sec": r}
+    (+ "busy": 1 hvis målmappen var låst, + "bulk": antall flyttet via Restrict).
+    bulk (standard: innstillingen move_bulk): per gruppe og kildemappe hentes treffene med
+    én DASL-Restrict på gruppens avsendermønstre i stedet for GetItemFromID per rad.
     """
-    rules = rules or load_rules()
-    get_item = lambda r: session.GetItemFromID(r.get("eid"), r.get("store")) if r.get("eid") else None
+    matcher = matcher_for(rules or None)
+    if bulk is None:
+        bulk = bool(load_settings().get("move_bulk", True))
 
     # Bucket per gruppe
     buckets: Dict[str, List[Dict]] = {}
@@ -86,7 +189,7 @@ def move_by_groups(session,
     for r in results:
         smtp = (r.get("from_email") or "").lower()
         name = r.get("from") or ""
-        g = resolve_group(rules, smtp, name)
+        g = matcher.match(smtp, name)
         if not g:
             unassigned.append(r); continue
         if not g.move_to_folder_path:
@@ -99,6 +202,7 @@ def move_by_groups(session,
     summary: Dict[str, Dict[str, int]] = {}
     # Cache mappeobjekter
     dest_cache: Dict[str, object] = {}
+    src_cache: Dict[str, object] = {}
 
     for gname, rows in buckets.items():
         rule = mapping[gname]
@@ -108,31 +212,28 @@ def move_by_groups(session,
             dest = get_folder_by_path(session, dest_path)
             dest_cache[dest_path] = dest
 
-        moved = skipped = errors = 0
         if not dest:
             # kan ikke flytte – manglende sti
-            errors = len(rows)
-            summary[gname] = {"moved": 0, "skipped": 0, "errors": errors}
+            summary[gname] = {"moved": 0, "skipped": 0, "errors": len(rows)}
             continue
 
-        for r in rows:
-            it = get_item(r)
-            if not it:
-                errors += 1; continue
-            try:
-                if dry_run:
-                    moved += 1
+        t0 = time.perf_counter()
+        try:
+            with resource_locks([] if dry_run else [folder_lock(dest_path)]), telemetry.stage("move") as st:
+                if bulk:
+                    moved, errors, n_bulk = _move_bulk(session, rule, rows, dest, dry_run, src_cache, st)
                 else:
-                    if rule.move_mark_read:
-                        try:
-                            if bool(getattr(it, "UnRead", False)):
-                                it.UnRead = False; it.Save()
-                        except Exception:
-                            pass
-                    it.Move(dest)
-                    moved += 1
-            except Exception:
-                errors += 1
-        summary[gname] = {"moved": moved, "skipped": skipped, "errors": errors}
+                    moved, errors = _move_each(session, rows, dest, bool(rule.move_mark_read), dry_run)
+                    n_bulk = 0
+                    st.add(com_calls=len(rows) * 3)
+                st.add(items=moved, errors=errors)
+        except LockBusy:
+            summary[gname] = {"moved": 0, "skipped": len(rows), "errors": 0, "busy": 1}
+            continue
+        sec = time.perf_counter() - t0
+        summary[gname] = {"moved": moved, "skipped": 0, "errors": errors, "sec": round(sec, 3),
+                          "per_sec": round(moved / sec, 1) if sec > 0 else 0.0}
+        if bulk:
+            summary[gname]["bulk"] = n_bulk
 
     return summary, unassigned, no_dest_groups
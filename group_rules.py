@@ -1,9 +1,14 @@
 from __future__ import annotations
 from dataclasses import dataclass, asdict
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional, Pattern, Tuple
+import copy
 import json
 import fnmatch
+import re
+import threading
+
+from . import config_cache
 
 def _base_dir() -> Path:
     root = Path(__file__).resolve().parents[1] / ".ragdb"
@@ -41,8 +46,7 @@ def _norm_exts(exts: Optional[List[str]]) -> List[str]:
         out.append(e)
     return out
 
-def load_rules(path: Optional[Path] = None) -> List[GroupRule]:
-    p = path or default_rules_path()
+def _parse_rules(p: Path) -> List[GroupRule]:
     if not p.exists(): return []
     try:
         data = json.loads(p.read_text(encoding="utf-8"))
@@ -68,12 +72,20 @@ def load_rules(path: Optional[Path] = None) -> List[GroupRule]:
     except Exception:
         return []
 
+def _cached_rules(path: Optional[Path] = None) -> List[GroupRule]:
+    return config_cache.load(path or default_rules_path(), _parse_rules)
+
+def load_rules(path: Optional[Path] = None) -> List[GroupRule]:
+    """Grupper fra minnecachen (parses på nytt når fila endres). Egen kopi – trygg å redigere."""
+    return copy.deepcopy(_cached_rules(path))
+
 def save_rules(rules: List[GroupRule], path: Optional[Path] = None) -> None:
     p = path or default_rules_path()
     payload = {"version": 6, "groups": [asdict(r) for r in rules]}
     tmp = p.with_suffix(".tmp")
     tmp.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
     tmp.replace(p)
+    config_cache.invalidate(p)
 
 def _match_sender(pat: str, smtp: str, name: str) -> bool:
     pat = pat.lower().strip()
@@ -92,3 +104,88 @@ def resolve_group(rules: List[GroupRule], smtp: str, name: str) -> Optional[Grou
             if _match_sender(pat, smtp, name):
                 return r
     return None
+
+# ---------- Kompilert matcher ----------
+class RuleMatcher:
+    """
+    Samme svar som resolve_group(), men mønstrene er forhåndskompilert:
+    eksakte adresser og @domene slås opp i dict, wildcards er kompilerte regex,
+    og svar per (smtp, navn) huskes – avsendere går igjen mange ganger i et søk.
+    Første gruppe (i listerekkefølge) med et treff vinner, som før.
+    """
+    CACHE_MAX = 50_000
+
+    def __init__(self, rules: List[GroupRule]):
+        self.rules = list(rules)
+        self._exact: Dict[str, int] = {}
+        self._domain: Dict[str, int] = {}
+        self._literals: List[Tuple[int, str]] = []        # eksakt mønster matcher også delstreng av navn
+        self._wild: List[Tuple[int, Pattern]] = []
+        for ix, r in enumerate(self.rules):
+            for pat in r.senders or []:
+                pat = (pat or "").lower().strip()
+                if not pat:
+                    continue
+                if pat.startswith("@"):
+                    self._domain.setdefault(pat, ix)
+                elif any(ch in pat for ch in "*?[]"):
+                    self._wild.append((ix, re.compile(fnmatch.translate(pat))))
+                else:
+                    self._exact.setdefault(pat, ix)
+                    self._literals.append((ix, pat))
+        self._memo: Dict[Tuple[str, str], Optional[int]] = {}
+
+    def _best(self, smtp: str, name: str) -> Optional[int]:
+        best = self._exact.get(smtp)
+        at = smtp.find("@")
+        while at >= 0:
+            ix = self._domain.get(smtp[at:])
+            if ix is not None and (best is None or ix < best):
+                best = ix
+            at = smtp.find("@", at + 1)
+        for ix, pat in self._literals:
+            if best is not None and ix >= best:
+                break
+            if pat in name:
+                best = ix
+        for ix, rx in self._wild:
+            if best is not None and ix >= best:
+                break
+            if rx.match(smtp) or rx.match(name):
+                best = ix
+        return best
+
+    def match(self, smtp: str, name: str) -> Optional[GroupRule]:
+        key = ((smtp or "").lower(), (name or "").lower())
+        try:
+            ix = self._memo[key]
+        except KeyError:
+            ix = self._best(*key)
+            if len(self._memo) >= self.CACHE_MAX:
+                self._memo.clear()
+            self._memo[key] = ix
+        return None if ix is None else self.rules[ix]
+
+_MATCHER: Optional[Tuple[List[GroupRule], RuleMatcher]] = None   # (kildeliste fra cachen, matcher)
+_MATCHER_LOCK = threading.Lock()
+
+def _rebuild_matcher(rules: List[GroupRule]) -> RuleMatcher:
+    global _MATCHER
+    m = RuleMatcher(rules)
+    with _MATCHER_LOCK:
+        _MATCHER = (rules, m)
+    return m
+
+def get_matcher() -> RuleMatcher:
+    """Matcher for standard grupper.json – bygges på nytt (via on_reload-kroken) når fila endres."""
+    config_cache.on_reload(default_rules_path(), _rebuild_matcher)
+    rules = _cached_rules()
+    with _MATCHER_LOCK:
+        cur = _MATCHER
+    if cur is not None and cur[0] is rules:
+        return cur[1]
+    return _rebuild_matcher(rules)          # første kall: fila ble lastet før kroken fantes
+
+def matcher_for(rules: Optional[List[GroupRule]] = None) -> RuleMatcher:
+    """Cachet matcher for standardgruppene (rules=None), ellers en ny for den gitte lista."""
+    return get_matcher() if rules is None else RuleMatcher(rules)
@@ -6,10 +6,6 @@ from datetime import datetime, timedelta
 from typing import List
 
 from .group_rules import GroupRule, load_rules, save_rules, default_rules_path, resolve_group
-from .scheduler import install_weekly_task, delete_task
-from .auto_archive import run_archive
-from .outlook_core import get_session
-from .retention import apply_retention
 
 TASK_ARCHIVE = "Fredag_AutoArkiv"
 TASK_RETENT  = "Fredag_Retention"
@@ -89,6 +85,11 @@ class GroupManagerWindow(tk.Toplevel):
         ttk.Label(mv, text=r"Eksempel: \\Mailbox - Ola Nordmann\Arkiv\KundeX").grid(row=1, column=1, sticky="w", pady=(2,0))
         self.var_move_read = tk.BooleanVar(value=False)
         ttk.Checkbutton(mv, text="Marker som lest etter flytt", variable=self.var_move_read).grid(row=0, column=2, sticky="w", padx=(10,0))
+        session = getattr(self.master, "session", None)   # åpnet fra Outlook-verktøy: velg fra mappeindeksen
+        if session is not None:
+            from .widgets_folderpicker import FolderPicker
+            ttk.Button(mv, text="Velg …", command=lambda: FolderPicker(self, session, self.var_move))\
+                .grid(row=0, column=3, sticky="w", padx=(10,0))
 
         ttk.Label(right, text="Sendere (en per linje) – epost, @domene.no eller wildcard som *firma.no").pack(anchor="w", pady=(8,2))
         self.txt_senders = tk.Text(right, height=12); self.txt_senders.pack(fill="both", expand=True)
@@ -197,13 +198,16 @@ class GroupManagerWindow(tk.Toplevel):
 
     def _archive_or_dry(self, dry: bool):
         try:
+            from .auto_archive import run_archive
+            from .outlook_core import get_session
             session = get_session()
             f = (datetime.now() - timedelta(days=7)).date()
             t = datetime.now().date()
             summary, unassigned = run_archive(session, f, t, include_subfolders=True, only_attachments=True, dry_run=dry)
             msg = ["(TØRRKJØRING)" if dry else "Arkivering fullført:", ""]
             for g, s in summary.items():
-                msg.append(f"• {g}: {'ville lagret' if dry else 'lagret'} {s['saved']}, hoppet {s['skipped']} (meldinger i gruppe: {s['msgs']})")
+                msg.append(f"• {g}: {'ville lagret' if dry else 'lagret'} {s['saved']}, hoppet {s['skipped']} (meldinger i gruppe: {s['msgs']})"
+                           + (" – mappen er låst av en annen jobb" if s.get("busy") else ""))
             if unassigned:
                 msg.append(f"\nUten gruppe: {len(unassigned)} meldinger (ikke berørt)")
             messagebox.showinfo("Arkiv", "\n".join(msg))
@@ -212,10 +216,12 @@ class GroupManagerWindow(tk.Toplevel):
 
     def _retention_now(self):
         try:
+            from .retention import apply_retention
             summary = apply_retention(self.rules, dry_run=False)
             lines = ["Retention kjørt:\n"]
             for g, s in summary.items():
-                lines.append(f"• {g}: slettet {s['deleted']}, beholdt {s['kept']}, feil {s['errors']}")
+                lines.append(f"• {g}: slettet {s['deleted']}, beholdt {s['kept']}, feil {s['errors']}"
+                             + (" – mappen er låst av en annen jobb" if s.get("busy") else ""))
             if len(lines) == 1: lines.append("(Ingen grupper har retention definert.)")
             messagebox.showinfo("Retention", "\n".join(lines))
         except Exception as e:
@@ -232,6 +238,8 @@ class GroupManagerWindow(tk.Toplevel):
         info = ttk.Label(frm, text="Oppgaven kjører Python‑modul i din brukerkontekst.")
         info.grid(row=1, column=0, columnspan=2, sticky="w", pady=(10,0))
 
+        from .scheduler import install_weekly_task, delete_task
+
         def do_install():
             from pathlib import Path
             if kind == "archive":
@@ -0,0 +1,109 @@
+from __future__ import annotations
+import heapq
+from collections import Counter
+from typing import Dict, Hashable, List, Tuple
+
+class SpaceSaving:
+    """
+    Strømmende «heavy hitters» (Space-Saving, Metwally m.fl.) med fast minne.
+
+    Holder maks 'capacity' tellere. Estimatet for en nøkkel er aldri lavere enn
+    sann verdi, og overestimatet er høyst 'err' for nøkkelen (≤ total/capacity).
+    Alle nøkler med sann frekvens > total/capacity er garantert med.
+    """
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("capacity må være > 0")
+        self.capacity = int(capacity)
+        self.total = 0
+        self._counts: Dict[Hashable, List[int]] = {}   # key -> [count, err]
+        self._heap: List[Tuple[int, int, Hashable]] = []  # (count, seq, key) – lat sletting
+        self._seq = 0
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def _push(self, key, count: int) -> None:
+        self._seq += 1
+        heapq.heappush(self._heap, (count, self._seq, key))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(c, i, k) for i, (k, (c, _e)) in enumerate(self._counts.items())]
+            heapq.heapify(self._heap)
+            self._seq = len(self._heap)
+
+    def _pop_min(self) -> Tuple[Hashable, int]:
+        while True:
+            count, _seq, key = heapq.heappop(self._heap)
+            cur = self._counts.get(key)
+            if cur is not None and cur[0] == count:
+                return key, count
+
+    def add(self, key, n: int = 1) -> None:
+        self.total += n
+        cur = self._counts.get(key)
+        if cur is not None:
+            cur[0] += n
+            self._push(key, cur[0])
+            return
+        if len(self._counts) < self.capacity:
+            self._counts[key] = [n, 0]
+            self._push(key, n)
+            return
+        old_key, floor = self._pop_min()
+        del self._counts[old_key]
+        self._counts[key] = [floor + n, floor]
+        self._push(key, floor + n)
+
+    def update(self, counts: Dict[Hashable, int]) -> None:
+        for k, n in counts.items():
+            self.add(k, n)
+
+    @property
+    def max_error(self) -> int:
+        """Øvre grense for overestimat på tvers av alle rapporterte nøkler."""
+        return max((e for _c, e in self._counts.values()), default=0)
+
+    def top(self, n: int) -> List[Tuple[Hashable, int, int]]:
+        """[(key, estimat, maks_overestimat)] sortert synkende på estimat."""
+        rows = ((k, c, e) for k, (c, e) in self._counts.items())
+        return heapq.nlargest(n, rows, key=lambda x: x[1])
+
+class SenderTally:
+    """
+    Eksakt Counter inntil antall distinkte nøkler passerer 'threshold', deretter
+    Space-Saving med 'capacity' tellere (konstant minne, oppgitt feilmargin).
+    """
+    def __init__(self, threshold: int, capacity: int):
+        self.threshold = int(threshold)
+        self.capacity = int(capacity)
+        self._exact: Counter = Counter()
+        self._sketch: SpaceSaving | None = None
+
+    @property
+    def exact(self) -> bool:
+        return self._sketch is None
+
+    def add(self, key, n: int = 1) -> None:
+        if self._sketch is not None:
+            self._sketch.add(key, n)
+            return
+        self._exact[key] += n
+        if self.threshold > 0 and len(self._exact) > self.threshold:
+            sk = SpaceSaving(self.capacity)
+            # Største først: de tyngste beholdes eksakt (err=0) så lenge plassen rekker
+            for k, c in self._exact.most_common():
+                sk.add(k, c)
+            self._sketch = sk
+            self._exact = Counter()
+
+    @property
+    def max_error(self) -> int:
+        return 0 if self._sketch is None else self._sketch.max_error
+
+    def top(self, n: int) -> List[Tuple[Hashable, int]]:
+        if self._sketch is None:
+            return self._exact.most_common(n)
+        return [(k, c) for k, c, _e in self._sketch.top(n)]
+
+    def __bool__(self) -> bool:
+        return bool(self._exact) or bool(self._sketch and len(self._sketch))
@@ -4,10 +4,7 @@ from datetime import datetime, timedelta, date, time
 
 from .config import WEEKEND_CUTOFF, DAGNAVN, TOP_N_SENDERS, FALLBACK_EMAIL
 from .outlook_core import have_outlook, get_outlook, get_session, default_smtp
-from .email_stats import weekly_sender_stats
-from .html_email import build_html
-from .tools_window import OutlookToolsWindow
-from .calendar_window import CalendarWindow
+# Vinduer, statistikk (sqlite) og HTML-rapport importeres først ved bruk – raskere oppstart
 
 
 def day_name(d: date) -> str:
@@ -83,8 +80,11 @@ def _send_html_mail(session, subject: str, status_text: str):
     to_addr = default_smtp(session) or FALLBACK_EMAIL
     if not to_addr:
         return False, "Fant ikke standard e-post i Outlook. Sett FALLBACK_EMAIL i config.py."
-    stats = weekly_sender_stats(session, TOP_N_SENDERS)
-    html = build_html(subject, status_text, stats)
+    from .email_stats import weekly_sender_report, weekly_sender_trend
+    from .html_email import build_html
+    report = weekly_sender_report(session, TOP_N_SENDERS)
+    html = build_html(subject, status_text, report.rows, trend=weekly_sender_trend(),
+                      max_error=report.max_error)
     m = app.CreateItem(0)
     m.To = to_addr
     m.Subject = subject
@@ -247,6 +247,7 @@ class HelgesjekkApp:
         if self._tools_window and self._tools_window.winfo_exists():
             self._tools_window.focus_set()
             return
+        from .tools_window import OutlookToolsWindow
         self._tools_window = OutlookToolsWindow(self.root, session)
         self._tools_window.protocol(
             "WM_DELETE_WINDOW",
@@ -271,6 +272,7 @@ class HelgesjekkApp:
         if self._cal_window and self._cal_window.winfo_exists():
             self._cal_window.focus_set()
             return
+        from .calendar_window import CalendarWindow
         self._cal_window = CalendarWindow(self.root, session)
         self._cal_window.protocol(
             "WM_DELETE_WINDOW",
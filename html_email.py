@@ -1,21 +1,41 @@
 from datetime import datetime
 from html import escape
-from .config import TOP_N_SENDERS
+from typing import Dict, Optional, Tuple
+from .config import TOP_N_SENDERS, TREND_WEEKS
 
-def build_html(subject_text: str, status_text: str, stats):
+_TD = "padding:6px 8px;border:1px solid #d0d7de"
+
+def _trend_cell(cnt: int, avg: Optional[float]) -> str:
+    if not avg:
+        return f"<td style='{_TD};text-align:right;color:#6b7280'>ny</td>"
+    diff = cnt - avg
+    color = "#b42318" if diff > 0 else ("#067647" if diff < 0 else "#6b7280")
+    arrow = "▲" if diff > 0 else ("▼" if diff < 0 else "·")
+    return f"<td style='{_TD};text-align:right;color:{color}'>{avg:.1f} {arrow}</td>"
+
+def build_html(subject_text: str, status_text: str, stats,
+               trend: Optional[Dict[Tuple[str, str], float]] = None,
+               max_error: int = 0):
+    """
+    trend: valgfritt {(navn, smtp): snitt per uke} for de siste TREND_WEEKS ukene –
+    gir en ekstra kolonne «Snitt N uker» med pil opp/ned mot inneværende uke.
+    max_error: > 0 når tallene er omtrentlige (heavy hitters) – oppgis i bunnteksten.
+    """
     ts = datetime.now().strftime("%d.%m.%Y %H:%M")
+    ncols = 4 if trend is not None else 3
     rows = []
     if stats:
         for name, addr, cnt in stats:
             rows.append(
                 f"<tr>"
-                f"<td style='padding:6px 8px;border:1px solid #d0d7de'>{escape(name or '—')}</td>"
-                f"<td style='padding:6px 8px;border:1px solid #d0d7de'>{escape(addr or '—')}</td>"
-                f"<td style='padding:6px 8px;border:1px solid #d0d7de;text-align:right'>{cnt}</td>"
+                f"<td style='{_TD}'>{escape(name or '—')}</td>"
+                f"<td style='{_TD}'>{escape(addr or '—')}</td>"
+                f"<td style='{_TD};text-align:right'>{cnt}</td>"
+                + (_trend_cell(cnt, trend.get((name, addr))) if trend is not None else "") +
                 f"</tr>"
             )
     else:
-        rows.append("<tr><td colspan='3' style='padding:10px;border:1px solid #d0d7de'>Ingen e‑poster funnet denne uken.</td></tr>")
+        rows.append(f"<tr><td colspan='{ncols}' style='padding:10px;border:1px solid #d0d7de'>Ingen e‑poster funnet denne uken.</td></tr>")
 
     table_html = (
         "<table style='border-collapse:collapse;width:100%;margin-top:6px'>"
@@ -23,10 +43,15 @@ def build_html(subject_text: str, status_text: str, stats):
         "<th style='padding:8px;border:1px solid #d0d7de;text-align:left'>Avsender</th>"
         "<th style='padding:8px;border:1px solid #d0d7de;text-align:left'>Adresse</th>"
         "<th style='padding:8px;border:1px solid #d0d7de;text-align:right'>Antall</th>"
+        + (f"<th style='padding:8px;border:1px solid #d0d7de;text-align:right'>Snitt {TREND_WEEKS} uker</th>"
+           if trend is not None else "") +
         "</tr></thead>"
         "<tbody>" + "".join(rows) + "</tbody></table>"
     )
 
+    approx = (f" Antall er omtrentlige (svært mange avsendere): hvert tall kan være inntil {max_error} for høyt."
+              if max_error else "")
+
     return f"""<!doctype html>
 <html><head><meta charset="utf-8"><title>{escape(subject_text)}</title></head>
 <body style="font-family:'Segoe UI', Arial, sans-serif; font-size:12pt; color:#111">
@@ -36,5 +61,5 @@ def build_html(subject_text: str, status_text: str, stats):
   <hr style="border:none;border-top:1px solid #e5e7eb;margin:12px 0">
   <p style="margin:0 0 4px 0; font-weight:600">Ukesoppsummering – avsendere (inneværende uke):</p>
   {table_html}
-  <p style="margin-top:12px; font-size:10pt; color:#6b7280">Generert {escape(ts)} · Topp {TOP_N_SENDERS} avsendere.</p>
+  <p style="margin-top:12px; font-size:10pt; color:#6b7280">Generert {escape(ts)} · Topp {TOP_N_SENDERS} avsendere.{approx}</p>
 </body></html>"""
@@ -1,37 +1,282 @@
 from __future__ import annotations
-import os, time
+import hashlib, json, os, socket, threading, time
+from contextlib import contextmanager
+from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import fcntl  # type: ignore  # POSIX
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+try:
+    import msvcrt  # type: ignore  # Windows
+except ImportError:
+    msvcrt = None
+
+from .log_utils import log_event
+
+# msvcrt.locking er obligatorisk (ikke rådgivende) for regionen – lås en byte langt
+# bak innholdet slik at andre prosesser fortsatt kan lese hvem som holder låsen.
+_WIN_LOCK_OFFSET = 1 << 30
+
+def _lock_dir() -> Path:
+    return Path(__file__).resolve().parents[1] / ".ragdb"
+
+def _try_os_lock(fd: int) -> bool:
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        elif msvcrt is not None:
+            os.lseek(fd, _WIN_LOCK_OFFSET, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+def _os_unlock(fd: int) -> None:
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        elif msvcrt is not None:
+            os.lseek(fd, _WIN_LOCK_OFFSET, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    except OSError:
+        pass
+
+def pid_alive(pid: int) -> bool:
+    """Best effort: lever prosessen på denne maskinen?"""
+    if pid <= 0:
+        return False
+    if os.name == "nt":
+        try:
+            import ctypes
+            k32 = ctypes.windll.kernel32  # type: ignore[attr-defined]
+            h = k32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+            if not h:
+                return False
+            code = ctypes.c_ulong()
+            ok = k32.GetExitCodeProcess(h, ctypes.byref(code))
+            k32.CloseHandle(h)
+            return bool(ok) and code.value == 259  # STILL_ACTIVE
+        except Exception:
+            return True
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True   # finnes, men tilhører en annen bruker
 
 class Lock:
-    def __init__(self, name: str):
+    """
+    Prosesslås på .ragdb/<name>.lock via OS-ens rådgivende låsing (fcntl.flock på POSIX,
+    msvcrt.locking på Windows). OS-et slipper låsen når prosessen dør, så en krasj
+    etterlater aldri en «evig» lås. Fila beholdes og inneholder holderens pid/vert/starttid:
+    - holder: info om nåværende holder når acquire() feiler
+    - recovered: info om forrige holder som ikke ryddet etter seg (krasj) – låsen er tatt over
+    - wait_sec: hvor lenge acquire() ventet
+    """
+    def __init__(self, name: str, root: Optional[Path] = None):
         self.name = name
-        self.path = Path(__file__).resolve().parents[1] / ".ragdb" / f"{name}.lock"
-        self._acquired = False
+        self.path = Path(root or _lock_dir()) / f"{name}.lock"
+        self._fd: Optional[int] = None
+        self.wait_sec = 0.0
+        self.holder: Optional[Dict] = None
+        self.recovered: Optional[Dict] = None
+
+    @property
+    def acquired(self) -> bool:
+        return self._fd is not None
 
-    def acquire(self, timeout_sec: int = 0) -> bool:
+    def read_info(self) -> Optional[Dict]:
+        """Holderinfo fra lås-fila (None hvis tom/ukjent). Gamle 'pid=..'-filer tolkes også."""
+        try:
+            raw = self.path.read_text(encoding="utf-8").strip()
+        except Exception:
+            return None
+        if not raw:
+            return None
+        try:
+            return json.loads(raw)
+        except Exception:
+            if raw.startswith("pid="):
+                try: return {"pid": int(raw[4:].split()[0])}
+                except Exception: return {}
+            return {}
+
+    def is_stale(self, info: Optional[Dict] = None) -> bool:
+        """Holder på denne verten hvis prosess ikke lenger finnes."""
+        info = self.read_info() if info is None else info
+        if not info or "pid" not in info:
+            return False
+        if info.get("host") not in (None, socket.gethostname()):
+            return False   # kan ikke sjekke pid på en annen maskin
+        return not pid_alive(int(info["pid"]))
+
+    def acquire(self, timeout_sec: float = 0, poll_sec: float = 0.2) -> bool:
         self.path.parent.mkdir(parents=True, exist_ok=True)
-        end = time.time() + max(0, timeout_sec)
-        while True:
-            try:
-                # eksklusiv opprettelse – feiler hvis finnes
-                fd = os.open(str(self.path), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
-                with os.fdopen(fd, "w", encoding="utf-8") as f:
-                    f.write(f"pid={os.getpid()}\n")
-                self._acquired = True
-                return True
-            except FileExistsError:
-                if time.time() >= end:
-                    return False
-                time.sleep(0.2)
+        t0 = time.monotonic()
+        end = t0 + max(0.0, timeout_sec)
+        fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o644)
+        delay = min(0.05, poll_sec)
+        while not _try_os_lock(fd):
+            if time.monotonic() >= end:
+                os.close(fd)
+                self.wait_sec = time.monotonic() - t0
+                self.holder = self.read_info()
+                return False
+            time.sleep(min(delay, max(0.0, end - time.monotonic())))
+            delay = min(delay * 2, poll_sec)
+
+        self.wait_sec = time.monotonic() - t0
+        # Ikke-tom fil betyr at forrige holder døde uten release()
+        prev = self.read_info()
+        if prev:
+            self.recovered = prev
+            try: log_event(f"Lås '{self.name}' tatt over etter død holder: {prev}")
+            except Exception: pass
+        info = {"pid": os.getpid(), "host": socket.gethostname(),
+                "started": datetime.now().isoformat(timespec="seconds"), "name": self.name}
+        os.lseek(fd, 0, os.SEEK_SET)
+        os.ftruncate(fd, 0)
+        os.write(fd, json.dumps(info).encode("utf-8"))
+        self._fd = fd
+        return True
 
     def release(self):
-        if self._acquired:
-            try:
-                self.path.unlink(missing_ok=True)
-            finally:
-                self._acquired = False
+        if self._fd is None:
+            return
+        fd, self._fd = self._fd, None
+        try:
+            os.ftruncate(fd, 0)   # tom fil = ryddig avslutning
+        except OSError:
+            pass
+        _os_unlock(fd)
+        os.close(fd)
+
+    def __enter__(self) -> "Lock":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
 
 def try_acquire_lock(name: str, timeout_sec: int = 0) -> Optional[Lock]:
     lk = Lock(name)
     return lk if lk.acquire(timeout_sec=timeout_sec) else None
+
+def describe_holder(info: Optional[Dict]) -> str:
+    if not info:
+        return "ukjent holder"
+    parts = [f"pid {info.get('pid', '?')}"]
+    if info.get("host"): parts.append(f"på {info['host']}")
+    if info.get("started"): parts.append(f"siden {info['started']}")
+    return " ".join(parts)
+
+# ---------- Navngitte låser per ressurs ----------
+# Jobber tar kun låsene for det de faktisk rører: gruppens målmappe på disk eller
+# Outlook-mappen det flyttes til. Låser tas alltid i sortert navnerekkefølge
+# (alle-eller-ingen), så to jobber kan aldri vente på hverandre i ring.
+
+RESOURCE_LOCK_TIMEOUT_SEC = 30
+
+class LockBusy(Exception):
+    """En eller flere ressurslåser kunne ikke tas innen tidsfristen."""
+    def __init__(self, name: str, label: str, holder: Optional[Dict]):
+        super().__init__(f"{label or name} er låst av {describe_holder(holder)}")
+        self.name, self.label, self.holder = name, label, holder
+
+def _norm_dir(path: str) -> str:
+    return os.path.normcase(os.path.abspath(os.path.expanduser(str(path)))).rstrip("\\/")
+
+def _hashed(prefix: str, key: str) -> str:
+    return f"{prefix}-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]}"
+
+def dir_lock(path: str) -> Tuple[str, str]:
+    """(låsnavn, etikett) for en målmappe på disk."""
+    return _hashed("dir", _norm_dir(path)), f"mappe {path}"
+
+def folder_lock(folder_path: str) -> Tuple[str, str]:
+    """(låsnavn, etikett) for en Outlook-mappe (sti som i move_to_folder_path)."""
+    key = folder_path.replace("/", "\\").strip().strip("\\").lower()
+    return _hashed("olf", key), f"Outlook-mappe {folder_path}"
+
+def dir_locks(path: str, known_dirs: Iterable[str] = ()) -> List[Tuple[str, str]]:
+    """
+    Låser for å røre 'path': mappen selv + andre kjente målmapper som ligger over
+    eller under den (retention på A sletter også i A/B, så de må utelukke hverandre).
+    """
+    me = _norm_dir(path)
+    out = {dir_lock(path)}
+    for d in known_dirs:
+        if not d:
+            continue
+        other = _norm_dir(d)
+        if other != me and (me.startswith(other + os.sep) or other.startswith(me + os.sep)):
+            out.add(dir_lock(d))
+    return sorted(out)
+
+# --- konkurranse-statistikk (i prosessen) ---
+_STATS: Dict[str, Dict] = {}
+_STATS_LOCK = threading.Lock()
+
+def _record(name: str, label: str, waited: float, ok: bool) -> None:
+    with _STATS_LOCK:
+        s = _STATS.setdefault(name, {"name": name, "label": label, "acquired": 0, "busy": 0,
+                                     "contended": 0, "wait_total": 0.0, "wait_max": 0.0})
+        s["acquired" if ok else "busy"] += 1
+        if waited > 0.05:          # måtte faktisk vente på en annen holder
+            s["contended"] += 1
+        s["wait_total"] += waited
+        s["wait_max"] = max(s["wait_max"], waited)
+
+def contention_report() -> List[Dict]:
+    """Låser med venting/opptatt, sortert på total ventetid."""
+    with _STATS_LOCK:
+        rows = [dict(s) for s in _STATS.values()]
+    return sorted(rows, key=lambda s: (-s["wait_total"], s["label"]))
+
+def total_lock_wait() -> float:
+    with _STATS_LOCK:
+        return sum(s["wait_total"] for s in _STATS.values())
+
+def format_contention_report(rows: Optional[List[Dict]] = None) -> str:
+    rows = contention_report() if rows is None else rows
+    rows = [r for r in rows if r["contended"] or r["busy"]]
+    if not rows:
+        return "Ingen låskonflikter."
+    lines = ["Låskonflikter:"]
+    for r in rows:
+        lines.append(f"- {r['label']}: ventet {r['contended']}×, totalt {r['wait_total']:.2f} s "
+                     f"(maks {r['wait_max']:.2f} s), opptatt {r['busy']}×")
+    return "\n".join(lines)
+
+def reset_contention_stats() -> None:
+    with _STATS_LOCK:
+        _STATS.clear()
+
+def _locks_dir() -> Path:
+    return _lock_dir() / "locks"
+
+@contextmanager
+def resource_locks(locks: Sequence[Tuple[str, str]], timeout_sec: float = RESOURCE_LOCK_TIMEOUT_SEC,
+                   root: Optional[Path] = None) -> Iterator[List[Lock]]:
+    """
+    Tar alle låsene i sortert rekkefølge (duplikater fjernes) og slipper dem i motsatt
+    rekkefølge. Reiser LockBusy – uten å holde noen av dem – hvis én ikke kan tas.
+    """
+    held: List[Lock] = []
+    deadline = time.monotonic() + max(0.0, timeout_sec)
+    try:
+        for name, label in sorted(dict(locks).items()):
+            lk = Lock(name, root=root or _locks_dir())
+            ok = lk.acquire(timeout_sec=max(0.0, deadline - time.monotonic()))
+            _record(name, label, lk.wait_sec, ok)
+            if not ok:
+                raise LockBusy(name, label, lk.holder)
+            held.append(lk)
+        yield held
+    finally:
+        for lk in reversed(held):
+            lk.release()
@@ -1,8 +1,18 @@
 from __future__ import annotations
+import atexit
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+import time
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
+
+LOG_REPEAT_WINDOW_SEC = 60    # vindu for like meldinger
+LOG_REPEAT_BURST = 3          # så mange like meldinger slipper gjennom per vindu
+LOG_REPEAT_MAX_KEYS = 2000
+
+_SETUP_LOCK = threading.RLock()
+_LISTENERS: Dict[str, Tuple] = {}
 
 def _logs_dir() -> Path:
     """
@@ -28,25 +38,158 @@ def setup_file_logger(
 ) -> logging.Logger:
     """
     Oppretter en roterende fil‑logger som skriver til log_path(name).
+    Loggeren får en QueueHandler; selve fil‑I/O og rotasjon gjøres av en QueueListener
+    i bakgrunnen, så søk/arkivering aldri venter på disk. Gjentatte meldinger
+    begrenses av RepeatFilter før de i det hele tatt formateres.
     Kaller du denne flere ganger får du samme logger (uten duplikate handlers).
     """
     logger = logging.getLogger(name)
-    if logger.handlers:
-        return logger
-    logger.setLevel(level)
-    handler = RotatingFileHandler(
-        log_path(name),
-        maxBytes=max_bytes,
-        backupCount=backup_count,
-        encoding="utf-8",
-    )
-    handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s"))
-    logger.addHandler(handler)
-    logger.propagate = False
+    with _SETUP_LOCK:
+        for h in list(logger.handlers):
+            if isinstance(h, _Bootstrap):
+                logger.removeHandler(h)
+        if logger.handlers:
+            return logger
+        # trekker inn socket/pickle – kun ved første logging
+        from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+        logger.setLevel(level)
+        fh = RotatingFileHandler(
+            log_path(name),
+            maxBytes=max_bytes,
+            backupCount=backup_count,
+            encoding="utf-8",
+            delay=True,          # fila åpnes av skrivertråden
+        )
+        fh.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s"))
+        q: "queue.SimpleQueue" = queue.SimpleQueue()
+        listener = QueueListener(q, fh, respect_handler_level=True)
+        listener.start()
+        qh = QueueHandler(q)
+        qh.addFilter(RepeatFilter())
+        logger.addHandler(qh)
+        logger.propagate = False
+        _LISTENERS[name] = (listener, qh)
     return logger
 
+def flush_logging() -> None:
+    """Skriver ut oppsamlede gjentakelser og venter til bakgrunnsskriveren har tømt køen."""
+    with _SETUP_LOCK:
+        items = list(_LISTENERS.items())
+        _LISTENERS.clear()
+    for name, (listener, qh) in items:
+        for f in qh.filters:
+            if isinstance(f, RepeatFilter):
+                for rec in f.pending_summaries():
+                    qh.emit(rec)
+        try:
+            listener.stop()
+        finally:
+            logger = logging.getLogger(name)
+            logger.removeHandler(qh)
+            logger.addHandler(_Bootstrap(name))   # senere logging starter en ny skriver
+            for h in listener.handlers:
+                try: h.close()
+                except Exception: pass
+
+atexit.register(flush_logging)
+
+class _Bootstrap(logging.Handler):
+    """Plassholder: setter opp kø‑loggeren først når noe faktisk logges (rask import)."""
+    def __init__(self, name: str):
+        super().__init__()
+        self._name = name
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        logger = setup_file_logger(self._name)
+        for h in logger.handlers:
+            if record.levelno >= h.level:
+                h.handle(record)
+        return True
+
+    def emit(self, record: logging.LogRecord) -> None:   # pragma: no cover – handle() overstyrt
+        pass
+
+def get_logger(module: str, root: str = "fredag") -> logging.Logger:
+    """
+    Logger for en modul ('fredag.outlook_core' …) som skriver til rotlogg‑fila.
+    Billig ved import: kø, skrivertråd og fil opprettes ved første loggkall.
+    """
+    base = logging.getLogger(root)
+    with _SETUP_LOCK:
+        if not base.handlers:
+            base.setLevel(logging.INFO)
+            base.addHandler(_Bootstrap(root))
+            base.propagate = False
+    short = module.rsplit(".", 1)[-1] if module else ""
+    return logging.getLogger(f"{root}.{short}") if short and short != root else base
+
 def log_event(msg: str, level: int = logging.INFO, name: str = "fredag") -> None:
     """
     Praktisk hjelpefunksjon for rask logging fra hvor som helst.
     """
     setup_file_logger(name=name).log(level, msg)
+
+class RepeatFilter(logging.Filter):
+    """
+    Begrenser like meldinger (samme logger, nivå, meldingsmal og unntakstype – argumentene
+    teller ikke, så «GetTable feilet for %s» fra 300 mapper regnes som én): de første
+    'burst' slipper gjennom per vindu, resten telles bare. Neste melding som slipper
+    gjennom får «(×N undertrykt siste M s)» lagt til; ved flush_logging() skrives
+    gjenværende tellere som egne sammendragslinjer.
+    """
+    def __init__(self, window_sec: float = LOG_REPEAT_WINDOW_SEC, burst: int = LOG_REPEAT_BURST,
+                 clock=time.monotonic):
+        super().__init__()
+        self.window = float(window_sec)
+        self.burst = int(burst)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state: Dict[Tuple, list] = {}      # nøkkel → [vindusstart, slupper, undertrykt, siste record]
+
+    @staticmethod
+    def _key(record: logging.LogRecord) -> Tuple:
+        exc = record.exc_info[0].__name__ if record.exc_info and record.exc_info[0] else ""
+        return (record.name, record.levelno, str(record.msg), exc)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.CRITICAL:
+            return True
+        now = self._clock()
+        key = self._key(record)
+        with self._lock:
+            st = self._state.get(key)
+            if st is None or now - st[0] >= self.window:
+                dropped = st[2] if st else 0
+                self._state[key] = [now, 1, 0, None]
+                if len(self._state) > LOG_REPEAT_MAX_KEYS:
+                    self._prune(now)
+            elif st[1] < self.burst:
+                st[1] += 1
+                return True
+            else:
+                st[2] += 1
+                st[3] = record
+                return False
+        if dropped:
+            record.msg = f"{record.msg} (×{dropped} undertrykt siste {self.window:.0f} s)"
+        return True
+
+    def _prune(self, now: float) -> None:
+        for k in [k for k, st in self._state.items() if now - st[0] >= self.window and not st[2]]:
+            del self._state[k]
+
+    def pending_summaries(self) -> List[logging.LogRecord]:
+        """Sammendrag for undertrykte meldinger som ennå ikke er rapportert (nullstiller)."""
+        out = []
+        with self._lock:
+            for st in self._state.values():
+                rec = st[3]
+                if st[2] and rec is not None:
+                    try: msg = rec.getMessage()
+                    except Exception: msg = str(rec.msg)
+                    out.append(logging.makeLogRecord({
+                        "name": rec.name, "levelno": rec.levelno, "levelname": rec.levelname,
+                        "msg": f"{msg} ×{st[2]} (undertrykt, siste {self.window:.0f} s)",
+                        "created": rec.created}))
+                st[2] = 0; st[3] = None
+        return out
@@ -0,0 +1,462 @@
+"""
+Offline kilde: postbokseksporter (.eml-mapper, mbox, .msg) som «Outlook» uten COM.
+
+Gir de samme søkerad-dictene som search_messages og element-objekter med det arkiveren
+bruker (Attachments/Item/SaveAsFile, ReceivedTime, Subject, Categories/Save …), så
+group_archiver.archive_by_groups og email_stats kan kjøres rett på eksportfiler:
+
+    rows = list(iter_rows(["eksport/innboks.mbox", "eksport/eml/"]))
+    archive_by_groups(OfflineSession(), rows)
+
+Filene strømmes melding for melding (mbox leses linjevis fra en byte-posisjon), så
+minnebruken er konstant uansett eksportstørrelse. EntryID peker tilbake til kilden
+(«mbox:<sti>#<offset>», «eml:<sti>»), og OfflineSession.GetItemFromID leser meldingen
+på nytt derfra. archive_offline og email_stats.update_sender_aggregate_offline fordeler
+arbeidet på en prosesspool: store mbox-filer deles i byte-intervaller, og arkiveringen
+shardes per gruppe.
+.msg krever pakken extract_msg (valgfri).
+
+    python -m fredag.offline_source archive eksport/ --dry-run
+    python -m fredag.offline_source stats eksport/innboks.mbox
+"""
+from __future__ import annotations
+import argparse
+import os
+from datetime import date, datetime
+from email import policy
+from email.parser import BytesParser
+from email.utils import getaddresses, parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+OFFLINE_STORE = "offline"
+MBOX_EXTS = {".mbox", ".mbx"}
+EML_EXTS = {".eml"}
+MSG_EXTS = {".msg"}
+MBOX_SHARD_BYTES = 64 * 1024 * 1024   # mbox deles i biter av denne størrelsen mellom prosessene
+EML_SHARD_FILES = 500
+
+_PARSER = BytesParser(policy=policy.default)
+
+# ---------- kildefiler ----------
+def _kind(p: Path) -> Optional[str]:
+    ext = p.suffix.lower()
+    if ext in MBOX_EXTS or (not ext and p.is_file() and _looks_like_mbox(p)):
+        return "mbox"
+    if ext in EML_EXTS:
+        return "eml"
+    if ext in MSG_EXTS:
+        return "msg"
+    return None
+
+def _looks_like_mbox(p: Path) -> bool:
+    try:
+        with open(p, "rb") as f:
+            return f.read(5) == b"From "
+    except OSError:
+        return False
+
+def expand_sources(paths: Iterable) -> List[Tuple[str, Path]]:
+    """(type, sti) for alle støttede filer – mapper gjennomgås rekursivt, sortert."""
+    out: List[Tuple[str, Path]] = []
+    for raw in paths:
+        p = Path(raw)
+        if p.is_dir():
+            for dirpath, dirnames, filenames in os.walk(p):
+                dirnames.sort()
+                for fn in sorted(filenames):
+                    f = Path(dirpath) / fn
+                    k = _kind(f)
+                    if k:
+                        out.append((k, f.resolve()))
+        elif p.is_file():
+            out.append((_kind(p) or "eml", p.resolve()))
+    return out
+
+# ---------- mbox (strømmet) ----------
+def _iter_mbox(path: Path, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[int, bytes]]:
+    """
+    (offset, råmelding) for meldinger hvis «From »-linje starter i [start, end).
+    Bare én melding holdes i minnet om gangen.
+    """
+    with open(path, "rb") as f:
+        if start > 0:
+            f.seek(start - 1)
+            f.readline()                   # hopp til første hele linje fra og med 'start'
+        pos = f.tell()
+        cur_off: Optional[int] = None
+        buf: List[bytes] = []
+        for line in iter(f.readline, b""):
+            if line.startswith(b"From "):
+                if cur_off is not None:
+                    yield cur_off, b"".join(buf)
+                if end is not None and pos >= end:
+                    return
+                cur_off, buf = pos, []
+            elif cur_off is not None:
+                buf.append(line[1:] if line.startswith(b">From ") else line)
+            pos += len(line)
+        if cur_off is not None:
+            yield cur_off, b"".join(buf)
+
+def _read_mbox_at(path: Path, offset: int) -> bytes:
+    for _off, raw in _iter_mbox(path, offset, offset + 1):
+        return raw
+    raise LookupError(f"Ingen melding ved {path}#{offset}")
+
+def _mbox_ranges(path: Path, shard_bytes: int = MBOX_SHARD_BYTES) -> List[Tuple[int, int]]:
+    size = path.stat().st_size
+    return [(a, min(size, a + shard_bytes)) for a in range(0, max(size, 1), shard_bytes)]
+
+# ---------- parsing ----------
+def _local_naive(dt: Optional[datetime]) -> Optional[datetime]:
+    if dt is None:
+        return None
+    if dt.tzinfo is not None:
+        try: dt = dt.astimezone()
+        except Exception: pass
+    return dt.replace(tzinfo=None)
+
+def _msg_date(msg, fallback: Optional[float] = None) -> Optional[datetime]:
+    try:
+        if msg["Date"]:
+            return _local_naive(parsedate_to_datetime(str(msg["Date"])))
+    except Exception:
+        pass
+    return datetime.fromtimestamp(fallback) if fallback else None
+
+def _sender(msg) -> Tuple[str, str]:
+    try:
+        name, addr = (getaddresses([str(msg["From"] or "")]) or [("", "")])[0]
+    except Exception:
+        name, addr = "", ""
+    return (name or addr).strip()[:120], addr.strip().lower()[:200]
+
+def _has_attachments(msg) -> bool:
+    # Kun hoder er parset: multipart/mixed (eller report) er det Outlook også viser som binders
+    return msg.get_content_type() in ("multipart/mixed", "multipart/report")
+
+def _row(eid: str, raw: bytes, source: Path, mtime: Optional[float]) -> Dict:
+    msg = _PARSER.parsebytes(raw, headersonly=True)
+    name, smtp = _sender(msg)
+    return {
+        "eid": eid,
+        "store": OFFLINE_STORE,
+        "dt": _msg_date(msg, mtime),
+        "from": name,
+        "from_email": smtp,
+        "subject": str(msg["Subject"] or ""),
+        "folder": str(source),
+        "attach": 1 if _has_attachments(msg) else 0,
+        "unread": False,
+        "size": len(raw),
+    }
+
+def _in_window(r: Dict, after: Optional[date], before: Optional[date]) -> bool:
+    dt = r.get("dt")
+    if dt is None:
+        return after is None and before is None
+    d = dt.date()
+    return (after is None or d >= after) and (before is None or d <= before)
+
+def _rows_of(kind: str, path: Path, start: int = 0, end: Optional[int] = None,
+             after: Optional[date] = None, before: Optional[date] = None) -> Iterator[Dict]:
+    if kind == "mbox":
+        for off, raw in _iter_mbox(path, start, end):
+            try: r = _row(f"mbox:{path}#{off}", raw, path, None)
+            except Exception: continue
+            if _in_window(r, after, before):
+                yield r
+    elif kind == "eml":
+        try:
+            r = _row(f"eml:{path}", path.read_bytes(), path, path.stat().st_mtime)
+        except Exception:
+            return
+        if _in_window(r, after, before):
+            yield r
+    elif kind == "msg":
+        try:
+            m = OfflineMsgFile(path)
+            r = {"eid": m.EntryID, "store": OFFLINE_STORE, "dt": m.ReceivedTime, "from": m.SenderName,
+                 "from_email": m.SenderEmailAddress, "subject": m.Subject, "folder": str(path),
+                 "attach": 1 if m.Attachments.Count else 0, "unread": False, "size": m.Size}
+        except Exception:
+            return
+        if _in_window(r, after, before):
+            yield r
+
+def iter_rows(paths: Iterable, after: Optional[date] = None, before: Optional[date] = None) -> Iterator[Dict]:
+    """Søkerad-dicts for alle meldinger i kildene (i én prosess, strømmet)."""
+    for kind, p in expand_sources(paths):
+        yield from _rows_of(kind, p, after=after, before=before)
+
+# ---------- element-objekter ----------
+class OfflineAttachment:
+    Type = 1   # olByValue
+
+    def __init__(self, part, index: int):
+        self._part = part
+        self.Index = index
+        self.FileName = self.DisplayName = part.get_filename() or f"vedlegg_{index}"
+        self._data: Optional[bytes] = None
+
+    def _bytes(self) -> bytes:
+        if self._data is None:
+            data = self._part.get_payload(decode=True)
+            if data is None:
+                c = self._part.get_content()
+                data = c.encode("utf-8") if isinstance(c, str) else bytes(c)
+            self._data = data
+        return self._data
+
+    @property
+    def Size(self) -> int:
+        return len(self._bytes())
+
+    def SaveAsFile(self, path: str) -> None:
+        with open(path, "wb") as f:
+            f.write(self._bytes())
+
+class _BytesAttachment(OfflineAttachment):
+    def __init__(self, name: str, data: bytes, index: int):
+        self.Index = index
+        self.FileName = self.DisplayName = name or f"vedlegg_{index}"
+        self._data = data
+
+class OfflineAttachments:
+    def __init__(self, items: List[OfflineAttachment]):
+        self._items = items
+
+    @property
+    def Count(self) -> int:
+        return len(self._items)
+
+    def Item(self, i: int) -> OfflineAttachment:
+        return self._items[i - 1]   # 1-basert som i Outlook
+
+    def __iter__(self):
+        return iter(self._items)
+
+class OfflineMail:
+    """MailItem-lignende visning av én parset e-post (kun lesing; Categories/Save er lokale)."""
+    Class = 43
+
+    def __init__(self, eid: str, raw: bytes, mtime: Optional[float] = None):
+        self._msg = _PARSER.parsebytes(raw)
+        self.EntryID = eid
+        self.Size = len(raw)
+        self.Subject = str(self._msg["Subject"] or "")
+        self.SenderName, self.SenderEmailAddress = _sender(self._msg)
+        self.ReceivedTime = self.SentOn = _msg_date(self._msg, mtime)
+        self.UnRead = False
+        self.Categories = ""
+        self._atts: Optional[OfflineAttachments] = None
+
+    @property
+    def Attachments(self) -> OfflineAttachments:
+        if self._atts is None:
+            parts = list(self._msg.iter_attachments()) if self._msg.is_multipart() else []
+            self._atts = OfflineAttachments([OfflineAttachment(p, i) for i, p in enumerate(parts, 1)])
+        return self._atts
+
+    @property
+    def HasAttachment(self) -> bool:
+        return self.Attachments.Count > 0
+
+    def _body(self, kind: str) -> str:
+        try:
+            part = self._msg.get_body(preferencelist=(kind,))
+            return part.get_content() if part is not None else ""
+        except Exception:
+            return ""
+
+    @property
+    def HTMLBody(self) -> str:
+        return self._body("html")
+
+    @property
+    def Body(self) -> str:
+        return self._body("plain")
+
+    def Save(self) -> None:
+        pass   # eksporten endres ikke
+
+class OfflineMsgFile(OfflineMail):
+    """Outlook .msg via extract_msg (valgfri pakke)."""
+    def __init__(self, path: Path):
+        import extract_msg  # type: ignore
+        m = extract_msg.Message(str(path))
+        try:
+            self.EntryID = f"msg:{path}"
+            self.Size = path.stat().st_size
+            self.Subject = m.subject or ""
+            addrs = getaddresses([m.sender or ""])
+            name, addr = addrs[0] if addrs else ("", "")
+            self.SenderName, self.SenderEmailAddress = (name or addr)[:120], addr.lower()[:200]
+            try: self.ReceivedTime = _local_naive(m.date if isinstance(m.date, datetime) else parsedate_to_datetime(m.date))
+            except Exception: self.ReceivedTime = datetime.fromtimestamp(path.stat().st_mtime)
+            self.SentOn = self.ReceivedTime
+            self.UnRead = False
+            self.Categories = ""
+            self._html = m.htmlBody.decode("utf-8", "replace") if isinstance(m.htmlBody, bytes) else (m.htmlBody or "")
+            self._plain = m.body or ""
+            self._atts = OfflineAttachments([
+                _BytesAttachment(a.longFilename or a.shortFilename or "", a.data or b"", i)
+                for i, a in enumerate(m.attachments, 1) if isinstance(getattr(a, "data", None), bytes)])
+        finally:
+            try: m.close()
+            except Exception: pass
+
+    @property
+    def HTMLBody(self) -> str:
+        return self._html
+
+    @property
+    def Body(self) -> str:
+        return self._plain
+
+def load_item(eid: str):
+    """Element for en offline-EntryID (leser kilden på nytt)."""
+    kind, _, ref = (eid or "").partition(":")
+    if kind == "mbox":
+        path, _, off = ref.rpartition("#")
+        return OfflineMail(eid, _read_mbox_at(Path(path), int(off)))
+    if kind == "eml":
+        p = Path(ref)
+        return OfflineMail(eid, p.read_bytes(), p.stat().st_mtime)
+    if kind == "msg":
+        return OfflineMsgFile(Path(ref))
+    raise LookupError(f"Ukjent offline-EntryID: {eid!r}")
+
+class _Categories:
+    """Tom kategoriliste – ensure_category «lykkes» uten at noe lagres."""
+    Count = 0
+
+    def Item(self, i):
+        raise IndexError(i)
+
+    def Add(self, name, color=None):
+        return type("Category", (), {"Name": name, "Color": color})()
+
+class OfflineSession:
+    """Namespace-erstatning for arkiveren: bare GetItemFromID (og en tom Categories)."""
+    def __init__(self):
+        self.Categories = _Categories()
+
+    def GetItemFromID(self, entry_id: str, store_id: Optional[str] = None):
+        return load_item(entry_id)
+
+# ---------- prosesspool ----------
+def _workers(n: Optional[int]) -> int:
+    return max(1, n if n and n > 0 else (os.cpu_count() or 2) - 1)
+
+def _pool(workers: int):
+    # spawn: arbeiderne skal ikke arve åpne SQLite-tilkoblinger/låser fra forelderen
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+def _shards(paths: Iterable, shard_bytes: int = MBOX_SHARD_BYTES) -> List[Tuple]:
+    """Arbeidsenheter: (type, sti, start, slutt) for mbox-biter, ('files', [..]) for .eml/.msg."""
+    shards: List[Tuple] = []
+    loose: List[Tuple[str, str]] = []
+    for kind, p in expand_sources(paths):
+        if kind == "mbox":
+            shards.extend(("mbox", str(p), a, b) for a, b in _mbox_ranges(p, shard_bytes))
+        else:
+            loose.append((kind, str(p)))
+    for i in range(0, len(loose), EML_SHARD_FILES):
+        shards.append(("files", loose[i:i + EML_SHARD_FILES]))
+    return shards
+
+def _rows_job(shard: Tuple, after: Optional[date], before: Optional[date]) -> List[Dict]:
+    if shard[0] == "mbox":
+        _k, p, a, b = shard
+        return list(_rows_of("mbox", Path(p), a, b, after, before))
+    out: List[Dict] = []
+    for kind, p in shard[1]:
+        out.extend(_rows_of(kind, Path(p), after=after, before=before))
+    return out
+
+def iter_rows_parallel(paths: Iterable, after: Optional[date] = None, before: Optional[date] = None,
+                       workers: Optional[int] = None, shard_bytes: int = MBOX_SHARD_BYTES) -> Iterator[Dict]:
+    """Som iter_rows, men parsingen fordeles på en prosesspool (rekkefølgen beholdes)."""
+    shards = _shards(paths, shard_bytes)
+    n = min(_workers(workers), len(shards))
+    if n <= 1:
+        for sh in shards:
+            yield from _rows_job(sh, after, before)
+        return
+    with _pool(n) as pool:
+        for rows in pool.map(_rows_job, shards, [after] * len(shards), [before] * len(shards)):
+            yield from rows
+
+def _archive_shard(rule, rows: List[Dict], dry_run: bool) -> Dict[str, Dict[str, int]]:
+    from .group_archiver import archive_by_groups
+    summary, _ = archive_by_groups(OfflineSession(), rows, rules=[rule], dedup=True, dry_run=dry_run)
+    return summary
+
+def archive_offline(paths: Sequence, after: Optional[date] = None, before: Optional[date] = None,
+                    dry_run: bool = False, workers: Optional[int] = None,
+                    rules=None) -> Tuple[Dict[str, Dict[str, int]], int]:
+    """
+    Arkiverer vedlegg fra eksportfiler etter gruppereglene (standard: grupper.json).
+    Radene grupperes i forelderen; hver gruppe arkiveres i sin egen prosess (gruppene
+    har egne målmapper og låser, og dedup-indeksen flettes ved lagring).
+    Returnerer (summary, antall uten gruppe).
+    """
+    from .group_rules import matcher_for
+    matcher = matcher_for(rules)
+    buckets: Dict[str, List[Dict]] = {}
+    mapping = {}
+    unassigned = 0
+    for r in iter_rows_parallel(paths, after, before, workers):
+        g = matcher.match((r.get("from_email") or "").lower(), r.get("from") or "")
+        if g is None:
+            unassigned += 1
+            continue
+        buckets.setdefault(g.name, []).append(r)
+        mapping[g.name] = g
+
+    summary: Dict[str, Dict[str, int]] = {}
+    n = min(_workers(workers), len(buckets))
+    if n <= 1:
+        for gname, rows in buckets.items():
+            summary.update(_archive_shard(mapping[gname], rows, dry_run))
+    else:
+        with _pool(n) as pool:
+            futs = [pool.submit(_archive_shard, mapping[gname], rows, dry_run) for gname, rows in buckets.items()]
+            for f in futs:
+                summary.update(f.result())
+    return summary, unassigned
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description="Arkiver/tell fra postbokseksporter (.eml/.mbox/.msg) uten Outlook")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    for name, hlp in (("archive", "Arkiver vedlegg etter grupper"), ("stats", "Oppdater avsenderstatistikken"),
+                      ("list", "Vis meldingene")):
+        sp = sub.add_parser(name, help=hlp)
+        sp.add_argument("paths", nargs="+")
+        sp.add_argument("--from-date", type=str, help="YYYY-MM-DD")
+        sp.add_argument("--to-date", type=str, help="YYYY-MM-DD")
+        sp.add_argument("--workers", type=int, default=None)
+        if name == "archive":
+            sp.add_argument("--dry-run", action="store_true")
+    args = ap.parse_args(argv)
+    after = date.fromisoformat(args.from_date) if args.from_date else None
+    before = date.fromisoformat(args.to_date) if args.to_date else None
+    if args.cmd == "archive":
+        summary, unassigned = archive_offline(args.paths, after, before, args.dry_run, args.workers)
+        for g, s in summary.items():
+            print(f"{g}: {s['msgs']} meldinger, lagret {s['saved']}, hoppet {s['skipped']}")
+        print(f"Uten gruppe: {unassigned}")
+    elif args.cmd == "stats":
+        from .email_stats import update_sender_aggregate_offline
+        n = update_sender_aggregate_offline(args.paths, args.workers, after, before)
+        print(f"{n} nye meldinger i statistikken.")
+    else:
+        for r in iter_rows_parallel(args.paths, after, before, args.workers):
+            print(f"{r['dt']}  {r['from_email']:<32}  {'📎' if r['attach'] else '  '} {r['subject'][:70]}")
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,8 @@ from __future__ import annotations
 import os
 import html as htmlmod
 import re
-from datetime import datetime, date
+from html.entities import html5 as _HTML5
+from datetime import datetime, date, timedelta
 from typing import Dict, Iterator, List, Optional, Tuple, Callable
 
 # --------- logging (valgfritt, faller stille tilbake) ----------
@@ -17,6 +18,9 @@ except Exception:  # pragma: no cover
         def exception(self, *a, **k): ...
     log = _Null()
 
+from . import telemetry
+from .com_retry import call as com_call, is_transient
+
 # ---------- Outlook bootstrap ----------
 def have_outlook() -> bool:
     """Rask sjekk at pywin32/Outlook finnes (for helgesjekk_app)."""
@@ -57,27 +61,27 @@ def default_smtp(session) -> Optional[str]:
     return None
 
 def normalize_sender(mail) -> Tuple[str, str]:
-    """Returnerer (navn, smtp) – robust også for Exchange."""
+    """Returnerer (navn, smtp) – robust også for Exchange. Struping kastes videre (se com_retry)."""
     name, smtp = "", ""
     try:
         pa = mail.PropertyAccessor
         v = pa.GetProperty(SMTP_PROP)
         if v and "@" in v:
             smtp = str(v).strip().lower()
-    except Exception:
-        pass
+    except Exception as e:
+        if is_transient(e): raise
     if not name:
         try:
             name = (getattr(mail, "SenderName", "") or "").strip()
-        except Exception:
-            pass
+        except Exception as e:
+            if is_transient(e): raise
     if not smtp:
         try:
             raw = getattr(mail, "SenderEmailAddress", "") or ""
             if "@" in raw:
                 smtp = raw.strip().lower()
-        except Exception:
-            pass
+        except Exception as e:
+            if is_transient(e): raise
     return name, smtp
 
 def msg_time(item) -> Optional[datetime]:
@@ -86,38 +90,56 @@ def msg_time(item) -> Optional[datetime]:
             dt = getattr(item, a, None)
             if dt:
                 return dt
-        except Exception:
+        except Exception as e:
+            if is_transient(e): raise
             continue
     return None
 
 # ---------- Tekstudtrekk ----------
-_RE_STYLE = re.compile(r"<style[^>]*>.*?</style>", re.I | re.S)
-_RE_SCRIPT = re.compile(r"<script[^>]*>.*?</script>", re.I | re.S)
-_RE_COM = re.compile(r"<!--.*?-->", re.S)
-
-def _a_to_text(h: str) -> str:
-    def rep(m):
-        href = (m.group(1) or "").strip()
-        txt = (m.group(2) or "").strip()
-        if txt and href and href not in txt:
-            return f"{htmlmod.unescape(txt)} ({htmlmod.unescape(href)})"
-        return htmlmod.unescape(txt or href or "")
-    return re.sub(r'<a[^>]+href=["\']?([^"\'>\s]+)[^>]*>(.*?)</a>', rep, h, flags=re.I | re.S)
+# Samme regler som før, men med færre hele-strengs-pass: style/script/kommentarer fjernes i
+# ett pass, entiteter i ett regex-pass og blanke linjer med str-operasjoner der det går.
+_RE_DROP = re.compile(r"<(?:!--.*?-->|style[^>]*>.*?</style>|script[^>]*>.*?</script>)", re.I | re.S)
+_RE_A = re.compile(r'<a[^>]+href=["\']?([^"\'>\s]+)[^>]*>((?:(?!</a>).)*)</a>', re.I | re.S)
+_RE_BR = re.compile(r"<\s*br\s*/?>", re.I)
+_RE_P = re.compile(r"</\s*p\s*>", re.I)
+_RE_TAG = re.compile(r"<[^>]+>")
+_RE_BLANK = re.compile(r"\n\n\n+")
+
+# Entiteter: html.unescape kaller Python-kode for hver '&' (også nakne '&' i URL-er, der den
+# prøver alle prefikser). Vi bruker samme mønster som stdlib, men et lookahead slipper bare
+# gjennom '&' som kan bli til noe (#, «navn;» eller et kjent navn uten ';'), og vanlige navn slås
+# opp direkte. Ett pass fra venstre, så '&amp;lt;' blir '&lt;' slik som i stdlib.
+_RE_ENT = re.compile("&(?=#|\\w{1,32};|" + "|".join(sorted((n for n in _HTML5 if not n.endswith(";")),
+                                                            key=len, reverse=True)) + ")"
+                     r"(#[0-9]+;?|#[xX][0-9a-fA-F]+;?|[^\t\n\f <&#;]{1,32};?)")
+
+def _ent(m) -> str:
+    ch = _HTML5.get(m.group(1))
+    return ch if ch is not None else htmlmod.unescape(m.group(0))
+
+def _unescape(s: str) -> str:
+    return _RE_ENT.sub(_ent, s) if "&" in s else s
+
+def _a_to_text(m) -> str:
+    href = (m.group(1) or "").strip()
+    txt = (m.group(2) or "").strip()
+    if txt and href and href not in txt:
+        return f"{_unescape(txt)} ({_unescape(href)})"
+    return _unescape(txt or href or "")
 
 def html_to_text(html: str) -> str:
+    """HTML → ren tekst: lenker som «tekst (href)», <br>/</p> som linjeskift/avsnitt."""
     if not html:
         return ""
-    h = _RE_STYLE.sub("", html)
-    h = _RE_SCRIPT.sub("", h)
-    h = _RE_COM.sub("", h)
-    h = _a_to_text(h)
-    h = re.sub(r"<\s*br\s*/?>", "\n", h, flags=re.I)
-    h = re.sub(r"</\s*p\s*>", "\n\n", h, flags=re.I)
-    h = re.sub(r"<[^>]+>", "", h)
-    h = htmlmod.unescape(h).replace("\r", "")
-    h = re.sub(r"[ \t]+\n", "\n", h)
-    h = re.sub(r"\n{3,}", "\n\n", h)
-    return h.strip()
+    h = _RE_DROP.sub("", html)
+    if "<a" in h or "<A" in h:
+        h = _RE_A.sub(_a_to_text, h)
+    h = _RE_TAG.sub("", _RE_P.sub("\n\n", _RE_BR.sub("\n", h)))
+    h = _unescape(h)
+    if "\r" in h:
+        h = h.replace("\r", "")
+    h = "\n".join([ln.rstrip(" \t") for ln in h.split("\n")])
+    return _RE_BLANK.sub("\n\n", h).strip()
 
 def mail_as_text(mail) -> str:
     try:
@@ -173,13 +195,20 @@ def walk_subfolders(folder, include_subfolders: bool) -> Iterator:
     if not include_subfolders:
         return
     try:
-        subs = folder.Folders
-        for i in range(1, subs.Count + 1):
-            sub = subs.Item(i)
-            for f in walk_subfolders(sub, True):
-                yield f
-    except Exception:
+        subs = com_call(lambda: folder.Folders, stage="search")
+        n = com_call(lambda: subs.Count, stage="search")
+    except Exception as e:
+        log.warning("Fant ikke undermapper for %s: %s", getattr(folder, "FolderPath", ""), e)
+        telemetry.count("search", errors=1)
         return
+    for i in range(1, n + 1):
+        try:
+            sub = com_call(subs.Item, i, stage="search")
+        except Exception as e:
+            log.warning("Hoppet over undermappe %d av %s: %s", i, getattr(folder, "FolderPath", ""), e)
+            telemetry.count("search", errors=1)
+            continue
+        yield from walk_subfolders(sub, True)
 
 # ---------- Restrict‑hjelpere ----------
 def _fmt(dt: datetime) -> str:
@@ -191,8 +220,8 @@ def _restrict_str(after: Optional[datetime], before: Optional[datetime],
     clauses = []
     if after:
         clauses.append(f"[ReceivedTime] >= '{_fmt(after)}'")
-    if before:
-        clauses.append(f"[ReceivedTime] <= '{_fmt(before)}'")
+    if before:     # eksklusiv: Restrict sammenligner på minuttet, så '<= 23:59' mister siste minutt
+        clauses.append(f"[ReceivedTime] < '{_fmt(before)}'")
     if only_unread is True:
         clauses.append("[UnRead] = True")
     if has_attachments is True:
@@ -200,11 +229,53 @@ def _restrict_str(after: Optional[datetime], before: Optional[datetime],
     return " AND ".join(clauses)
 
 # ---------- Intern: GetTable‑motor ----------
+_TABLE_COLS = ("[EntryID]", "[ReceivedTime]", "[Subject]", "[SenderName]",
+               "[SenderEmailAddress]", "[UnRead]", "[HasAttachment]", "[Size]")
+
+def _open_table(folder, flt_base: str):
+    tbl = folder.GetTable(flt_base) if flt_base else folder.GetTable()
+    cols = tbl.Columns
+    for col in _TABLE_COLS:
+        try: cols.Add(col)
+        except Exception as e:
+            if is_transient(e): raise    # ellers mangler kolonnen for hele mappen; call() åpner på nytt
+    return tbl
+
+def _table_row(row, folder, q_sender: str, q_subj: str) -> Optional[Dict]:
+    """Søkerad fra en tabellrad, eller None hvis filtrert bort. EntryID/Size leses bare for treff."""
+    dt = row.Item("ReceivedTime")
+    if not isinstance(dt, datetime):
+        return None
+    subj = (row.Item("Subject") or "")
+    from_name = (row.Item("SenderName") or "")
+    from_raw = (row.Item("SenderEmailAddress") or "")
+    unread = bool(row.Item("UnRead"))
+    has_att = bool(row.Item("HasAttachment"))
+
+    if q_subj and q_subj not in subj.lower():
+        return None
+    if q_sender:
+        if q_sender not in (from_name or "").lower() and q_sender not in (from_raw or "").lower():
+            return None
+    return {
+        "eid": row.Item("EntryID"),
+        "store": getattr(folder, "StoreID", None),
+        "dt": dt,
+        "from": from_name,
+        "from_email": from_raw.lower() if isinstance(from_raw, str) else "",
+        "subject": subj,
+        "folder": getattr(folder, "FolderPath", ""),
+        "attach": 1 if has_att else 0,  # hurtig indikator
+        "unread": unread,
+        "size": row.Item("Size") or 0,
+    }
+
 def _search_via_gettable(session, inbox, flt_base: str, q_sender: str, q_subj: str,
                          include_subfolders: bool, cap_per_folder: int, cap_total: int,
                          stop_evt, progress: Optional[Callable[[str, int, int], None]]) -> Tuple[List[Dict], Optional[str], bool]:
     results: List[Dict] = []
     aborted = False
+    com_calls = 0   # GetTable + GetNextRow (telemetri)
 
     for folder in walk_subfolders(inbox, include_subfolders):
         if stop_evt.is_set():
@@ -214,23 +285,22 @@ def _search_via_gettable(session, inbox, flt_base: str, q_sender: str, q_subj: s
             break
 
         added_folder = 0
+        com_calls += 1
         try:
-            tbl = folder.GetTable(flt_base) if flt_base else folder.GetTable()
-            cols = tbl.Columns
-            for col in ["[EntryID]", "[ReceivedTime]", "[Subject]", "[SenderName]",
-                        "[SenderEmailAddress]", "[UnRead]", "[HasAttachment]"]:
-                try: cols.Add(col)
-                except Exception: pass
+            tbl = com_call(_open_table, folder, flt_base, stage="search")
         except Exception as e:
             if progress:
                 try: progress(getattr(folder, "FolderPath", ""), 0, len(results))
                 except Exception: pass
             log.warning("GetTable feilet for %s: %s", getattr(folder, "FolderPath", ""), e)
+            telemetry.count("search", errors=1)
             continue
 
         try:
-            row = tbl.GetNextRow()
-        except Exception:
+            row = com_call(tbl.GetNextRow, stage="search")
+        except Exception as e:
+            log.warning("Tabellen for %s kunne ikke leses: %s", getattr(folder, "FolderPath", ""), e)
+            telemetry.count("search", errors=1)
             row = None
 
         while row and added_folder < cap_per_folder and len(results) < cap_total:
@@ -238,47 +308,30 @@ def _search_via_gettable(session, inbox, flt_base: str, q_sender: str, q_subj: s
                 aborted = True
                 break
             try:
-                dt = row.Item("ReceivedTime")
-                if not isinstance(dt, datetime):
-                    row = tbl.GetNextRow();  continue
-                subj = (row.Item("Subject") or "")
-                from_name = (row.Item("SenderName") or "")
-                from_raw = (row.Item("SenderEmailAddress") or "")
-                unread = bool(row.Item("UnRead"))
-                has_att = bool(row.Item("HasAttachment"))
-
-                if q_subj and q_subj not in subj.lower():
-                    row = tbl.GetNextRow();  continue
-                if q_sender:
-                    if q_sender not in (from_name or "").lower() and q_sender not in (from_raw or "").lower():
-                        row = tbl.GetNextRow();  continue
-
-                results.append({
-                    "eid": row.Item("EntryID"),
-                    "store": getattr(folder, "StoreID", None),
-                    "dt": dt,
-                    "from": from_name,
-                    "from_email": from_raw.lower() if isinstance(from_raw, str) else "",
-                    "subject": subj,
-                    "folder": getattr(folder, "FolderPath", ""),
-                    "attach": 1 if has_att else 0,  # hurtig indikator
-                    "unread": unread,
-                })
+                rec = com_call(_table_row, row, folder, q_sender, q_subj, stage="search")
+            except Exception:
+                rec = None
+                telemetry.count("search", errors=1)
+            if rec is not None:
+                results.append(rec)
                 added_folder += 1
                 if progress and added_folder % 200 == 0:
                     try: progress(getattr(folder, "FolderPath", ""), added_folder, len(results))
                     except Exception: pass
-            except Exception:
-                pass
+            com_calls += 1
             try:
-                row = tbl.GetNextRow()
-            except Exception:
+                row = com_call(tbl.GetNextRow, stage="search")
+            except Exception as e:
+                # resten av mappen mangler – si fra i stedet for å stoppe stille
+                log.warning("Søket i %s stoppet etter %d treff: %s", getattr(folder, "FolderPath", ""), added_folder, e)
+                telemetry.count("search", errors=1)
                 break
 
         if progress:
             try: progress(getattr(folder, "FolderPath", ""), added_folder, len(results))
             except Exception: pass
 
+    telemetry.count("search", com_calls=com_calls)
     return results, None, aborted
 
 # ---------- Intern: Items.Restrict‑motor (fallback) ----------
@@ -297,18 +350,20 @@ def _search_via_items(session, inbox, flt_base: str, q_sender: str, q_subj: str,
 
         added_folder = 0
         try:
-            items = folder.Items
-            items.Sort("[ReceivedTime]", True)
-        except Exception:
+            items = com_call(lambda: folder.Items, stage="search")
+            com_call(items.Sort, "[ReceivedTime]", True, stage="search")
+        except Exception as e:
+            log.warning("Items feilet for %s: %s", getattr(folder, "FolderPath", ""), e)
+            telemetry.count("search", errors=1)
             continue
 
         try:
-            rset = items.Restrict(flt_base) if flt_base else items
+            rset = com_call(items.Restrict, flt_base, stage="search") if flt_base else items
         except Exception:
             rset = items
 
         try:
-            it = rset.GetFirst()
+            it = com_call(rset.GetFirst, stage="search")
             iter_by_next = True
         except Exception:
             it = None
@@ -323,30 +378,39 @@ def _search_via_items(session, inbox, flt_base: str, q_sender: str, q_subj: str,
                 return False
             return True
 
-        def capture(mail, folder_obj):
+        def _item_row(mail, folder_obj) -> Optional[Dict]:
+            dt = msg_time(mail)
+            if not dt:
+                return None
+            name, smtp = normalize_sender(mail)
+            n_att = 0
             try:
-                dt = msg_time(mail)
-                if not dt:
-                    return
-                name, smtp = normalize_sender(mail)
+                n_att = getattr(mail.Attachments, "Count", 0)
+            except Exception as e:
+                if is_transient(e): raise
                 n_att = 0
-                try:
-                    n_att = getattr(mail.Attachments, "Count", 0)
-                except Exception:
-                    n_att = 0
-                results.append({
-                    "eid": getattr(mail, "EntryID", None),
-                    "store": getattr(folder_obj, "StoreID", None),
-                    "dt": dt,
-                    "from": name,
-                    "from_email": smtp,
-                    "subject": (getattr(mail, "Subject", "") or ""),
-                    "folder": getattr(folder_obj, "FolderPath", ""),
-                    "attach": n_att,
-                    "unread": bool(getattr(mail, "UnRead", False)),
-                })
+            return {
+                "eid": getattr(mail, "EntryID", None),
+                "store": getattr(folder_obj, "StoreID", None),
+                "dt": dt,
+                "from": name,
+                "from_email": smtp,
+                "subject": (getattr(mail, "Subject", "") or ""),
+                "folder": getattr(folder_obj, "FolderPath", ""),
+                "attach": n_att,
+                "unread": bool(getattr(mail, "UnRead", False)),
+                "size": getattr(mail, "Size", 0) or 0,
+            }
+
+        def capture(mail, folder_obj):
+            try:
+                rec = com_call(_item_row, mail, folder_obj, stage="search")
             except Exception:
                 log.exception("Feil under bygging av søkeresultat")
+                telemetry.count("search", errors=1)
+                return
+            if rec is not None:
+                results.append(rec)
 
         if iter_by_next:
             while it and added_folder < cap_per_folder and len(results) < cap_total:
@@ -354,15 +418,20 @@ def _search_via_items(session, inbox, flt_base: str, q_sender: str, q_subj: str,
                     aborted = True
                     break
                 try:
-                    if getattr(it, "Class", None) == 43:  # olMail
-                        if accept(it):
+                    if com_call(getattr, it, "Class", None, stage="search") == 43:  # olMail
+                        if com_call(accept, it, stage="search"):
                             capture(it, folder)
                             added_folder += 1
                             if progress and added_folder % 200 == 0:
                                 try: progress(getattr(folder, "FolderPath", ""), added_folder, len(results))
                                 except Exception: pass
-                    it = rset.GetNext()
                 except Exception:
+                    telemetry.count("search", errors=1)
+                try:
+                    it = com_call(rset.GetNext, stage="search")
+                except Exception as e:
+                    log.warning("Søket i %s stoppet etter %d treff: %s", getattr(folder, "FolderPath", ""), added_folder, e)
+                    telemetry.count("search", errors=1)
                     break
         else:
             total = getattr(rset, "Count", 0)
@@ -374,10 +443,10 @@ def _search_via_items(session, inbox, flt_base: str, q_sender: str, q_subj: str,
                 if len(results) >= cap_total:
                     break
                 try:
-                    it = rset.Item(idx)
+                    it = com_call(rset.Item, idx, stage="search")
                     if getattr(it, "Class", None) != 43:
                         continue
-                    if accept(it):
+                    if com_call(accept, it, stage="search"):
                         capture(it, folder)
                         added_folder += 1
                         if progress and added_folder % 200 == 0:
@@ -410,16 +479,20 @@ def search_messages(session,
     """
     results: List[Dict] = []
     aborted = False
+    com = None
     try:
-        import pythoncom  # type: ignore
-        pythoncom.CoInitialize()
+        try:
+            import pythoncom  # type: ignore
+            pythoncom.CoInitialize(); com = pythoncom
+        except ImportError:
+            pass   # ikke Windows (f.eks. fake_outlook i benchmarks/tester)
         inbox = session.GetDefaultFolder(6)  # olFolderInbox
 
         q_sender = (sender_query or "").strip().lower()
         q_subj = (subject_contains or "").strip().lower()
 
         after_dt = datetime.combine(after_date, datetime.min.time()) if after_date else None
-        before_dt = datetime.combine(before_date, datetime.max.time()) if before_date else None
+        before_dt = datetime.combine(before_date + timedelta(days=1), datetime.min.time()) if before_date else None
         flt_base = _restrict_str(after_dt, before_dt, only_unread, only_attachments)
 
         if progress:
@@ -446,8 +519,6 @@ def search_messages(session,
         log.exception("Uventet feil i search_messages (auto)")
         return [], f"Uventet feil i søk: {e}", aborted
     finally:
-        try:
-            import pythoncom  # type: ignore
-            pythoncom.CoUninitialize()
-        except Exception:
-            pass
+        if com:
+            try: com.CoUninitialize()
+            except Exception: pass
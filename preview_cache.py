@@ -0,0 +1,312 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+PREVIEW_CACHE_MB = 256           # bytebudsjett for hele cachen (filer + miniatyrer + tekst)
+THUMB_MAX = (1024, 768)          # miniatyr lagres i denne størrelsen, skaleres videre ved visning
+TEXT_MAX_BYTES = 256 * 1024      # maks tekst som trekkes ut for forhåndsvisning
+
+IMAGE_EXTS = (".png", ".gif", ".jpg", ".jpeg", ".bmp", ".webp", ".tif", ".tiff")
+TEXT_EXTS = (".txt", ".log", ".csv", ".json", ".xml", ".md", ".ini")
+HTML_EXTS = (".html", ".htm")
+
+_ILLEGAL = r'<>:"/\\|?*'
+_RE_TAG = re.compile(r"<[^>]+>")
+
+Key = Tuple[str, int, int]
+
+def _root() -> Path:
+    root = Path(__file__).resolve().parents[1] / ".ragdb" / "preview_cache"
+    root.mkdir(parents=True, exist_ok=True)
+    return root
+
+def cache_key(entry_id: str, index: int, size: int) -> str:
+    return hashlib.sha1(f"{entry_id}|{int(index)}|{int(size)}".encode("utf-8")).hexdigest()
+
+def _sanitize(name: str) -> str:
+    return "".join("_" if c in _ILLEGAL else c for c in (name or "")).strip() or "vedlegg"
+
+def _dir_bytes(d: Path) -> int:
+    try:
+        return sum(p.stat().st_size for p in d.iterdir() if p.is_file())
+    except Exception:
+        return 0
+
+def _extract_text(path: Path, ext: str) -> Optional[str]:
+    if ext not in TEXT_EXTS and ext not in HTML_EXTS:
+        return None
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            txt = f.read(TEXT_MAX_BYTES)
+    except Exception:
+        return None
+    return _RE_TAG.sub("", txt).strip() if ext in HTML_EXTS else txt
+
+def _make_thumb(src: Path, dst: Path) -> bool:
+    try:
+        from PIL import Image  # type: ignore  # valgfri, lastes først når et bilde caches
+    except Exception:
+        return False
+    try:
+        with Image.open(src) as im:
+            im.thumbnail(THUMB_MAX)
+            if im.mode not in ("RGB", "RGBA", "L", "P"):
+                im = im.convert("RGB")
+            im.save(dst, "PNG")
+        return True
+    except Exception:
+        return False
+
+class PreviewCache:
+    """
+    LRU-cache på disk for vedleggsforhåndsvisning, nøkkel (EntryID, vedleggsindeks, størrelse).
+    Per nøkkel lagres selve fila (originalt filnavn), en nedskalert miniatyr (thumb.png,
+    krever Pillow) og uttrukket tekst (text.txt). Når summen passerer budsjettet kastes
+    minst nylig brukte oppføringer. Trådsikker – brukes både fra GUI og prefetch-tråd.
+    """
+    def __init__(self, root: Optional[Path] = None, budget_bytes: int = PREVIEW_CACHE_MB * 1024 * 1024):
+        self.root = Path(root) if root else _root()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.budget = int(budget_bytes)
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()   # eldst først
+        self._dirty = False
+        self._load()
+
+    # ---- indeks ----
+    @property
+    def _index_path(self) -> Path:
+        return self.root / "index.json"
+
+    def _load(self) -> None:
+        try:
+            data = json.loads(self._index_path.read_text(encoding="utf-8"))
+            items = sorted((data.get("items") or {}).items(), key=lambda kv: kv[1].get("atime", 0))
+        except Exception:
+            items = []
+        for k, e in items:
+            if (self.root / k / e.get("file", "")).exists():
+                self._entries[k] = e
+
+    def _merge_disk(self) -> None:
+        """Tar inn oppføringer som andre instanser/prosesser har skrevet siden vi leste indeksen."""
+        try:
+            items = (json.loads(self._index_path.read_text(encoding="utf-8")).get("items") or {}).items()
+        except Exception:
+            return
+        for k, e in items:
+            cur = self._entries.get(k)
+            if cur is not None:
+                cur["atime"] = max(cur.get("atime", 0), e.get("atime", 0))
+            elif (self.root / k / e.get("file", "")).exists():     # slettede mapper er kastet
+                self._entries[k] = e
+        self._entries = OrderedDict(sorted(self._entries.items(), key=lambda kv: kv[1].get("atime", 0)))
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            # Indeksen er felles for hele rota: flett inn det som står på disk og hold budsjettet
+            # for summen, ellers overskriver siste skriver de andres oppføringer.
+            self._merge_disk()
+            self._evict(keep=next(reversed(self._entries), None))
+            payload = {"v": 1, "items": dict(self._entries)}
+            tmp = self._index_path.with_name(f"index.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+            tmp.replace(self._index_path)
+            self._dirty = False
+
+    @property
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(e.get("bytes", 0) for e in self._entries.values())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Key) -> bool:
+        return cache_key(*key) in self._entries
+
+    # ---- oppslag ----
+    def get(self, entry_id: str, index: int, size: int) -> Optional[Dict]:
+        """
+        {'file': Path, 'thumb': Path|None, 'text': str|None} eller None.
+        Oppslaget flytter oppføringen bakerst i LRU-rekkefølgen.
+        """
+        k = cache_key(entry_id, index, size)
+        with self._lock:
+            e = self._entries.get(k)
+            if e is None:
+                return None
+            d = self.root / k
+            f = d / e["file"]
+            if not f.exists():
+                self._drop(k)
+                return None
+            e["atime"] = time.time()
+            self._entries.move_to_end(k)
+            self._dirty = True
+        text = None
+        if e.get("text"):
+            try: text = (d / "text.txt").read_text(encoding="utf-8")
+            except Exception: text = None
+        return {"file": f, "thumb": (d / "thumb.png") if e.get("thumb") else None, "text": text}
+
+    def put(self, entry_id: str, index: int, size: int, name: str,
+            save: Callable[[str], None]) -> Optional[Dict]:
+        """
+        Lagrer vedlegget via save(path) (typisk Attachment.SaveAsFile), lager miniatyr/tekst
+        og kaster eldste oppføringer ved behov. Returnerer som get().
+        """
+        k = cache_key(entry_id, index, size)
+        hit = self.get(entry_id, index, size)
+        if hit:
+            return hit
+        d = self.root / k
+        tmp = self.root / f"{k}.part{threading.get_ident()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        fname = _sanitize(name)
+        ext = os.path.splitext(fname)[1].lower()
+        try:
+            save(str(tmp / fname))
+            thumb = ext in IMAGE_EXTS and _make_thumb(tmp / fname, tmp / "thumb.png")
+            text = _extract_text(tmp / fname, ext)
+            if text is not None:
+                (tmp / "text.txt").write_text(text, encoding="utf-8")
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            return None
+
+        with self._lock:
+            if k in self._entries:                 # en annen tråd rakk det først
+                shutil.rmtree(tmp, ignore_errors=True)
+            else:
+                shutil.rmtree(d, ignore_errors=True)
+                tmp.replace(d)
+                self._entries[k] = {"file": fname, "thumb": bool(thumb), "text": text is not None,
+                                    "bytes": _dir_bytes(d), "atime": time.time()}
+                self._dirty = True
+                self._evict(keep=k)
+            try: self.flush()
+            except Exception: pass
+        return self.get(entry_id, index, size)
+
+    # ---- eviction ----
+    def _drop(self, k: str) -> None:
+        self._entries.pop(k, None)
+        shutil.rmtree(self.root / k, ignore_errors=True)
+        self._dirty = True
+
+    def _evict(self, keep: Optional[str] = None) -> int:
+        total = sum(e.get("bytes", 0) for e in self._entries.values())
+        dropped = 0
+        for k in list(self._entries):
+            if total <= self.budget:
+                break
+            if k == keep:
+                continue
+            total -= self._entries[k].get("bytes", 0)
+            self._drop(k)
+            dropped += 1
+        return dropped
+
+    def clear(self) -> None:
+        with self._lock:
+            for k in list(self._entries):
+                self._drop(k)
+            self.flush()
+
+_CACHE: Optional[PreviewCache] = None
+_CACHE_LOCK = threading.Lock()
+
+def get_cache() -> PreviewCache:
+    """Felles cache for prosessen – alle vedleggsvinduer deler indeks, LRU og budsjett."""
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = PreviewCache()
+        return _CACHE
+
+# ---------- Prefetch ----------
+class Prefetcher:
+    """
+    Bakgrunnstråd som legger nabovedlegg i cachen før de velges.
+    open_mail() kalles i tråden (egen COM-apartment/sesjon) og skal returnere MailItem.
+    request() erstatter ventende jobber – kun siste ønske om naboer er interessant.
+    """
+    def __init__(self, cache: PreviewCache, entry_id: str, open_mail: Callable[[], object]):
+        self.cache = cache
+        self.entry_id = entry_id
+        self._open_mail = open_mail
+        self._q: "queue.Queue[Optional[Tuple[int, int, str]]]" = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _drain(self) -> None:
+        try:
+            while True:
+                self._q.get_nowait()
+        except queue.Empty:
+            pass
+
+    def request(self, atts: Iterable[Tuple[int, int, str]]) -> None:
+        """atts: (vedleggsindeks, størrelse, filnavn) i ønsket rekkefølge."""
+        self._drain()
+        for a in atts:
+            if (self.entry_id, a[0], a[1]) not in self.cache:
+                self._q.put(a)
+
+    def stop(self, finish: bool = False) -> None:
+        """Stopper tråden; finish=True fullfører køen først."""
+        if not finish:
+            self._stop.set()
+            self._drain()
+        self._q.put(None)
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        com = None
+        try:
+            import pythoncom  # type: ignore
+            pythoncom.CoInitialize(); com = pythoncom
+        except Exception:
+            pass
+        mail = None
+        try:
+            while not self._stop.is_set():
+                job = self._q.get()
+                if job is None or self._stop.is_set():
+                    break
+                ix, size, name = job
+                try:
+                    if mail is None:
+                        mail = self._open_mail()
+                    att = mail.Attachments.Item(ix)
+                    self.cache.put(self.entry_id, ix, size, name, att.SaveAsFile)
+                except Exception:
+                    continue
+        finally:
+            mail = None
+            if com:
+                try: com.CoUninitialize()
+                except Exception: pass
+
+def open_mail_by_id(entry_id: str, store_id: Optional[str]) -> Callable[[], object]:
+    """Fabrikk for Prefetcher: åpner meldingen i en egen Outlook-sesjon (COM-objekter kan ikke deles mellom tråder)."""
+    def _open():
+        from .outlook_core import get_session
+        return get_session().GetItemFromID(entry_id, store_id) if store_id else get_session().GetItemFromID(entry_id)
+    return _open
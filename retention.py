@@ -4,7 +4,9 @@ from pathlib import Path
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple
 
+from . import telemetry
 from .group_rules import GroupRule, load_rules
+from .locking import LockBusy, dir_locks, resource_locks
 
 def _iter_files(root: Path) -> Path:
     for p in root.rglob("*"):
@@ -20,13 +22,34 @@ def _prune_empty_dirs(root: Path, keep: Path):
         except Exception:
             pass
 
+def _sweep(root: Path, threshold: datetime, dry_run: bool) -> Dict[str, int]:
+    deleted = kept = errors = 0
+    for f in _iter_files(root):
+        try:
+            mtime = datetime.fromtimestamp(f.stat().st_mtime)
+            if mtime < threshold:
+                if dry_run:
+                    deleted += 1   # ville slettet
+                else:
+                    f.unlink(missing_ok=True)
+                    deleted += 1
+            else:
+                kept += 1
+        except Exception:
+            errors += 1
+    if not dry_run:
+        _prune_empty_dirs(root, keep=root)
+    return {"deleted": deleted, "kept": kept, "errors": errors}
+
 def apply_retention(rules: List[GroupRule], dry_run: bool = False) -> Dict[str, Dict[str, int]]:
     """
     Sletter filer eldre enn 'retention_days' for hver gruppe-mappe (0=behold).
     Returnerer summary per gruppe: {"deleted": x, "kept": y, "errors": z}
+    (+ "busy": 1 hvis gruppemappen var låst av en annen jobb og ble hoppet over).
     """
     now = datetime.now()
     summary: Dict[str, Dict[str, int]] = {}
+    known_dirs = [r.target_dir for r in rules]
     for r in rules:
         days = int(r.retention_days or 0)
         if days <= 0:
@@ -34,22 +57,11 @@ def apply_retention(rules: List[GroupRule], dry_run: bool = False) -> Dict[str,
         root = Path(r.target_dir)
         if not root.exists():
             continue
-        deleted = kept = errors = 0
-        threshold = now - timedelta(days=days)
-        for f in _iter_files(root):
-            try:
-                mtime = datetime.fromtimestamp(f.stat().st_mtime)
-                if mtime < threshold:
-                    if dry_run:
-                        deleted += 1   # ville slettet
-                    else:
-                        f.unlink(missing_ok=True)
-                        deleted += 1
-                else:
-                    kept += 1
-            except Exception:
-                errors += 1
-        if not dry_run:
-            _prune_empty_dirs(root, keep=root)
-        summary[r.name] = {"deleted": deleted, "kept": kept, "errors": errors}
+        try:
+            with resource_locks([] if dry_run else dir_locks(r.target_dir, known_dirs)):
+                with telemetry.stage("retention") as st:
+                    summary[r.name] = s = _sweep(root, now - timedelta(days=days), dry_run)
+                    st.add(items=s["deleted"], errors=s["errors"])
+        except LockBusy:
+            summary[r.name] = {"deleted": 0, "kept": 0, "errors": 0, "busy": 1}
     return summary
@@ -1,10 +1,9 @@
 from __future__ import annotations
 import argparse
 from typing import Dict
+from . import telemetry
 from .group_rules import load_rules
 from .retention import apply_retention
-from .outlook_core import get_session, default_smtp
-from .mail_utils import send_html_mail
 
 def _html(summary: Dict[str, Dict[str,int]], dry: bool) -> str:
     rows = "".join(
@@ -30,14 +29,19 @@ def main():
     ap.add_argument("--to", type=str, help="Mottaker (overstyr)")
     args = ap.parse_args()
 
-    rules = load_rules()
-    summary = apply_retention(rules, dry_run=args.dry_run)
+    with telemetry.run("retention", dry_run=bool(args.dry_run)):
+        rules = load_rules()
+        summary = apply_retention(rules, dry_run=args.dry_run)
 
     print("=== Retention ===" + (" (tørrkjøring)" if args.dry_run else ""))
     for g, s in summary.items():
-        print(f"- {g}: {('ville slettet' if args.dry_run else 'slettet')} {s['deleted']}, beholdt {s['kept']}, feil {s['errors']}")
+        print(f"- {g}: {('ville slettet' if args.dry_run else 'slettet')} {s['deleted']}, beholdt {s['kept']}, feil {s['errors']}"
+              + (" – LÅST, hoppet over" if s.get("busy") else ""))
 
     if args.mail_report:
+        # Outlook/COM lastes kun når rapport faktisk skal sendes
+        from .outlook_core import get_session, default_smtp
+        from .mail_utils import send_html_mail
         session = get_session()
         to = args.to or (default_smtp(session) or "")
         if to:
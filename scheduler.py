@@ -40,3 +40,19 @@ def delete_task(task_name: str) -> tuple[bool, str]:
         return ok, out
     except Exception as e:
         return False, f"Kunne ikke slette oppgave: {e}"
+
+def install_logon_task(task_name: str, module: str = "fredag.daemon", args: str = "serve") -> tuple[bool, str]:
+    """
+    Starter en langlivet modul (standard: daemon) ved pålogging i stedet for én
+    kald Python-prosess per planlagt jobb. Bruker pythonw hvis den finnes (ingen konsoll).
+    """
+    py = Path(sys.executable)
+    pyw = py.with_name("pythonw.exe")
+    exe = pyw if pyw.exists() else py
+    tr = f'{_quote(str(exe))} -m {module} {args}'.strip()
+    cmd = ["schtasks", "/Create", "/F", "/SC", "ONLOGON", "/TN", task_name, "/TR", tr]
+    try:
+        cp = subprocess.run(cmd, capture_output=True, text=True, check=False)
+        return cp.returncode == 0, (cp.stdout.strip() or cp.stderr.strip())
+    except Exception as e:
+        return False, f"Kunne ikke opprette planlagt oppgave: {e}"
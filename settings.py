@@ -1,8 +1,11 @@
 from __future__ import annotations
+import copy
 import json
 from pathlib import Path
 from typing import Any, Dict, Tuple
 
+from . import config_cache
+
 _DEFAULTS: Dict[str, Any] = {
     # Søk/ytelse
     "cap_per_folder": 6000,
@@ -20,9 +23,40 @@ _DEFAULTS: Dict[str, Any] = {
     # Retention
     "retention_default_days": 0,       # 0 = behold
 
+    # Flytting via grupper: én DASL-Restrict per gruppe/kildemappe i stedet for GetItemFromID per melding
+    "move_bulk": True,
+
+    # COM mot Outlook/Exchange: gjenforsøk ved struping og adaptiv samtidighet (com_retry)
+    "com_retries": 5,
+    "com_backoff_sec": 0.5,            # dobles per forsøk (med jitter)
+    "com_max_backoff_sec": 30,
+    "com_max_concurrency": 4,          # øvre grense; senkes automatisk ved struping/treghet
+
     # Vedvarende dedup (vedleggs‑hash på tvers av kjøringer)
     "dedup_persist": True,
     "dedup_ttl_days": 365,
+
+    # Fulltekstindeks (SQLite FTS5 i .ragdb/fulltext.db): brødtekst + vedleggsnavn
+    "fulltext_enabled": False,
+    "fulltext_window_days": 90,        # bare meldinger nyere enn dette indekseres
+    "fulltext_max_mb_per_store": 500,  # eldste kastes først når en store passerer taket
+
+    # Tekstindeks over arkiverte vedlegg (.ragdb/attachments.db); pdf krever pypdf
+    "attachment_index_enabled": False,
+    "attachment_index_workers": 0,     # prosesser for tekstuttrekk; 0 = antall CPU-er − 1
+
+    # Telemetri (.ragdb/metrics.jsonl skrives alltid); sti her = også Prometheus-tekstfil
+    "metrics_prometheus_textfile": "",
+
+    # Daemon (python -m fredag.daemon): cron-uttrykk per jobb, "" = kun manuelt
+    "daemon_schedule": {
+        "archive": "0 16 * * fri",
+        "retention": "10 16 * * fri",
+        "move": "",
+        "weekly_report": "15 16 * * fri",
+        "fulltext": "40 * * * *",       # gjør ingenting når fulltext_enabled er av
+        "attachment_text": "50 * * * *",  # gjør ingenting når attachment_index_enabled er av
+    },
 }
 
 def _store_dir() -> Path:
@@ -33,8 +67,7 @@ def _store_dir() -> Path:
 def settings_path() -> Path:
     return _store_dir() / "settings.json"
 
-def load_settings() -> Dict[str, Any]:
-    p = settings_path()
+def _parse_settings(p: Path) -> Dict[str, Any]:
     if not p.exists():
         return dict(_DEFAULTS)
     try:
@@ -47,6 +80,10 @@ def load_settings() -> Dict[str, Any]:
     except Exception:
         return dict(_DEFAULTS)
 
+def load_settings() -> Dict[str, Any]:
+    """Innstillinger fra minnecachen (parses på nytt når settings.json endres). Egen kopi per kall."""
+    return copy.deepcopy(config_cache.load(settings_path(), _parse_settings))
+
 def save_settings(new_values: Dict[str, Any]) -> Tuple[bool, str]:
     try:
         out = dict(_DEFAULTS)
@@ -56,6 +93,7 @@ def save_settings(new_values: Dict[str, Any]) -> Tuple[bool, str]:
         tmp = settings_path().with_suffix(".tmp")
         tmp.write_text(json.dumps(out, ensure_ascii=False, indent=2), encoding="utf-8")
         tmp.replace(settings_path())
+        config_cache.invalidate(settings_path())
         return True, "Innstillinger lagret."
     except Exception as e:
         return False, f"Feil ved lagring: {e}"
@@ -68,4 +106,5 @@ def update_settings(partial: Dict[str, Any]) -> Tuple[bool, str]:
     return save_settings(s)
 
 def get(key: str, default: Any = None) -> Any:
-    return load_settings().get(key, default)
+    """Enkeltverdi uten å kopiere hele innstillingssettet – ikke endre muterbare verdier."""
+    return config_cache.load(settings_path(), _parse_settings).get(key, default)
@@ -86,7 +86,9 @@ class SettingsWindow(tk.Toplevel):
             messagebox.showerror("Innstillinger", "Min/Max KB og Retention må være tall.")
             return
         exts = [e.strip().lower().lstrip(".") for e in (self.v_exts.get() or "").split(",") if e.strip()]
-        payload = {
+        # Felt som ikke vises her (caps, daemon-tidsplan, telemetri …) beholdes uendret
+        payload = dict(load_settings())
+        payload.update({
             "default_allowed_exts": exts,
             "default_min_kb": min_kb,
             "default_max_kb": max_kb,
@@ -95,9 +97,6 @@ class SettingsWindow(tk.Toplevel):
             "default_target_template": self.v_tpl.get().strip(),
             "default_subject_tag_regex": self.v_rx.get().strip(),
             "retention_default_days": ret,
-            # behold også caps/limits hvis de finnes fra før
-            "cap_per_folder": load_settings().get("cap_per_folder", 6000),
-            "cap_total": load_settings().get("cap_total", 4000),
-        }
+        })
         ok, msg = save_settings(payload)
         messagebox.showinfo("Innstillinger", msg)
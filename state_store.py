@@ -1,8 +1,8 @@
 from __future__ import annotations
 import sqlite3
 from pathlib import Path
-from typing import Optional
-from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from datetime import date, datetime, timedelta
 
 _DB = None  # type: Optional[sqlite3.Connection]
 
@@ -29,6 +29,20 @@ def _ensure_schema(db: sqlite3.Connection) -> None:
         eid TEXT PRIMARY KEY,
         ts  TEXT NOT NULL
     );
+    CREATE TABLE IF NOT EXISTS sender_daily (
+        day      TEXT NOT NULL,
+        smtp     TEXT NOT NULL,
+        name     TEXT NOT NULL,
+        cnt      INTEGER NOT NULL DEFAULT 0,
+        bytes    INTEGER NOT NULL DEFAULT 0,
+        with_att INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, smtp, name)
+    );
+    CREATE TABLE IF NOT EXISTS sender_seen (
+        eid TEXT PRIMARY KEY,
+        day TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS ix_sender_seen_day ON sender_seen(day);
     """)
     db.commit()
 
@@ -63,3 +77,67 @@ def mark_archived(eid: str) -> None:
         (eid, datetime.now().isoformat())
     )
     _conn().commit()
+
+# --------- avsenderstatistikk (dagsaggregat) -----------
+def record_sender_rows(rows: Iterable[Dict]) -> int:
+    """
+    Legger søkeresultat-rader inn i dagsaggregatet (én gang per EntryID).
+    Rader: {"eid", "dt", "from", "from_email", "attach", "size"}. Returnerer antall nye.
+    """
+    db = _conn()
+    added = 0
+    with db:
+        for r in rows:
+            eid, dt = r.get("eid"), r.get("dt")
+            if not eid or not dt:
+                continue
+            day = dt.date().isoformat() if isinstance(dt, datetime) else str(dt)[:10]
+            cur = db.execute("INSERT OR IGNORE INTO sender_seen(eid, day) VALUES (?, ?)", (eid, day))
+            if cur.rowcount != 1:
+                continue
+            db.execute(
+                """INSERT INTO sender_daily(day, smtp, name, cnt, bytes, with_att)
+                   VALUES (?, ?, ?, 1, ?, ?)
+                   ON CONFLICT(day, smtp, name) DO UPDATE SET
+                       cnt = cnt + 1,
+                       bytes = bytes + excluded.bytes,
+                       with_att = with_att + excluded.with_att""",
+                (day,
+                 (r.get("from_email") or "").strip().lower()[:200],
+                 (r.get("from") or "").strip()[:120],
+                 int(r.get("size") or 0),
+                 1 if r.get("attach") else 0),
+            )
+            added += 1
+    return added
+
+def top_senders(d_from: date, d_to: date, top_n: int) -> List[Tuple[str, str, int]]:
+    """Topp-N (navn, smtp, antall) for [d_from, d_to] fra dagsaggregatet."""
+    cur = _conn().execute(
+        """SELECT name, smtp, SUM(cnt) AS n FROM sender_daily
+           WHERE day BETWEEN ? AND ?
+           GROUP BY name, smtp ORDER BY n DESC LIMIT ?""",
+        (d_from.isoformat(), d_to.isoformat(), int(top_n)),
+    )
+    return [(name, smtp, int(n)) for name, smtp, n in cur.fetchall()]
+
+def sender_weekly_average(before: date, weeks: int) -> Dict[Tuple[str, str], float]:
+    """Snitt antall per uke per (navn, smtp) for de 'weeks' ukene før 'before'."""
+    if weeks <= 0:
+        return {}
+    start = before - timedelta(days=7 * weeks)
+    cur = _conn().execute(
+        """SELECT name, smtp, SUM(cnt) FROM sender_daily
+           WHERE day >= ? AND day < ? GROUP BY name, smtp""",
+        (start.isoformat(), before.isoformat()),
+    )
+    return {(name, smtp): n / weeks for name, smtp, n in cur.fetchall()}
+
+def prune_sender_stats(keep_days: int) -> None:
+    """Fjerner aggregat og EntryID-merker eldre enn 'keep_days'."""
+    if keep_days <= 0:
+        return
+    cutoff = (datetime.now().date() - timedelta(days=keep_days)).isoformat()
+    with _conn() as db:
+        db.execute("DELETE FROM sender_seen WHERE day < ?", (cutoff,))
+        db.execute("DELETE FROM sender_daily WHERE day < ?", (cutoff,))
@@ -0,0 +1,268 @@
+"""
+Strukturert kjøre-telemetri: én JSON-linje per jobb og per steg i .ragdb/metrics.jsonl.
+
+    with telemetry.run("archive"):
+        with telemetry.stage("search") as st:
+            res = search(...); st.add(items=len(res))
+
+Steg med samme navn summeres innen kjøringen (f.eks. 'hash' per vedlegg), så fila får
+én linje per steg med tid, antall kall, elementer, bytes, COM-kall, feil og COM-
+gjenforsøk/strupehendelser. Uten aktiv
+kjøring er stage()/count() no-op, slik at bibliotekskoden kan instrumenteres fritt.
+Fila roteres som en RotatingFileHandler (metrics.jsonl.1 …). Er innstillingen
+'metrics_prometheus_textfile' satt, skrives siste kjøring per jobb også som Prometheus-
+tekstfil (node_exporter textfile collector).
+"""
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+STAGES = ("search", "resolve_groups", "extract", "hash", "write", "category", "retention", "fulltext",
+          "attachment_text", "move")
+METRICS_MAX_BYTES = 5 * 1024 * 1024
+METRICS_BACKUPS = 3
+_FIELDS = ("items", "bytes", "com_calls", "errors", "retries", "throttled")
+
+def _store_dir() -> Path:
+    root = Path(__file__).resolve().parents[1] / ".ragdb"
+    root.mkdir(parents=True, exist_ok=True)
+    return root
+
+def metrics_path() -> Path:
+    return _store_dir() / "metrics.jsonl"
+
+class StageStats:
+    __slots__ = ("seconds", "calls", "items", "bytes", "com_calls", "errors", "retries", "throttled", "_lock")
+
+    def __init__(self, lock: Optional[threading.Lock] = None):
+        self._lock = lock or threading.Lock()   # kjøringens lås (deles av arbeidertrådene)
+        self.seconds = 0.0
+        self.calls = self.items = self.bytes = self.com_calls = self.errors = 0
+        self.retries = self.throttled = 0       # COM-gjenforsøk/strupehendelser (com_retry)
+
+    def add(self, items: int = 0, bytes: int = 0, com_calls: int = 0, errors: int = 0,
+            retries: int = 0, throttled: int = 0) -> None:
+        with self._lock:
+            self._add(items, bytes, com_calls, errors, retries, throttled)
+
+    def _add(self, items, bytes, com_calls, errors, retries, throttled) -> None:
+        self.items += items; self.bytes += bytes
+        self.com_calls += com_calls; self.errors += errors
+        self.retries += retries; self.throttled += throttled
+
+    def as_dict(self) -> Dict:
+        with self._lock:
+            return {"seconds": round(self.seconds, 4), "calls": self.calls, "items": self.items,
+                    "bytes": self.bytes, "com_calls": self.com_calls, "errors": self.errors,
+                    "retries": self.retries, "throttled": self.throttled}
+
+class Run:
+    """Én jobbkjøring. Trådsikker: arbeidertråder kan legge til i samme kjøring (alle tellere
+    oppdateres under kjøringens lås)."""
+    def __init__(self, job: str, **meta):
+        self.job = job
+        self.meta = meta
+        self.id = f"{int(time.time()):x}-{os.urandom(3).hex()}"
+        self.started = datetime.now()
+        self._t0 = time.perf_counter()
+        self.stages: Dict[str, StageStats] = {}
+        self._lock = threading.Lock()
+
+    def _stats(self, name: str) -> StageStats:
+        st = self.stages.get(name)
+        if st is None:
+            with self._lock:
+                st = self.stages.setdefault(name, StageStats(self._lock))
+        return st
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageStats]:
+        st = self._stats(name)
+        t0 = time.perf_counter()
+        try:
+            yield st
+        except BaseException:
+            st.add(errors=1)
+            raise
+        finally:
+            dt = time.perf_counter() - t0
+            with self._lock:
+                st.seconds += dt
+                st.calls += 1
+
+    def count(self, name: str, **kw) -> None:
+        self._stats(name).add(**kw)
+
+    def records(self, status: str = "ok", error: str = "") -> List[Dict]:
+        ts = self.started.isoformat(timespec="seconds")
+        base = {"ts": ts, "run": self.id, "job": self.job}
+        with self._lock:
+            stages = list(self.stages.items())
+        out = [dict(base, kind="stage", stage=name, **st.as_dict()) for name, st in stages]
+        job = dict(base, kind="job", status=status, seconds=round(time.perf_counter() - self._t0, 4),
+                   **{f: sum(r[f] for r in out) for f in _FIELDS})
+        if error: job["error"] = error[:500]
+        job.update(self.meta)
+        out.append(job)
+        return out
+
+# ---------- aktiv kjøring (per tråd) ----------
+_CURRENT = threading.local()
+
+def current() -> Optional[Run]:
+    return getattr(_CURRENT, "run", None)
+
+@contextmanager
+def bind(r: Optional[Run]) -> Iterator[Optional[Run]]:
+    """Gjør 'r' aktiv i denne tråden (for arbeidertråder som jobber for en kjøring)."""
+    prev = current()
+    _CURRENT.run = r
+    try:
+        yield r
+    finally:
+        _CURRENT.run = prev
+
+@contextmanager
+def run(job: str, **meta) -> Iterator[Run]:
+    """
+    Starter en kjøring og skriver postene når blokken avsluttes (også ved feil).
+    Nøstet kall gjenbruker ytre kjøring – f.eks. daemon → auto_archive.
+    """
+    outer = current()
+    if outer is not None:
+        yield outer
+        return
+    r = Run(job, **meta)
+    status, error = "ok", ""
+    with bind(r):
+        try:
+            yield r
+        except BaseException as e:
+            status, error = "error", f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            try: emit(r.records(status, error))
+            except Exception: pass
+
+class _NullStage:
+    def __enter__(self): return _NULL_STATS
+    def __exit__(self, *exc): return False
+
+_NULL_STATS = StageStats()   # slukt (ingen aktiv kjøring)
+
+def stage(name: str):
+    r = current()
+    return r.stage(name) if r is not None else _NullStage()
+
+def count(name: str, **kw) -> None:
+    r = current()
+    if r is not None:
+        r.count(name, **kw)
+
+# ---------- lagring ----------
+_WRITE_LOCK = threading.Lock()
+
+def _rotate(p: Path, backups: int) -> None:
+    for i in range(backups - 1, 0, -1):
+        src = p.with_name(f"{p.name}.{i}")
+        if src.exists():
+            os.replace(src, p.with_name(f"{p.name}.{i + 1}"))
+    os.replace(p, p.with_name(f"{p.name}.1"))
+
+def emit(records: List[Dict], path: Optional[Path] = None,
+         max_bytes: int = METRICS_MAX_BYTES, backups: int = METRICS_BACKUPS) -> None:
+    p = Path(path) if path else metrics_path()
+    data = "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in records)
+    with _WRITE_LOCK:
+        try:
+            if p.exists() and p.stat().st_size + len(data) > max_bytes:
+                _rotate(p, backups)
+        except OSError:
+            pass   # en annen prosess roterte samtidig – skriv videre
+        with open(p, "a", encoding="utf-8") as f:
+            f.write(data)
+    if path is None:
+        try:
+            from .settings import get
+            prom = get("metrics_prometheus_textfile") or ""
+            if prom:
+                write_prometheus(Path(prom))
+        except Exception:
+            pass
+
+def read_records(path: Optional[Path] = None, tail_bytes: int = 1024 * 1024) -> List[Dict]:
+    """Poster fra slutten av forrige rotasjon + gjeldende fil (eldst først)."""
+    p = Path(path) if path else metrics_path()
+    out: List[Dict] = []
+    for f in (p.with_name(f"{p.name}.1"), p):
+        try:
+            with open(f, "rb") as fh:
+                size = fh.seek(0, os.SEEK_END)
+                fh.seek(max(0, size - tail_bytes))
+                chunk = fh.read()
+        except OSError:
+            continue
+        lines = chunk.split(b"\n")
+        if size > tail_bytes:
+            lines = lines[1:]          # første linje er kuttet
+        for ln in lines:
+            try: out.append(json.loads(ln))
+            except Exception: continue
+    return out
+
+def recent_runs(n: int = 20, job: Optional[str] = None, path: Optional[Path] = None) -> List[Dict]:
+    """
+    Siste n kjøringer (eldst først): jobbposten + 'stages' {navn: stegpost}.
+    Kjøringer uten jobbpost (avbrutt prosess) tas ikke med.
+    """
+    stages: Dict[str, Dict[str, Dict]] = {}
+    runs: List[Dict] = []
+    for r in read_records(path):
+        if job and r.get("job") != job:
+            continue
+        if r.get("kind") == "stage":
+            stages.setdefault(r.get("run"), {})[r.get("stage")] = r
+        elif r.get("kind") == "job":
+            runs.append(dict(r, stages=stages.pop(r.get("run"), {})))
+    return runs[-n:]
+
+def _prom_label(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+def write_prometheus(dest: Path, runs: Optional[List[Dict]] = None) -> None:
+    """Siste kjøring per jobb som Prometheus-tekstformat (atomisk erstatning)."""
+    last: Dict[str, Dict] = {}
+    for r in (runs if runs is not None else recent_runs(200)):
+        last[r["job"]] = r
+    lines = [
+        "# HELP fredag_job_seconds Varighet for siste kjøring per jobb.",
+        "# TYPE fredag_job_seconds gauge",
+        "# HELP fredag_job_success 1 hvis siste kjøring gikk bra.",
+        "# TYPE fredag_job_success gauge",
+        "# HELP fredag_job_last_run_timestamp_seconds Starttid for siste kjøring.",
+        "# TYPE fredag_job_last_run_timestamp_seconds gauge",
+        "# HELP fredag_stage_seconds Tid per steg i siste kjøring.",
+        "# TYPE fredag_stage_seconds gauge",
+    ]
+    for job, r in sorted(last.items()):
+        j = f'job="{_prom_label(job)}"'
+        lines.append(f"fredag_job_seconds{{{j}}} {r.get('seconds', 0)}")
+        lines.append(f"fredag_job_success{{{j}}} {1 if r.get('status') == 'ok' else 0}")
+        try: ts = datetime.fromisoformat(r["ts"]).timestamp()
+        except Exception: ts = 0
+        lines.append(f"fredag_job_last_run_timestamp_seconds{{{j}}} {int(ts)}")
+        for name, st in sorted(r.get("stages", {}).items()):
+            s = f'{j},stage="{_prom_label(name)}"'
+            lines.append(f"fredag_stage_seconds{{{s}}} {st.get('seconds', 0)}")
+            for f in _FIELDS:
+                lines.append(f"fredag_stage_{f}{{{s}}} {st.get(f, 0)}")
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(dest.name + ".tmp")
+    tmp.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    os.replace(tmp, dest)
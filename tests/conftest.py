@@ -0,0 +1,77 @@
+import threading
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from fredag import archiver, dedup_index, folder_index, group_archiver, locking, outlook_core, state_store
+from fredag.fake_outlook import FakeNamespace
+
+
+@pytest.fixture
+def never_stop():
+    """stop_evt som aldri settes."""
+    return threading.Event()
+
+
+@pytest.fixture
+def search_rows(never_stop):
+    """search_rows(s, days=7, engine=None): alle søkerader de siste 'days' dagene (evt. via én motor)."""
+    def _search(s, days: int = 7, engine=None):
+        after = datetime.combine(date.today() - timedelta(days=days), datetime.min.time())
+        if engine:
+            res, err, _ = engine(s, s.GetDefaultFolder(6), outlook_core._restrict_str(after, None, False, False),
+                                 "", "", True, 100_000, 100_000, never_stop, None)
+        else:
+            res, err, _ = outlook_core.search_messages(
+                s, "", "", after.date(), date.today(), True, False, False, 100_000, 100_000, never_stop)
+        assert err is None and res
+        return res
+    return _search
+
+
+@pytest.fixture
+def kunde_mailbox():
+    """
+    kunde_mailbox(n_attachments=0) → (session, eid_gammel): 30 meldinger fra kari0-3@kunde.no
+    i Innboks/Innboks\\Kunder (annenhver ulest), én fra sjef@kunde.no, én fra ola@annet.no
+    og én 60 dager gammel fra kari0@kunde.no.
+    """
+    def _make(n_attachments: int = 0):
+        s = FakeNamespace()
+        st = s.add_store("Postboks", ["Innboks", "Innboks\\Kunder", "Arkiv\\KundeX", "Arkiv\\VIP"])
+        inbox, kunder = s.folder(st, "Innboks"), s.folder(st, "Innboks\\Kunder")
+        t = datetime.now().replace(microsecond=0) - timedelta(days=1)
+        for k in range(30):
+            f = inbox if k % 3 else kunder
+            who = ("Kari", f"kari{k % 4}@kunde.no", f"kari{k % 4}@kunde.no")
+            s.add_message(f, t - timedelta(hours=k), who, subject_no=k, unread=k % 2 == 0,
+                          n_attachments=n_attachments)
+        s.add_message(inbox, t, ("Sjef", "sjef@kunde.no", "sjef@kunde.no"), subject_no=30,
+                      n_attachments=n_attachments)
+        s.add_message(inbox, t, ("Ola", "ola@annet.no", "ola@annet.no"))
+        old = s.add_message(inbox, t - timedelta(days=60), ("Kari", "kari0@kunde.no", "kari0@kunde.no"))
+        return s, old
+    return _make
+
+
+@pytest.fixture
+def mover_env(tmp_path, monkeypatch):
+    """Låser og mappeindeks under tmp_path."""
+    monkeypatch.setattr(locking, "_lock_dir", lambda: tmp_path / "locks")
+    monkeypatch.setattr(folder_index, "_path", lambda: tmp_path / "folder_index.json")
+    monkeypatch.setattr(folder_index, "_INDEX", None)
+
+
+@pytest.fixture
+def state_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(state_store, "_db_path", lambda: tmp_path / "state.db")
+    monkeypatch.setattr(state_store, "_DB", None)
+
+
+@pytest.fixture
+def archive_env(tmp_path, monkeypatch, state_db):
+    """state.db, dedup-indeks og temp-mappe under tmp_path; målmal '{year}'."""
+    monkeypatch.setattr(dedup_index, "_path", lambda: tmp_path / "dedup_index.json")
+    monkeypatch.setattr(archiver, "_temp_dir", lambda: tmp_path / "tmp")
+    monkeypatch.setattr(group_archiver, "load_settings", lambda: {"default_target_template": "{year}"})
+    (tmp_path / "tmp").mkdir()
@@ -0,0 +1,109 @@
+import os
+import zipfile
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from fredag import archiver, attachment_index
+from fredag.fulltext_index import available
+
+pytestmark = pytest.mark.skipif(not available(), reason="SQLite uten FTS5")
+
+
+@pytest.fixture(autouse=True)
+def _tmp_db(tmp_path, monkeypatch):
+    attachment_index.close()
+    monkeypatch.setattr(attachment_index, "_db_path", lambda: tmp_path / "attachments.db")
+    monkeypatch.setattr(attachment_index, "_settings", lambda: {})
+    yield
+    attachment_index.close()
+
+
+def _docx(path: Path, *paras: str) -> None:
+    body = "".join(f"<w:p><w:r><w:t>{p}</w:t></w:r></w:p>" for p in paras)
+    with zipfile.ZipFile(path, "w") as z:
+        z.writestr("word/document.xml", f'<?xml version="1.0"?><w:document><w:body>{body}</w:body></w:document>')
+
+
+def _xlsx(path: Path, *cells: str) -> None:
+    si = "".join(f"<si><t>{c}</t></si>" for c in cells)
+    with zipfile.ZipFile(path, "w") as z:
+        z.writestr("xl/sharedStrings.xml", f"<sst>{si}</sst>")
+        z.writestr("xl/worksheets/sheet1.xml", "<worksheet><sheetData><row><c t='s'><v>0</v></c></row></sheetData></worksheet>")
+
+
+def test_extractors(tmp_path):
+    _docx(tmp_path / "a.docx", "Kontrakt &amp; vedlegg", "Andre avsnitt")
+    _xlsx(tmp_path / "b.xlsx", "Timeliste", "Prosjekt PRJ-1234")
+    (tmp_path / "c.txt").write_bytes("Kvittering for bl\xe5b\xe6r".encode("cp1252"))
+    (tmp_path / "d.html").write_text("<p>Hei<br>verden</p>", encoding="utf-8")
+    assert attachment_index.extract_text(str(tmp_path / "a.docx")).split("\n")[:2] == ["Kontrakt & vedlegg", "Andre avsnitt"]
+    assert "PRJ-1234" in attachment_index.extract_text(str(tmp_path / "b.xlsx"))
+    assert attachment_index.extract_text(str(tmp_path / "c.txt")) == "Kvittering for blåbær"
+    assert attachment_index.extract_text(str(tmp_path / "d.html")) == "Hei\nverden"
+    assert attachment_index._extract_job(str(tmp_path / "x.zip"))[1] == "skip"
+    (tmp_path / "bad.docx").write_bytes(b"ikke zip")
+    assert attachment_index._extract_job(str(tmp_path / "bad.docx"))[1] == "error"
+
+
+def test_update_is_incremental_and_tracks_changes(tmp_path):
+    root = tmp_path / "arkiv"
+    (root / "2025" / "01_Jan").mkdir(parents=True)
+    (root / "2025" / "02_Feb").mkdir(parents=True)
+    (root / "2025" / "01_Jan" / "faktura.txt").write_text("Faktura 1001 fra leverandør", encoding="utf-8")
+    _docx(root / "2025" / "02_Feb" / "kontrakt.docx", "Rammeavtale om renhold")
+    (root / "2025" / "02_Feb" / "bilde.jpg").write_bytes(b"\xff\xd8")
+
+    res = attachment_index.update({"KundeX": str(root)}, workers=1)
+    assert (res["new"], res["ok"], res["scanned_dirs"]) == (2, 2, 4)
+    hits = attachment_index.search("rammeavtale")
+    assert [Path(h["path"]).name for h in hits] == ["kontrakt.docx"] and hits[0]["group"] == "KundeX"
+
+    # ingenting endret → ingen mapper listes, ingenting trekkes ut på nytt
+    assert attachment_index.update({"KundeX": str(root)}, workers=1)["scanned_dirs"] == 0
+
+    f = root / "2025" / "01_Jan" / "faktura.txt"
+    f.write_text("Kreditnota 2002", encoding="utf-8")
+    os.utime(f.parent, ns=(0, f.parent.stat().st_mtime_ns + 10**9))
+    (root / "2025" / "02_Feb" / "kontrakt.docx").unlink()
+    res = attachment_index.update({"KundeX": str(root)}, workers=1)
+    assert (res["new"], res["removed"]) == (1, 1)
+    assert attachment_index.search("1001") == [] and len(attachment_index.search("kreditnota")) == 1
+    assert attachment_index.search("rammeavtale") == []
+
+
+def test_archiver_on_saved_records_facets_and_pool(tmp_path, monkeypatch):
+    monkeypatch.setattr(archiver, "_temp_dir", lambda: tmp_path / "tmp")
+    (tmp_path / "tmp").mkdir()
+
+    class Att:
+        def __init__(self, name, data): self.FileName, self._d = name, data
+        def SaveAsFile(self, p): Path(p).write_bytes(self._d)
+
+    class Atts:
+        def __init__(self, a): self._a = a; self.Count = len(a)
+        def Item(self, i): return self._a[i - 1]
+
+    class Mail:
+        def __init__(self, i):
+            self.ReceivedTime = datetime(2025, 3, i + 1, 9, 0)
+            self.Attachments = Atts([Att(f"notat_{i}.txt", f"Møtenotat nummer {i} om budsjett".encode())])
+
+    rows = [{"eid": f"E{i}", "dt": datetime(2025, 3, i + 1, 9, 0), "from": "Kari", "from_email": f"kari{i % 2}@x.no"}
+            for i in range(6)]
+    saved_files = []
+    root = tmp_path / "arkiv"
+    n, _, err = archiver.archive_messages(None, rows, lambda r: Mail(int(r["eid"][1:])), str(root),
+                                          on_saved=lambda p, r: saved_files.append((p, "Styret", r)))
+    assert n == 6 and not err and len(saved_files) == 6
+    assert attachment_index.record_saved(saved_files) == 6
+
+    res = attachment_index.update({"Annet": str(root)}, workers=2)          # prosesspool (≥ INLINE_BELOW filer)
+    assert res["ok"] == 6
+    hits = attachment_index.search("budsjett", sender="KARI1@x.no")
+    assert len(hits) == 3 and {h["group"] for h in hits} == {"Styret"}
+    assert all(h["dt"].startswith("2025-03-0") and h["eid"] for h in hits)
+    fac = attachment_index.facets("budsjett")
+    assert fac["group"] == [("Styret", 6)] and fac["month"] == [("2025-03", 6)]
+    assert dict(fac["sender"]) == {"kari0@x.no": 3, "kari1@x.no": 3}
@@ -0,0 +1,21 @@
+import json
+
+from fredag.benchmarks import suite
+
+
+def _res(**per_op):
+    return {"meta": {}, "results": {k: {"per_op_us": v} for k, v in per_op.items()}}
+
+
+def test_compare_flags_regressions_and_skips_missing_cases():
+    rows = suite.compare(_res(a=10.0, b=10.0, c=10.0, gone=1.0), _res(a=12.0, b=8.5, c=10.5, new=1.0),
+                         threshold=0.1)
+    assert {r[0]: r[4] for r in rows} == {"a": "REGRESJON", "b": "raskere", "c": ""}
+
+
+def test_quick_case_runs_and_is_recorded(tmp_path):
+    data = suite.run_suite("render_template", quick=True, echo=lambda s: None)
+    (res,) = data["results"].values()
+    assert res["ops"] == 2000 and res["runs"] >= 3 and res["per_op_us"] > 0
+    p = suite.save_results(data, tmp_path / "r.json")
+    assert suite.compare(data, json.loads(p.read_text(encoding="utf-8")))[0][3] == 1.0
@@ -0,0 +1,145 @@
+from datetime import datetime, timedelta
+
+from fredag import calendar_cache
+from fredag.calendar_cache import CalendarSnapshot, EventIndex
+from fredag.freebusy import free_slots
+
+
+def _ev(eid, start, hours=1.0):
+    return {"eid": eid, "start": start, "end": start + timedelta(hours=hours),
+            "subject": eid, "location": "", "folder": "F"}
+
+
+def test_event_index_query_and_overlap():
+    d = datetime(2025, 3, 3, 9, 0)
+    evs = [_ev("a", d), _ev("b", d + timedelta(days=1)), _ev("lang", d - timedelta(days=2), hours=72),
+           _ev("c", d + timedelta(days=7))]
+    ix = EventIndex(evs)
+
+    week = ix.query(datetime(2025, 3, 3), datetime(2025, 3, 9, 23, 59))
+    assert [e["eid"] for e in week] == ["a", "b"]
+
+    busy = ix.overlapping(datetime(2025, 3, 3, 8), datetime(2025, 3, 3, 12))
+    assert {e["eid"] for e in busy} == {"a", "lang"}
+
+
+def test_snapshot_json_roundtrip():
+    snap = CalendarSnapshot(include_subfolders=True)
+    snap.window = CalendarSnapshot.desired_window(datetime(2025, 3, 3, 12))
+    snap.events = [_ev("a", datetime(2025, 3, 4, 10))]
+    snap.folders = {"F": {"count": 1, "synced": datetime(2025, 3, 3, 12), "full": datetime(2025, 3, 3, 12)}}
+
+    back = CalendarSnapshot.from_json(snap.to_json())
+    assert back.window == snap.window
+    assert back.covers(datetime(2025, 3, 1), datetime(2025, 3, 31))
+    assert not back.covers(datetime(2024, 1, 1), datetime(2025, 3, 31))
+    assert [e["eid"] for e in back.query(datetime(2025, 3, 4), datetime(2025, 3, 5))] == ["a"]
+
+
+def test_busy_events_include_multi_day_event_started_before_range(monkeypatch):
+    now = datetime.now().replace(microsecond=0)
+    snap = CalendarSnapshot()
+    snap.window, snap.synced = CalendarSnapshot.desired_window(now), now    # nylig synket: ingen COM
+    mon = (now + timedelta(days=14 - now.weekday())).replace(hour=0, minute=0, second=0)
+    snap.events = [_ev("konferanse", mon - timedelta(days=2, hours=-8), hours=24 * 3),   # lør 08 – tir 08
+                   _ev("møte", mon + timedelta(days=1, hours=9))]
+    monkeypatch.setattr(calendar_cache, "_SNAPSHOTS", {False: snap})
+
+    start, end = mon, mon + timedelta(days=2)
+    busy = calendar_cache.busy_events(None, start, end, False)
+    assert {e["eid"] for e in busy} == {"konferanse", "møte"}
+    assert [e["eid"] for e in calendar_cache.get_events(None, start, end, False)] == ["møte"]
+
+    slots = free_slots(busy, mon.date(), mon.date() + timedelta(days=1), timedelta(hours=1), n=1)
+    assert slots == [(mon + timedelta(days=1, hours=8), mon + timedelta(days=1, hours=9))]
+
+
+class _Appt:
+    Class = 26
+
+    def __init__(self, eid, start, hours=1.0, modified=None):
+        self.EntryID, self.Start, self.End = eid, start, start + timedelta(hours=hours)
+        self.Subject, self.Location, self.BusyStatus, self.IsRecurring = eid, "", 2, False
+        self.LastModificationTime = modified or start
+
+
+class _Items:
+    def __init__(self, cal, appts):
+        self._cal, self._a, self._i = cal, appts, 0
+        self.IncludeRecurrences = False
+
+    @property
+    def Count(self):
+        return len(self._a)
+
+    def Sort(self, _key): self._a.sort(key=lambda a: a.Start)
+    def Item(self, i): return self._a[i - 1]
+
+    def Restrict(self, flt):
+        from fredag.fake_outlook import parse_filter
+        ops = {">": lambda a, b: a > b, ">=": lambda a, b: a >= b, "<": lambda a, b: a < b, "<=": lambda a, b: a <= b}
+        clauses = parse_filter(flt)
+        self._cal.restricts.append(flt)
+        return _Items(self._cal, [a for a in self._a
+                                  if all(ops[op](getattr(a, f), v) for f, op, v in clauses)])
+
+    def GetFirst(self):
+        self._i = 0
+        return self.GetNext()
+
+    def GetNext(self):
+        if self._i >= len(self._a): return None
+        self._i += 1
+        return self._a[self._i - 1]
+
+
+class _Table:
+    def __init__(self, eids):
+        self._e = list(eids); self.Columns = type("Cols", (), {"Add": lambda s, c: None})()
+
+    @property
+    def EndOfTable(self): return not self._e
+
+    def GetNextRow(self):
+        eid = self._e.pop(0)
+        return type("Row", (), {"Item": lambda s, c: eid})()
+
+
+class _Calendar:
+    StoreID, EntryID, FolderPath = "S", "CAL", "\\\\Postboks\\Kalender"
+
+    def __init__(self, appts):
+        self.appts, self.restricts, self.tables = list(appts), [], 0
+
+    @property
+    def Items(self): return _Items(self, list(self.appts))
+
+    def GetTable(self):
+        self.tables += 1
+        return _Table(a.EntryID for a in self.appts)
+
+
+def test_sync_is_incremental_for_deletes_adds_and_new_days(monkeypatch):
+    t0 = datetime(2025, 3, 3, 12)
+    far = CalendarSnapshot.desired_window(t0)[1] + timedelta(hours=10)   # rett utenfor dagens vindu
+    cal = _Calendar([_Appt("a", t0 + timedelta(days=1)), _Appt("b", t0 + timedelta(days=2)),
+                     _Appt("gammel", t0 - timedelta(days=90, hours=2)), _Appt("ny_dag", far)])
+    monkeypatch.setattr(calendar_cache, "calendar_folders", lambda session, sub: iter([cal]))
+    snap = CalendarSnapshot()
+    snap.sync(None, now=t0)
+    eids = lambda: sorted(e["eid"] for e in snap.events)
+    assert eids() == ["a", "b", "gammel"] and len(cal.restricts) == 1
+
+    # sletting + ny avtale samme dag: delta + EntryID-avstemming, ingen full omlasting
+    cal.appts = [a for a in cal.appts if a.EntryID != "b"] + [_Appt("c", t0 + timedelta(days=3), modified=t0 + timedelta(hours=1))]
+    cal.restricts.clear()
+    snap.sync(None, now=t0 + timedelta(hours=2))
+    assert eids() == ["a", "c", "gammel"] and cal.tables == 1
+    assert all("LastModificationTime" in f for f in cal.restricts)
+
+    # ny dag: bare de nye dagene lastes, utløpte avtaler fjernes
+    cal.restricts.clear()
+    snap.sync(None, now=t0 + timedelta(days=1))
+    assert eids() == ["a", "c", "ny_dag"]
+    start_filters = [f for f in cal.restricts if f.startswith("[Start]")]
+    assert start_filters == ["[Start] >= '03/04/2026 12:00 AM' AND [Start] <= '03/05/2026 12:00 AM'"]
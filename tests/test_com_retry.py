@@ -0,0 +1,158 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from fredag import com_retry, group_archiver, group_mover, outlook_core, state_store, telemetry
+from fredag.fake_outlook import FakeComError, generate_mailbox
+from fredag.group_rules import GroupRule
+
+
+@pytest.fixture(autouse=True)
+def _no_sleep(tmp_path, monkeypatch, mover_env):
+    waits = []
+    com_retry.set_default_governor(com_retry.Governor(retries=3, sleep=waits.append, seed=0))
+    monkeypatch.setattr(telemetry, "metrics_path", lambda: tmp_path / "metrics.jsonl")
+    yield waits
+    com_retry.set_default_governor(None)
+
+
+def _flaky(n, exc=None):
+    left = [n]
+    def fn(x):
+        if left[0] > 0:
+            left[0] -= 1
+            raise exc or FakeComError()
+        return x * 2
+    return fn
+
+
+def test_transient_errors_are_retried_with_growing_backoff(_no_sleep):
+    assert com_retry.is_transient(FakeComError())
+    assert com_retry.is_transient(Exception(-2147352567, "Exception occurred.",
+                                            (4096, "Outlook", "Serveren er opptatt.", None, 0, -2147221237), None))
+    assert com_retry.is_transient(Exception("The administrator has limited the number of items ..."))
+    assert not com_retry.is_transient(ValueError("feil sti"))
+
+    g = com_retry.default_governor()
+    with telemetry.run("search"):
+        assert com_retry.call(_flaky(2), 21, stage="search") == 42
+    backoffs = [w for w in _no_sleep if w >= g.backoff_sec / 2]      # resten er pacing før hvert kall
+    assert len(backoffs) == 2 and backoffs[0] <= backoffs[1] <= g.max_backoff_sec
+    snap = g.snapshot()
+    assert (snap["retries"], snap["throttled"], snap["failures"]) == (2, 2, 0)
+    recs = [json.loads(l) for l in telemetry.metrics_path().read_text(encoding="utf-8").splitlines()]
+    st = next(r for r in recs if r.get("stage") == "search")
+    assert (st["retries"], st["throttled"]) == (2, 2)
+
+    with pytest.raises(FakeComError):
+        com_retry.call(_flaky(10), 1)                      # 1 + 3 forsøk, så gir vi opp
+    with pytest.raises(ValueError):
+        com_retry.call(_flaky(1, ValueError("x")), 1)      # ikke forbigående: ingen nye forsøk
+    assert g.snapshot()["failures"] == 1 and g.snapshot()["retries"] == 5
+
+
+def test_governor_backs_off_on_throttle_and_recovers():
+    g = com_retry.Governor(max_concurrency=8, sleep=lambda s: None)
+    for _ in range(3):
+        g.on_throttle()
+    assert g.limit == 1.0 and g.pace == pytest.approx(0.2)
+    for _ in range(200):
+        g.on_success(0.001)
+    assert g.limit == 8.0 and g.pace == 0.0
+    for _ in range(50):
+        g.on_success(0.5)                                  # mye tregere enn grunnlinjen
+    assert g.limit < 8.0 and g.slow > 0
+
+
+def test_slowness_is_judged_per_call_kind():
+    g = com_retry.Governor(max_concurrency=4, sleep=lambda s: None)
+    for _ in range(20):
+        for _ in range(100):
+            g.on_success(2e-5, "search:GetNextRow")
+        g.on_success(0.02, "search:GetTable")              # alltid tregt, men normalt for GetTable
+    assert g.slow == 0 and g.limit == 4.0
+    for _ in range(30):
+        g.on_success(0.2, "search:GetTable")               # vedvarende 10x tregere
+    assert g.slow > 0 and g.limit < 4.0
+
+
+def test_slot_enforces_concurrency_limit():
+    g = com_retry.Governor(max_concurrency=2)
+    active, peak, lock = [0], [0], threading.Lock()
+    def work():
+        with g.slot():
+            with lock:
+                active[0] += 1; peak[0] = max(peak[0], active[0])
+            time.sleep(0.01)
+            with lock:
+                active[0] -= 1
+    ts = [threading.Thread(target=work) for _ in range(8)]
+    for t in ts: t.start()
+    for t in ts: t.join()
+    assert peak[0] == 2
+
+
+@pytest.mark.parametrize("engine", [outlook_core._search_via_gettable, outlook_core._search_via_items])
+def test_search_under_random_throttling_matches_clean_run(engine, search_rows):
+    end = datetime.now().replace(microsecond=0) - timedelta(hours=1)
+    clean = search_rows(generate_mailbox(800, n_senders=40, days=30, end=end, seed=3), 60, engine)
+    s = generate_mailbox(800, n_senders=40, days=30, end=end, seed=3)
+    s.faults = {"*": 0.01}                                 # 1 % av alle COM-kall avvises
+    assert search_rows(s, 60, engine) == clean and sum(s.faults_raised.values()) > 0
+
+
+def test_move_retries_rejected_calls(kunde_mailbox, search_rows):
+    rules = [GroupRule("Kunde", "", ["@kunde.no"], move_to_folder_path="\\\\Postboks\\Arkiv\\KundeX",
+                       move_mark_read=True)]
+    for bulk in (True, False):
+        s, _ = kunde_mailbox()
+        rows = search_rows(s)
+        for op in ("Items.Restrict", "Mail.Move", "Namespace.GetItemFromID", "Mail.set"):
+            s.fail_next(op, 2)
+        summary, _, _ = group_mover.move_by_groups(s, rows, rules=rules, bulk=bulk)
+        assert summary["Kunde"]["moved"] == 31 and summary["Kunde"]["errors"] == 0
+        assert sum(s.faults_raised.values()) >= 6
+        assert not any(s.mailbox.unread)
+
+
+def test_archive_retries_and_does_not_mark_failed_messages(tmp_path, archive_env, kunde_mailbox, search_rows):
+    rules = [GroupRule("Kunde", str(tmp_path / "arkiv"), ["@kunde.no"])]
+    s, _ = kunde_mailbox(n_attachments=1)
+    rows = search_rows(s)
+    s.fail_next("Namespace.GetItemFromID", 2)              # tas igjen av gjenforsøkene
+    s.fail_next("Attachment.SaveAsFile", 4)                # én melding bruker opp alle forsøk
+    summary, _ = group_archiver.archive_by_groups(s, rows, rules=rules)
+    assert summary["Kunde"]["msgs"] == 31 and summary["Kunde"]["failed"] == 1
+    assert summary["Kunde"]["saved"] == 30
+
+    summary, _ = group_archiver.archive_by_groups(s, rows, rules=rules)
+    assert summary["Kunde"] == {"saved": 1, "skipped": 0, "msgs": 1, "failed": 0}
+
+
+def test_archive_marks_permanent_failures_as_done(tmp_path, archive_env, kunde_mailbox, search_rows):
+    rules = [GroupRule("Kunde", str(tmp_path / "arkiv"), ["@kunde.no"])]
+    s, _ = kunde_mailbox(n_attachments=1)
+    rows = search_rows(s)
+    s.fail_next("Attachment.SaveAsFile", 1, hresult=-2147467259)   # E_FAIL: varig, ingen nye forsøk
+    summary, _ = group_archiver.archive_by_groups(s, rows, rules=rules)
+    assert summary["Kunde"]["failed"] == 0 and summary["Kunde"]["saved"] == 30
+    assert group_archiver.archive_by_groups(s, rows, rules=rules)[0] == {}     # prøves ikke om og om igjen
+
+
+def test_archive_rechecks_state_inside_dir_lock(tmp_path, archive_env, kunde_mailbox, search_rows, monkeypatch):
+    rules = [GroupRule("Kunde", str(tmp_path / "arkiv"), ["@kunde.no"])]
+    s, _ = kunde_mailbox(n_attachments=1)
+    rows = search_rows(s)
+    real = group_archiver.dir_locks
+    def racing_locks(*a):
+        # en annen prosess rekker å arkivere halvparten mellom gruppering og lås
+        for r in rows[::2]:
+            state_store.mark_archived(r["eid"])
+        return real(*a)
+    monkeypatch.setattr(group_archiver, "dir_locks", racing_locks)
+    summary, _ = group_archiver.archive_by_groups(s, rows, rules=rules)
+    left = [r for r in rows[1::2] if "@kunde.no" in r["from_email"]]
+    assert summary["Kunde"]["msgs"] == len(left) and summary["Kunde"]["saved"] == len(left)
@@ -0,0 +1,36 @@
+import json
+import os
+from pathlib import Path
+
+from fredag import config_cache
+from fredag.group_rules import _parse_rules
+
+
+def _write(p: Path, names, mtime_ns: int):
+    p.write_text(json.dumps({"groups": [{"name": n, "target_dir": ".", "senders": [f"@{n}.no"]}
+                                        for n in names]}), encoding="utf-8")
+    os.utime(p, ns=(mtime_ns, mtime_ns))
+
+
+def test_reparses_only_when_mtime_or_size_changes(tmp_path: Path):
+    p = tmp_path / "grupper.json"
+    _write(p, ["a"], 1_000_000_000)
+    calls, seen = [], []
+    def parse(path):
+        calls.append(path); return _parse_rules(path)
+    config_cache.on_reload(p, lambda rules: seen.append([r.name for r in rules]))
+
+    first = config_cache.load(p, parse)
+    assert config_cache.load(p, parse) is first and len(calls) == 1
+
+    _write(p, ["b"], 1_000_000_000)                  # samme mtime og størrelse – fortsatt cachet
+    assert config_cache.load(p, parse) is first
+    _write(p, ["bb"], 1_000_000_000)                 # størrelsen endret
+    assert [r.name for r in config_cache.load(p, parse)] == ["bb"]
+    _write(p, ["cc"], 2_000_000_000)                 # mtime endret
+    assert [r.name for r in config_cache.load(p, parse)] == ["cc"]
+
+    assert len(calls) == 3 and seen == [["a"], ["bb"], ["cc"]]
+    config_cache.invalidate(p)
+    config_cache.load(p, parse)
+    assert len(calls) == 4
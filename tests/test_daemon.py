@@ -0,0 +1,64 @@
+import sys
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from fredag.daemon import CronSpec, Daemon, Job, send_command
+
+
+def test_cron_next_after():
+    fri = CronSpec("0 16 * * fri")
+    assert fri.next_after(datetime(2025, 1, 6, 9, 0)) == datetime(2025, 1, 10, 16, 0)   # mandag → fredag
+    assert fri.next_after(datetime(2025, 1, 10, 16, 0)) == datetime(2025, 1, 17, 16, 0)
+
+    every = CronSpec("*/30 8-9 * * mon-fri")
+    assert every.next_after(datetime(2025, 1, 10, 9, 45)) == datetime(2025, 1, 13, 8, 0)
+    assert every.matches(datetime(2025, 1, 13, 9, 30))
+    with pytest.raises(ValueError):
+        CronSpec("61 * * * *")
+
+
+def test_due_jobs_run_with_one_session(tmp_path: Path):
+    made, seen = [], []
+    def factory():
+        made.append(object()); return made[-1]
+    now = [datetime(2025, 1, 10, 15, 59)]
+    job = Job("x", CronSpec("0 16 * * *"), lambda d: seen.append(d.session) or "ok")
+    d = Daemon([job], session_factory=factory, address=str(tmp_path / "s"), authkey=b"k",
+               clock=lambda: now[0])
+
+    assert d.run_due() == []
+    now[0] = datetime(2025, 1, 10, 16, 0, 5)
+    assert [r["ok"] for r in d.run_due()] == [True]
+    now[0] = datetime(2025, 1, 11, 16, 0)
+    d.run_due()
+    assert len(made) == 1 and seen == [made[0], made[0]]      # sesjonen gjenbrukes
+    assert job.next_run == datetime(2025, 1, 12, 16, 0)
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="bruker Unix-socket i tmp_path")
+def test_commands_over_socket_run_on_daemon_thread(tmp_path: Path):
+    threads = []
+    job = Job("x", None, lambda d: threads.append(threading.current_thread()) or f"kjørt mot {d.session}")
+    addr = str(tmp_path / "fredag.sock")
+    d = Daemon([job], session_factory=lambda: "falsk-sesjon", address=addr, authkey=b"hemmelig")
+    t = threading.Thread(target=d.serve_forever, daemon=True)
+    t.start()
+    try:
+        for _ in range(100):
+            if Path(addr).exists():
+                break
+            threading.Event().wait(0.02)
+        assert send_command("ping", addr, b"hemmelig")["msg"] == "pong"
+        r = send_command("run", addr, b"hemmelig", job="x")
+        assert r["ok"] and r["msg"] == "kjørt mot falsk-sesjon"
+        assert threads == [t]
+        assert send_command("status", addr, b"hemmelig")["jobs"]["x"]["last"]["ok"]
+        assert not send_command("run", addr, b"hemmelig", job="finnes-ikke")["ok"]
+        send_command("stop", addr, b"hemmelig")
+    finally:
+        d.stop()
+        t.join(5)
+    assert not t.is_alive()
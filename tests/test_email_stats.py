@@ -0,0 +1,101 @@
+from datetime import datetime
+
+from fredag.email_stats import _count_senders_in_folder
+from fredag.outlook_core import SMTP_PROP
+
+
+# ---- Fakes: GetTable med rader (ingen MailItem-objekter) ----
+class FakeRow:
+    def __init__(self, values):
+        self._v = values
+
+    def Item(self, col):
+        return self._v.get(col)
+
+
+class FakeColumns:
+    def __init__(self):
+        self.names = []
+
+    def RemoveAll(self):
+        self.names.clear()
+
+    def Add(self, name):
+        self.names.append(name)
+
+
+class FakeTable:
+    def __init__(self, rows):
+        self._rows = list(rows)
+        self.Columns = FakeColumns()
+
+    @property
+    def EndOfTable(self):
+        return not self._rows
+
+    def GetNextRow(self):
+        return FakeRow(self._rows.pop(0)) if self._rows else None
+
+
+class FakeFolder:
+    def __init__(self, rows):
+        self._rows = rows
+        self.filters = []
+
+    def GetTable(self, flt=""):
+        self.filters.append(flt)
+        return FakeTable(self._rows)
+
+
+def test_count_senders_via_gettable():
+    rows = [
+        {"SenderName": "Ola", SMTP_PROP: "Ola@X.no", "MessageClass": "IPM.Note"},
+        {"SenderName": "Ola", SMTP_PROP: "ola@x.no", "MessageClass": "IPM.Note"},
+        {"SenderName": "Kari", SMTP_PROP: None, "SenderEmailAddress": "kari@y.no", "MessageClass": "IPM.Note"},
+        {"SenderName": "Møte", SMTP_PROP: "m@x.no", "MessageClass": "IPM.Schedule.Meeting.Request"},
+    ]
+    folder = FakeFolder(rows)
+    counts = _count_senders_in_folder(folder, datetime(2025, 1, 6))
+
+    assert counts[("Ola", "ola@x.no")] == 2
+    assert counts[("Kari", "kari@y.no")] == 1
+    assert sum(counts.values()) == 3
+    assert folder.filters == ["[ReceivedTime] >= '01/06/2025 12:00 AM'"]
+
+
+def test_daily_aggregate_top_and_trend(state_db):
+    from datetime import date
+    from fredag import state_store
+
+    def row(eid, day, smtp, size=100, attach=0):
+        return {"eid": eid, "dt": datetime(2025, 1, day, 9, 0), "from": smtp.split("@")[0],
+                "from_email": smtp, "size": size, "attach": attach}
+
+    rows = [row("E1", 6, "a@x.no"), row("E2", 7, "a@x.no"), row("E3", 7, "b@y.no", attach=1),
+            row("E0", 1, "a@x.no")]
+    assert state_store.record_sender_rows(rows) == 4
+    # samme EntryID telles ikke to ganger (søk + ukeskanning)
+    assert state_store.record_sender_rows(rows[:2]) == 0
+
+    top = state_store.top_senders(date(2025, 1, 6), date(2025, 1, 12), 10)
+    assert top == [("a", "a@x.no", 2), ("b", "b@y.no", 1)]
+
+    avg = state_store.sender_weekly_average(date(2025, 1, 6), 4)
+    assert avg == {("a", "a@x.no"): 0.25}
+
+
+def test_search_rows_with_exchange_dn_are_left_for_the_smtp_scan(state_db):
+    from datetime import date
+    from fredag import state_store
+    from fredag.email_stats import rows_from_search
+
+    dn = "/o=exchangelabs/ou=exchange administrative group/cn=recipients/cn=kari"
+    search = [{"eid": "E1", "dt": datetime(2025, 1, 6, 9), "from": " Kari Nordmann ", "from_email": dn},
+              {"eid": "E2", "dt": datetime(2025, 1, 6, 10), "from": "Ola", "from_email": "Ola@X.no"}]
+    assert state_store.record_sender_rows(rows_from_search(search)) == 1
+    # ukeskanningen (SMTP via PR_SENDER_SMTP_ADDRESS) teller E1 under samme nøkkel som ellers
+    scan = [{"eid": "E1", "dt": datetime(2025, 1, 6, 9), "from": "Kari Nordmann", "from_email": "kari@x.no"},
+            {"eid": "E3", "dt": datetime(2025, 1, 7, 9), "from": "Kari Nordmann", "from_email": "kari@x.no"}]
+    assert state_store.record_sender_rows(scan) == 2
+    top = state_store.top_senders(date(2025, 1, 6), date(2025, 1, 12), 10)
+    assert top == [("Kari Nordmann", "kari@x.no", 2), ("Ola", "ola@x.no", 1)]
@@ -0,0 +1,37 @@
+import csv
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from fredag.excel_export import HEADERS, export_rows_to_csv, export_rows_to_xlsx
+
+
+def _rows(n):
+    # Generator – eksporten skal ikke trenge en liste i minnet
+    for i in range(n):
+        yield {"dt": datetime(2025, 1, 6, 9, i % 60), "subject": f"Emne {i}", "from": "Ola",
+               "from_email": "ola@x.no", "attach": i % 3, "unread": i % 2 == 0, "folder": "\\\\Innboks"}
+
+
+def test_csv_fast_path(tmp_path: Path):
+    p = tmp_path / "ut.csv"
+    assert export_rows_to_csv(str(p), _rows(5)) is None
+    with open(p, newline="", encoding="utf-8-sig") as f:
+        lines = list(csv.reader(f, delimiter=";"))
+    assert lines[0] == HEADERS
+    assert len(lines) == 6
+    assert lines[1][:2] == ["2025-01-06 09:00", "Emne 0"]
+
+
+def test_xlsx_splits_sheets_at_row_limit(tmp_path: Path):
+    openpyxl = pytest.importorskip("openpyxl")
+    p = tmp_path / "ut.xlsx"
+    assert export_rows_to_xlsx(str(p), _rows(25), max_rows_per_sheet=11) is None
+
+    wb = openpyxl.load_workbook(p, read_only=True)
+    assert wb.sheetnames == ["Eposter", "Eposter (2)", "Eposter (3)"]
+    sizes = [sum(1 for _ in ws.iter_rows()) for ws in wb.worksheets]
+    assert sizes == [11, 11, 6]          # topptekst + 10, 10, 5 rader
+    last = list(wb["Eposter (3)"].iter_rows(values_only=True))
+    assert last[0] == tuple(HEADERS) and last[-1][1] == "Emne 24"
@@ -0,0 +1,66 @@
+import time
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from fredag import fake_outlook, outlook_core
+from fredag.fake_outlook import FakeNamespace, eid_of, generate_mailbox, parse_filter
+
+def test_generator_is_deterministic_and_search_engines_agree(never_stop):
+    a, b = generate_mailbox(3000, seed=7), generate_mailbox(3000, seed=7)
+    assert a.mailbox.received == b.mailbox.received and a.mailbox.sender == b.mailbox.sender
+
+    res, err, aborted = outlook_core.search_messages(
+        a, "", "", date(2025, 6, 1), date(2025, 6, 30), True, False, True, 10_000, 10_000, never_stop)
+    assert err is None and not aborted and res
+    assert all(r["attach"] and datetime(2025, 6, 1) <= r["dt"] for r in res)
+    assert a.calls["Folder.GetTable"] == 5                # Innboks + 4 undermapper
+
+    inbox = a.GetDefaultFolder(6)
+    flt = outlook_core._restrict_str(datetime(2025, 6, 1), None, None, True)
+    via_items, _, _ = outlook_core._search_via_items(a, inbox, flt, "", "", True, 10_000, 10_000, never_stop, None)
+    mails = {r["eid"] for r in res if not a.mailbox.kind[int(r["eid"][-12:], 16)]}
+    assert {r["eid"] for r in via_items} == mails        # Items-motoren hopper over møteinnkallinger
+
+
+def test_before_date_includes_the_last_minute_of_the_day(never_stop):
+    s = FakeNamespace()
+    inbox = s.folder(s.add_store("Postboks", ["Innboks"]), "Innboks")
+    day = date.today() - timedelta(days=3)
+    late = s.add_message(inbox, datetime.combine(day, datetime.max.time()) - timedelta(seconds=10),
+                         ("Kunde AS", "post@kunde.no", "post@kunde.no"))
+    s.add_message(inbox, datetime.combine(day + timedelta(days=1), datetime.min.time()),
+                  ("Kunde AS", "post@kunde.no", "post@kunde.no"))
+    res, err, _ = outlook_core.search_messages(s, "", "", day, day, True, False, False, 100, 100, never_stop)
+    assert err is None and [r["eid"] for r in res] == [late]
+
+
+def test_table_getarray_move_and_latency():
+    s = FakeNamespace(latency={"Mail.Move": 0.002})
+    st = s.add_store("Postboks", ["Innboks", "Arkiv"])
+    inbox, arkiv = s.folder(st, "Innboks"), s.folder(st, "Arkiv")
+    sender = ("Kunde AS", "post@kunde.no", "post@kunde.no")
+    eids = [s.add_message(inbox, datetime(2025, 1, d), sender, n_attachments=1) for d in (1, 2, 3)]
+
+    tbl = inbox.GetTable("[ReceivedTime] > '01/01/2025 12:00 PM'")
+    tbl.Columns.RemoveAll(); tbl.Columns.Add("[EntryID]"); tbl.Columns.Add(fake_outlook.SMTP_PROP)
+    assert tbl.GetArray(10) == ((eids[1], "post@kunde.no"), (eids[2], "post@kunde.no"))
+    assert tbl.EndOfTable
+
+    item = s.GetItemFromID(eids[0])
+    assert item.Attachments.Item(1).Size > 0
+    t0 = time.perf_counter()
+    item.Move(arkiv)
+    assert time.perf_counter() - t0 >= 0.002
+    assert (inbox.Items.Count, arkiv.Items.Count) == (2, 1)
+    s.GetItemFromID(eids[0]).Move(inbox)                # tilbake – ingen duplikat
+    assert (inbox.Items.Count, arkiv.Items.Count) == (3, 0)
+    assert s.calls["Mail.Move"] == 2
+
+
+def test_parse_filter_rejects_garbage():
+    assert parse_filter("[UnRead] = True AND [Size] >= 10") == [("UnRead", "=", True), ("Size", ">=", 10)]
+    with pytest.raises(ValueError):
+        parse_filter("ReceivedTime after yesterday")
+    with pytest.raises(LookupError):
+        FakeNamespace().GetItemFromID(eid_of(5))
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from fredag import folder_index
+from fredag.fake_outlook import FakeNamespace
+from fredag.group_mover import get_folder_by_path
+
+
+@pytest.fixture(autouse=True)
+def _tmp_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(folder_index, "_path", lambda: tmp_path / "folder_index.json")
+    monkeypatch.setattr(folder_index, "_INDEX", None)
+
+
+def _session():
+    s = FakeNamespace()
+    s.add_store("Postboks", ["Innboks", "Arkiv\\KundeX", "Arkiv\\2024"])
+    s.add_store("Felles", ["Innboks", "Prosjekter\\PRJ-1"])
+    return s
+
+
+def _walk_calls(s):
+    return s.calls["Folders.Item"] + s.calls["Collection.Item"]
+
+
+def test_resolve_uses_index_after_first_walk_and_survives_restart(tmp_path, monkeypatch):
+    s = _session()
+    f = get_folder_by_path(s, "//felles/prosjekter/ PRJ-1 ")
+    assert f.FolderPath == "\\\\Felles\\Prosjekter\\PRJ-1" and _walk_calls(s) > 0
+
+    s.reset_calls()
+    assert get_folder_by_path(s, "\\\\Felles\\Prosjekter\\PRJ-1") is f
+    assert _walk_calls(s) == 0 and s.calls["Namespace.GetFolderFromID"] == 1
+
+    assert get_folder_by_path(s, "Arkiv\\KundeX").FolderPath == "\\\\Postboks\\Arkiv\\KundeX"   # DefaultStore
+    saved = json.loads((tmp_path / "folder_index.json").read_text(encoding="utf-8"))["items"]
+    assert saved["\\\\arkiv\\kundex"]["path"] == "\\\\Postboks\\Arkiv\\KundeX"
+
+    monkeypatch.setattr(folder_index, "_INDEX", None)           # ny prosess: leses fra disk
+    s.reset_calls()
+    assert get_folder_by_path(s, "arkiv/kundex").Name == "KundeX" and _walk_calls(s) == 0
+    assert get_folder_by_path(s, "\\\\Postboks\\Finnes ikke") is None
+
+
+def test_stale_entries_are_rebuilt_individually():
+    s = _session()
+    kx = get_folder_by_path(s, "\\\\Postboks\\Arkiv\\KundeX")
+    y24 = get_folder_by_path(s, "\\\\Postboks\\Arkiv\\2024")
+    kx.Name = "KundeY"                                           # omdøpt i Outlook
+    new = s.folder(s._stores[0], "Arkiv\\KundeX")               # ny mappe med gammelt navn
+
+    s.reset_calls()
+    assert get_folder_by_path(s, "\\\\Postboks\\Arkiv\\KundeX") is new
+    assert _walk_calls(s) > 0
+    s.reset_calls()
+    assert get_folder_by_path(s, "\\\\Postboks\\Arkiv\\2024") is y24 and _walk_calls(s) == 0
+    assert get_folder_by_path(s, "\\\\Postboks\\Arkiv\\KundeY") is kx
+
+
+def test_list_paths_builds_once_for_pickers():
+    s = _session()
+    paths = folder_index.list_paths(s)
+    assert "\\\\Felles\\Prosjekter\\PRJ-1" in paths and "\\\\Postboks\\Arkiv" in paths and len(paths) == 9
+    s.reset_calls()
+    assert folder_index.list_paths(s) == paths and s.com_calls == 0
+    assert get_folder_by_path(s, "\\\\Postboks\\Arkiv\\2024").Name == "2024" and _walk_calls(s) == 0
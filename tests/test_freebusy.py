@@ -0,0 +1,42 @@
+from datetime import datetime, time, timedelta
+
+from fredag.freebusy import free_slots, merge_busy
+
+
+def _ev(start, minutes, busy=2):
+    return {"start": start, "end": start + timedelta(minutes=minutes), "busy": busy}
+
+
+def test_merge_busy_overlaps_and_free_status():
+    d = datetime(2025, 3, 3, 9, 0)
+    merged = merge_busy([_ev(d, 60), _ev(d + timedelta(minutes=30), 60),
+                         _ev(d + timedelta(hours=3), 30), _ev(d + timedelta(hours=5), 60, busy=0)])
+    assert merged == [(d, d + timedelta(minutes=90)),
+                      (d + timedelta(hours=3), d + timedelta(hours=3, minutes=30))]
+
+
+def test_free_slots_within_working_hours():
+    mon = datetime(2025, 3, 3)  # mandag
+    events = [
+        _ev(mon.replace(hour=8), 120),                   # 08–10
+        _ev(mon.replace(hour=10, minute=30), 300),       # 10:30–15:30
+        _ev(datetime(2025, 3, 4, 7), 60 * 9),            # tirsdag 07–16 (hele dagen)
+    ]
+    slots = free_slots(events, mon.date(), datetime(2025, 3, 10).date(), timedelta(minutes=60), n=3)
+    # mandag har kun 30-min luker; tirsdag er full; onsdag morgen er første ledige time
+    assert slots[0] == (datetime(2025, 3, 5, 8), datetime(2025, 3, 5, 9))
+    assert [s.date() for s, _ in slots] == [datetime(2025, 3, 5).date(), datetime(2025, 3, 6).date(),
+                                            datetime(2025, 3, 7).date()]
+
+    short = free_slots(events, mon.date(), mon.date(), timedelta(minutes=30), n=5,
+                       work_start=time(8), work_end=time(16))
+    assert short == [(mon.replace(hour=10), mon.replace(hour=10, minute=30)),
+                     (mon.replace(hour=15, minute=30), mon.replace(hour=16))]
+
+
+def test_free_slots_step_and_not_before():
+    mon = datetime(2025, 3, 3)
+    slots = free_slots([], mon.date(), mon.date(), timedelta(minutes=60), n=3,
+                       step=timedelta(minutes=60), not_before=mon.replace(hour=9, minute=5))
+    assert [s.hour for s, _ in slots] == [9, 10, 11]
+    assert slots[0][0].minute == 15
@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from fredag import fulltext_index
+from fredag.fake_outlook import FakeNamespace, generate_mailbox
+
+pytestmark = pytest.mark.skipif(not fulltext_index.available(), reason="SQLite uten FTS5")
+
+@pytest.fixture(autouse=True)
+def _tmp_db(tmp_path, monkeypatch):
+    fulltext_index.close()
+    monkeypatch.setattr(fulltext_index, "_db_path", lambda: tmp_path / "fulltext.db")
+    monkeypatch.setattr(fulltext_index, "_settings", lambda: {})
+    yield
+    fulltext_index.close()
+
+
+def _doc(eid, days_ago, body, store="S1", subject="", atts=()):
+    return {"eid": eid, "store": store, "dt": datetime.now() - timedelta(days=days_ago),
+            "subject": subject, "from": "Kunde AS", "folder": "\\\\Postboks\\Innboks",
+            "body": body, "attachments": list(atts)}
+
+
+def test_search_ranks_and_quotes_user_input():
+    fulltext_index.add_documents([
+        _doc("E1", 1, "Vedlagt faktura for mars. Faktura forfaller snart."),
+        _doc("E2", 2, "Møtereferat fra styret", subject="Faktura?"),
+        _doc("E3", 3, "Ingen treff her", atts=["kontrakt_2025.pdf"]),
+    ])
+    hits = fulltext_index.search("faktura")
+    assert [h["eid"] for h in hits][:2] == ["E2", "E1"]        # emne veier mest
+    assert "[faktura]" in hits[1]["snippet"].lower()
+    assert [h["eid"] for h in fulltext_index.search("kontrakt*")] == ["E3"]
+    assert [h["eid"] for h in fulltext_index.search("MØTEREFERAT")] == ["E2"]
+    assert len(fulltext_index.search('(faktura"')) == 2 and fulltext_index.search("  ") == []
+    assert fulltext_index.search("faktura", store="S2") == []
+
+
+def test_reindex_replaces_and_cap_evicts_oldest_per_store():
+    fulltext_index.add_documents([_doc(f"E{i}", 10 - i, "x" * 1000) for i in range(10)])
+    fulltext_index.add_documents([_doc("O1", 50, "y" * 1000, store="S2")])
+    fulltext_index.add_documents([_doc("E9", 1, "ny tekst om budsjett")])
+    assert [h["eid"] for h in fulltext_index.search("budsjett")] == ["E9"]
+    assert fulltext_index.stats()["S1"]["docs"] == 10
+
+    evicted = fulltext_index.enforce_cap(5000, ["S1"])
+    st = fulltext_index.stats()
+    assert evicted == 5 and st["S1"]["docs"] == 5 and st["S1"]["bytes"] <= 5000
+    assert fulltext_index.known_eids(["E0", "E4", "E5", "E9"]) == {"E5", "E9"}
+    assert st["S2"]["docs"] == 1                                # andre stores røres ikke
+
+    assert fulltext_index.prune(30) == 1 and "S2" not in fulltext_index.stats()
+
+
+def test_index_rows_from_search_results_is_incremental(search_rows):
+    end = datetime.now().replace(microsecond=0)
+    s = generate_mailbox(300, days=20, end=end, seed=3)
+    res = search_rows(s, days=30)
+
+    added = fulltext_index.index_rows(s, res, window_days=10, max_mb=100)
+    inside = [r for r in res if r["dt"] >= datetime.now() - timedelta(days=10)]
+    assert 0 < added == len(inside) < len(res)
+    assert s.calls["Namespace.GetItemFromID"] == added
+
+    s.reset_calls()
+    assert fulltext_index.index_rows(s, res, window_days=10, max_mb=100) == 0
+    assert s.calls["Namespace.GetItemFromID"] == 0             # allerede indeksert → ikke åpnet igjen
+
+    r = inside[0]
+    hits = fulltext_index.search(r["subject"].split()[0], limit=1000)
+    assert r["eid"] in {h["eid"] for h in hits}
+
+
+def test_attachment_names_are_searchable():
+    s = FakeNamespace()
+    st = s.add_store("Postboks", ["Innboks"])
+    inbox = s.folder(st, "Innboks")
+    eid = s.add_message(inbox, datetime.now() - timedelta(days=1), ("Kunde AS", "post@kunde.no", "post@kunde.no"),
+                        n_attachments=2)
+    rows = [{"eid": eid, "store": None, "dt": datetime.now() - timedelta(days=1), "subject": "", "from": ""}]
+    assert fulltext_index.index_rows(s, rows) == 1
+    name = s.GetItemFromID(eid).Attachments.Item(1).FileName
+    assert [h["eid"] for h in fulltext_index.search(name.rsplit(".", 1)[0])] == [eid]
+
+
+def test_backfill_walks_past_the_search_cap_in_date_slices(search_rows, monkeypatch):
+    end = datetime.now().replace(microsecond=0) - timedelta(minutes=5)
+    s = generate_mailbox(1500, days=40, end=end, seed=5)
+    total = len(search_rows(s, days=60))
+    # søket fra auto_archive har allerede indeksert den nyeste uka
+    fulltext_index.index_rows(s, search_rows(s, days=6), window_days=60, max_mb=100)
+
+    monkeypatch.setattr(fulltext_index, "_settings", lambda: {"cap_total": 100, "cap_per_folder": 100})
+    first = fulltext_index.backfill(s, days=60)
+    assert sum(v["docs"] for v in fulltext_index.stats().values()) == total and first > 100
+
+    s.reset_calls()
+    assert fulltext_index.backfill(s, days=60) == 0
+    assert s.calls["Folder.GetTable"] == 5                # bare nyeste intervall, så stopp
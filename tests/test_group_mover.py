@@ -0,0 +1,67 @@
+from datetime import datetime
+
+import pytest
+
+from fredag import group_mover
+from fredag.fake_outlook import parse_dasl
+from fredag.group_rules import GroupRule
+
+pytestmark = pytest.mark.usefixtures("mover_env")
+_ARKIV = "\\\\Postboks\\Arkiv\\KundeX"
+
+
+def _rules(senders=("@kunde.no",)):
+    return [GroupRule("VIP", "", ["sjef@kunde.no"], move_to_folder_path="\\\\Postboks\\Arkiv\\VIP"),
+            GroupRule("Kunde", "", list(senders), move_to_folder_path=_ARKIV, move_mark_read=True)]
+
+
+def _placement(s):
+    mb = s.mailbox
+    return [(s._folders[mb.folder_of[i]].FolderPath, mb.unread[i]) for i in range(len(mb))]
+
+
+def test_bulk_moves_via_restrict_and_matches_per_item(kunde_mailbox, search_rows):
+    a, old = kunde_mailbox()
+    summary, unassigned, _ = group_mover.move_by_groups(a, search_rows(a), rules=_rules(), bulk=True)
+    assert summary["Kunde"]["moved"] == summary["Kunde"]["bulk"] == 30 and summary["VIP"]["moved"] == 1
+    assert len(unassigned) == 1 and summary["Kunde"]["per_sec"] > 0
+    # lest-markering lagres eksplisitt før Move, én Save per ulest melding (15 av 30)
+    assert a.calls["Namespace.GetItemFromID"] == 0 and a.calls["Mail.Save"] == 15
+    assert a.calls["Items.Restrict"] == 3                 # VIP i Innboks, Kunde i Innboks og Kunder
+
+    b, _ = kunde_mailbox()
+    group_mover.move_by_groups(b, search_rows(b), rules=_rules(), bulk=False)
+    assert b.calls["Namespace.GetItemFromID"] == 31
+    assert _placement(a) == _placement(b)
+    # ikke i søkeresultatet (for gammel) → blir liggende selv om avsenderen matcher
+    assert a.GetItemFromID(old).Parent.FolderPath.endswith("Innboks")
+
+
+def test_bulk_falls_back_per_item_when_filter_or_folder_is_unusable(kunde_mailbox, search_rows):
+    s, _ = kunde_mailbox()
+    rows = search_rows(s)
+    rows[0] = dict(rows[0], folder="\\\\Postboks\\Finnes ikke")
+    summary, _, _ = group_mover.move_by_groups(s, rows, rules=_rules(["kari[0-3]@kunde.no"]), bulk=True)
+    assert summary["Kunde"]["moved"] == 30 and summary["Kunde"]["bulk"] == 0
+    assert s.calls["Namespace.GetItemFromID"] == 30       # VIP går fortsatt via Restrict
+
+    s, _ = kunde_mailbox()
+    rows = search_rows(s)
+    rows[0] = dict(rows[0], folder="\\\\Postboks\\Finnes ikke")
+    summary, _, _ = group_mover.move_by_groups(s, rows, rules=_rules(), bulk=True, dry_run=True)
+    assert summary["Kunde"]["moved"] == 30 and summary["Kunde"]["bulk"] == 29
+    assert s.calls["Mail.Move"] == 0
+
+
+def test_group_dasl_is_a_superset_of_the_matcher():
+    rule = GroupRule("G", "", ["@kunde.no", "ola*@x.no", "o'brien"])
+    flt = group_mover.group_dasl(rule, [{"dt": datetime(2025, 3, 3, 9)}])
+    pred = parse_dasl(flt)
+
+    def hit(name, smtp, when=datetime(2025, 3, 3, 12)):
+        v = {"SenderName": name, "SenderEmailAddress": smtp, "ReceivedTime": when,
+             "http://schemas.microsoft.com/mapi/proptag/0x5D01001E": smtp}
+        return pred(v.get)
+    assert hit("Kari", "KARI@Kunde.no") and hit("Ola N", "ola.n@x.no") and hit("Pat O'Brien", "pat@y.no")
+    assert not hit("Per", "per@annet.no") and not hit("Kari", "kari@kunde.no", datetime(2025, 3, 6))
+    assert group_mover.group_dasl(GroupRule("G", "", ["[ab]*@x.no"]), []) is None
@@ -14,3 +14,18 @@ def test_resolve_group_wildcard_in_name():
     rules = [GroupRule(name="Leverandør", target_dir=".", senders=["*as"]) ]
     r = resolve_group(rules, "no-reply@annet.no", "Fabrikk AS")
     assert r and r.name == "Leverandør"
+
+def test_rule_matcher_agrees_with_resolve_group():
+    from fredag.group_rules import RuleMatcher
+    rules = [
+        GroupRule(name="Navn", target_dir=".", senders=["ola"]),
+        GroupRule(name="Domene", target_dir=".", senders=["@kundex.no", "*@*.gov"]),
+        GroupRule(name="Eksakt", target_dir=".", senders=["ola@kundex.no", "*as"]),
+    ]
+    m = RuleMatcher(rules)
+    cases = [("ola@kundex.no", "Ola N"), ("kari@kundex.no", "Kari"), ("x@y.gov", "X"),
+             ("a@b.no", "Fabrikk AS"), ("ola@kundex.no", "Per"), ("z@z.no", "Z"), ("", "")]
+    for smtp, name in cases * 2:          # andre runde går via huskede svar
+        want = resolve_group(rules, smtp, name)
+        got = m.match(smtp, name)
+        assert (got and got.name) == (want and want.name), (smtp, name)
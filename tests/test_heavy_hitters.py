@@ -0,0 +1,40 @@
+import random
+from collections import Counter
+
+from fredag.heavy_hitters import SpaceSaving, SenderTally
+
+
+def _zipf_stream(n_keys=5000, n=60000, seed=1):
+    rnd = random.Random(seed)
+    weights = [1.0 / (i + 1) for i in range(n_keys)]
+    return rnd.choices([f"k{i}" for i in range(n_keys)], weights=weights, k=n)
+
+
+def test_space_saving_error_bound():
+    stream = _zipf_stream()
+    truth = Counter(stream)
+    ss = SpaceSaving(capacity=200)
+    for k in stream:
+        ss.add(k)
+
+    assert len(ss) <= 200
+    assert ss.max_error <= len(stream) / 200
+    for key, est, err in ss.top(25):
+        assert truth[key] <= est <= truth[key] + err
+    # de tyngste nøklene er med
+    assert {k for k, _ in truth.most_common(5)} <= {k for k, _e, _r in ss.top(25)}
+
+
+def test_tally_switches_to_sketch_over_threshold():
+    t = SenderTally(threshold=100, capacity=50)
+    for k in _zipf_stream(n_keys=1000, n=5000):
+        t.add(k)
+    assert not t.exact
+    assert t.max_error > 0
+    assert t.top(1)[0][0] == "k0"
+
+    small = SenderTally(threshold=100, capacity=50)
+    for k in ["a", "a", "b"]:
+        small.add(k)
+    assert small.exact and small.max_error == 0
+    assert small.top(2) == [("a", 2), ("b", 1)]
@@ -0,0 +1,46 @@
+import sys
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from fredag import Helgesjekk_HTML as hs
+from fredag.fake_outlook import FakeNamespace
+
+
+@pytest.fixture
+def app(monkeypatch):
+    """FakeApplication med to postbokser; pywin32-eventene går via app.pump()."""
+    s = FakeNamespace()
+    a, b = s.add_store("Postboks", ["Innboks", "Innboks\\Kunder"]), s.add_store("Felles", ["Innboks"])
+    sow = hs._start_of_week_local()
+    for k in range(6):
+        s.add_message(s.folder(a, "Innboks"), sow + timedelta(minutes=k), ("Kari", "kari@kunde.no", "kari@kunde.no"))
+    s.add_message(s.folder(a, "Innboks\\Kunder"), sow, ("Ola", "ola@annet.no", "ola@annet.no"))
+    for k in range(3):
+        s.add_message(s.folder(b, "Innboks"), sow + timedelta(hours=k), ("Per", "per@felles.no", "per@felles.no"))
+    s.add_message(s.folder(a, "Innboks"), sow - timedelta(days=2), ("Gammel", "gammel@x.no", "gammel@x.no"))
+
+    app = s.Application
+    monkeypatch.setattr(hs, "win32", SimpleNamespace(WithEvents=lambda _app, cls: app.sinks.append(cls()) or app.sinks[-1]))
+    monkeypatch.setitem(sys.modules, "pythoncom", SimpleNamespace(PumpWaitingMessages=app.pump))
+    monkeypatch.setitem(sys.modules, "win32event", SimpleNamespace(
+        QS_ALLINPUT=0, MsgWaitForMultipleObjects=lambda *a: time.sleep(a[2] / 1000)))
+    return app
+
+
+def test_weekly_stats_use_concurrent_search_in_all_inboxes(app):
+    stats = hs._weekly_sender_stats(app.Session, 10, app)
+    assert stats == [("Kari", "kari@kunde.no", 6), ("Per", "per@felles.no", 3), ("Ola", "ola@annet.no", 1)]
+    assert len(app.searches) == 2 and app.Session.calls["Folder.Items"] == 0
+
+
+def test_weekly_stats_fall_back_to_scan_when_search_is_incomplete(app, monkeypatch):
+    monkeypatch.setattr(hs, "SEARCH_TIMEOUT_SEC", 0.05)
+    app.hang_scopes.append("Felles")
+    stats = hs._weekly_sender_stats(app.Session, 10, app)
+    # Skanningen dekker bare default Innboks + undermapper
+    assert stats == [("Kari", "kari@kunde.no", 6), ("Ola", "ola@annet.no", 1)]
+    assert [x.stopped for x in app.searches] == [False, True]
+    assert app.Session.calls["Folder.Items"] > 0
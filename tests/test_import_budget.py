@@ -0,0 +1,23 @@
+import pytest
+
+from fredag.benchmarks.bench_importtime import CLI_BUDGET_MS, measure
+
+CLI_MODULES = ("auto_archive", "retention_job", "daemon", "config_cli")
+
+# Skal først lastes når de faktisk trengs (GUI, Excel, bilder, COM, sqlite, logg-rotasjon, IPC)
+HEAVY = ("tkinter", "openpyxl", "PIL", "win32com", "pythoncom", "sqlite3",
+         "logging.handlers", "multiprocessing.connection")
+
+
+@pytest.mark.parametrize("module", CLI_MODULES)
+def test_cli_import_within_budget(module):
+    # beste av tre – første kjøring kan måle kald diskcache
+    best = min(measure(module)["total_ms"] for _ in range(3))
+    assert best < CLI_BUDGET_MS, f"{module}: {best} ms"
+
+
+def test_cli_modules_do_not_load_heavy_deps():
+    check = "import sys; print(','.join(m for m in %r if m in sys.modules))" % (HEAVY,)
+    for module in CLI_MODULES:
+        loaded = measure(module, extra=check)["stdout"].strip()
+        assert loaded == "", f"{module} laster {loaded}"
@@ -0,0 +1,66 @@
+import json
+import os
+import socket
+from pathlib import Path
+
+from fredag.locking import Lock
+
+
+def test_second_lock_fails_and_sees_holder(tmp_path: Path):
+    a = Lock("jobb", root=tmp_path)
+    assert a.acquire()
+    info = json.loads(a.path.read_text(encoding="utf-8"))
+    assert info["pid"] == os.getpid() and info["host"] == socket.gethostname()
+
+    b = Lock("jobb", root=tmp_path)
+    assert not b.acquire(timeout_sec=0.3)
+    assert b.holder["pid"] == os.getpid()
+    assert b.wait_sec >= 0.3
+    assert not b.is_stale(b.holder)
+
+    a.release()
+    assert a.path.read_text(encoding="utf-8") == ""   # ryddig avslutning
+    assert b.acquire() and b.recovered is None
+    b.release()
+
+
+def test_leftover_lock_file_from_crash_is_taken_over(tmp_path: Path):
+    # Fil igjen etter krasj (ingen OS-lås holdes): gammel 'pid='-stil og JSON
+    p = tmp_path / "jobb.lock"
+    p.write_text("pid=999999\n", encoding="utf-8")
+    lk = Lock("jobb", root=tmp_path)
+    assert lk.is_stale()
+    assert lk.acquire()
+    assert lk.recovered == {"pid": 999999}
+    lk.release()
+
+    p.write_text(json.dumps({"pid": 999999, "host": socket.gethostname(), "started": "2025-01-01T00:00:00"}))
+    with Lock("jobb", root=tmp_path) as lk2:
+        assert lk2.acquire() and lk2.recovered["started"] == "2025-01-01T00:00:00"
+
+
+def test_resource_locks_all_or_nothing_in_sorted_order(tmp_path: Path):
+    import pytest
+    from fredag.locking import LockBusy, contention_report, reset_contention_stats, resource_locks
+
+    reset_contention_stats()
+    blocker = Lock("b", root=tmp_path)
+    assert blocker.acquire()
+    with pytest.raises(LockBusy):
+        with resource_locks([("c", "C"), ("a", "A"), ("b", "B")], timeout_sec=0.2, root=tmp_path):
+            pass
+    # 'a' ble tatt før 'b' (sortert) og må være sluppet igjen; 'c' ble aldri forsøkt
+    with resource_locks([("a", "A")], timeout_sec=0, root=tmp_path) as held:
+        assert [lk.name for lk in held] == ["a"]
+    stats = {r["name"]: r for r in contention_report()}
+    assert stats["b"]["busy"] == 1 and stats["b"]["contended"] == 1
+    assert "c" not in stats
+    blocker.release()
+
+
+def test_dir_locks_cover_nested_group_dirs(tmp_path: Path):
+    from fredag.locking import dir_lock, dir_locks
+
+    a, ab, c = str(tmp_path / "A"), str(tmp_path / "A" / "B"), str(tmp_path / "C")
+    assert dir_locks(ab, [a, ab, c]) == sorted({dir_lock(a), dir_lock(ab)})
+    assert dir_locks(c, [a, ab, c]) == [dir_lock(c)]
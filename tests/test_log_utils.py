@@ -0,0 +1,41 @@
+import logging
+from pathlib import Path
+
+from fredag import log_utils
+from fredag.log_utils import RepeatFilter
+
+
+def _rec(msg="GetTable feilet for %s", arg="x"):
+    return logging.LogRecord("fredag.outlook_core", logging.WARNING, __file__, 1, msg, (arg,), None)
+
+
+def test_repeat_filter_limits_and_reports_count():
+    now = [0.0]
+    f = RepeatFilter(window_sec=60, burst=3, clock=lambda: now[0])
+    passed = [f.filter(_rec(arg=str(i))) for i in range(10)]
+    assert passed == [True] * 3 + [False] * 7
+    assert f.filter(_rec("Annen melding %s"))              # annen mal telles for seg
+
+    now[0] = 61.0
+    r = _rec(arg="ny")
+    assert f.filter(r) and "×7 undertrykt" in r.getMessage()
+
+    for i in range(5):
+        f.filter(_rec(arg=str(i)))
+    (summary,) = f.pending_summaries()
+    assert "×3" in summary.getMessage() and f.pending_summaries() == []
+
+
+def test_queue_logger_writes_in_background(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(log_utils, "_logs_dir", lambda: tmp_path)
+    logger = log_utils.setup_file_logger("fredag_qtest")
+    try:
+        for i in range(500):
+            logger.warning("Feil under bygging av søkeresultat %d", i)
+        logger.info("ferdig")
+    finally:
+        log_utils.flush_logging()
+    text = (tmp_path / "fredag_qtest.log").read_text(encoding="utf-8")
+    lines = text.splitlines()
+    assert len(lines) == 5                                  # 3 + «ferdig» + sammendrag
+    assert "ferdig" in text and "×497 (undertrykt" in text
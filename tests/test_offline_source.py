@@ -0,0 +1,85 @@
+from datetime import date, datetime
+from email.message import EmailMessage
+
+import pytest
+
+from fredag import dedup_index, offline_source, state_store
+from fredag.email_stats import update_sender_aggregate_offline
+from fredag.group_rules import GroupRule
+
+
+def _mail(sender, subject, day, body="Hei", att=None) -> bytes:
+    m = EmailMessage()
+    m["From"], m["To"], m["Subject"] = sender, "meg@firma.no", subject
+    m["Date"] = f"Mon, {day:02d} Mar 2025 09:30:00 +0000"
+    m.set_content(body)
+    if att:
+        m.add_attachment(att[1], maintype="application", subtype="octet-stream", filename=att[0])
+    return m.as_bytes()
+
+
+@pytest.fixture
+def export(tmp_path):
+    root = tmp_path / "eksport"
+    (root / "eml").mkdir(parents=True)
+    msgs = [_mail("Kari <kari@kunde.no>", "Faktura 1", 3, att=("f1.pdf", b"%PDF-1")),
+            _mail("Ola <ola@annet.no>", "Lunsj", 4, body="From the kitchen\n>From escaped"),
+            _mail("Kari <kari@kunde.no>", "Faktura 2", 5, att=("f2.pdf", b"%PDF-2"))]
+    with open(root / "innboks.mbox", "wb") as f:
+        for raw in msgs:
+            f.write(b"From MAILER-DAEMON Mon Mar  3 09:30:00 2025\n" + raw.replace(b"\nFrom ", b"\n>From ") + b"\n")
+    (root / "eml" / "a.eml").write_bytes(_mail("Kari <kari@kunde.no>", "Faktura 3", 6, att=("f1.pdf", b"%PDF-1")))
+    (root / "eml" / "b.eml").write_bytes(_mail("Per <per@kunde.no>", "Kontrakt", 7, att=("k.docx", b"PK")))
+    return root
+
+
+def test_rows_items_and_sharding(export):
+    rows = list(offline_source.iter_rows([export]))
+    assert [r["subject"] for r in rows] == ["Faktura 1", "Lunsj", "Faktura 2", "Faktura 3", "Kontrakt"]
+    assert [r["attach"] for r in rows] == [1, 0, 1, 1, 1]
+    assert rows[0]["from_email"] == "kari@kunde.no" and rows[0]["dt"].date() == date(2025, 3, 3)
+    assert rows[0]["eid"].startswith("mbox:") and rows[3]["eid"].startswith("eml:")
+
+    it = offline_source.OfflineSession().GetItemFromID(rows[1]["eid"])
+    assert it.Subject == "Lunsj" and "From escaped" in it.Body and it.Attachments.Count == 0
+    att = offline_source.load_item(rows[2]["eid"]).Attachments.Item(1)
+    out = export / "ut.pdf"
+    att.SaveAsFile(str(out))
+    assert att.FileName == "f2.pdf" and out.read_bytes() == b"%PDF-2"
+
+    # små mbox-biter: hver melding havner i nøyaktig én bit, uansett hvor grensene faller
+    for shard_bytes in (1, 97, 400):
+        assert [r["eid"] for r in offline_source.iter_rows_parallel([export], workers=1, shard_bytes=shard_bytes)] \
+            == [r["eid"] for r in rows]
+    assert [r["subject"] for r in offline_source.iter_rows([export], after=date(2025, 3, 5), before=date(2025, 3, 6))] \
+        == ["Faktura 2", "Faktura 3"]
+
+
+def test_process_pool_matches_serial(export):
+    serial = list(offline_source.iter_rows([export]))
+    assert list(offline_source.iter_rows_parallel([export], workers=2, shard_bytes=200)) == serial
+
+
+def test_archive_offline_and_sender_stats(export, tmp_path, archive_env):
+    rules = [GroupRule("Kunde", str(tmp_path / "arkiv"), ["@kunde.no"])]
+
+    summary, unassigned = offline_source.archive_offline([export], rules=rules, workers=1)
+    assert unassigned == 1 and summary["Kunde"]["msgs"] == 4
+    # f1.pdf finnes både i mbox og .eml – lagres bare én gang
+    assert summary["Kunde"]["saved"] == 3 and summary["Kunde"]["skipped"] == 1
+    assert sorted(p.name for p in (tmp_path / "arkiv").rglob("*.pdf")) == ["f1.pdf", "f2.pdf"]
+    assert offline_source.archive_offline([export], rules=rules, workers=1)[0] == {}   # alt allerede arkivert
+
+    assert update_sender_aggregate_offline([export], workers=1) == 5
+    assert update_sender_aggregate_offline([export], workers=1) == 0
+    top = state_store.top_senders(date(2025, 3, 1), date(2025, 3, 31), 1)
+    assert top[0][1:] == ("kari@kunde.no", 3)
+
+
+def test_dedup_merge_keeps_other_writers_hashes(tmp_path):
+    p = tmp_path / "dedup_index.json"
+    now = datetime.now().timestamp()
+    dedup_index.save_index({"a": now, "gammel": now - 400 * 86400}, p)
+    mine = {"b": now}                                  # lest før 'a' ble skrevet av en annen prosess
+    dedup_index.save_index(mine, p, merge=True, ttl_days=365)
+    assert set(dedup_index.load_index(p)) == {"a", "b"} and set(mine) == {"a", "b"}
@@ -0,0 +1,88 @@
+from pathlib import Path
+
+from fredag import preview_cache
+from fredag.preview_cache import PreviewCache, Prefetcher
+
+
+class FakeAttachment:
+    def __init__(self, content: bytes):
+        self._content = content
+        self.saves = 0
+
+    def SaveAsFile(self, path):
+        self.saves += 1
+        Path(path).write_bytes(self._content)
+
+
+class FakeAttachments:
+    def __init__(self, files):
+        self._files = files
+
+    @property
+    def Count(self):
+        return len(self._files)
+
+    def Item(self, i: int):
+        return self._files[i - 1]
+
+
+class FakeMail:
+    def __init__(self, files):
+        self.Attachments = FakeAttachments(files)
+
+
+def test_put_get_text_and_persisted_index(tmp_path: Path):
+    cache = PreviewCache(tmp_path, budget_bytes=10_000)
+    att = FakeAttachment(b"<p>Hei &amp; hallo</p>")
+    hit = cache.put("EID", 1, 22, "side.html", att.SaveAsFile)
+    assert hit["file"].read_bytes() == b"<p>Hei &amp; hallo</p>"
+    assert hit["text"] == "Hei &amp; hallo"
+
+    # Ny instans leser indeksen fra disk – ingen ny lagring via COM
+    again = PreviewCache(tmp_path, budget_bytes=10_000)
+    assert again.put("EID", 1, 22, "side.html", att.SaveAsFile)["file"] == hit["file"]
+    assert att.saves == 1
+    # Annen størrelse = annen nøkkel (vedlegget er byttet ut)
+    assert again.get("EID", 1, 23) is None
+
+
+def test_lru_eviction_respects_budget(tmp_path: Path):
+    cache = PreviewCache(tmp_path, budget_bytes=2500)
+    for i in (1, 2):
+        cache.put("EID", i, 1000, f"f{i}.bin", FakeAttachment(b"x" * 1000).SaveAsFile)
+    cache.get("EID", 1, 1000)                      # 1 er nå sist brukt
+    cache.put("EID", 3, 1000, "f3.bin", FakeAttachment(b"x" * 1000).SaveAsFile)
+
+    assert ("EID", 2, 1000) not in cache
+    assert ("EID", 1, 1000) in cache and ("EID", 3, 1000) in cache
+    assert cache.total_bytes <= 2500
+
+
+def test_prefetcher_fills_cache(tmp_path: Path):
+    cache = PreviewCache(tmp_path)
+    mail = FakeMail([FakeAttachment(b"a"), FakeAttachment(b"bb"), FakeAttachment(b"ccc")])
+    pf = Prefetcher(cache, "EID", lambda: mail)
+    pf.request([(2, 2, "b.txt"), (3, 3, "c.txt")])
+    pf.stop(finish=True); pf.join(5)
+
+    assert cache.get("EID", 2, 2)["text"] == "bb"
+    assert cache.get("EID", 3, 3)["text"] == "ccc"
+    assert cache.get("EID", 1, 1) is None
+
+
+def test_instances_sharing_root_merge_index_and_budget(tmp_path: Path, monkeypatch):
+    a = PreviewCache(tmp_path, budget_bytes=2500)
+    b = PreviewCache(tmp_path, budget_bytes=2500)
+    a.put("A", 1, 1000, "a1.bin", FakeAttachment(b"x" * 1000).SaveAsFile)
+    b.put("B", 1, 1000, "b1.bin", FakeAttachment(b"x" * 1000).SaveAsFile)
+    a.put("A", 2, 1000, "a2.bin", FakeAttachment(b"x" * 1000).SaveAsFile)
+
+    # b sin oppføring overlever a sin flush, og budsjettet gjelder summen – eldste (A,1) er kastet
+    fresh = PreviewCache(tmp_path, budget_bytes=2500)
+    assert ("B", 1, 1000) in fresh and ("A", 2, 1000) in fresh and ("A", 1, 1000) not in fresh
+    dirs = [p for p in tmp_path.iterdir() if p.is_dir()]
+    assert len(dirs) == 2 and not list(tmp_path.glob("*.tmp"))
+
+    monkeypatch.setattr(preview_cache, "_root", lambda: tmp_path)
+    monkeypatch.setattr(preview_cache, "_CACHE", None)
+    assert preview_cache.get_cache() is preview_cache.get_cache()
@@ -0,0 +1,76 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from fredag import telemetry
+
+
+@pytest.fixture
+def metrics(tmp_path: Path, monkeypatch):
+    p = tmp_path / "metrics.jsonl"
+    monkeypatch.setattr(telemetry, "metrics_path", lambda: p)
+    return p
+
+
+def test_run_writes_job_and_aggregated_stage_records(metrics: Path):
+    telemetry.count("hash", items=99)                     # ingen aktiv kjøring – ignoreres
+    with telemetry.run("archive", dry_run=True):
+        for _ in range(3):
+            with telemetry.stage("hash") as st:
+                st.add(items=1, bytes=10)
+        with telemetry.run("nested"):                     # gjenbruker ytre kjøring
+            telemetry.count("extract", com_calls=2, errors=1)
+
+    recs = [json.loads(l) for l in metrics.read_text(encoding="utf-8").splitlines()]
+    assert {r["job"] for r in recs} == {"archive"} and len({r["run"] for r in recs}) == 1
+    hash_rec = next(r for r in recs if r.get("stage") == "hash")
+    assert (hash_rec["calls"], hash_rec["items"], hash_rec["bytes"]) == (3, 3, 30)
+    job = recs[-1]
+    assert job["kind"] == "job" and job["status"] == "ok" and job["dry_run"] is True
+    assert (job["items"], job["com_calls"], job["errors"]) == (3, 2, 1)
+
+
+def test_failed_run_recent_runs_and_prometheus(metrics: Path, tmp_path: Path):
+    with pytest.raises(SystemExit):
+        with telemetry.run("retention"):
+            with telemetry.stage("retention"):
+                raise SystemExit("Avbrutt.")
+    with telemetry.run("retention"):
+        pass
+
+    runs = telemetry.recent_runs(job="retention")
+    assert [r["status"] for r in runs] == ["error", "ok"]
+    assert runs[0]["stages"]["retention"]["errors"] == 1 and "Avbrutt" in runs[0]["error"]
+
+    prom = tmp_path / "fredag.prom"
+    telemetry.write_prometheus(prom)
+    text = prom.read_text(encoding="utf-8")
+    assert 'fredag_job_success{job="retention"} 1' in text
+
+
+def test_rotation_keeps_backups(tmp_path: Path):
+    p = tmp_path / "m.jsonl"
+    for i in range(10):
+        telemetry.emit([{"i": i, "pad": "x" * 50}], path=p, max_bytes=200, backups=2)
+    assert p.exists() and (tmp_path / "m.jsonl.1").exists() and (tmp_path / "m.jsonl.2").exists()
+    assert not (tmp_path / "m.jsonl.3").exists()
+    assert [r["i"] for r in telemetry.read_records(p)][-1] == 9
+
+
+def test_counters_are_exact_across_worker_threads(metrics: Path):
+    import threading
+
+    with telemetry.run("archive") as r:
+        def work():
+            with telemetry.bind(r):
+                for _ in range(2000):
+                    telemetry.count("hash", items=1, bytes=2)
+                    with telemetry.stage("write"):
+                        pass
+        ts = [threading.Thread(target=work) for _ in range(8)]
+        for t in ts: t.start()
+        for t in ts: t.join()
+    recs = {x.get("stage"): x for x in telemetry.read_records(metrics)}
+    assert (recs["hash"]["items"], recs["hash"]["bytes"]) == (16000, 32000)
+    assert recs["write"]["calls"] == 16000 and recs[None]["items"] == 16000
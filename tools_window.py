@@ -9,6 +9,7 @@ from typing import Dict, List
 
 from .outlook_core import save_attachments, search_messages, mail_as_text
 from .widgets_datepicker import DatePicker
+from .widgets_virtuallist import VirtualList
 from .attachments_window import AttachmentsWindow
 from .excel_export import export_messages_to_xlsx
 from .archiver import archive_messages
@@ -29,9 +30,6 @@ class OutlookToolsWindow(tk.Toplevel):
         self.session = session
 
         self._stop_evt = threading.Event()
-        self._results: List[Dict] = []
-        self._id_to_ix: Dict[str, int] = {}
-        self._row_iids: List[str] = []
         self._save_per_sender = tk.BooleanVar(value=False)
 
         self._build_ui()
@@ -73,18 +71,14 @@ class OutlookToolsWindow(tk.Toplevel):
         ttk.Checkbutton(r2, text="Bare uleste", variable=self.unread_var).pack(side="left", padx=(16,0))
         ttk.Checkbutton(r2, text="Kun med vedlegg", variable=self.attach_var).pack(side="left")
 
-        mid = ttk.Frame(frm); mid.pack(fill="both", expand=True, pady=(6,4))
-        cols = ("dato","emne","fra","vedlegg","ulest")
-        self.tree = ttk.Treeview(mid, columns=cols, show="headings", height=16)
-        for c,t,w,a in [("dato","Dato",165,"w"),("emne","Emne",560,"w"),("fra","Fra",260,"w"),
-                        ("vedlegg","#Vedlegg",80,"e"),("ulest","Ulest",60,"center")]:
-            self.tree.heading(c, text=t); self.tree.column(c, width=w, anchor=a)
-        self.tree.pack(side="left", fill="both", expand=True)
-        sb = ttk.Scrollbar(mid, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscroll=sb.set); sb.pack(side="right", fill="y")
-        self.tree.bind("<<TreeviewSelect>>", self.on_select)
-        self.tree.bind("<Double-1>", lambda e: self.open_in_outlook())
-        self.tree.bind("<Button-3>", self._popup)
+        # Virtualisert liste: kun synlige rader tegnes, treff kan strømmes inn underveis
+        cols = [("dato","Dato",165,"w"),("emne","Emne",560,"w"),("fra","Fra",260,"w"),
+                ("vedlegg","#Vedlegg",80,"e"),("ulest","Ulest",60,"center")]
+        self.list = VirtualList(frm, cols, self._row_values, height=16)
+        self.list.pack(fill="both", expand=True, pady=(6,4))
+        self.list.bind("<<VirtualListSelect>>", self.on_select)
+        self.list.tree.bind("<Double-1>", lambda e: self.open_in_outlook())
+        self.list.tree.bind("<Button-3>", self._popup)
 
         bot = ttk.Frame(frm); bot.pack(fill="both", expand=True)
         self.body = tk.Text(bot, wrap="word"); self.body.pack(side="left", fill="both", expand=True)
@@ -147,6 +141,32 @@ class OutlookToolsWindow(tk.Toplevel):
     # archive_via_groups, dryrun_via_groups, suggest_groups, show_diag, _async_update_attachment_counts
     # (Du kan beholde disse som i forrige fil – her kommer kun de 2 nye metodene under.)
 
+    # ---- resultatliste (virtualisert) ----
+    @property
+    def _results(self) -> List[Dict]:
+        return self.list.rows
+
+    @staticmethod
+    def _row_values(r: Dict):
+        dt = r.get("dt")
+        d = dt.strftime("%d.%m.%Y %H:%M") if dt else ""
+        subj = (r.get("subject") or "").replace("\r", " ").replace("\n", " ")
+        return (d, subj, f"{r.get('from','')} <{r.get('from_email') or ''}>",
+                r.get("attach", 0), "●" if r.get("unread") else "")
+
+    def _populate(self, res: List[Dict]):
+        """Erstatter hele resultatlisten (kun synlige rader formateres)."""
+        self.list.set_rows(res)
+        self.status.config(text=f"Fant {len(res)} e‑poster.")
+
+    def _append_results(self, rows: List[Dict]):
+        """Legger til en bolk treff mens et strømmende søk pågår (kalles i hovedtråd)."""
+        self.list.append_rows(rows)
+        self.status.config(text=f"Søker… {len(self.list)} treff så langt.")
+
+    def _selected_results(self) -> List[Dict]:
+        return self.list.selected_rows()
+
     # --- NYTT: Flytt via grupper (real) ---
     def move_via_groups(self):
         if not self._results:
@@ -166,7 +186,9 @@ class OutlookToolsWindow(tk.Toplevel):
             def done():
                 lines = ["Flytt via grupper:"]
                 for g, s in summary.items():
-                    lines.append(f"• {g}: flyttet {s['moved']}, feil {s['errors']}")
+                    lines.append(f"• {g}: flyttet {s['moved']}, feil {s['errors']}"
+                                 + (f" ({s['per_sec']}/s, {s['sec']} s)" if s.get("moved") else "")
+                                 + (" – mappen er låst av en annen jobb" if s.get("busy") else ""))
                 if nodest:
                     lines.append(f"\nGrupper uten flytt‑mappe: {', '.join(nodest)}")
                 if unassigned:
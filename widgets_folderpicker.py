@@ -0,0 +1,68 @@
+import tkinter as tk
+from tkinter import ttk
+
+from . import folder_index
+
+__all__ = ["FolderPicker"]
+
+class FolderPicker(tk.Toplevel):
+    """
+    Velg Outlook-mappe fra folder_index (ingen COM-kall når indeksen er bygd).
+    Skriver valgt sti (\\\\Store\\Mappe\\Under) til en tk.StringVar.
+    """
+    def __init__(self, master, session, target_var: tk.StringVar, title: str = "Velg Outlook-mappe"):
+        super().__init__(master)
+        self.title(title)
+        self.geometry("560x480")
+        self.transient(master)
+        self.session = session
+        self.target_var = target_var
+        self._all = []
+
+        frm = ttk.Frame(self, padding=8); frm.pack(fill="both", expand=True)
+        top = ttk.Frame(frm); top.pack(fill="x")
+        ttk.Label(top, text="Filter:").pack(side="left")
+        self.var_filter = tk.StringVar()
+        ent = ttk.Entry(top, textvariable=self.var_filter); ent.pack(side="left", fill="x", expand=True, padx=(6, 6))
+        ttk.Button(top, text="Oppdater fra Outlook", command=lambda: self._load(refresh=True)).pack(side="right")
+        self.var_filter.trace_add("write", lambda *_: self._apply_filter())
+
+        self.lst = tk.Listbox(frm, activestyle="dotbox")
+        self.lst.pack(fill="both", expand=True, pady=(6, 0))
+        self.lst.bind("<Double-Button-1>", lambda _e: self._ok())
+
+        btns = ttk.Frame(frm); btns.pack(fill="x", pady=(6, 0))
+        self.status = ttk.Label(btns, text=""); self.status.pack(side="left")
+        ttk.Button(btns, text="Avbryt", command=self.destroy).pack(side="right")
+        ttk.Button(btns, text="Velg", command=self._ok).pack(side="right", padx=(0, 6))
+
+        self._load(refresh=False)
+        self.var_filter.set("")
+        ent.focus_set()
+
+    def _load(self, refresh: bool):
+        try:
+            self._all = folder_index.list_paths(self.session, refresh=refresh)
+        except Exception as e:
+            self._all = []
+            self.status.config(text=f"Feil: {e}")
+        else:
+            self.status.config(text=f"{len(self._all)} mapper")
+        self._apply_filter()
+
+    def _apply_filter(self):
+        words = self.var_filter.get().casefold().split()
+        self.lst.delete(0, "end")
+        for p in self._all:
+            if all(w in p.casefold() for w in words):
+                self.lst.insert("end", p)
+        cur = folder_index.normalize(self.target_var.get()).casefold()
+        for i, p in enumerate(self.lst.get(0, "end")):
+            if p.casefold() == cur:
+                self.lst.selection_set(i); self.lst.see(i); break
+
+    def _ok(self):
+        sel = self.lst.curselection()
+        if sel:
+            self.target_var.set(self.lst.get(sel[0]))
+        self.destroy()
@@ -0,0 +1,196 @@
+from tkinter import ttk
+from typing import Callable, List, Sequence, Set, Tuple
+
+__all__ = ["VirtualList"]
+
+Column = Tuple[str, str, int, str]   # (id, overskrift, bredde, anchor)
+
+class VirtualList(ttk.Frame):
+    """
+    Virtualisert resultatliste: en Treeview med kun så mange rader som får plass,
+    fylt fra en liste i minnet ved rulling. Raden formateres først når den vises.
+    - set_rows()/append_rows(): bytt eller utvid data (også mens et søk pågår)
+    - utvalg holdes som indekser i data og sendes som <<VirtualListSelect>>
+    """
+    def __init__(self, master, columns: Sequence[Column], formatter: Callable[[object], Sequence],
+                 height: int = 16):
+        super().__init__(master)
+        self._fmt = formatter
+        self._rows: List = []
+        self._top = 0                      # første synlige dataindeks
+        self._sel: Set[int] = set()
+        self._anchor: int | None = None    # for Shift-klikk/piltaster
+        self._pool: List[str] = []         # gjenbrukte Treeview-iid-er
+
+        self.tree = ttk.Treeview(self, columns=[c[0] for c in columns], show="headings",
+                                 height=height, selectmode="none")
+        for cid, title, width, anchor in columns:
+            self.tree.heading(cid, text=title); self.tree.column(cid, width=width, anchor=anchor)
+        self.tree.pack(side="left", fill="both", expand=True)
+        self._sb = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self._sb.pack(side="right", fill="y")
+        self._resize_pool(height)
+
+        t = self.tree
+        t.bind("<Configure>", self._on_configure)
+        t.bind("<MouseWheel>", lambda e: self._scroll(-1 if e.delta > 0 else 1, "units"))
+        t.bind("<Button-4>", lambda e: self._scroll(-1, "units"))
+        t.bind("<Button-5>", lambda e: self._scroll(1, "units"))
+        t.bind("<Button-1>", lambda e: self._click(e, "set"))
+        t.bind("<Control-Button-1>", lambda e: self._click(e, "toggle"))
+        t.bind("<Shift-Button-1>", lambda e: self._click(e, "range"))
+        for key, step in (("<Up>", -1), ("<Down>", 1), ("<Prior>", "-page"), ("<Next>", "page"),
+                          ("<Home>", "home"), ("<End>", "end")):
+            t.bind(key, lambda e, s=step: self._key(s))
+
+    # ---- data ----
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @property
+    def rows(self) -> List:
+        return self._rows
+
+    def set_rows(self, rows: Sequence) -> None:
+        self._rows = list(rows)
+        self._top = 0
+        self._sel.clear(); self._anchor = None
+        self._render()
+
+    def append_rows(self, rows: Sequence) -> None:
+        """Legger til rader på slutten; visningen tegnes bare om hvis de nye radene er synlige."""
+        if not rows:
+            return
+        was = len(self._rows)
+        self._rows.extend(rows)
+        if was < self._top + len(self._pool):
+            self._render()
+        else:
+            self._update_scrollbar()
+
+    def clear(self) -> None:
+        self.set_rows([])
+
+    # ---- utvalg ----
+    def selected_indices(self) -> List[int]:
+        return sorted(i for i in self._sel if i < len(self._rows))
+
+    def selected_rows(self) -> List:
+        return [self._rows[i] for i in self.selected_indices()]
+
+    def index_at(self, y: int) -> int | None:
+        iid = self.tree.identify_row(y)
+        if not iid or iid not in self._pool:
+            return None
+        ix = self._top + self._pool.index(iid)
+        return ix if ix < len(self._rows) else None
+
+    def select(self, ix: int, mode: str = "set") -> None:
+        if not (0 <= ix < len(self._rows)):
+            return
+        if mode == "toggle":
+            self._sel ^= {ix}
+        elif mode == "range" and self._anchor is not None:
+            a, b = sorted((self._anchor, ix))
+            self._sel = set(range(a, b + 1))
+        else:
+            self._sel = {ix}
+        if mode != "range" or self._anchor is None:
+            self._anchor = ix
+        self.see(ix)
+        self._render()
+        self.event_generate("<<VirtualListSelect>>")
+
+    def see(self, ix: int) -> None:
+        n = len(self._pool)
+        if ix < self._top:
+            self._top = ix
+        elif ix >= self._top + n:
+            self._top = ix - n + 1
+        self._clamp()
+
+    # ---- rulling ----
+    def _max_top(self) -> int:
+        return max(0, len(self._rows) - len(self._pool))
+
+    def _clamp(self) -> None:
+        self._top = max(0, min(self._top, self._max_top()))
+
+    def _scroll(self, n: int, what: str) -> str:
+        step = max(1, len(self._pool) - 1) if what == "pages" else 3
+        self._top += n * step
+        self._clamp(); self._render()
+        return "break"
+
+    def _on_scrollbar(self, *args) -> None:
+        if args[0] == "moveto":
+            self._top = int(float(args[1]) * len(self._rows))
+            self._clamp(); self._render()
+        elif args[0] == "scroll":
+            self._scroll(int(args[1]), args[2])
+
+    def _update_scrollbar(self) -> None:
+        total = len(self._rows)
+        if total <= len(self._pool):
+            self._sb.set(0.0, 1.0)
+        else:
+            self._sb.set(self._top / total, (self._top + len(self._pool)) / total)
+
+    def _click(self, e, mode: str) -> str:
+        self.tree.focus_set()
+        ix = self.index_at(e.y)
+        if ix is None:
+            return None          # overskrift/kolonnekant: la Treeview håndtere det
+        self.select(ix, mode)
+        return "break"
+
+    def _key(self, step) -> str:
+        if not self._rows:
+            return "break"
+        cur = self._anchor if self._anchor is not None else self._top
+        page = max(1, len(self._pool) - 1)
+        target = {"home": 0, "end": len(self._rows) - 1, "page": cur + page, "-page": cur - page}.get(step)
+        if target is None:
+            target = cur + step
+        self.select(max(0, min(target, len(self._rows) - 1)))
+        return "break"
+
+    # ---- tegning ----
+    def _resize_pool(self, n: int) -> None:
+        n = max(1, n)
+        while len(self._pool) < n:
+            self._pool.append(self.tree.insert("", "end", values=()))
+        while len(self._pool) > n:
+            self.tree.delete(self._pool.pop())
+
+    def _on_configure(self, e) -> None:
+        # Antall hele rader som får plass: mål radhøyde/overskrift fra første rad
+        try:
+            bbox = self.tree.bbox(self._pool[0])
+        except Exception:
+            bbox = None
+        if not bbox or bbox[3] <= 0:
+            return
+        _x, head, _w, rowh = bbox
+        n = max(1, (e.height - head) // rowh)
+        if n != len(self._pool):
+            self._resize_pool(n)
+            self._clamp(); self._render()
+
+    def _render(self) -> None:
+        t = self.tree
+        selected = []
+        for pos, iid in enumerate(self._pool):
+            ix = self._top + pos
+            if ix < len(self._rows):
+                try:
+                    vals = self._fmt(self._rows[ix])
+                except Exception:
+                    vals = ()
+                t.item(iid, values=vals)
+                if ix in self._sel:
+                    selected.append(iid)
+            else:
+                t.item(iid, values=())
+        t.selection_set(selected)
+        self._update_scrollbar()